@@ -673,6 +673,7 @@ class Order(models.Model):
 
             with transaction.atomic():
                 groups_to_recalc = set() 
+                students_to_recalc = set()
 
                 for item in self.items.all():
                     student = item.student
@@ -723,14 +724,15 @@ class Order(models.Model):
                             student.group = item.target_group
                             groups_to_recalc.add(item.target_group)
                     student.save()
+                    students_to_recalc.add(student.pk)
 
                 self.status = 'APPROVED'
                 self.approved_by = approver_user
                 self.save()
 
-                from journal.models import StudentStatistics
-                for g in groups_to_recalc:
-                    StudentStatistics.recalculate_group(g)
+                from journal import stats_queue
+                stats_queue.mark_students(students_to_recalc)
+                stats_queue.mark_groups(g.pk for g in groups_to_recalc)
 
 
 
@@ -23,8 +23,8 @@ def academic_context(request):
     context = {"current_date": d, "current_term": term}
     
     if request.user.is_authenticated and hasattr(request.user, 'student_profile'):
-        from schedule.models import Semester
-        sem = Semester.get_current()
+        from schedule import semesters
+        sem = semesters.for_request(request)
         if sem and sem.start_date:
             days_passed = (d - sem.start_date).days
             current_week = (days_passed // 7) + 1
@@ -15,6 +15,7 @@ import json
 from datetime import datetime
 from schedule.models import Semester, SubjectMaterial, AcademicPlan, Classroom, Subject
 from schedule.academic_calendar import get_bologna_week, format_rating_week_alerts
+from schedule import semesters
 from lms.models import Course
 import logging
 import os
@@ -239,7 +240,7 @@ def dashboard(request):
                 except Institute.DoesNotExist:
                     pass
 
-            cur_sem = Semester.get_current()
+            cur_sem = semesters.for_request(request)
             slot_qs = ScheduleSlot.objects.filter(semester=cur_sem, is_active=True)
             if selected_institute:
                 slot_qs = slot_qs.filter(group__specialty__department__faculty__institute=selected_institute)
@@ -322,7 +323,7 @@ def dashboard(request):
             context['json_gpa'] = json.dumps(chart_gpa)
             context['json_attendance'] = json.dumps(chart_attendance)
 
-            cur_sem = Semester.get_current()
+            cur_sem = semesters.for_request(request)
             context['schedule_stats'] = {
                 'semester': cur_sem,
                 'active_schedule_slots': ScheduleSlot.objects.filter(
@@ -362,7 +363,7 @@ def dashboard(request):
         current_time = today.time()
         classes =[]
 
-        active_semester = Semester.get_current()
+        active_semester = semesters.for_request(request)
 
         if active_semester:
             base_slots = ScheduleSlot.objects.filter(
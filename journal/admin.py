@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import JournalEntry, JournalChangeLog, StudentStatistics
+from . import student_stats
+from .models import JournalEntry, JournalChangeLog, JournalChangeLogArchive, StudentStatistics
 from .models import MatrixStructure, MatrixColumn, StudentMatrixScore
 
 @admin.register(JournalEntry)
@@ -57,12 +58,12 @@ class JournalChangeLogAdmin(admin.ModelAdmin):
     search_fields = ['entry__student__user__first_name', 'entry__student__user__last_name',
                      'changed_by__user__first_name', 'changed_by__user__last_name']
     date_hierarchy = 'changed_at'
-    raw_id_fields = ['entry', 'changed_by']
+    raw_id_fields = ['entry', 'student', 'subject', 'changed_by']
     readonly_fields = ['changed_at']
     
     fieldsets = (
         ('Информация об изменении', {
-            'fields': ('entry', 'changed_by', 'changed_at')
+            'fields': ('entry', 'student', 'subject', 'changed_by', 'changed_at')
         }),
         ('Старые значения', {
             'fields': ('old_grade', 'old_attendance')
@@ -83,6 +84,24 @@ class JournalChangeLogAdmin(admin.ModelAdmin):
         return obj.get_change_description()
     change_description_display.short_description = 'Изменение'
 
+
+@admin.register(JournalChangeLogArchive)
+class JournalChangeLogArchiveAdmin(admin.ModelAdmin):
+    list_display = ['semester', 'student', 'subject', 'changed_by', 'changed_at', 'change_description_display']
+    list_filter = ['semester']
+    raw_id_fields = ['student', 'group', 'subject', 'changed_by']
+    date_hierarchy = 'changed_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def change_description_display(self, obj):
+        return obj.get_change_description()
+    change_description_display.short_description = 'Изменение'
+
 @admin.register(StudentStatistics)
 class StudentStatisticsAdmin(admin.ModelAdmin):
     list_display = ['student', 'overall_gpa', 'group_rank', 'attendance_percentage', 
@@ -111,10 +130,9 @@ class StudentStatisticsAdmin(admin.ModelAdmin):
     actions = ['recalculate_statistics']
     
     def recalculate_statistics(self, request, queryset):
-        count = 0
-        for stats in queryset:
-            stats.recalculate()
-            count += 1
+        student_ids = list(queryset.values_list('student_id', flat=True))
+        student_stats.recalculate_students(student_ids)
+        count = len(student_ids)
         self.message_user(request, f'Пересчитана статистика для {count} студентов')
     recalculate_statistics.short_description = 'Пересчитать статистику'
 
@@ -0,0 +1,282 @@
+"""
+Пакетная запись ячеек журнала.
+
+Изменения приходят пачкой [{entry_id, value, version?}]. version — отметка
+updated_at записи, с которой ячейка была показана: если запись с тех пор
+изменил кто-то другой, ячейка возвращается конфликтом с текущим значением и
+не перезаписывается (без version — последняя запись побеждает, как в
+update_journal_cell). Записи читаются и блокируются одним запросом вместе с
+проверкой блокировки и версии, сохраняются одним bulk_update, журнал
+изменений пишется одним bulk_create, статистика студентов обновляется через
+stats_queue.
+
+Баллы ведомости (StudentMatrixScore) приходят в том же запросе списком
+[{student_id, subject_id, column_id, value, version?}] и проверяются как в
+update_weekly_score: права на предмет, доступность колонки по неделе
+семестра, диапазон балла. Рейтинг SubjectRating (update_matrix_cell) сюда
+не входит.
+"""
+from __future__ import annotations
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from accounts.models import Student
+from schedule.models import Semester, Subject
+from . import stats_queue
+from .models import JournalChangeLog, JournalEntry, MatrixColumn, StudentMatrixScore
+
+BATCH_LIMIT = 1000
+WRITE_FIELDS = ["grade", "attendance_status", "participation", "modified_by", "updated_at"]
+SCORE_FIELDS = ["score", "updated_by", "updated_at"]
+
+ABSENT_CODES = {
+    "ABSENT_INVALID": ("н", "нб", "nb", "n", "abs"),
+    "ABSENT_VALID": ("у", "ув", "уваж", "u", "v"),
+    "ABSENT_ILLNESS": ("б", "бол", "болезнь", "b", "ill"),
+}
+ABSENT_DISPLAY = {"ABSENT_INVALID": "НБ", "ABSENT_VALID": "У", "ABSENT_ILLNESS": "Б"}
+
+
+def parse_value(raw) -> dict:
+    """
+    Значение из ячейки → {grade, attendance_status[, participation]}.
+    Пусто или «-» очищает ячейку; ValueError с текстом для пользователя.
+    """
+    value = str(raw if raw is not None else "").strip().lower()
+    if value in ("", "-"):
+        return {"grade": None, "attendance_status": "PRESENT", "participation": "NONE"}
+    for status, codes in ABSENT_CODES.items():
+        if value in codes:
+            return {"grade": None, "attendance_status": status}
+    try:
+        grade = float(value.replace(",", "."))
+    except ValueError:
+        raise ValueError(_('Введите число (до 100), "нб" (неуваж), "у" (уваж) или "б" (болезнь)'))
+    if not 0 <= grade <= 100:
+        raise ValueError(_('Оценка должна быть от 0 до 100'))
+    return {"grade": grade, "attendance_status": "PRESENT"}
+
+
+def display(grade, attendance_status) -> tuple[str, str]:
+    """(текст ячейки, тип для CSS) — как их возвращает update_journal_cell."""
+    if attendance_status in ABSENT_DISPLAY:
+        return ABSENT_DISPLAY[attendance_status], attendance_status.lower()
+    if grade is not None:
+        return str(grade), "grade"
+    return "", "clear"
+
+
+def version_of(entry) -> str:
+    return entry.updated_at.isoformat() if entry.updated_at else ""
+
+
+def _cell(entry) -> dict:
+    text, kind = display(entry.grade, entry.attendance_status)
+    return {"entry_id": entry.pk, "display": text, "type": kind, "version": version_of(entry)}
+
+
+def _save(teacher, changed, comment: str, now) -> None:
+    """changed — [(запись с новыми значениями, (балл, статус) до правки, stats_state до правки)]."""
+    for entry, _old, _state in changed:
+        entry.modified_by = teacher
+        entry.updated_at = now
+    JournalEntry.objects.bulk_update([c[0] for c in changed], WRITE_FIELDS, batch_size=500)
+    JournalChangeLog.objects.bulk_create([
+        JournalChangeLog(
+            entry=entry, student_id=entry.student_id, subject_id=entry.subject_id, changed_by=teacher,
+            old_grade=old_grade, old_attendance=old_attendance,
+            new_grade=entry.grade, new_attendance=entry.attendance_status,
+            comment=comment,
+        )
+        for entry, (old_grade, old_attendance), _state in changed
+        if (old_grade, old_attendance) != (entry.grade, entry.attendance_status)
+    ], batch_size=500)
+    stats_queue.entries_changed([(entry.student_id, state, entry.stats_state()) for entry, _old, state in changed])
+
+
+def apply_cells(teacher, changes, comment: str = "Пакетный ввод") -> tuple[list, list]:
+    """
+    Применяет пачку изменений преподавателя. Возвращает (записанные ячейки,
+    конфликты); конфликт — {entry_id, reason, error[, current]}, reason:
+    invalid, not_found, forbidden, locked, version.
+    """
+    conflicts = []
+    parsed = {}
+    for change in changes:
+        entry_id = change.get("entry_id") if isinstance(change, dict) else None
+        try:
+            entry_id = int(entry_id)
+            parsed[entry_id] = (parse_value(change.get("value")), change.get("version") or "")
+        except (TypeError, ValueError) as e:
+            error = str(e) if isinstance(entry_id, int) else _("Некорректная ячейка")
+            conflicts.append({"entry_id": entry_id, "reason": "invalid", "error": error})
+
+    now = timezone.now()
+    written, changed = [], []
+    with transaction.atomic():
+        entries = {e.pk: e for e in JournalEntry.objects.select_for_update().filter(pk__in=list(parsed))}
+        owners = dict(
+            Subject.objects.filter(pk__in={e.subject_id for e in entries.values()}).values_list("id", "teacher_id")
+        )
+        for entry_id, (values, version) in parsed.items():
+            entry = entries.get(entry_id)
+            if entry is None:
+                conflicts.append({"entry_id": entry_id, "reason": "not_found", "error": _("Запись не найдена")})
+                continue
+            if owners.get(entry.subject_id) != teacher.pk:
+                conflicts.append({"entry_id": entry_id, "reason": "forbidden", "error": _("Это не ваш предмет")})
+                continue
+            if entry.locked_at and now >= entry.locked_at:
+                conflicts.append({
+                    "entry_id": entry_id, "reason": "locked",
+                    "error": _("Запись заблокирована (прошло 24 часа)"), "current": _cell(entry),
+                })
+                continue
+            if version and version != version_of(entry):
+                conflicts.append({
+                    "entry_id": entry_id, "reason": "version",
+                    "error": _("Запись уже изменена другим пользователем"), "current": _cell(entry),
+                })
+                continue
+
+            old = (entry.grade, entry.attendance_status)
+            state = entry.stats_state()
+            for field, value in values.items():
+                setattr(entry, field, value)
+            changed.append((entry, old, state))
+        if changed:
+            _save(teacher, changed, comment, now)
+        written = [_cell(entry) for entry, _old, _state in changed]
+    return written, conflicts
+
+
+def _score_cell(key, score) -> dict:
+    student_id, subject_id, column_id = key
+    return {
+        "student_id": student_id, "subject_id": subject_id, "column_id": column_id,
+        "score": score.score if score else None, "version": version_of(score) if score else "",
+    }
+
+
+def _column_closed(column, week: int) -> str | None:
+    """Почему колонка ещё закрыта для ввода на этой неделе семестра; None — открыта."""
+    if column.col_type == "WEEK" and column.week_number and column.week_number > week:
+        return _("Нельзя выставлять баллы за будущие недели!")
+    if column.col_type == "RATING":
+        if "1" in column.name and week < 8:
+            return _("Рейтинг 1 доступен только с 8-й недели!")
+        if "2" in column.name and week < 16:
+            return _("Рейтинг 2 доступен только с 16-й недели!")
+    if column.col_type == "EXAM" and week < 16:
+        return _("Экзамен доступен только с 16-й недели!")
+    return None
+
+
+def apply_scores(user, changes, privileged: bool = False) -> tuple[list, list]:
+    """
+    Пачка баллов ведомости [{student_id, subject_id, column_id, value, version?}].
+    version "" — ячейка была пустой; без version — последняя запись побеждает.
+    privileged (деканат, администратор) — без проверки предмета и недели.
+    Возвращает (записанные ячейки, конфликты) как apply_cells.
+    """
+    conflicts = []
+    parsed = {}
+    for change in changes:
+        try:
+            key = (int(change["student_id"]), int(change["subject_id"]), int(change["column_id"]))
+        except (TypeError, ValueError, KeyError):
+            conflicts.append({"reason": "invalid", "error": _("Некорректная ячейка")})
+            continue
+        raw = str(change.get("value") if change.get("value") is not None else "").strip()
+        try:
+            parsed[key] = (float(raw.replace(",", ".")) if raw else None, change.get("version"))
+        except ValueError:
+            conflicts.append({**_score_cell(key, None), "reason": "invalid", "error": _("Введите корректное число")})
+
+    week = 1
+    if not privileged:
+        semester = Semester.get_current()
+        week = semester.get_current_week_number() if semester else 1
+    teacher = getattr(user, "teacher_profile", None)
+    now = timezone.now()
+    written, to_create, to_update = [], [], []
+    with transaction.atomic():
+        columns = MatrixColumn.objects.in_bulk({key[2] for key in parsed})
+        students = set(Student.objects.filter(pk__in={key[0] for key in parsed}).values_list("id", flat=True))
+        owners = dict(Subject.objects.filter(pk__in={key[1] for key in parsed}).values_list("id", "teacher_id"))
+        scores = {
+            (s.student_id, s.subject_id, s.column_id): s
+            for s in StudentMatrixScore.objects.select_for_update().filter(
+                student_id__in={key[0] for key in parsed},
+                subject_id__in={key[1] for key in parsed},
+                column_id__in={key[2] for key in parsed},
+            )
+        }
+        for key, (value, version) in parsed.items():
+            student_id, subject_id, column_id = key
+            column = columns.get(column_id)
+            current = scores.get(key)
+            if column is None or student_id not in students or subject_id not in owners:
+                conflicts.append({**_score_cell(key, None), "reason": "not_found", "error": _("Запись не найдена")})
+                continue
+            if not privileged and (teacher is None or owners[subject_id] != teacher.pk):
+                conflicts.append({**_score_cell(key, None), "reason": "forbidden", "error": _("Это не ваш предмет")})
+                continue
+            closed = None if privileged else _column_closed(column, week)
+            if closed:
+                conflicts.append({
+                    **_score_cell(key, None), "reason": "locked", "error": closed, "current": _score_cell(key, current),
+                })
+                continue
+            if value is not None and not 0 <= value <= column.max_score:
+                conflicts.append({
+                    **_score_cell(key, None), "reason": "invalid",
+                    "error": _("Балл должен быть от 0 до %(max)s") % {"max": column.max_score},
+                })
+                continue
+            if version is not None and version != (version_of(current) if current else ""):
+                conflicts.append({
+                    **_score_cell(key, None), "reason": "version",
+                    "error": _("Запись уже изменена другим пользователем"), "current": _score_cell(key, current),
+                })
+                continue
+
+            if current is None:
+                current = StudentMatrixScore(student_id=student_id, subject_id=subject_id, column=column)
+                to_create.append(current)
+            else:
+                to_update.append(current)
+            current.score = value
+            current.updated_by = user
+            current.updated_at = now
+            written.append((key, current))
+        StudentMatrixScore.objects.bulk_create(to_create, batch_size=500)
+        StudentMatrixScore.objects.bulk_update(to_update, SCORE_FIELDS, batch_size=500)
+    return [_score_cell(key, score) for key, score in written], conflicts
+
+
+def set_attendance(teacher, subject, student_ids, lesson_date, lesson_time, status: str, comment: str) -> tuple[int, int]:
+    """
+    Статус посещения занятия для нескольких студентов (массовое НБ).
+    Возвращает (обновлено, заблокировано).
+    """
+    now = timezone.now()
+    changed, locked = [], 0
+    with transaction.atomic():
+        for entry in JournalEntry.objects.select_for_update().filter(
+            student_id__in=list(student_ids), subject=subject, lesson_date=lesson_date, lesson_time=lesson_time,
+        ):
+            if entry.locked_at and now >= entry.locked_at:
+                locked += 1
+                continue
+            old = (entry.grade, entry.attendance_status)
+            state = entry.stats_state()
+            entry.attendance_status = status
+            if status != "PRESENT":
+                entry.grade = None
+            changed.append((entry, old, state))
+        if changed:
+            _save(teacher, changed, comment, now)
+    return len(changed), locked
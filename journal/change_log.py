@@ -0,0 +1,170 @@
+"""
+История изменений журнала: чтение курсором и архив закрытых семестров.
+
+Живая таблица JournalChangeLog хранит правки текущих семестров. Команда
+archive_journal_log переносит правки закрытого семестра (семестр правки —
+по дате занятия записи) в JournalChangeLogArchive пачками: вставка в архив и
+удаление из живой таблицы в одной транзакции, так что строка никогда не
+оказывается в обеих таблицах или ни в одной. Архив логически разбит по
+семестрам — индексы начинаются с semester — и при необходимости выгружается
+в JSON Lines.
+
+Страницы истории читаются курсором (changed_at, id) по убыванию, а не
+OFFSET: стоимость страницы не зависит от её номера.
+"""
+from __future__ import annotations
+
+import base64
+import gzip
+import json
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from schedule.models import Semester
+from .models import JournalChangeLog, JournalChangeLogArchive, JournalEntry
+
+PAGE_SIZE = 100
+CHUNK = 2000
+ARCHIVE_FIELDS = (
+    "entry_id", "student_id", "subject_id", "changed_by_id", "changed_at",
+    "old_grade", "old_attendance", "new_grade", "new_attendance", "comment",
+)
+
+
+def encode_cursor(changed_at: datetime, pk: int) -> str:
+    raw = f"{changed_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        stamp, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(stamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def page(queryset, cursor: str | None = None, limit: int = PAGE_SIZE) -> tuple[list, str | None]:
+    """Страница по убыванию (changed_at, id) после курсора; (строки, курсор следующей страницы)."""
+    position = decode_cursor(cursor)
+    if position:
+        changed_at, pk = position
+        queryset = queryset.filter(Q(changed_at__lt=changed_at) | Q(changed_at=changed_at, id__lt=pk))
+    rows = list(queryset.order_by("-changed_at", "-id")[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].changed_at, rows[-1].pk)
+
+
+def live_logs(group, subject):
+    return JournalChangeLog.objects.filter(subject=subject, student__group=group).select_related(
+        "entry", "student__user", "changed_by__user",
+    )
+
+
+def archived_logs(semester, group, subject):
+    return JournalChangeLogArchive.objects.filter(semester=semester, subject=subject, group=group).select_related(
+        "student__user", "changed_by__user",
+    )
+
+
+def archived_semesters(subject) -> list:
+    """Семестры, по которым у предмета есть архив."""
+    ids = JournalChangeLogArchive.objects.filter(subject=subject).values("semester_id").distinct()
+    return list(Semester.objects.filter(pk__in=ids))
+
+
+def closed_semesters(today: date | None = None) -> list:
+    """Закончившиеся семестры, кроме текущего."""
+    today = today or timezone.localdate()
+    current = Semester.get_current()
+    semesters = Semester.objects.filter(end_date__lt=today)
+    if current:
+        semesters = semesters.exclude(pk=current.pk)
+    return list(semesters.order_by("start_date"))
+
+
+def _semester_logs(semester):
+    return JournalChangeLog.objects.filter(
+        entry__lesson_date__gte=semester.start_date, entry__lesson_date__lte=semester.end_date,
+    )
+
+
+def pending_count(semester) -> int:
+    return _semester_logs(semester).count()
+
+
+def compact(semester, chunk: int = CHUNK) -> int:
+    """Переносит правки семестра в архив; возвращает число перенесённых строк."""
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                _semester_logs(semester).order_by("id").values(
+                    "id", *ARCHIVE_FIELDS, "entry__student_id", "entry__subject_id", "entry__student__group_id",
+                    "entry__lesson_date", "entry__lesson_time",
+                )[:chunk]
+            )
+            if not rows:
+                return moved
+            for row in rows:
+                row["student_id"] = row["student_id"] or row["entry__student_id"]
+                row["subject_id"] = row["subject_id"] or row["entry__subject_id"]
+            JournalChangeLogArchive.objects.bulk_create([
+                JournalChangeLogArchive(
+                    semester=semester,
+                    **{field: row[field] for field in ARCHIVE_FIELDS},
+                    group_id=row["entry__student__group_id"],
+                    lesson_date=row["entry__lesson_date"],
+                    lesson_time=row["entry__lesson_time"],
+                )
+                for row in rows
+            ], batch_size=500)
+            JournalChangeLog.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+        moved += len(rows)
+
+
+def export(semester, path: str) -> int:
+    """Архив семестра в JSON Lines (gzip, если путь оканчивается на .gz); возвращает число строк."""
+    opener = gzip.open if path.endswith(".gz") else open
+    count = 0
+    rows = JournalChangeLogArchive.objects.filter(semester=semester).order_by("changed_at", "id").values(
+        "id", "semester_id", "group_id", "lesson_date", "lesson_time", *ARCHIVE_FIELDS,
+    )
+    with opener(path, "wt", encoding="utf-8") as fh:
+        for row in rows.iterator(chunk_size=CHUNK):
+            fh.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+            fh.write("\n")
+            count += 1
+    return count
+
+
+def _unfilled():
+    return JournalChangeLog.objects.filter(Q(student__isnull=True) | Q(subject__isnull=True))
+
+
+def backfill_pending() -> dict:
+    """Строки без student/subject: {count, min_id, max_id} — ничего не меняет."""
+    return _unfilled().aggregate(count=Count("id"), min_id=Min("id"), max_id=Max("id"))
+
+
+def backfill(chunk: int = CHUNK) -> int:
+    """Заполняет student/subject у строк, записанных до их появления; возвращает число строк."""
+    entries = JournalEntry.objects.filter(pk=OuterRef("entry_id"))
+    filled = 0
+    while True:
+        ids = list(_unfilled().order_by("id").values_list("id", flat=True)[:chunk])
+        if not ids:
+            return filled
+        filled += JournalChangeLog.objects.filter(pk__in=ids).update(
+            student_id=Subquery(entries.values("student_id")[:1]),
+            subject_id=Subquery(entries.values("subject_id")[:1]),
+        )
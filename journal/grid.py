@@ -0,0 +1,106 @@
+"""
+Недельная сетка журнала группы по предмету для journal_view.
+
+Число запросов не зависит от числа студентов и занятий: записи журнала
+недели — один запрос (плюс вставка недостающих и дочитывание только
+вставленных), итоги по дням считаются по уже загруженным ячейкам, баллы
+ведомости — один запрос. Ячейки — словари с полями, которые нужны шаблону,
+без экземпляров моделей и форм; version — отметка для cell_writes.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from . import stats_queue
+from .models import JournalEntry, StudentMatrixScore
+
+CELL_FIELDS = (
+    "id", "student_id", "lesson_date", "lesson_time", "grade", "attendance_status", "locked_at", "updated_at",
+)
+MATRIX_TOTAL_TYPES = ("RATING", "WEEK", "EXAM")
+
+
+def _cells(student_ids, subject, dates) -> dict:
+    rows = JournalEntry.objects.filter(
+        student_id__in=student_ids, subject=subject, lesson_date__in=dates,
+    ).order_by().values(*CELL_FIELDS)
+    cells = {}
+    for row in rows:
+        row["version"] = row["updated_at"].isoformat() if row["updated_at"] else ""
+        cells[(row["student_id"], row["lesson_date"], row["lesson_time"])] = row
+    return cells
+
+
+def load_week(students, subject, days, teacher=None) -> tuple[list, list]:
+    """
+    (journal_data, day_stats) для шаблона journal_table_weekly.
+    days — days_with_lessons (date, time). Недостающие записи создаются.
+    """
+    student_ids = [s.id for s in students]
+    dates = list({d["date"] for d in days})
+    cells = _cells(student_ids, subject, dates)
+
+    missing = [
+        (student_id, day["date"], day["time"])
+        for student_id in student_ids for day in days
+        if (student_id, day["date"], day["time"]) not in cells
+    ]
+    if missing:
+        JournalEntry.objects.bulk_create([
+            JournalEntry(
+                student_id=student_id, subject=subject, lesson_date=lesson_date, lesson_time=lesson_time,
+                lesson_type=subject.type, created_by=teacher, modified_by=teacher,
+                locked_at=timezone.make_aware(datetime.combine(lesson_date, lesson_time)) + timedelta(hours=24),
+            )
+            for student_id, lesson_date, lesson_time in missing
+        ], ignore_conflicts=True)
+        stats_queue.mark_students({key[0] for key in missing})
+        cells.update(_cells(
+            sorted({key[0] for key in missing}), subject, list({key[1] for key in missing}),
+        ))
+
+    now = timezone.now()
+    journal_data = []
+    for student in students:
+        entries = []
+        for day in days:
+            cell = cells[(student.id, day["date"], day["time"])]
+            entries.append({"entry": cell, "is_locked": bool(cell["locked_at"]) and now >= cell["locked_at"]})
+        journal_data.append({"student": student, "entries": entries})
+
+    day_stats = []
+    for day in days:
+        day_cells = [
+            cell for cell in (cells.get((student_id, day["date"], day["time"])) for student_id in student_ids) if cell
+        ]
+        present = sum(1 for cell in day_cells if cell["attendance_status"] == "PRESENT")
+        grades = [cell["grade"] for cell in day_cells if cell["grade"] is not None]
+        day_stats.append({
+            "attendance_pct": present / len(day_cells) * 100 if day_cells else 0,
+            "avg_grade": round(sum(grades) / len(grades), 1) if grades else 0,
+        })
+    return journal_data, day_stats
+
+
+def load_matrix(students, subject, columns) -> list:
+    """students_matrix_data: баллы ведомости по колонкам (с version для cell_writes) и итог, одним запросом."""
+    columns = list(columns)
+    scores = {
+        (student_id, column_id): (score, updated_at.isoformat() if updated_at else "")
+        for student_id, column_id, score, updated_at in StudentMatrixScore.objects.filter(
+            subject=subject, student_id__in=[s.id for s in students],
+        ).values_list("student_id", "column_id", "score", "updated_at")
+    }
+    data = []
+    for student in students:
+        row_scores = []
+        total = 0
+        for column in columns:
+            value, version = scores.get((student.id, column.id), (None, ""))
+            row_scores.append({"column": column, "value": value, "version": version})
+            if value and column.col_type in MATRIX_TOTAL_TYPES:
+                total += value
+        data.append({"obj": student, "scores": row_scores, "total": round(total, 2)})
+    return data
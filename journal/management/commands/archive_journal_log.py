@@ -0,0 +1,62 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from journal import change_log
+from schedule.models import Semester
+
+
+class Command(BaseCommand):
+    help = 'Переносит логи изменений журнала закрытых семестров в архив и выгружает архив в JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', type=int, nargs='*', help='ID семестров (по умолчанию все закрытые)')
+        parser.add_argument('--export', metavar='DIR', help='Выгрузить архив каждого семестра в DIR (*.jsonl.gz)')
+        parser.add_argument('--backfill', action='store_true',
+                            help='Только заполнить студента и предмет у старых строк живой таблицы, без переноса')
+        parser.add_argument('--chunk', type=int, default=change_log.CHUNK, help='Строк в одной транзакции переноса')
+        parser.add_argument('--dry-run', action='store_true', help='Ничего не менять, только показать, сколько строк будет заполнено и перенесено')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            if options['dry_run']:
+                pending = change_log.backfill_pending()
+                if pending['count']:
+                    self.stdout.write(
+                        f"Нужно заполнить строк живой таблицы: {pending['count']} "
+                        f"(ID {pending['min_id']}–{pending['max_id']}); запустите --backfill без --dry-run"
+                    )
+                else:
+                    self.stdout.write("Заполнять нечего")
+            else:
+                filled = change_log.backfill(max(1, options['chunk']))
+                self.stdout.write(f"Заполнено строк живой таблицы: {filled}")
+            return
+
+        closed = {s.pk: s for s in change_log.closed_semesters()}
+        if options['semester']:
+            semesters = list(Semester.objects.filter(pk__in=options['semester']).order_by('start_date'))
+            open_ids = [s.pk for s in semesters if s.pk not in closed]
+            if open_ids:
+                raise CommandError(f"Семестры ещё не закрыты: {', '.join(map(str, open_ids))}")
+        else:
+            semesters = list(closed.values())
+        if not semesters:
+            self.stdout.write("Закрытых семестров нет")
+            return
+
+        if options['export']:
+            os.makedirs(options['export'], exist_ok=True)
+
+        for semester in semesters:
+            if options['dry_run']:
+                self.stdout.write(f"{semester} (ID {semester.pk}): к переносу {change_log.pending_count(semester)}")
+                continue
+            moved = change_log.compact(semester, max(1, options['chunk']))
+            self.stdout.write(f"{semester} (ID {semester.pk}): перенесено {moved}")
+            if options['export']:
+                path = os.path.join(options['export'], f"journal_log_{semester.pk}.jsonl.gz")
+                count = change_log.export(semester, path)
+                self.stdout.write(f"  выгружено {count} строк в {path}")
+
+        self.stdout.write(self.style.SUCCESS("Готово"))
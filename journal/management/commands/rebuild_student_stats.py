@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Student
+from journal import student_stats
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает статистику студентов и рейтинги в группах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, nargs='*', help='ID групп (по умолчанию все студенты)')
+        parser.add_argument('--batch', type=int, default=500, help='Студентов в одном агрегирующем запросе')
+
+    def handle(self, *args, **options):
+        students = Student.objects.order_by('pk')
+        if options['groups']:
+            students = students.filter(group_id__in=options['groups'])
+        student_ids = list(students.values_list('pk', flat=True))
+        batch = max(1, options['batch'])
+
+        started = time.monotonic()
+        for i in range(0, len(student_ids), batch):
+            student_stats.recalculate_students(student_ids[i:i + batch], rank=False)
+            self.stdout.write(f"Пересчитано {min(i + batch, len(student_ids))} из {len(student_ids)}")
+
+        group_ids = set(students.exclude(group__isnull=True).values_list('group_id', flat=True))
+        student_stats.rank_groups(group_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Статистика пересчитана: студентов {len(student_ids)}, групп {len(group_ids)}, "
+            f"{time.monotonic() - started:.1f} с"
+        ))
@@ -1,5 +1,4 @@
 from django.db import models
-from django.db.models import Avg, Count, Q
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -8,7 +7,7 @@ from accounts.models import Student, Teacher, User
 from schedule.models import Subject, ScheduleSlot
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from accounts.models import Institute
 
@@ -117,6 +116,17 @@ class JournalEntry(models.Model):
 
         super().save(*args, **kwargs)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields() & {'subject_id', 'lesson_date', 'attendance_status', 'grade'}:
+            instance._stats_loaded = instance.stats_state()
+        return instance
+
+    def stats_state(self):
+        """(предмет, дата, статус, балл) — всё, от чего зависит StudentStatistics."""
+        return (self.subject_id, self.lesson_date, self.attendance_status, self.grade)
+
     def is_locked(self):
         if not self.locked_at:
             return False
@@ -139,7 +149,35 @@ class JournalEntry(models.Model):
         else:
             return self.get_attendance_status_display()
 
-class JournalChangeLog(models.Model):
+class ChangeLogValues(models.Model):
+    old_grade = models.FloatField(null=True, blank=True, verbose_name=_("Старый балл"))
+    old_attendance = models.CharField(max_length=20, blank=True, verbose_name=_("Старая посещаемость"))
+
+    new_grade = models.FloatField(null=True, blank=True, verbose_name=_("Новый балл"))
+    new_attendance = models.CharField(max_length=20, blank=True, verbose_name=_("Новая посещаемость"))
+
+    comment = models.TextField(blank=True, verbose_name=_("Комментарий"))
+
+    class Meta:
+        abstract = True
+
+    def get_change_description(self):
+        parts = []
+
+        if self.old_grade != self.new_grade:
+            old = self.old_grade if self.old_grade else "—"
+            new = self.new_grade if self.new_grade else "—"
+            parts.append(f"балл: {old} → {new}")
+
+        if self.old_attendance != self.new_attendance:
+            old_display = dict(JournalEntry.ATTENDANCE_CHOICES).get(self.old_attendance, self.old_attendance)
+            new_display = dict(JournalEntry.ATTENDANCE_CHOICES).get(self.new_attendance, self.new_attendance)
+            parts.append(f"посещаемость: {old_display} → {new_display}")
+
+        return ", ".join(parts) if parts else "изменение"
+
+
+class JournalChangeLog(ChangeLogValues):
     entry = models.ForeignKey(
         JournalEntry,
         on_delete=models.CASCADE,
@@ -147,6 +185,24 @@ class JournalChangeLog(models.Model):
         verbose_name=_("Запись")
     )
 
+    # Копии entry.student / entry.subject: фильтры истории изменений идут по
+    # индексам этой таблицы, без соединения с JournalEntry.
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        verbose_name=_("Студент")
+    )
+
+    subject = models.ForeignKey(
+        Subject,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        verbose_name=_("Предмет")
+    )
+
     changed_by = models.ForeignKey(
         Teacher,
         on_delete=models.SET_NULL,
@@ -156,36 +212,67 @@ class JournalChangeLog(models.Model):
 
     changed_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Когда"))
 
-    old_grade = models.FloatField(null=True, blank=True, verbose_name=_("Старый балл"))
-    old_attendance = models.CharField(max_length=20, blank=True, verbose_name=_("Старая посещаемость"))
-
-    new_grade = models.FloatField(null=True, blank=True, verbose_name=_("Новый балл"))
-    new_attendance = models.CharField(max_length=20, blank=True, verbose_name=_("Новая посещаемость"))
-
-    comment = models.TextField(blank=True, verbose_name=_("Комментарий"))
-
     class Meta:
         verbose_name = _("Лог изменений")
         verbose_name_plural = _("Логи изменений")
         ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['subject', 'changed_at', 'id']),
+            models.Index(fields=['student', 'changed_at']),
+            models.Index(fields=['changed_by', 'changed_at']),
+            models.Index(fields=['changed_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.changed_by.user.get_full_name() if self.changed_by else 'Система'} изменил запись {self.entry.id} в {self.changed_at}"
 
-    def get_change_description(self):
-        parts = []
+    def save(self, *args, **kwargs):
+        if self.student_id is None or self.subject_id is None:
+            self.student_id = self.entry.student_id
+            self.subject_id = self.entry.subject_id
+        super().save(*args, **kwargs)
 
-        if self.old_grade != self.new_grade:
-            old = self.old_grade if self.old_grade else "—"
-            new = self.new_grade if self.new_grade else "—"
-            parts.append(f"балл: {old} → {new}")
+    @property
+    def lesson_date(self):
+        return self.entry.lesson_date
 
-        if self.old_attendance != self.new_attendance:
-            old_display = dict(JournalEntry.ATTENDANCE_CHOICES).get(self.old_attendance, self.old_attendance)
-            new_display = dict(JournalEntry.ATTENDANCE_CHOICES).get(self.new_attendance, self.new_attendance)
-            parts.append(f"посещаемость: {old_display} → {new_display}")
+    @property
+    def lesson_time(self):
+        return self.entry.lesson_time
+
+
+class JournalChangeLogArchive(ChangeLogValues):
+    """
+    Логи изменений закрытых семестров, перенесённые командой
+    archive_journal_log. Строка самодостаточна: запись журнала может быть уже
+    удалена, группа студента — другой.
+    """
+    semester = models.ForeignKey(
+        'schedule.Semester',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_("Семестр")
+    )
+    entry_id = models.IntegerField(verbose_name=_("ID записи"))
+    student = models.ForeignKey(Student, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name=_("Студент"))
+    group = models.ForeignKey('accounts.Group', on_delete=models.SET_NULL, null=True, related_name='+', verbose_name=_("Группа"))
+    subject = models.ForeignKey(Subject, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name=_("Предмет"))
+    lesson_date = models.DateField(verbose_name=_("Дата занятия"))
+    lesson_time = models.TimeField(verbose_name=_("Время начала пары"))
+    changed_by = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name=_("Кто изменил"))
+    changed_at = models.DateTimeField(verbose_name=_("Когда"))
 
-        return ", ".join(parts) if parts else "изменение"
+    class Meta:
+        verbose_name = _("Архив логов изменений")
+        verbose_name_plural = _("Архив логов изменений")
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['semester', 'subject', 'group', 'changed_at', 'id']),
+            models.Index(fields=['semester', 'student', 'changed_at']),
+        ]
+
+    def __str__(self):
+        return f"Архив: запись {self.entry_id} в {self.changed_at}"
 
 class StudentStatistics(models.Model):
     student = models.OneToOneField(
@@ -208,6 +295,9 @@ class StudentStatistics(models.Model):
     total_absent = models.IntegerField(default=0, verbose_name=_("Всего прогулов"))
     
     subjects_data = models.JSONField(default=dict, verbose_name=_("Данные по предметам"))
+
+    grade_sum = models.FloatField(null=True, blank=True, verbose_name=_("Сумма баллов"))
+    grade_count = models.IntegerField(default=0, verbose_name=_("Число баллов"))
     
     last_updated = models.DateTimeField(auto_now=True, verbose_name=_("Последнее обновление"))
     
@@ -219,95 +309,28 @@ class StudentStatistics(models.Model):
         return f"Статистика: {self.student.user.get_full_name()}"
     
     def recalculate(self):
-        from schedule.models import Semester
-        entries = JournalEntry.objects.filter(student=self.student)
-        
-        active_sem = Semester.get_current() if self.student.group else None
+        from .student_stats import recalculate_students
+        recalculate_students([self.student_id])
+        self.refresh_from_db()
 
-        if active_sem and active_sem.start_date and active_sem.end_date:
-            entries = entries.filter(
-                lesson_date__gte=active_sem.start_date,
-                lesson_date__lte=active_sem.end_date
-            )
-        
-        grades = entries.filter(grade__isnull=False, grade__gt=0).values_list('grade', flat=True)
-        self.overall_gpa = sum(grades) / len(grades) if grades else 0.0
-        
-        self.total_lessons = entries.count()
-        self.attended_lessons = entries.filter(attendance_status='PRESENT').count()
-        self.attendance_percentage = (
-            (self.attended_lessons / self.total_lessons * 100) 
-            if self.total_lessons > 0 else 0.0
-        )
-        
-        self.absent_illness = entries.filter(attendance_status='ABSENT_ILLNESS').count()
-        self.absent_valid = entries.filter(attendance_status='ABSENT_VALID').count()
-        self.absent_invalid = entries.filter(attendance_status='ABSENT_INVALID').count()
-        self.total_absent = self.absent_illness + self.absent_valid + self.absent_invalid
-        
-        from schedule.models import Subject
-        agg_map = {
-            r['subject_id']: r
-            for r in entries.values('subject_id').annotate(
-                average_grade=Avg('grade', filter=Q(grade__gt=0)),
-                total_lessons=Count('id'),
-                attended=Count('id', filter=Q(attendance_status='PRESENT')),
-                absent=Count('id', filter=~Q(attendance_status='PRESENT')),
-            )
-        }
-        subjects_stats = {}
-        for subject in Subject.objects.filter(journal_entries__student=self.student).distinct():
-            r = agg_map.get(subject.id)
-            if r:
-                avg = r['average_grade'] or 0.0
-                subjects_stats[subject.id] = {
-                    'name': subject.name,
-                    'average_grade': float(avg),
-                    'total_lessons': r['total_lessons'],
-                    'attended': r['attended'],
-                    'absent': r['absent'],
-                }
-            else:
-                subjects_stats[subject.id] = {
-                    'name': subject.name,
-                    'average_grade': 0.0,
-                    'total_lessons': 0,
-                    'attended': 0,
-                    'absent': 0,
-                }
-
-        self.subjects_data = subjects_stats
-        
-        if self.student.group:
-            group_students = Student.objects.filter(group=self.student.group)
-            ranked = []
-            for s in group_students:
-                stats, created = StudentStatistics.objects.get_or_create(student=s)
-                ranked.append((s.id, stats.overall_gpa))
-            
-            ranked.sort(key=lambda x: x[1], reverse=True)
-            for rank, (student_id, _) in enumerate(ranked, 1):
-                if student_id == self.student.id:
-                    self.group_rank = rank
-                    break
-        
-        self.save()
-    
     @classmethod
     def recalculate_group(cls, group):
-        students = Student.objects.filter(group=group)
-        for student in students:
-            stats, created = cls.objects.get_or_create(student=student)
-            stats.recalculate()
-
-
+        from .student_stats import recalculate_students
+        recalculate_students(Student.objects.filter(group=group).values_list('id', flat=True))
 
 
+@receiver(post_save, sender=JournalEntry)
+def trigger_stats_recalculate(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from .stats_queue import entry_saved
+    entry_saved(instance, created)
 
 
-@receiver(post_save, sender=JournalEntry)
-def trigger_stats_recalculate(sender, instance, **kwargs):
-    pass
+@receiver(post_delete, sender=JournalEntry)
+def trigger_stats_on_delete(sender, instance, **kwargs):
+    from .stats_queue import entry_deleted
+    entry_deleted(instance)
 
 
 class SubjectRating(models.Model):
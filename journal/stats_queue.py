@@ -0,0 +1,200 @@
+"""
+Отложенное обновление статистики студентов по правкам журнала.
+
+Сигналы JournalEntry не трогают StudentStatistics внутри запроса: после
+фиксации транзакции изменение записи (student_id, старое, новое состояние)
+ставится в очередь процесса. Фоновый поток ждёт STATS_DEBOUNCE секунд после
+первой постановки и выгружает очередь пачками по STATS_BATCH:
+student_stats.apply_changes прибавляет разности к счётчикам — несколько
+запросов на пачку, без пересчёта всех записей студента.
+
+Полный пересчёт (student_stats.recalculate_students, один агрегирующий запрос
+на пачку) остаётся для студентов, чьё старое состояние записи неизвестно
+(запись сохранена без загрузки из БД), для строк статистики без счётчиков
+(apply_changes пересчитывает их сам) и для явных mark_students. Пересчёт
+видит в БД все зафиксированные правки, поэтому разности студента, стоящие
+в очереди до него, отбрасываются, а пришедшие во время пересчёта
+превращаются в ещё один пересчёт — иначе правка была бы учтена дважды.
+
+Очередь живёт в памяти процесса: при аварийной остановке накопленные правки
+теряются, и счётчики отстают до полного пересчёта командой
+rebuild_student_stats. JOURNAL_STATS_ASYNC = False применяет то же самое
+сразу после фиксации, в том же потоке.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import student_stats
+
+logger = logging.getLogger(__name__)
+
+STATS_ASYNC = getattr(settings, "JOURNAL_STATS_ASYNC", True)
+STATS_DEBOUNCE = getattr(settings, "JOURNAL_STATS_DEBOUNCE", 2.0)
+STATS_BATCH = getattr(settings, "JOURNAL_STATS_BATCH", 200)
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal_stats")
+_lock = threading.Lock()
+_students: set[int] = set()
+_deltas: list[tuple] = []
+_recounting: set[int] = set()
+_groups: set[int] = set()
+_scheduled = False
+_UNKNOWN = object()
+
+
+def mark_students(student_ids) -> None:
+    """
+    Помечает студентов для полного пересчёта после фиксации текущей
+    транзакции; рейтинг их групп пересчитается вместе с ними.
+    """
+    transaction.on_commit(partial(_mark, students=set(student_ids)))
+
+
+def mark_groups(group_ids) -> None:
+    """Помечает группы для пересчёта рейтинга — например, после перевода студентов."""
+    transaction.on_commit(partial(_mark, groups={g for g in group_ids if g}))
+
+
+def _mark(students=(), groups=(), deltas=()) -> None:
+    global _scheduled
+    if not STATS_ASYNC:
+        student_stats.apply_changes(deltas)
+        student_stats.recalculate_students(students)
+        student_stats.rank_groups(groups)
+        return
+    with _lock:
+        _students.update(students)
+        for delta in deltas:
+            if delta[0] in _students or delta[0] in _recounting:
+                _students.add(delta[0])
+            else:
+                _deltas.append(delta)
+        _groups.update(groups)
+        start = not _scheduled and bool(_students or _deltas or _groups)
+        if start:
+            _scheduled = True
+    if start:
+        _EXECUTOR.submit(_worker)
+
+
+def pending() -> int:
+    with _lock:
+        return len(_students) + len(_deltas) + len(_groups)
+
+
+def _take(limit: int) -> tuple[list[int], list[tuple], list[int]]:
+    global _deltas
+    with _lock:
+        students = list(itertools.islice(_students, limit))
+        _students.difference_update(students)
+        _recounting.update(students)
+        recounted = set(students)
+        # Все разности студента уходят одной пачкой: apply_changes может
+        # пересчитать его целиком, и оставшиеся в очереди легли бы сверху.
+        chosen: set[int] = set()
+        deltas, rest = [], []
+        for delta in _deltas:
+            if delta[0] in recounted:
+                continue
+            if delta[0] not in chosen and len(chosen) < limit:
+                chosen.add(delta[0])
+            (deltas if delta[0] in chosen else rest).append(delta)
+        _deltas = rest
+        groups = [] if _students or _deltas else list(_groups)
+        _groups.difference_update(groups)
+    return students, deltas, groups
+
+
+def drain() -> int:
+    """Применяет всю очередь в текущем потоке; возвращает число затронутых студентов."""
+    done = 0
+    while True:
+        students, deltas, groups = _take(STATS_BATCH)
+        if not students and not deltas and not groups:
+            return done
+        touched = {delta[0] for delta in deltas}
+        try:
+            student_stats.apply_changes(deltas)
+        except Exception:
+            logger.exception("journal stats: %s changes failed, recalculating their students", len(deltas))
+            with _lock:
+                _recounting.update(touched)
+            students = [*students, *touched]
+        try:
+            student_stats.recalculate_students(students)
+            student_stats.rank_groups(groups)
+        except Exception:
+            logger.exception("journal stats: batch of %s students failed", len(students))
+        finally:
+            with _lock:
+                _recounting.difference_update(students)
+        done += len(touched | set(students))
+
+
+def _worker() -> None:
+    global _scheduled
+    time.sleep(STATS_DEBOUNCE)
+    close_old_connections()
+    try:
+        while True:
+            started = time.monotonic()
+            done = drain()
+            if done:
+                logger.info("journal stats: updated %s students in %.2fs", done, time.monotonic() - started)
+            with _lock:
+                if not _students and not _deltas and not _groups:
+                    _scheduled = False
+                    return
+    finally:
+        close_old_connections()
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if pending():
+        drain()
+
+
+def entries_changed(changes) -> None:
+    """
+    Изменения записей [(student_id, old, new)] — из сигналов или в обход
+    save(), например bulk_update; old/new — JournalEntry.stats_state().
+    """
+    changes = [change for change in changes if change[1] != change[2]]
+    if changes:
+        transaction.on_commit(partial(_mark, deltas=changes))
+
+
+def _entry_changed(student_id: int, old, new) -> None:
+    if old is _UNKNOWN:
+        mark_students([student_id])
+    else:
+        entries_changed([(student_id, old, new)])
+
+
+def entry_saved(entry, created: bool) -> None:
+    """post_save JournalEntry."""
+    new = entry.stats_state()
+    old = None if created else getattr(entry, "_stats_loaded", _UNKNOWN)
+    entry._stats_loaded = new
+    if old != new:
+        _entry_changed(entry.student_id, old, new)
+
+
+def entry_deleted(entry) -> None:
+    """
+    post_delete JournalEntry. Разность применяется после фиксации: при
+    каскадном удалении студента его строки статистики уже нет, и apply_changes
+    её просто пропускает.
+    """
+    _entry_changed(entry.student_id, getattr(entry, "_stats_loaded", _UNKNOWN), None)
@@ -0,0 +1,261 @@
+"""
+Инкрементальное ведение StudentStatistics.
+
+Статистика студента — счётчики по записям журнала текущего семестра (у
+студента без группы — по всем его записям): занятия, присутствия, пропуски по
+видам, сумма и число баллов > 0; те же счётчики по каждому предмету лежат в
+subjects_data. Правка записи журнала превращается в разность вкладов старого
+и нового состояния записи и прибавляется к счётчикам — несколько запросов на
+пачку правок вместо пересчёта всех записей студента. Рейтинг в группе
+пересчитывается одной сортировкой средних баллов группы и только когда
+средний балл студента изменился.
+
+Полный пересчёт (recalculate_students) — один агрегирующий запрос на любое
+число студентов. Им же достраиваются строки с grade_sum = NULL: созданные
+через get_or_create без пересчёта или записанные до инкрементального режима.
+
+Когда и как применяются правки из сигналов JournalEntry, решает
+journal.stats_queue.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from accounts.models import Student
+from schedule.models import Semester, Subject
+from .models import JournalEntry, StudentStatistics
+
+ABSENT_FIELDS = {
+    "ABSENT_ILLNESS": "absent_illness",
+    "ABSENT_VALID": "absent_valid",
+    "ABSENT_INVALID": "absent_invalid",
+}
+STORED_FIELDS = (
+    "overall_gpa", "attendance_percentage", "total_lessons", "attended_lessons",
+    *ABSENT_FIELDS.values(), "total_absent", "grade_sum", "grade_count", "subjects_data",
+)
+
+
+def _window(semester) -> tuple[date, date] | None:
+    """Даты текущего семестра; None — учитывать все записи."""
+    if semester and semester.start_date and semester.end_date:
+        return semester.start_date, semester.end_date
+    return None
+
+
+def _in_window(lesson_date, window) -> bool:
+    if window is None:
+        return True
+    if isinstance(lesson_date, str):
+        lesson_date = date.fromisoformat(lesson_date)
+    return window[0] <= lesson_date <= window[1]
+
+
+def _subject_row(name: str) -> dict:
+    return {
+        "name": name, "average_grade": 0.0, "total_lessons": 0,
+        "attended": 0, "absent": 0, "grade_sum": 0.0, "grade_count": 0,
+    }
+
+
+def _finish(stats: StudentStatistics) -> None:
+    """Производные поля из счётчиков."""
+    stats.total_absent = stats.absent_illness + stats.absent_valid + stats.absent_invalid
+    stats.attendance_percentage = (
+        stats.attended_lessons / stats.total_lessons * 100 if stats.total_lessons > 0 else 0.0
+    )
+    stats.overall_gpa = stats.grade_sum / stats.grade_count if stats.grade_count else 0.0
+    for row in stats.subjects_data.values():
+        row["absent"] = row["total_lessons"] - row["attended"]
+        row["average_grade"] = row["grade_sum"] / row["grade_count"] if row["grade_count"] else 0.0
+
+
+def _add(stats: StudentStatistics, state, sign: int, window, names: dict) -> None:
+    """Прибавляет (sign=1) или вычитает (sign=-1) вклад записи в состоянии state."""
+    subject_id, lesson_date, status, grade = state
+    row = stats.subjects_data.setdefault(str(subject_id), _subject_row(names.get(subject_id, "")))
+    if not _in_window(lesson_date, window):
+        return
+    graded = grade is not None and grade > 0
+
+    stats.total_lessons += sign
+    row["total_lessons"] += sign
+    if status == "PRESENT":
+        stats.attended_lessons += sign
+        row["attended"] += sign
+    elif status in ABSENT_FIELDS:
+        field = ABSENT_FIELDS[status]
+        setattr(stats, field, getattr(stats, field) + sign)
+    if graded:
+        stats.grade_sum += sign * grade
+        stats.grade_count += sign
+        row["grade_sum"] += sign * grade
+        row["grade_count"] += sign
+
+
+def apply_change(student_id: int, old, new) -> None:
+    """
+    Применяет к статистике студента изменение одной записи журнала.
+    old/new — JournalEntry.stats_state() до и после, None — записи не было
+    (создание) или больше нет (удаление).
+    """
+    apply_changes([(student_id, old, new)])
+
+
+def apply_changes(changes) -> None:
+    """
+    Пакет изменений [(student_id, old, new)]: строки статистики читаются и
+    пишутся одним запросом, рейтинг каждой затронутой группы считается один
+    раз. Студенты без готовых счётчиков пересчитываются целиком.
+    """
+    changes = [change for change in changes if change[1] != change[2]]
+    if not changes:
+        return
+    student_ids = {student_id for student_id, _old, _new in changes}
+    with transaction.atomic():
+        stats = {
+            s.student_id: s
+            for s in StudentStatistics.objects.select_for_update().filter(
+                student_id__in=student_ids, grade_sum__isnull=False
+            )
+        }
+        groups = dict(Student.objects.filter(pk__in=list(stats)).values_list("id", "group_id"))
+        semester_window = _window(Semester.get_current()) if any(groups.values()) else None
+        unknown = {
+            state[0]
+            for student_id, old, new in changes if student_id in stats
+            for state in (old, new) if state is not None and str(state[0]) not in stats[student_id].subjects_data
+        }
+        names = dict(Subject.objects.filter(pk__in=unknown).values_list("id", "name")) if unknown else {}
+
+        gpa = {student_id: row.overall_gpa for student_id, row in stats.items()}
+        for student_id, old, new in changes:
+            row = stats.get(student_id)
+            if row is None:
+                continue
+            window = semester_window if groups.get(student_id) else None
+            for state, sign in ((old, -1), (new, 1)):
+                if state is not None:
+                    _add(row, state, sign, window, names)
+
+        now = timezone.now()
+        for row in stats.values():
+            _finish(row)
+            row.last_updated = now
+        StudentStatistics.objects.bulk_update(list(stats.values()), [*STORED_FIELDS, "last_updated"], batch_size=500)
+
+        recalculate_students(student_ids - stats.keys())
+        rank_groups({groups[sid] for sid, row in stats.items() if row.overall_gpa != gpa[sid]})
+
+
+def recalculate_students(student_ids, rank: bool = True) -> None:
+    """
+    Полный пересчёт статистики студентов одним агрегирующим запросом;
+    недостающие строки StudentStatistics создаются. rank — затем пересчитать
+    рейтинг в их группах.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    groups = dict(Student.objects.filter(pk__in=student_ids).values_list("id", "group_id"))
+    if not groups:
+        return
+    window = _window(Semester.get_current())
+    in_window = None
+    if window:
+        in_window = Q(student__group__isnull=True) | Q(lesson_date__gte=window[0], lesson_date__lte=window[1])
+
+    def where(condition):
+        return condition if in_window is None else in_window & condition
+
+    graded = Q(grade__gt=0)
+    rows = (
+        JournalEntry.objects.filter(student_id__in=list(groups))
+        .order_by()
+        .values("student_id", "subject_id", "subject__name")
+        .annotate(
+            total=Count("id", filter=in_window),
+            attended=Count("id", filter=where(Q(attendance_status="PRESENT"))),
+            absent_illness=Count("id", filter=where(Q(attendance_status="ABSENT_ILLNESS"))),
+            absent_valid=Count("id", filter=where(Q(attendance_status="ABSENT_VALID"))),
+            absent_invalid=Count("id", filter=where(Q(attendance_status="ABSENT_INVALID"))),
+            grade_sum=Sum("grade", filter=where(graded)),
+            grade_count=Count("id", filter=where(graded)),
+        )
+    )
+
+    fresh = {
+        student_id: StudentStatistics(
+            student_id=student_id, total_lessons=0, attended_lessons=0, absent_illness=0,
+            absent_valid=0, absent_invalid=0, grade_sum=0.0, grade_count=0, subjects_data={},
+        )
+        for student_id in groups
+    }
+    for row in rows:
+        stats = fresh[row["student_id"]]
+        stats.total_lessons += row["total"]
+        stats.attended_lessons += row["attended"]
+        for field in ABSENT_FIELDS.values():
+            setattr(stats, field, getattr(stats, field) + row[field])
+        stats.grade_sum += row["grade_sum"] or 0.0
+        stats.grade_count += row["grade_count"]
+        subject = _subject_row(row["subject__name"])
+        subject.update(
+            total_lessons=row["total"], attended=row["attended"],
+            grade_sum=row["grade_sum"] or 0.0, grade_count=row["grade_count"],
+        )
+        stats.subjects_data[str(row["subject_id"])] = subject
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            s.student_id: s
+            for s in StudentStatistics.objects.select_for_update().filter(student_id__in=list(groups))
+        }
+        to_update = []
+        for student_id, stats in fresh.items():
+            _finish(stats)
+            row = existing.get(student_id)
+            if row is None:
+                continue
+            for field in STORED_FIELDS:
+                setattr(row, field, getattr(stats, field))
+            row.last_updated = now
+            to_update.append(row)
+        StudentStatistics.objects.bulk_create(
+            [stats for student_id, stats in fresh.items() if student_id not in existing], batch_size=500
+        )
+        StudentStatistics.objects.bulk_update(to_update, [*STORED_FIELDS, "last_updated"], batch_size=500)
+
+        if rank:
+            rank_groups(groups.values())
+
+
+def rank_groups(group_ids) -> None:
+    """
+    Рейтинг в группе по убыванию среднего балла: один запрос и одна сортировка
+    на все группы; пишутся только изменившиеся места. Студенты без строки
+    статистики занимают места с нулевым баллом.
+    """
+    group_ids = {g for g in group_ids if g}
+    if not group_ids:
+        return
+
+    by_group = defaultdict(list)
+    for student_id, group_id, stats_id, gpa, rank in Student.objects.filter(group_id__in=group_ids).values_list(
+        "id", "group_id", "statistics__id", "statistics__overall_gpa", "statistics__group_rank",
+    ):
+        by_group[group_id].append((-(gpa or 0.0), student_id, stats_id, rank))
+
+    changed = []
+    for ranked in by_group.values():
+        ranked.sort()
+        for position, (_gpa, _student_id, stats_id, rank) in enumerate(ranked, 1):
+            if stats_id is not None and rank != position:
+                changed.append(StudentStatistics(pk=stats_id, group_rank=position))
+    StudentStatistics.objects.bulk_update(changed, ["group_rank"], batch_size=500)
@@ -4,7 +4,7 @@ from django.contrib import messages
 from django.db import transaction
 from django.db.models import Avg, Count, Q
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 import json
 from django.views.decorators.http import require_POST
 from django.utils.translation import gettext as _
@@ -12,8 +12,9 @@ from django.utils import timezone
 from django.http import JsonResponse
 import logging
 logger = logging.getLogger(__name__)
+from . import cell_writes, change_log, grid
 from .models import JournalEntry, JournalChangeLog, StudentStatistics, MatrixStructure, MatrixColumn, StudentMatrixScore
-from .forms import JournalEntryForm, BulkGradeForm, JournalFilterForm, ChangeLogFilterForm
+from .forms import BulkGradeForm, JournalFilterForm, ChangeLogFilterForm
 from accounts.models import Student, Teacher, Group
 from schedule.models import Subject, ScheduleSlot, Semester
 from .models import SubjectRating
@@ -53,7 +54,7 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.utils.translation import gettext as _
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.db.models import Avg
 from .models import JournalEntry, JournalChangeLog, StudentStatistics, MatrixStructure, StudentMatrixScore
 
@@ -142,7 +143,7 @@ def journal_view(request):
 
     schedule_slots = schedule_slots.filter(semester=active_semester)
 
-    students = Student.objects.filter(group=group).select_related('user').order_by('user__last_name')
+    students = list(Student.objects.filter(group=group).select_related('user').order_by('user__last_name'))
     week_end = week_start + timedelta(days=6)
 
     exceptions = ScheduleException.objects.filter(
@@ -190,72 +191,7 @@ def journal_view(request):
 
     days_with_lessons.sort(key=lambda x: (x['date'], x['time']))
 
-    dates_for_entries = list({d['date'] for d in days_with_lessons})
-    existing_entries = JournalEntry.objects.filter(
-        student__in=students,
-        subject=subject,
-        lesson_date__in=dates_for_entries,
-    ).select_related('student')
-    entries_dict = {
-        (e.student_id, e.lesson_date, e.lesson_time): e
-        for e in existing_entries
-    }
-    new_entries = []
-    for student in students:
-        for day_info in days_with_lessons:
-            key = (student.id, day_info['date'], day_info['time'])
-            if key not in entries_dict:
-                lesson_dt = timezone.make_aware(
-                    datetime.combine(day_info['date'], day_info['time'])
-                )
-                new_entries.append(JournalEntry(
-                    student=student,
-                    subject=subject,
-                    lesson_date=day_info['date'],
-                    lesson_time=day_info['time'],
-                    lesson_type=subject.type,
-                    created_by=teacher,
-                    modified_by=teacher,
-                    locked_at=lesson_dt + timedelta(hours=24),
-                ))
-    if new_entries:
-        JournalEntry.objects.bulk_create(new_entries, ignore_conflicts=True)
-        existing_entries = JournalEntry.objects.filter(
-            student__in=students,
-            subject=subject,
-            lesson_date__in=dates_for_entries,
-        ).select_related('student')
-        entries_dict = {
-            (e.student_id, e.lesson_date, e.lesson_time): e
-            for e in existing_entries
-        }
-    journal_data = []
-    for student in students:
-        student_row = {'student': student, 'entries': []}
-        for day_info in days_with_lessons:
-            key = (student.id, day_info['date'], day_info['time'])
-            entry = entries_dict[key]
-            student_row['entries'].append({
-                'entry': entry,
-                'is_locked': entry.is_locked(),
-                'form': JournalEntryForm(instance=entry, user=request.user, prefix=f'entry_{entry.id}')
-            })
-        journal_data.append(student_row)
-
-    day_stats = []
-    for day_info in days_with_lessons:
-        day_entries = JournalEntry.objects.filter(
-            subject=subject,
-            lesson_date=day_info['date'],
-            lesson_time=day_info['time']
-        )
-        total = day_entries.count()
-        present = day_entries.filter(attendance_status='PRESENT').count()
-        avg_grade = day_entries.filter(grade__isnull=False).aggregate(Avg('grade'))['grade__avg'] or 0
-        day_stats.append({
-            'attendance_pct': (present / total * 100) if total > 0 else 0,
-            'avg_grade': round(avg_grade, 1)
-        })
+    journal_data, day_stats = grid.load_week(students, subject, days_with_lessons, teacher)
 
     current_week_actual = active_semester.get_current_week_number() if active_semester else 1
     is_future_week = week_num > current_week_actual
@@ -269,29 +205,9 @@ def journal_view(request):
 
     columns = []
     if matrix_structure:
-        columns = matrix_structure.columns.all()
+        columns = list(matrix_structure.columns.all())
 
-    scores = StudentMatrixScore.objects.filter(subject=subject, student__in=students)
-    scores_dict = {(s.student_id, s.column_id): s.score for s in scores}
-
-    students_matrix_data = []
-    for s in students:
-        student_scores = []
-        total_score = 0
-        for col in columns:
-            val = scores_dict.get((s.id, col.id))
-            student_scores.append({
-                'column': col,
-                'value': val
-            })
-            if val and col.col_type in ['RATING', 'WEEK', 'EXAM']:
-                total_score += val
-
-        students_matrix_data.append({
-            'obj': s,
-            'scores': student_scores,
-            'total': round(total_score, 2)
-        })
+    students_matrix_data = grid.load_matrix(students, subject, columns)
 
     return render(request, 'journal/journal_table_weekly.html', {
         'group': group,
@@ -384,9 +300,6 @@ def update_entry(request, entry_id):
                 )
                 messages.success(request, _('✅ НБ обновлено'))
 
-            stats, created = StudentStatistics.objects.get_or_create(student=entry.student)
-            stats.recalculate()
-
     return redirect(request.META.get('HTTP_REFERER', 'journal:journal_view'))
 
 @login_required
@@ -413,37 +326,11 @@ def bulk_update(request):
             messages.error(request, _('Выберите статус посещаемости'))
             return redirect(request.META.get('HTTP_REFERER', 'journal:journal_view'))
         
-        updated_count = locked_count = 0
-        with transaction.atomic():
-            for student_id in selected_students:
-                student = Student.objects.get(id=student_id)
-                try:
-                    entry = JournalEntry.objects.get(
-                        student=student, subject=subject,
-                        lesson_date=lesson_date, lesson_time=lesson_time
-                    )
-                    if entry.is_locked():
-                        locked_count += 1
-                        continue
-                    
-                    old_attendance = entry.attendance_status
-                    entry.attendance_status = attendance
-                    if attendance != 'PRESENT':
-                        entry.grade = None
-                    entry.modified_by = teacher
-                    entry.save()
-                    
-                    JournalChangeLog.objects.create(
-                        entry=entry, changed_by=teacher,
-                        old_grade=entry.grade, old_attendance=old_attendance,
-                        new_grade=entry.grade, new_attendance=entry.attendance_status,
-                        comment="Массовое обновление НБ"
-                    )
-                    updated_count += 1
-                except JournalEntry.DoesNotExist:
-                    pass
+        updated_count, locked_count = cell_writes.set_attendance(
+            teacher, subject, selected_students, lesson_date, lesson_time, attendance,
+            comment="Массовое обновление НБ",
+        )
         
-        StudentStatistics.recalculate_group(group)
         if updated_count > 0:
             messages.success(request, _('✅ Обновлено: %(updated_count)s') % {'updated_count': updated_count})
         if locked_count > 0:
@@ -464,9 +351,13 @@ def change_log_view(request):
     
     group = get_object_or_404(Group, id=group_id)
     subject = get_object_or_404(Subject, id=subject_id, teacher=teacher)
-    logs = JournalChangeLog.objects.filter(
-        entry__subject=subject, entry__student__group=group
-    ).select_related('entry__student__user', 'changed_by__user').order_by('-changed_at')
+
+    archived = change_log.archived_semesters(subject)
+    semester = next((s for s in archived if str(s.pk) == request.GET.get('semester')), None)
+    if semester:
+        logs = change_log.archived_logs(semester, group, subject)
+    else:
+        logs = change_log.live_logs(group, subject)
 
     filter_form = ChangeLogFilterForm(request.GET, group=group, subject=subject)
     
@@ -479,12 +370,20 @@ def change_log_view(request):
         if date_to:
             logs = logs.filter(changed_at__date__lte=date_to)
         if student_id:
-            logs = logs.filter(entry__student_id=student_id)
+            logs = logs.filter(student_id=student_id)
         if teacher_id:
             logs = logs.filter(changed_by_id=teacher_id)
-    
+
+    logs, next_cursor = change_log.page(logs, request.GET.get('cursor'))
+    next_query = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_query = query.urlencode()
+
     return render(request, 'journal/change_log.html', {
-        'logs': logs[:100], 'group': group, 'subject': subject, 'filter_form': filter_form
+        'logs': logs, 'group': group, 'subject': subject, 'filter_form': filter_form,
+        'archived_semesters': archived, 'semester': semester, 'next_query': next_query,
     })
 
 @login_required
@@ -765,46 +664,18 @@ def update_journal_cell(request):
         old_grade = entry.grade
         old_attendance = entry.attendance_status
         
+        try:
+            values = cell_writes.parse_value(value)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         response_data = {}
+        response_data['display'], response_data['type'] = cell_writes.display(
+            values['grade'], values['attendance_status']
+        )
 
         with transaction.atomic():
-            if value == '' or value == '-':
-                entry.grade = None
-                entry.attendance_status = 'PRESENT'
-                entry.participation = 'NONE'
-                response_data['display'] = ''
-                response_data['type'] = 'clear'
-                
-            elif value in['н', 'нб', 'nb', 'n', 'abs']:
-                entry.grade = None
-                entry.attendance_status = 'ABSENT_INVALID' 
-                response_data['display'] = 'НБ'
-                response_data['type'] = 'absent_invalid'
-                
-            elif value in ['у', 'ув', 'уваж', 'u', 'v']:
-                entry.grade = None
-                entry.attendance_status = 'ABSENT_VALID'
-                response_data['display'] = 'У'
-                response_data['type'] = 'absent_valid'
-                
-            elif value in ['б', 'бол', 'болезнь', 'b', 'ill']:
-                entry.grade = None
-                entry.attendance_status = 'ABSENT_ILLNESS'
-                response_data['display'] = 'Б'
-                response_data['type'] = 'absent_illness'
-                
-            else:
-                try:
-                    grade = float(value.replace(',', '.'))
-                    if 0 <= grade <= 100:
-                        entry.grade = grade
-                        entry.attendance_status = 'PRESENT'
-                        response_data['display'] = str(grade)
-                        response_data['type'] = 'grade'
-                    else:
-                        return JsonResponse({'success': False, 'error': _('Оценка должна быть от 0 до 100')}, status=400)
-                except ValueError:
-                    return JsonResponse({'success': False, 'error': _('Введите число (до 100), "нб" (неуваж), "у" (уваж) или "б" (болезнь)')}, status=400)
+            for field, field_value in values.items():
+                setattr(entry, field, field_value)
 
             entry.modified_by = teacher
             entry.save()
@@ -815,9 +686,6 @@ def update_journal_cell(request):
                     new_grade=entry.grade, new_attendance=entry.attendance_status,
                     comment="Быстрый ввод"
                 )
-                
-            stats, created = StudentStatistics.objects.get_or_create(student=entry.student)
-            stats.recalculate()
 
         response_data['success'] = True
         return JsonResponse(response_data)
@@ -825,6 +693,47 @@ def update_journal_cell(request):
     except Exception as e:
         logger.exception("update_journal_cell")
         return JsonResponse({'success': False, 'error': _('Внутренняя ошибка сервера')}, status=500)
+
+
+@login_required
+@user_passes_test(is_teacher_or_management)
+@require_POST
+def update_journal_cells(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': _('Некорректный JSON')}, status=400)
+    changes = data.get('changes', []) if isinstance(data, dict) else None
+    scores = data.get('scores', []) if isinstance(data, dict) else None
+    if not isinstance(changes, list) or not isinstance(scores, list) or not (changes or scores):
+        return JsonResponse({'success': False, 'error': _('Нет изменений')}, status=400)
+    if len(changes) + len(scores) > cell_writes.BATCH_LIMIT:
+        return JsonResponse(
+            {'success': False, 'error': _('Не больше %(limit)s ячеек за раз') % {'limit': cell_writes.BATCH_LIMIT}},
+            status=400,
+        )
+    if changes and not is_teacher(request.user):
+        return JsonResponse({'success': False, 'error': _('Нет прав')}, status=403)
+
+    written, conflicts, written_scores, score_conflicts = [], [], [], []
+    try:
+        if changes:
+            written, conflicts = cell_writes.apply_cells(request.user.teacher_profile, changes)
+        if scores:
+            written_scores, score_conflicts = cell_writes.apply_scores(
+                request.user, scores, privileged=is_dean_or_admin(request.user),
+            )
+    except Exception:
+        logger.exception("update_journal_cells")
+        return JsonResponse({'success': False, 'error': _('Внутренняя ошибка сервера')}, status=500)
+
+    return JsonResponse({
+        'success': not conflicts and not score_conflicts,
+        'cells': written,
+        'conflicts': conflicts,
+        'scores': written_scores,
+        'score_conflicts': score_conflicts,
+    })
     
 
 
@@ -877,29 +786,8 @@ def performance_journal_view(request):
     
     students = Student.objects.filter(group=group).select_related('user').order_by('user__last_name')
     
-    scores = StudentMatrixScore.objects.filter(subject=subject, student__in=students)
-    scores_dict = {(s.student_id, s.column_id): s.score for s in scores}
-    
-    students_data = []
-    for s in students:
-        student_scores =[]
-        total_score = 0
-        
-        for col in columns:
-            val = scores_dict.get((s.id, col.id))
-            student_scores.append({
-                'column': col,
-                'value': val
-            })
-            if val and col.col_type in['RATING', 'WEEK', 'EXAM']:
-                total_score += val 
-                
-        students_data.append({
-            'obj': s,
-            'scores': student_scores,
-            'total': round(total_score, 2)
-        })
-        
+    students_data = grid.load_matrix(students, subject, columns)
+
     return render(request, 'journal/performance_journal.html', {
         'group': group,
         'subject': subject,
@@ -4,7 +4,8 @@ import random
 import copy
 from collections import defaultdict
 from django.db import transaction
-from .models import ScheduleSlot, Subject, Classroom, TimeSlot, TeacherUnavailableSlot
+from .models import ScheduleSlot, Semester, Subject, Classroom, TimeSlot
+from . import availability
 import logging
 logger = logging.getLogger(__name__)
 
@@ -52,12 +53,10 @@ class AutoScheduleEngine:
         self._load_teacher_unavailability()
 
     def _load_teacher_unavailability(self):
-        unavailables_qs = TeacherUnavailableSlot.objects.all()
-        if self.target_teachers:
-            unavailables_qs = unavailables_qs.filter(teacher_id__in=self.target_teachers)
-            
-        for u in unavailables_qs:
-            self.teacher_unavailable[u.teacher_id][u.day_of_week][u.time_slot_id] = True
+        cells_by_teacher = availability.cells_for(self.target_teachers or None)
+        for teacher_id, cells in cells_by_teacher.items():
+            for day, ts_id in cells:
+                self.teacher_unavailable[teacher_id][day][ts_id] = True
 
     def _load_existing_schedule(self):
         existing_slots = ScheduleSlot.objects.filter(semester=self.semester, is_active=True)
@@ -282,6 +281,7 @@ def generate(self):
 
         with transaction.atomic():
             ScheduleSlot.objects.bulk_create(best_schedule)
+            Semester.bump_schedule_version(self.semester.pk)
 
         result = {
             'success': True,
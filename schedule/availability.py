@@ -0,0 +1,165 @@
+"""
+Недоступное время преподавателей битовыми масками.
+
+Каждому преподавателю — одна строка TeacherAvailability: бит
+time_slot_id * DAYS + day_of_week установлен, если в эту пару дня
+преподаватель недоступен. Маска хранится little-endian байтами, так что
+загрузка для генератора расписания — один запрос на список преподавателей,
+а не на все их строки TeacherUnavailableSlot.
+
+Бит адресуется первичным ключом TimeSlot, а не позицией пары в сетке: сетки
+пар у институтов и смен разные и меняются (пару добавили — номера сдвинулись),
+а pk стабилен, так что сохранённые маски не надо переписывать при правке
+сетки. Маска поэтому длиной в наибольший pk отмеченной пары — байты на
+преподавателя, не компактная недельная сетка. Удалённая пара оставляет в
+маске «мёртвые» биты: masks_for и save_masks отбрасывают ячейки пар, которых
+уже нет, а следующее сохранение графика стирает их и из БД.
+
+Строки TeacherUnavailableSlot по-прежнему пишутся вместе с маской, чтобы
+откат на старый код не терял графики. Для преподавателей, у которых маски ещё
+нет, чтение берёт строки — маски из них строит команда
+migrate_teacher_availability или первое же сохранение графика.
+"""
+from __future__ import annotations
+
+from django.db import transaction
+
+from .models import TeacherAvailability, TeacherUnavailableSlot, TimeSlot
+
+DAYS = 6
+
+
+def bit(day: int, time_slot_id: int) -> int:
+    return 1 << (time_slot_id * DAYS + day)
+
+
+def to_mask(cells) -> int:
+    mask = 0
+    for day, ts_id in cells:
+        if 0 <= day < DAYS and ts_id > 0:
+            mask |= bit(day, ts_id)
+    return mask
+
+
+def to_cells(mask: int) -> list[tuple[int, int]]:
+    """[(день, time_slot_id)] установленных битов по возрастанию."""
+    cells = []
+    while mask:
+        low = mask & -mask
+        index = low.bit_length() - 1
+        cells.append((index % DAYS, index // DAYS))
+        mask ^= low
+    return cells
+
+
+def encode(mask: int) -> bytes:
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def decode(data) -> int:
+    return int.from_bytes(bytes(data or b""), "little")
+
+
+def _live(masks: dict[int, int]) -> dict[int, int]:
+    """Маски без битов удалённых пар и без пустых; один запрос к TimeSlot."""
+    slot_ids = {ts_id for mask in masks.values() for _day, ts_id in to_cells(mask)}
+    dead = slot_ids - set(TimeSlot.objects.filter(id__in=slot_ids).values_list("id", flat=True))
+    if dead:
+        masks = {
+            tid: to_mask((day, ts_id) for day, ts_id in to_cells(mask) if ts_id not in dead)
+            for tid, mask in masks.items()
+        }
+    return {tid: m for tid, m in masks.items() if m}
+
+
+def masks_for(teacher_ids=None) -> dict[int, int]:
+    """{teacher_id: маска}; teacher_ids=None — все преподаватели с недоступным временем."""
+    stored = TeacherAvailability.objects.all()
+    if teacher_ids is not None:
+        teacher_ids = set(teacher_ids)
+        stored = stored.filter(teacher_id__in=teacher_ids)
+    masks = {teacher_id: decode(data) for teacher_id, data in stored.values_list("teacher_id", "unavailable_mask")}
+
+    legacy = TeacherUnavailableSlot.objects.exclude(teacher_id__in=list(masks))
+    if teacher_ids is not None:
+        missing = teacher_ids - masks.keys()
+        if not missing:
+            return _live(masks)
+        legacy = legacy.filter(teacher_id__in=missing)
+    for teacher_id, day, ts_id in legacy.values_list("teacher_id", "day_of_week", "time_slot_id"):
+        masks[teacher_id] = masks.get(teacher_id, 0) | bit(day, ts_id)
+    return _live(masks)
+
+
+def cells_for(teacher_ids=None) -> dict[int, list[tuple[int, int]]]:
+    return {tid: to_cells(mask) for tid, mask in masks_for(teacher_ids).items()}
+
+
+def save_masks(masks: dict[int, int]) -> None:
+    """
+    Записывает маски {teacher_id: маска} и синхронизирует строки
+    TeacherUnavailableSlot: четыре-пять запросов на любое число преподавателей.
+    """
+    if not masks:
+        return
+    live = _live(masks)
+    masks = {teacher_id: live.get(teacher_id, 0) for teacher_id in masks}
+    with transaction.atomic():
+        existing = {
+            a.teacher_id: a for a in TeacherAvailability.objects.select_for_update().filter(teacher_id__in=list(masks))
+        }
+        to_update, to_create = [], []
+        for teacher_id, mask in masks.items():
+            row = existing.get(teacher_id)
+            if row is None:
+                to_create.append(TeacherAvailability(teacher_id=teacher_id, unavailable_mask=encode(mask)))
+            else:
+                row.unavailable_mask = encode(mask)
+                to_update.append(row)
+        TeacherAvailability.objects.bulk_create(to_create, batch_size=500)
+        TeacherAvailability.objects.bulk_update(to_update, ["unavailable_mask"], batch_size=500)
+
+        TeacherUnavailableSlot.objects.filter(teacher_id__in=list(masks)).delete()
+        TeacherUnavailableSlot.objects.bulk_create([
+            TeacherUnavailableSlot(teacher_id=teacher_id, day_of_week=day, time_slot_id=ts_id)
+            for teacher_id, mask in masks.items()
+            for day, ts_id in to_cells(mask)
+        ], batch_size=1000)
+
+
+def apply_changes(changes) -> dict[int, int]:
+    """
+    Пакетное изменение графиков. changes — [{'teacher_id', 'unavailable'?, 'add'?, 'remove'?}],
+    ячейки — пары [день, time_slot_id]; 'unavailable' заменяет график целиком,
+    'add'/'remove' правят текущий. Возвращает новые маски.
+    """
+    changes = list(changes)
+    current = masks_for({c["teacher_id"] for c in changes})
+    result = {}
+    for change in changes:
+        teacher_id = change["teacher_id"]
+        mask = result.get(teacher_id, current.get(teacher_id, 0))
+        if "unavailable" in change:
+            mask = to_mask(change["unavailable"])
+        mask |= to_mask(change.get("add", ()))
+        mask &= ~to_mask(change.get("remove", ()))
+        result[teacher_id] = mask
+    save_masks(result)
+    return result
+
+
+def rebuild_from_rows(teacher_ids=None) -> int:
+    """Строит маски из строк TeacherUnavailableSlot; возвращает число преподавателей."""
+    rows = TeacherUnavailableSlot.objects.all()
+    if teacher_ids is not None:
+        rows = rows.filter(teacher_id__in=list(teacher_ids))
+    masks: dict[int, int] = {}
+    for teacher_id, day, ts_id in rows.values_list("teacher_id", "day_of_week", "time_slot_id"):
+        masks[teacher_id] = masks.get(teacher_id, 0) | bit(day, ts_id)
+    with transaction.atomic():
+        stale = TeacherAvailability.objects.exclude(teacher_id__in=list(masks))
+        if teacher_ids is not None:
+            stale = stale.filter(teacher_id__in=list(teacher_ids))
+        stale.delete()
+        save_masks(masks)
+    return len(masks)
@@ -0,0 +1,97 @@
+"""
+Массовая отмена занятий за день (праздник, отключение света и т.п.).
+
+Чётность недели считается один раз, подходящие занятия отбираются одним
+запросом, исключения и записи банка часов пишутся пачками: существующие
+исключения на эту дату переводятся в CANCEL одним UPDATE, недостающие
+создаются bulk_create; записи UnusedHourPool создаются только для тех
+(группа, дисциплина, преподаватель), у которых ещё нет записи на эту дату —
+как раньше делал get_or_create. bulk_create не вызывает сигналы, поэтому
+версия расписания семестра поднимается явно.
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter
+
+from django.db import transaction
+
+from . import occupancy
+from .models import ScheduleException, Semester, UnusedHourPool
+
+logger = logging.getLogger(__name__)
+
+REASON_MAX_LENGTH = UnusedHourPool._meta.get_field("reason").max_length
+
+
+def week_types_on(day, semester: Semester) -> tuple[str, ...]:
+    """Типы недели занятий, которые проходят в день day (неделя 1 семестра — красная)."""
+    is_red = ((day - semester.start_date).days // 7) % 2 == 0
+    return ("EVERY", "RED") if is_red else ("EVERY", "BLUE")
+
+
+def cancel_day(slots_qs, cancel_date, reason: str) -> dict:
+    """
+    Отменяет занятия slots_qs, проходящие в cancel_date.
+    Возвращает {'count': n, 'by_faculty': [{'faculty_id', 'faculty', 'count'}]}.
+    """
+    semester = Semester.get_current(cancel_date)
+    if not semester or not semester.start_date:
+        return {"count": 0, "by_faculty": []}
+
+    rows = list(
+        slots_qs.filter(
+            semester=semester,
+            day_of_week=cancel_date.weekday(),
+            week_type__in=week_types_on(cancel_date, semester),
+            is_active=True,
+        ).values_list(
+            "id", "group_id", "subject_id", "teacher_id",
+            "group__specialty__department__faculty_id", "group__specialty__department__faculty__name",
+        )
+    )
+    if not rows:
+        return {"count": 0, "by_faculty": []}
+    slot_ids = [row[0] for row in rows]
+
+    with transaction.atomic():
+        existing = ScheduleException.objects.filter(schedule_slot_id__in=slot_ids, exception_date=cancel_date)
+        existing_ids = set(existing.values_list("schedule_slot_id", flat=True))
+        existing.update(exception_type="CANCEL", reason=reason)
+        ScheduleException.objects.bulk_create([
+            ScheduleException(
+                schedule_slot_id=slot_id, exception_date=cancel_date, exception_type="CANCEL", reason=reason
+            )
+            for slot_id in slot_ids if slot_id not in existing_ids
+        ], batch_size=1000)
+
+        pooled = set(
+            UnusedHourPool.objects.filter(
+                semester=semester, original_date=cancel_date,
+                group_id__in={row[1] for row in rows},
+            ).values_list("group_id", "subject_id", "teacher_id")
+        )
+        new_pool = []
+        for _slot_id, group_id, subject_id, teacher_id, _faculty_id, _faculty_name in rows:
+            key = (group_id, subject_id, teacher_id)
+            if key in pooled:
+                continue
+            pooled.add(key)
+            new_pool.append(UnusedHourPool(
+                group_id=group_id, subject_id=subject_id, teacher_id=teacher_id,
+                semester=semester, original_date=cancel_date, reason=reason[:REASON_MAX_LENGTH],
+            ))
+        UnusedHourPool.objects.bulk_create(new_pool, batch_size=1000)
+
+        occupancy.schedule_touched(semester.pk)
+
+    faculties = Counter((row[4], row[5]) for row in rows)
+    by_faculty = [
+        {"faculty_id": faculty_id, "faculty": name or "—", "count": count}
+        for (faculty_id, name), count in faculties.most_common()
+    ]
+    logger.info(
+        "cancel_day: %s cancelled %s slot(s) (%s new exception(s), %s new pool row(s)) in %s faculty(ies)",
+        cancel_date, len(rows), len(slot_ids) - len(existing_ids), len(new_pool), len(by_faculty)
+    )
+    return {"count": len(rows), "by_faculty": by_faculty}
@@ -0,0 +1,348 @@
+"""
+Вёрстка расписания группы в DOCX и XLSX.
+
+На вход — контекст из примитивов (его собирает schedule.exports по снимку
+недельной сетки), на выход — байты файла. Модуль не зависит от Django, поэтому
+render() можно вызывать в процессах пула при пакетной выгрузке.
+
+Контекст:
+  lang, head_edu_name, vice_name, director_name, sem_number, academic_year,
+  course, institute_name, shift_num, group_header,
+  time_slots: ["08:00-09:40", ...],
+  days: [{'military': bool, 'cells': [([(заголовок, преподаватель)], аудитории) по парам]}]
+"""
+from __future__ import annotations
+
+from io import BytesIO
+
+try:
+    from docx import Document
+    from docx.shared import Pt, Cm
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    DOCX_AVAILABLE = True
+except ImportError:
+    DOCX_AVAILABLE = False
+
+try:
+    import openpyxl
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+CONTENT_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+HEADER_FILL = "D9D9D9"
+
+TRANSLATIONS = {
+    'ru': {
+        'agreed': "Согласовано:",
+        'head_edu': "Начальник учебного управления",
+        'approved': "Утверждаю:",
+        'vice_director': "Заместитель директора\nпо учебной работе",
+        'docent': "________ доцент",
+        'date_line': "«___» _________ 202__ г.",
+        'title': "Расписание уроков",
+        'subtitle': "на {sem_text} семестр {year_text} учебного года для студентов {course}-го курса {institute_name}",
+        'sem_1': "первый",
+        'sem_2': "второй",
+        'shift': "(СМЕНА {shift_num})",
+        'week': "НЕДЕЛЯ",
+        'time': "ЧАС",
+        'aud': "АУД",
+        'military': "Военная кафедра",
+        'director': "Директор",
+        'days': ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота'],
+        'students': "чел."
+    },
+    'tg': {
+        'agreed': "Мувофиқа карда шуд:",
+        'head_edu': "Сардори раёсати таълим",
+        'approved': "Тасдиқ мекунам:",
+        'vice_director': "Муовини директор\nоид ба корҳои таълимӣ",
+        'docent': "________ дотсент",
+        'date_line': "«___» _________ 202__ с.",
+        'title': "ҶАДВАЛИ ДАРСӢ",
+        'subtitle': "дар нимсолаи {sem_text} соли таҳсили {year_text} барои донишҷӯёни курси {course}-юми {institute_name}",
+        'sem_1': "якуми",
+        'sem_2': "дуюми",
+        'shift': "(БАСТИ {shift_num})",
+        'week': "РӮЗҲО",
+        'time': "СОАТ",
+        'aud': "ҲУҶРА",
+        'military': "Кафедраи ҳарбӣ",
+        'director': "Директор",
+        'days': ['Душанбе', 'Сешанбе', 'Чоршанбе', 'Панҷшанбе', 'Ҷумъа', 'Шанбе'],
+        'students': "нафар"
+    },
+    'en': {
+        'agreed': "Agreed:",
+        'head_edu': "Head of Educational Department",
+        'approved': "Approved:",
+        'vice_director': "Deputy Director\nfor Academic Affairs",
+        'docent': "________ docent",
+        'date_line': "«___» _________ 202__",
+        'title': "Class Schedule",
+        'subtitle': "for the {sem_text} semester of {year_text} academic year for {course} year students of {institute_name}",
+        'sem_1': "first",
+        'sem_2': "second",
+        'shift': "(SHIFT {shift_num})",
+        'week': "DAY",
+        'time': "TIME",
+        'aud': "ROOM",
+        'military': "Military Department",
+        'director': "Director",
+        'days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'],
+        'students': "students"
+    }
+}
+
+
+def _subtitle(ctx: dict, t: dict) -> str:
+    return t['subtitle'].format(
+        sem_text=t['sem_1'] if ctx['sem_number'] == 1 else t['sem_2'],
+        year_text=ctx['academic_year'],
+        course=ctx['course'],
+        institute_name=ctx['institute_name'],
+    )
+
+
+def _shade(tc_pr):
+    shading_elm = OxmlElement('w:shd')
+    shading_elm.set(qn('w:val'), 'clear')
+    shading_elm.set(qn('w:color'), 'auto')
+    shading_elm.set(qn('w:fill'), HEADER_FILL)
+    tc_pr.append(shading_elm)
+
+
+def render_docx(ctx: dict) -> bytes:
+    t = TRANSLATIONS[ctx['lang']]
+    doc = Document()
+
+    section = doc.sections[0]
+    section.left_margin = Cm(1.0)
+    section.right_margin = Cm(1.0)
+    section.top_margin = Cm(1.0)
+    section.bottom_margin = Cm(1.0)
+
+    header_table = doc.add_table(rows=1, cols=2)
+    header_table.autofit = True
+    header_table.width = section.page_width - section.left_margin - section.right_margin
+
+    p1 = header_table.cell(0, 0).paragraphs[0]
+    p1.add_run(t['agreed'] + "\n").bold = True
+    p1.add_run(t['head_edu'] + "\n")
+    p1.add_run(f"{t['docent']} {ctx['head_edu_name']}\n")
+    p1.add_run(t['date_line'])
+
+    p2 = header_table.cell(0, 1).paragraphs[0]
+    p2.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    p2.add_run(t['approved'] + "\n").bold = True
+    p2.add_run(t['vice_director'] + "\n").bold = False
+    p2.add_run(f"{t['docent']} {ctx['vice_name']}\n")
+    p2.add_run(t['date_line'])
+
+    doc.add_paragraph()
+
+    title_p = doc.add_paragraph()
+    title_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = title_p.add_run(t['title'])
+    run.bold = True
+    run.font.size = Pt(16)
+    run.font.name = 'Times New Roman'
+
+    subtitle = doc.add_paragraph()
+    subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run_sub = subtitle.add_run(_subtitle(ctx, t))
+    run_sub.font.name = 'Times New Roman'
+    run_sub.font.size = Pt(12)
+    run_sub.bold = True
+
+    shift_p = doc.add_paragraph(t['shift'].format(shift_num=ctx['shift_num']))
+    shift_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    shift_p.runs[0].bold = True
+    shift_p.runs[0].font.size = Pt(14)
+
+    table = doc.add_table(rows=1, cols=4)
+    table.style = 'Table Grid'
+    table.autofit = False
+
+    def set_col_widths(row):
+        row.cells[0].width = Cm(1.5)
+        row.cells[1].width = Cm(2.5)
+        row.cells[2].width = Cm(11.0)
+        row.cells[3].width = Cm(2.0)
+
+    set_col_widths(table.rows[0])
+
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = t['week']
+    hdr_cells[1].text = t['time']
+    hdr_cells[2].text = ctx['group_header']
+    hdr_cells[3].text = t['aud']
+
+    for cell in hdr_cells:
+        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+        _shade(cell._tc.get_or_add_tcPr())
+        for run in cell.paragraphs[0].runs:
+            run.bold = True
+            run.font.size = Pt(10)
+
+    for day_name, day in zip(t['days'], ctx['days']):
+        first_row_idx = len(table.rows)
+
+        for time_label, (entries, rooms) in zip(ctx['time_slots'], day['cells']):
+            row = table.add_row()
+            set_col_widths(row)
+            row.cells[1].text = time_label
+            row.cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            row.cells[1].vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+            row.cells[1].paragraphs[0].runs[0].font.bold = True
+
+            if day['military'] or not entries:
+                continue
+
+            p = row.cells[2].paragraphs[0]
+            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            for idx, (title, teacher_name) in enumerate(entries):
+                if idx > 0:
+                    p.add_run("\n-------------------\n")
+                p.add_run(f"{title}\n").bold = True
+                if teacher_name:
+                    p.add_run(teacher_name)
+
+            cell_aud = row.cells[3]
+            cell_aud.text = rooms
+            cell_aud.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            cell_aud.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+
+        day_cell = table.rows[first_row_idx].cells[0]
+        day_cell.text = day_name
+        day_cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+
+        tc_pr = day_cell._tc.get_or_add_tcPr()
+        text_direction = OxmlElement('w:textDirection')
+        text_direction.set(qn('w:val'), 'btLr')
+        tc_pr.append(text_direction)
+        _shade(tc_pr)
+
+        last_row_idx = len(table.rows) - 1
+        if last_row_idx > first_row_idx:
+            day_cell.merge(table.rows[last_row_idx].cells[0])
+
+        if day['military']:
+            top_left = table.rows[first_row_idx].cells[2]
+            top_left.merge(table.rows[last_row_idx].cells[3])
+            top_left.text = t['military']
+            for paragraph in top_left.paragraphs:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                for run in paragraph.runs:
+                    run.bold = True
+                    run.font.size = Pt(48)
+                    run.font.name = 'Times New Roman'
+            top_left.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+
+    doc.add_paragraph().add_run('\n')
+
+    footer_table = doc.add_table(rows=1, cols=2)
+    footer_table.autofit = True
+    footer_table.width = section.page_width
+
+    footer_table.cell(0, 0).paragraphs[0].add_run(t['director']).bold = True
+    fp2 = footer_table.cell(0, 1).paragraphs[0]
+    fp2.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    fp2.add_run(ctx['director_name']).bold = True
+
+    f = BytesIO()
+    doc.save(f)
+    return f.getvalue()
+
+
+def render_xlsx(ctx: dict) -> bytes:
+    t = TRANSLATIONS[ctx['lang']]
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = t['title'][:31]
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    fill = PatternFill('solid', fgColor=HEADER_FILL)
+    center = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    for col, width in zip('ABCD', (8, 14, 60, 12)):
+        ws.column_dimensions[col].width = width
+
+    ws['A1'] = f"{t['agreed']}\n{t['head_edu']}\n{t['docent']} {ctx['head_edu_name']}\n{t['date_line']}"
+    ws['C1'] = f"{t['approved']}\n{t['vice_director']}\n{t['docent']} {ctx['vice_name']}\n{t['date_line']}"
+    ws.merge_cells('A1:B1')
+    ws.merge_cells('C1:D1')
+    ws['A1'].alignment = Alignment(vertical='top', wrap_text=True)
+    ws['C1'].alignment = Alignment(horizontal='right', vertical='top', wrap_text=True)
+    ws.row_dimensions[1].height = 75
+
+    for row_idx, text, size in (
+        (3, t['title'], 16),
+        (4, _subtitle(ctx, t), 12),
+        (5, t['shift'].format(shift_num=ctx['shift_num']), 14),
+    ):
+        ws.cell(row=row_idx, column=1, value=text).font = Font(name='Times New Roman', size=size, bold=True)
+        ws.cell(row=row_idx, column=1).alignment = center
+        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=4)
+
+    header_row = 7
+    for col, text in enumerate((t['week'], t['time'], ctx['group_header'], t['aud']), start=1):
+        cell = ws.cell(row=header_row, column=col, value=text)
+        cell.font = Font(bold=True, size=10)
+        cell.alignment = center
+        cell.fill = fill
+        cell.border = border
+
+    row_idx = header_row + 1
+    for day_name, day in zip(t['days'], ctx['days']):
+        first = row_idx
+        for time_label, (entries, rooms) in zip(ctx['time_slots'], day['cells']):
+            ws.cell(row=row_idx, column=2, value=time_label).font = Font(bold=True)
+            if not day['military'] and entries:
+                lesson = "\n-------------------\n".join(
+                    f"{title}\n{teacher_name}" if teacher_name else title for title, teacher_name in entries
+                )
+                ws.cell(row=row_idx, column=3, value=lesson)
+                ws.cell(row=row_idx, column=4, value=rooms)
+            for col in range(1, 5):
+                ws.cell(row=row_idx, column=col).alignment = center
+                ws.cell(row=row_idx, column=col).border = border
+            row_idx += 1
+        if row_idx == first:
+            continue
+        last = row_idx - 1
+
+        day_cell = ws.cell(row=first, column=1, value=day_name)
+        day_cell.alignment = Alignment(horizontal='center', vertical='center', text_rotation=90)
+        day_cell.fill = fill
+        if last > first:
+            ws.merge_cells(start_row=first, start_column=1, end_row=last, end_column=1)
+        if day['military']:
+            cell = ws.cell(row=first, column=3, value=t['military'])
+            cell.font = Font(name='Times New Roman', size=28, bold=True)
+            ws.merge_cells(start_row=first, start_column=3, end_row=last, end_column=4)
+
+    footer = row_idx + 1
+    ws.cell(row=footer, column=1, value=t['director']).font = Font(bold=True)
+    ws.cell(row=footer, column=4, value=ctx['director_name']).font = Font(bold=True)
+    ws.cell(row=footer, column=4).alignment = Alignment(horizontal='right')
+
+    f = BytesIO()
+    wb.save(f)
+    return f.getvalue()
+
+
+def render(fmt: str, ctx: dict) -> bytes:
+    if fmt == "xlsx":
+        return render_xlsx(ctx)
+    return render_docx(ctx)
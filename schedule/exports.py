@@ -0,0 +1,249 @@
+"""
+Выгрузка расписания групп в DOCX/XLSX.
+
+Документ строится по снимку недельной сетки (schedule.snapshots) и кэшируется
+целиком по ключу (формат, группа, семестр, язык, версия расписания семестра):
+правка расписания поднимает версию, и старый файл просто перестаёт находиться.
+Шапка с подписантами и числом студентов в версию не входит — её ограничивает
+EXPORT_TTL.
+
+Пакетная выгрузка факультета отдаёт ZIP потоком: файлы из кэша пишутся сразу,
+остальные верстаются в пуле процессов (schedule.export_render не зависит от
+Django), контексты для них собираются в основном процессе.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+from django.utils.translation import gettext as _
+
+from accounts.models import Director, ProRector
+from . import export_render
+from .models import Institute, Semester
+
+logger = logging.getLogger(__name__)
+
+EXPORT_TTL = getattr(settings, "SCHEDULE_EXPORT_TTL", 900)
+EXPORT_WORKERS = getattr(settings, "SCHEDULE_EXPORT_WORKERS", None)
+
+FORMATS = tuple(export_render.CONTENT_TYPES)
+LANGUAGES = tuple(export_render.TRANSLATIONS)
+SHIFT_NUMBERS = {'MORNING': '1', 'DAY': '2', 'EVENING': '3'}
+WEEK_MARKS = {'RED': " (Красн.)", 'BLUE': " (Син.)"}
+EMPTY_SIGNATURE = "__________________"
+
+
+def available(fmt: str) -> bool:
+    return export_render.XLSX_AVAILABLE if fmt == "xlsx" else export_render.DOCX_AVAILABLE
+
+
+def filename(group, lang: str, fmt: str) -> str:
+    return f"Jadval_{group.name}_{lang}.{fmt}"
+
+
+def cache_key(fmt: str, group_id: int, semester_id: int, lang: str, version: int) -> str:
+    return f"schedule:export:{fmt}:{group_id}:{semester_id}:{lang}:{version}"
+
+
+def _signatories(institute, memo: dict) -> tuple[str, str, str]:
+    """(начальник учебного управления, зам. директора, директор) института."""
+    key = institute.pk if institute else None
+    if key in memo:
+        return memo[key]
+
+    director_obj = Director.objects.filter(institute=institute).select_related('user').first()
+    vice_obj = (
+        ProRector.objects.filter(institute=institute, title__icontains='таълим').select_related('user').first()
+        or ProRector.objects.filter(institute=institute).select_related('user').first()
+    )
+    head_edu_obj = ProRector.objects.filter(
+        institute=institute,
+        title__icontains='раёсат'
+    ).exclude(
+        title__icontains='директор'
+    ).select_related('user').first()
+
+    memo[key] = (
+        head_edu_obj.user.get_full_name() if head_edu_obj else EMPTY_SIGNATURE,
+        vice_obj.user.get_full_name() if vice_obj else EMPTY_SIGNATURE,
+        director_obj.user.get_full_name() if director_obj else EMPTY_SIGNATURE,
+    )
+    return memo[key]
+
+
+def document_context(group, semester: Semester, lang: str, grid: dict, memo: dict | None = None) -> dict:
+    """
+    Контекст для export_render по снимку сетки группы. Вызывать с активным
+    языком lang: названия видов занятий и «общей» специальности переводятся здесь.
+    """
+    memo = {} if memo is None else memo
+    if group.specialty:
+        specialty_code = group.specialty.code
+        specialty_name = group.specialty.name
+        institute = group.specialty.department.faculty.institute
+    else:
+        specialty_code = "—"
+        specialty_name = _("Умумитаълимӣ (Общая)")
+        institute = Institute.objects.first()
+    head_edu_name, vice_name, director_name = _signatories(institute, memo)
+    t = export_render.TRANSLATIONS[lang]
+
+    time_slots = grid["time_slots"]
+    days = []
+    for day_num in range(len(t['days'])):
+        day_cells = grid["cells"].get(day_num, {})
+        military = any(slot.is_military for slots in day_cells.values() for slot in slots)
+        cells = []
+        for ts in time_slots:
+            slots = day_cells.get(ts.id, [])
+            entries = [
+                (
+                    f"{slot.subject.name} ({slot.get_lesson_type_display()}){WEEK_MARKS.get(slot.week_type, '')}",
+                    slot.teacher.user.get_full_name if slot.teacher else "",
+                )
+                for slot in slots
+            ]
+            rooms = "\n".join(dict.fromkeys(slot.room for slot in slots if slot.room))
+            cells.append((entries, rooms))
+        days.append({'military': military, 'cells': cells})
+
+    return {
+        'lang': lang,
+        'head_edu_name': head_edu_name,
+        'vice_name': vice_name,
+        'director_name': director_name,
+        'sem_number': semester.number,
+        'academic_year': str(semester.academic_year),
+        'course': group.course,
+        'institute_name': institute.name if institute else "",
+        'shift_num': SHIFT_NUMBERS.get(group.shift, '1'),
+        'group_header': (
+            f"Группа {group.name} | {specialty_code} – «{specialty_name}» "
+            f"({_student_count(group)} {t['students']})"
+        ),
+        'time_slots': [f'{ts.start_time.strftime("%H:%M")}-{ts.end_time.strftime("%H:%M")}' for ts in time_slots],
+        'days': days,
+    }
+
+
+def _student_count(group) -> int:
+    """Число студентов: аннотация student_count из пакетной выгрузки или отдельный запрос."""
+    count = getattr(group, "student_count", None)
+    return group.students.count() if count is None else count
+
+
+def _version(semester_id: int) -> int | None:
+    return Semester.objects.filter(pk=semester_id).values_list("schedule_version", flat=True).first()
+
+
+def group_document(group, semester: Semester, lang: str, fmt: str, grid_for) -> bytes | None:
+    """
+    Файл расписания группы из кэша или свёрстанный заново.
+    grid_for(group, semester) возвращает снимок сетки; None — семестр не найден.
+    """
+    version = _version(semester.pk)
+    if version is None:
+        return None
+    key = cache_key(fmt, group.pk, semester.pk, lang, version)
+    data = cache.get(key)
+    if data is None:
+        with translation.override(lang):
+            ctx = document_context(group, semester, lang, grid_for(group, semester))
+        data = export_render.render(fmt, ctx)
+        cache.set(key, data, EXPORT_TTL)
+    return data
+
+
+class _ChunkWriter:
+    """Файлоподобный приёмник для ZipFile без seek: копит байты до следующего drain()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _pool_context():
+    """
+    Процессы пула не форкаются от воркера: в нём уже работают потоки
+    (генерация расписания, очередь статистики журнала), и fork мог бы
+    унести в дочерний процесс захваченные ими блокировки.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _render_pool(jobs: list, workers: int):
+    """(индекс, байты) по мере готовности; без пула — по порядку в этом процессе."""
+    pool = futures = None
+    if workers > 1 and len(jobs) > 1:
+        try:
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=_pool_context())
+            futures = {pool.submit(export_render.render, fmt, ctx): idx for idx, (fmt, ctx) in enumerate(jobs)}
+        except (OSError, NotImplementedError) as e:
+            logger.warning("export: process pool unavailable (%s), rendering inline", e)
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            pool = None
+
+    if pool is None:
+        for idx, (fmt, ctx) in enumerate(jobs):
+            yield idx, export_render.render(fmt, ctx)
+        return
+    with pool:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def archive_stream(groups, lang: str, fmt: str, grid_for, workers: int | None = None):
+    """
+    ZIP с расписаниями групп на текущий семестр потоком байтов для
+    StreamingHttpResponse.
+    """
+    workers = workers or EXPORT_WORKERS or os.cpu_count() or 1
+    writer = _ChunkWriter()
+    memo: dict = {}
+    pending = []
+
+    semester = Semester.get_current()
+    version = _version(semester.pk) if semester else None
+
+    with zipfile.ZipFile(writer, "w", zipfile.ZIP_STORED) as archive:
+        with translation.override(lang):
+            for group in groups if version is not None else ():
+                key = cache_key(fmt, group.pk, semester.pk, lang, version)
+                data = cache.get(key)
+                if data is not None:
+                    archive.writestr(filename(group, lang, fmt), data)
+                    yield writer.drain()
+                    continue
+                ctx = document_context(group, semester, lang, grid_for(group, semester), memo)
+                pending.append((filename(group, lang, fmt), key, ctx))
+
+        rendered = 0
+        for idx, data in _render_pool([(fmt, ctx) for _name, _key, ctx in pending], workers):
+            name, key, _ctx = pending[idx]
+            cache.set(key, data, EXPORT_TTL)
+            archive.writestr(name, data)
+            rendered += 1
+            yield writer.drain()
+
+    logger.info("export: archive lang=%s fmt=%s rendered=%s workers=%s", lang, fmt, rendered, workers)
+    yield writer.drain()
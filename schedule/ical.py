@@ -0,0 +1,215 @@
+"""
+Подписка на расписание в формате iCalendar (RFC 5545).
+
+Каждое занятие — один VEVENT с RRULE: еженедельно (EVERY) или раз в две
+недели (RED/BLUE) от первой подходящей даты семестра до Semester.end_date.
+Отмены и переносы без новой даты — EXDATE, переносы — отдельный VEVENT с тем
+же UID и RECURRENCE-ID исходной даты. Календарное приложение разворачивает повторения само, сервер
+отдаёт ленту только при изменении версии расписания (ETag/Last-Modified).
+
+Ссылка на ленту подписана (django.core.signing), поэтому открывается без
+сессии: g<id> — группа, u<id> — «мои занятия» пользователя.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.core import signing
+
+from accounts.models import Group, User
+from . import recurrence
+from .models import ScheduleException, ScheduleSlot
+
+_signer = signing.Signer(salt="schedule.ical")
+
+PRODID = "-//Django_Pr1//Schedule//RU"
+REFRESH_INTERVAL = "PT1H"
+
+
+def feed_token(kind: str, obj_id: int) -> str:
+    return _signer.sign(f"{kind}{obj_id}")
+
+
+def parse_token(token: str) -> tuple[str, int] | None:
+    try:
+        value = _signer.unsign(token)
+    except signing.BadSignature:
+        return None
+    if value[:1] not in ("g", "u") or not value[1:].isdigit():
+        return None
+    return value[0], int(value[1:])
+
+
+def feed_scope(kind: str, obj_id: int):
+    """(название календаря, queryset занятий) для ленты или None."""
+    if kind == "g":
+        group = Group.objects.filter(pk=obj_id).first()
+        if group is None:
+            return None
+        return group.name, ScheduleSlot.objects.filter(group=group, is_active=True)
+
+    user = User.objects.filter(pk=obj_id, is_active=True).first()
+    if user is None:
+        return None
+    if hasattr(user, "student_profile") and getattr(user.student_profile, "group", None):
+        group = user.student_profile.group
+        return group.name, ScheduleSlot.objects.filter(group=group, is_active=True)
+    if hasattr(user, "teacher_profile"):
+        return user.get_full_name(), ScheduleSlot.objects.filter(teacher=user.teacher_profile, is_active=True)
+    return user.get_full_name(), ScheduleSlot.objects.none()
+
+
+def _escape(text) -> str:
+    return (
+        str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Перенос строк длиннее 75 октетов (RFC 5545, 3.1)."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    return "\r\n ".join(parts)
+
+
+def _local(d: date, t: time) -> str:
+    return datetime.combine(d, t).strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(value: datetime) -> str:
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _vtimezone(tz_name: str, year: int) -> list[str]:
+    """VTIMEZONE для зоны без перехода на летнее время; иначе клиент берёт зону по IANA-имени."""
+    tz = ZoneInfo(tz_name)
+    winter = datetime(year, 1, 1, tzinfo=tz).utcoffset()
+    summer = datetime(year, 7, 1, tzinfo=tz).utcoffset()
+    if winter != summer:
+        return []
+    minutes = int(winter.total_seconds()) // 60
+    offset = f"{'+' if minutes >= 0 else '-'}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+    return [
+        "BEGIN:VTIMEZONE", f"TZID:{tz_name}",
+        "BEGIN:STANDARD", "DTSTART:19700101T000000",
+        f"TZOFFSETFROM:{offset}", f"TZOFFSETTO:{offset}",
+        "END:STANDARD", "END:VTIMEZONE",
+    ]
+
+
+def _first_date(slot) -> date | None:
+    sem = slot.semester
+    first = sem.start_date + timedelta(days=(slot.day_of_week - sem.start_date.weekday()) % 7)
+    if slot.week_type == "BLUE":
+        first += timedelta(weeks=1)
+    return first if first <= sem.end_date else None
+
+
+def _real_exceptions(slots, exceptions):
+    """Только исключения, попадающие на настоящую дату занятия (с учётом чётности недели)."""
+    if not exceptions:
+        return []
+    dates = [e.exception_date for e in exceptions]
+    rows, ordinals = recurrence.expand(
+        [s.day_of_week for s in slots], [s.week_type for s in slots],
+        [s.semester.start_date for s in slots], [s.semester.end_date for s in slots],
+        min(dates), max(dates),
+    )
+    slot_ids = np.fromiter((s.id for s in slots), dtype=np.int64, count=len(slots))
+    occ_keys = recurrence.occurrence_keys(slot_ids[rows], ordinals)
+    exc_keys = recurrence.occurrence_keys([e.schedule_slot_id for e in exceptions], [d.toordinal() for d in dates])
+    keep = np.isin(exc_keys, occ_keys)
+    return [e for e, ok in zip(exceptions, keep.tolist()) if ok]
+
+
+def build_feed(name: str, slots_qs, stamp: datetime | None = None) -> str:
+    tz_name = settings.TIME_ZONE
+    stamp = _utc(stamp or datetime.now(dt_timezone.utc))
+    host = getattr(settings, "ICAL_UID_DOMAIN", "schedule")
+
+    slots = [
+        s for s in slots_qs.select_related("subject", "teacher__user", "group", "time_slot", "semester", "classroom")
+        if s.semester and s.semester.start_date and s.semester.end_date and _first_date(s)
+    ]
+    exceptions = []
+    if slots:
+        exceptions = list(
+            ScheduleException.objects.filter(
+                schedule_slot_id__in=[s.id for s in slots],
+                exception_date__gte=min(s.semester.start_date for s in slots),
+            ).select_related("new_classroom").order_by("pk")
+        )
+    by_slot: dict[int, dict] = {}
+    for exc in _real_exceptions(slots, exceptions):
+        # Последнее исключение на дату перекрывает предыдущие.
+        by_slot.setdefault(exc.schedule_slot_id, {})[exc.exception_date] = exc
+
+    year = min((s.semester.start_date.year for s in slots), default=date.today().year)
+    lines = [
+        "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}", f"X-WR-TIMEZONE:{tz_name}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}", f"X-PUBLISHED-TTL:{REFRESH_INTERVAL}",
+        *_vtimezone(tz_name, year),
+    ]
+
+    for slot in slots:
+        sem = slot.semester
+        first = _first_date(slot)
+        start_t, end_t = slot.time_slot.start_time, slot.time_slot.end_time
+        uid = f"slot-{slot.id}-{sem.id}@{host}"
+        summary = "Воен. каф" if slot.is_military else slot.subject.name
+        room = slot.room or (slot.classroom.number if slot.classroom else "")
+        teacher = slot.teacher.user.get_full_name() if slot.teacher else "—"
+        description = f"{slot.get_lesson_type_display()}\n{slot.group.name}\n{teacher}"
+        until = datetime.combine(sem.end_date, time(23, 59, 59), tzinfo=ZoneInfo(tz_name))
+        interval = 1 if slot.week_type == "EVERY" else 2
+
+        lines += [
+            "BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}",
+            f"DTSTART;TZID={tz_name}:{_local(first, start_t)}",
+            f"DTEND;TZID={tz_name}:{_local(first, end_t)}",
+            f"RRULE:FREQ=WEEKLY;INTERVAL={interval};UNTIL={_utc(until)}",
+            f"SUMMARY:{_escape(summary)}",
+            f"DESCRIPTION:{_escape(description)}",
+            f"CATEGORIES:{_escape(slot.get_lesson_type_display())}",
+        ]
+        if room:
+            lines.append(f"LOCATION:{_escape(room)}")
+        overrides = by_slot.get(slot.id, {})
+        for exc_date, exc in sorted(overrides.items()):
+            # Перенос без новой даты снимает занятие, как и в календаре на сайте.
+            if exc.exception_type == "CANCEL" or (exc.exception_type == "RESCHEDULE" and not exc.new_date):
+                lines.append(f"EXDATE;TZID={tz_name}:{_local(exc_date, start_t)}")
+        lines.append("END:VEVENT")
+
+        for exc_date, exc in sorted(overrides.items()):
+            if exc.exception_type != "RESCHEDULE" or not exc.new_date:
+                continue
+            new_room = exc.new_classroom.number if exc.new_classroom else room
+            lines += [
+                "BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}",
+                f"RECURRENCE-ID;TZID={tz_name}:{_local(exc_date, start_t)}",
+                f"DTSTART;TZID={tz_name}:{_local(exc.new_date, exc.new_start_time or start_t)}",
+                f"DTEND;TZID={tz_name}:{_local(exc.new_date, exc.new_end_time or end_t)}",
+                f"SUMMARY:{_escape(summary)}",
+                f"DESCRIPTION:{_escape(description + chr(10) + exc.reason)}",
+            ]
+            if new_room:
+                lines.append(f"LOCATION:{_escape(new_room)}")
+            lines.append("END:VEVENT")
+
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
@@ -0,0 +1,176 @@
+"""
+Планирование недельной нагрузки: сколько пар в неделю нужно дисциплине по
+каждому виду занятий и сколько уже стоит в расписании.
+
+Расчёт один для всех потребителей (конструктор, генератор расписания,
+Subject.get_weekly_slots_needed, отчёты по нагрузке):
+
+  часы за семестр → пары: ceil(часы × академ. час / пара) по институту кафедры;
+  пары → в неделю: делим на число недель текущего семестра
+  (или Subject.semester_weeks, если у семестра нет дат).
+
+Если часы по видам не заполнены, а кредиты есть, аудиторные часы выводятся из
+кредитов (2/3 от кредитов × часов в кредите, поровну лекции/практика/СРСП).
+Для многих дисциплин всё считается одним запросом и массивами NumPy; уже
+поставленные пары считает БД (EVERY = 1, RED/BLUE = 0.5).
+"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, QuerySet, Sum, Value, When
+
+from .models import ScheduleSlot, Semester, Subject
+
+LESSON_TYPES = ("LECTURE", "PRACTICE", "LAB", "SRSP")
+
+DEFAULT_ACADEMIC_HOUR = 50
+DEFAULT_PAIR = 100
+DEFAULT_HOURS_PER_CREDIT = 24
+
+_SUBJECT_FIELDS = (
+    "id", "lecture_hours", "practice_hours", "lab_hours", "control_hours", "credits",
+    "credit_type__hours_per_credit",
+    "department__faculty__institute__academic_hour_duration",
+    "department__faculty__institute__pair_duration",
+    "semester_weeks",
+)
+
+
+def semester_weeks(semester=None) -> int | None:
+    """Число недель семестра (по умолчанию текущего) или None, если у него нет дат."""
+    semester = semester or Semester.get_current()
+    if semester and semester.start_date and semester.end_date:
+        return max(1, int(math.ceil((semester.end_date - semester.start_date).days / 7.0)))
+    return None
+
+
+def weekly_rates(hours, credits, hours_per_credit, academic_hour, pair, weeks, exact: bool = False) -> np.ndarray:
+    """
+    Пар в неделю, массив n×4 в порядке LESSON_TYPES.
+
+    hours — n×4 часов за семестр (лекции, практика, лабораторные, СРСП);
+    остальные аргументы — векторы длины n (None/0 → значения по умолчанию).
+    exact=False — округление до 0.5 пары (но не меньше 0.5, если часы есть),
+    как в конструкторе; exact=True — 4 знака, как ждёт движок расписания.
+    """
+    hours = np.array(hours, dtype=np.int64).reshape(-1, 4)
+    n = len(hours)
+
+    def column(values, default):
+        arr = np.array([v or 0 for v in values], dtype=np.int64) if n else np.zeros(0, dtype=np.int64)
+        return np.where(arr > 0, arr, default)
+
+    credits = np.array([c or 0 for c in credits], dtype=np.int64) if n else np.zeros(0, dtype=np.int64)
+    hours_per_credit = column(hours_per_credit, DEFAULT_HOURS_PER_CREDIT)
+    academic_hour = column(academic_hour, DEFAULT_ACADEMIC_HOUR)
+    pair = column(pair, DEFAULT_PAIR)
+    weeks = np.array([w or 0 for w in weeks], dtype=np.float64) if n else np.zeros(0)
+
+    from_credits = (hours.sum(axis=1) == 0) & (credits > 0)
+    if from_credits.any():
+        auditory = credits[from_credits] * hours_per_credit[from_credits] * 2 // 3
+        lec = auditory // 3
+        hours[from_credits] = np.stack([lec, lec, np.zeros_like(lec), auditory - 2 * lec], axis=1)
+
+    pairs = np.where(hours > 0, np.ceil(hours * academic_hour[:, None] / pair[:, None]), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(weeks[:, None] > 0, pairs / weeks[:, None], 0.0)
+
+    if exact:
+        return np.round(rate, 4)
+    rounded = np.round(rate * 2) / 2.0
+    return np.where((rounded == 0.0) & (rate > 0), 0.5, rounded)
+
+
+def _as_dicts(ids, rates) -> dict[int, dict[str, float]]:
+    return {sid: dict(zip(LESSON_TYPES, row)) for sid, row in zip(ids, rates.tolist())}
+
+
+def weekly_requirements(subjects, semester=None, exact: bool = False) -> dict[int, dict[str, float]]:
+    """{subject_id: {вид занятия: пар в неделю}} для queryset'а или списка id дисциплин — одним запросом."""
+    if not isinstance(subjects, QuerySet):
+        subjects = Subject.objects.filter(pk__in=list(subjects))
+    rows = list(subjects.order_by().values_list(*_SUBJECT_FIELDS).distinct())
+    if not rows:
+        return {}
+    weeks = semester_weeks(semester)
+    cols = list(zip(*rows))
+    rates = weekly_rates(
+        list(zip(*cols[1:5])), cols[5], cols[6], cols[7], cols[8],
+        [weeks or w for w in cols[9]], exact=exact,
+    )
+    return _as_dicts(cols[0], rates)
+
+
+def subject_requirements(subject: Subject, semester=None, exact: bool = False) -> dict[str, float]:
+    """То же для одного уже загруженного экземпляра Subject."""
+    institute = None
+    if subject.department_id and getattr(subject.department, "faculty", None):
+        institute = subject.department.faculty.institute
+    rates = weekly_rates(
+        [(subject.lecture_hours, subject.practice_hours, subject.lab_hours, subject.control_hours)],
+        [subject.credits],
+        [subject.credit_type.hours_per_credit if subject.credit_type_id else None],
+        [getattr(institute, "academic_hour_duration", None)],
+        [getattr(institute, "pair_duration", None)],
+        [semester_weeks(semester) or subject.semester_weeks],
+        exact=exact,
+    )
+    return _as_dicts([subject.pk], rates)[subject.pk]
+
+
+def scheduled_weekly(semester, **filters) -> dict[tuple[int, int, str], float]:
+    """{(group_id, subject_id, вид занятия): поставлено пар в неделю} по активным занятиям семестра."""
+    rows = (
+        ScheduleSlot.objects.filter(semester=semester, is_active=True, **filters)
+        .order_by()
+        .values("group_id", "subject_id", "lesson_type")
+        .annotate(weekly=Sum(Case(
+            When(week_type="EVERY", then=Value(1.0)), default=Value(0.5), output_field=FloatField(),
+        )))
+    )
+    return {(r["group_id"], r["subject_id"], r["lesson_type"]): r["weekly"] for r in rows}
+
+
+def remaining_for_group(group, subjects, semester) -> list[tuple[Subject, str, float]]:
+    """(дисциплина, вид занятия, осталось пар в неделю) для дисциплин группы, где ещё не всё поставлено."""
+    subjects = list(subjects)
+    needed = weekly_requirements([s.pk for s in subjects], semester=semester)
+    scheduled = scheduled_weekly(semester, group=group)
+    result = []
+    for subject in subjects:
+        for lesson_type, weekly in needed.get(subject.pk, {}).items():
+            if weekly <= 0:
+                continue
+            remaining = max(0, weekly - scheduled.get((group.pk, subject.pk, lesson_type), 0))
+            if remaining > 0:
+                result.append((subject, lesson_type, remaining))
+    return result
+
+
+def hours_by(subjects, key: str) -> dict:
+    """
+    Часы за семестр по группировке key (например 'department_id', 'teacher_id'):
+    lec, prac (практика + лабораторные), kmro, credits, count и то же для
+    дисциплин с назначенным преподавателем (ass_lec, ass_prac, ass_kmro).
+    """
+    assigned = Q(teacher__isnull=False)
+
+    def assigned_sum(expr):
+        return Sum(Case(When(assigned, then=expr), default=Value(0), output_field=IntegerField()))
+
+    rows = (
+        subjects.order_by().values(key).annotate(
+            lec=Sum("lecture_hours"),
+            prac=Sum(F("practice_hours") + F("lab_hours")),
+            kmro=Sum("control_hours"),
+            credits=Sum("credits"),
+            count=Count("id"),
+            ass_lec=assigned_sum(F("lecture_hours")),
+            ass_prac=assigned_sum(F("practice_hours") + F("lab_hours")),
+            ass_kmro=assigned_sum(F("control_hours")),
+        )
+    )
+    return {r.pop(key): {k: v or 0 for k, v in r.items()} for r in rows}
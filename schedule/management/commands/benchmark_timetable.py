@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schedule.timetable_benchmark import ENGINES, SCALES, run_suite
+from schedule.timetable_bridge import BINARY_PATH, engine_problem, engine_status
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк решателей расписания на синтетических задачах (время, оценка, RSS, ходы/с)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES), help='Размеры задач (число групп)')
+        parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES), help='Решатели')
+        parser.add_argument('--seed', type=int, default=1, help='Seed генератора задач')
+        parser.add_argument('--repeat', type=int, default=1, help='Повторов на каждую комбинацию')
+        parser.add_argument('--restarts', type=int, help='sa_restarts')
+        parser.add_argument('--steps', type=int, help='sa_steps')
+        parser.add_argument('--max-seconds', type=int, help='max_seconds')
+        parser.add_argument('--output', help='Записать отчёт JSON в файл')
+        parser.add_argument('--json', action='store_true', help='Вывести отчёт JSON в stdout')
+
+    def handle(self, *args, **options):
+        engines = list(options['engines'])
+        problem = engine_problem(BINARY_PATH) if 'native' in engines else None
+        if problem:
+            if engines == ['native']:
+                raise CommandError(problem)
+            self.stderr.write(self.style.WARNING(f'{problem}; нативный движок пропущен'))
+            engines.remove('native')
+
+        params = {
+            key: options[opt]
+            for key, opt in (('sa_restarts', 'restarts'), ('sa_steps', 'steps'), ('max_seconds', 'max_seconds'))
+            if options[opt] is not None
+        }
+
+        if not options['json']:
+            self.stdout.write(
+                f"{'Решатель':<9}{'Групп':>7}{'Задач':>7}{'Время, мс':>12}{'Оценка':>12}"
+                f"{'Не разм.':>10}{'RSS, МБ':>9}{'Ходов/с':>11}"
+            )
+
+        def on_result(row):
+            if options['json']:
+                return
+            if row['error']:
+                self.stdout.write(self.style.ERROR(f"{row['engine']:<9}{row['groups']:>7}  ошибка: {row['error']}"))
+                return
+            rss = f"{row['peak_rss_kb'] / 1024:.0f}" if row['peak_rss_kb'] else '—'
+            self.stdout.write(
+                f"{row['engine']:<9}{row['groups']:>7}{row['tasks']:>7}{row['wall_ms']:>12.0f}"
+                f"{row['score']:>12.0f}{row['unassigned']:>10}{rss:>9}{row['moves_per_sec'] or 0:>11}"
+            )
+            if row['conflicts']:
+                self.stdout.write(self.style.ERROR(f"  пересечений в результате: {row['conflicts']}"))
+
+        report = run_suite(
+            BINARY_PATH,
+            scales=options['scales'],
+            engines=engines,
+            seed=options['seed'],
+            repeat=max(1, options['repeat']),
+            params=params,
+            on_result=on_result,
+        )
+        status = engine_status(BINARY_PATH)
+        report['native_engine'] = {
+            key: status[key] for key in ('binary', 'usable', 'version', 'threads', 'source_hash')
+        }
+
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(text)
+            out = self.stderr if options['json'] else self.stdout
+            out.write(self.style.SUCCESS(f"Отчёт записан в {options['output']}"))
+        if options['json']:
+            self.stdout.write(text)
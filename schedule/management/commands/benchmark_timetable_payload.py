@@ -0,0 +1,113 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Group
+from schedule.models import Semester
+from schedule.timetable_bridge import BINARY_FORMAT, TimetableBridge, engine_info
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает форматы входа движка расписания (JSON и бинарный): размер, кодирование, передачу и разбор'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', type=int, help='ID семестра (по умолчанию текущий)')
+        parser.add_argument('--groups', type=int, nargs='*', help='ID групп (по умолчанию все)')
+        parser.add_argument('--payload', help='Взять готовый JSON-payload из файла вместо БД')
+        parser.add_argument('--warm-start', action='store_true', help='Включить текущее расписание в payload')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов каждого замера')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        bridge = TimetableBridge()
+        if not bridge.binary.exists():
+            raise CommandError(f'Движок не найден: {bridge.binary}')
+        formats = ['json']
+        if BINARY_FORMAT in (engine_info(bridge.binary) or {}).get('payload_formats', []):
+            formats.append(BINARY_FORMAT)
+        else:
+            self.stderr.write(self.style.WARNING('Движок не поддерживает бинарный формат, замер только для JSON'))
+
+        payload = self._payload(bridge, options)
+        repeat = max(1, options['repeat'])
+        rows = [self._measure(bridge, payload, fmt, repeat) for fmt in formats]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'tasks': len(payload['tasks']),
+                'groups': len(payload['groups']),
+                'rooms': len(payload['rooms']),
+                'repeat': repeat,
+                'formats': rows,
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f"Задач: {len(payload['tasks'])}, групп: {len(payload['groups'])}, "
+            f"аудиторий: {len(payload['rooms'])}, повторов: {repeat}"
+        )
+        self.stdout.write(f"{'Формат':<8}{'Байт':>12}{'Кодир., мс':>14}{'Передача+разбор, мс':>22}{'Разбор, мс':>13}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['format']:<8}{row['bytes']:>12}{row['encode_ms']:>14.2f}"
+                f"{row['roundtrip_ms']:>22.2f}{row['parse_ms']:>13.2f}"
+            )
+        if len(rows) == 2 and rows[1]['roundtrip_ms']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Бинарный формат: размер ×{rows[0]['bytes'] / rows[1]['bytes']:.1f} меньше, "
+                f"передача+разбор ×{rows[0]['roundtrip_ms'] / rows[1]['roundtrip_ms']:.1f} быстрее"
+            ))
+
+    def _payload(self, bridge, options):
+        if options['payload']:
+            with open(options['payload'], encoding='utf-8') as fh:
+                return json.load(fh)
+
+        if options['semester']:
+            semester = Semester.objects.filter(pk=options['semester']).first()
+            if not semester:
+                raise CommandError(f"Семестр {options['semester']} не найден")
+        else:
+            semester = Semester.get_current()
+        groups = Group.objects.all()
+        if options['groups']:
+            groups = groups.filter(id__in=options['groups'])
+
+        started = time.perf_counter()
+        payload = bridge.build_payload(semester, groups, warm_start=options['warm_start'])
+        self.stdout.write(f'Payload собран из БД за {(time.perf_counter() - started) * 1000:.0f} мс')
+        return payload
+
+    def _measure(self, bridge, payload, fmt, repeat):
+        encode_ms, roundtrip_ms, parse_ms = [], [], []
+        data = b''
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = bridge.encode(payload, fmt)
+            encode_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            proc = subprocess.run(
+                [str(bridge.binary), '--parse-only'], input=data, capture_output=True, timeout=60,
+            )
+            roundtrip_ms.append((time.perf_counter() - started) * 1000)
+            try:
+                report = json.loads(proc.stdout)
+            except ValueError:
+                report = {}
+            if proc.returncode != 0 or not report.get('success'):
+                raise CommandError(
+                    f"Движок не разобрал payload ({fmt}): {report.get('error') or proc.stderr[:500]}"
+                )
+            parse_ms.append(report.get('parse_ms', 0.0))
+
+        return {
+            'format': fmt,
+            'bytes': len(data),
+            'encode_ms': statistics.median(encode_ms),
+            'roundtrip_ms': statistics.median(roundtrip_ms),
+            'parse_ms': statistics.median(parse_ms),
+        }
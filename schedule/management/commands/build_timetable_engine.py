@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schedule.timetable_bridge import (
+    ENGINE_MIN_VERSION, ENGINE_SOURCES, TimetableBridge, TimetableError,
+    engine_info, engine_source_hash, engine_status,
+)
+from schedule.timetable_synthetic import find_conflicts, generate_payload
+
+BIN_DIR = ENGINE_SOURCES[0].parent / "bin"
+SMOKE_PAYLOAD = {"sa_restarts": 2, "sa_steps": 20000, "max_seconds": 15}
+
+
+class Command(BaseCommand):
+    help = 'Собирает timetable_engine из исходников под текущий CPU и проверяет его пробным решением'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compiler', default=os.environ.get('CXX', 'g++'), help='Компилятор C++ (по умолчанию $CXX или g++)')
+        parser.add_argument('--portable', action='store_true', help='Без -march=native (бинарник для другого CPU)')
+        parser.add_argument('--output', help='Путь к бинарнику (по умолчанию schedule/bin/timetable_engine)')
+        parser.add_argument('--force', action='store_true', help='Пересобрать, даже если бинарник актуален')
+        parser.add_argument('--check', action='store_true', help='Только проверить текущий бинарник, без сборки')
+        parser.add_argument('--smoke-groups', type=int, default=10, help='Размер пробной задачи (групп)')
+        parser.add_argument('--json', action='store_true', help='Вывести отчёт в JSON')
+
+    def handle(self, *args, **options):
+        output = Path(options['output']) if options['output'] else BIN_DIR / (
+            'timetable_engine.exe' if os.name == 'nt' else 'timetable_engine'
+        )
+
+        if options['check']:
+            status = engine_status(output)
+            if status['usable']:
+                status['smoke'] = self._smoke(output, options['smoke_groups'])
+            self._report(status, options)
+            if not status['usable']:
+                raise CommandError(status['problem'])
+            return
+
+        if not options['force'] and engine_status(output)['usable']:
+            self.stdout.write(self.style.SUCCESS(f'Движок актуален: {output} (используйте --force для пересборки)'))
+            return
+
+        source_hash = engine_source_hash()
+        if source_hash is None:
+            raise CommandError('Исходники движка не найдены: ' + ', '.join(str(p) for p in ENGINE_SOURCES))
+        if not shutil.which(options['compiler']):
+            raise CommandError(f"Компилятор не найден: {options['compiler']}")
+
+        flags = ['-O3', '-std=c++17', '-pthread', '-DNDEBUG', f'-DENGINE_SOURCE_HASH="{source_hash}"']
+        if not options['portable']:
+            flags += ['-march=native', '-mtune=native']
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output.with_name(f'{output.stem}.build-{os.getpid()}{output.suffix}')
+        cmd = [options['compiler'], *flags, '-o', str(tmp), str(ENGINE_SOURCES[0])]
+        self.stdout.write(f"  → {' '.join(cmd)}")
+
+        started = time.monotonic()
+        try:
+            proc = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+        except subprocess.TimeoutExpired as exc:
+            raise CommandError('Компиляция не завершилась за 10 минут') from exc
+        compile_seconds = time.monotonic() - started
+        if proc.returncode != 0:
+            tmp.unlink(missing_ok=True)
+            raise CommandError(f'Ошибка компиляции:\n{proc.stderr[-3000:]}')
+
+        try:
+            info = engine_info(tmp) or {}
+            if info.get('version', 0) < ENGINE_MIN_VERSION or info.get('source_hash') != source_hash:
+                raise CommandError(f'Собранный движок не прошёл самопроверку: --version вернул {info}')
+            smoke = self._smoke(tmp, options['smoke_groups'])
+            os.replace(tmp, output)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        build = {
+            'version': info['version'],
+            'threads': info.get('threads'),
+            'source_hash': source_hash,
+            'compiler': options['compiler'],
+            'flags': flags,
+            'compile_seconds': round(compile_seconds, 1),
+            'built_at': timezone.now().isoformat(),
+            'smoke': smoke,
+        }
+        output.with_name('timetable_engine.build.json').write_text(json.dumps(build, indent=2), encoding='utf-8')
+
+        status = engine_status(output)
+        status['smoke'] = smoke
+        self._report(status, options)
+
+    def _smoke(self, binary, n_groups):
+        payload = generate_payload(n_groups, seed=1, **SMOKE_PAYLOAD)
+        bridge = TimetableBridge(binary, backend='native')
+        started = time.monotonic()
+        try:
+            result = bridge.run(payload)
+        except TimetableError as exc:
+            raise CommandError(f'Пробное решение завершилось ошибкой: {exc}') from exc
+        conflicts = find_conflicts(result)
+        if conflicts:
+            raise CommandError('Пробное решение содержит пересечения: ' + '; '.join(conflicts[:5]))
+        if not result.get('placed_count'):
+            raise CommandError('Пробное решение не разместило ни одного занятия')
+        return {
+            'groups': n_groups,
+            'tasks': result.get('total_tasks'),
+            'placed': result.get('placed_count'),
+            'unplaced': result.get('unplaced_count'),
+            'score': result.get('score'),
+            'seconds': round(time.monotonic() - started, 2),
+        }
+
+    def _report(self, status, options):
+        if options['json']:
+            self.stdout.write(json.dumps(status, indent=2, ensure_ascii=False))
+            return
+        if not status['usable']:
+            self.stderr.write(self.style.ERROR(status['problem']))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Движок {status['binary']}: версия {status['version']}, потоков {status['threads']}, "
+            f"форматы {', '.join(status['payload_formats'])}"
+        ))
+        smoke = status.get('smoke')
+        if smoke:
+            self.stdout.write(
+                f"  Пробное решение: {smoke['placed']}/{smoke['tasks']} занятий, "
+                f"не размещено {smoke['unplaced']}, {smoke['seconds']} с"
+            )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from schedule import availability
+from schedule.models import TeacherAvailability, TeacherUnavailableSlot
+
+
+class Command(BaseCommand):
+    help = 'Строит битовые маски доступности преподавателей из строк TeacherUnavailableSlot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, nargs='*', help='ID преподавателей (по умолчанию все)')
+        parser.add_argument('--check', action='store_true', help='Только сравнить маски со строками, ничего не менять')
+
+    def handle(self, *args, **options):
+        teacher_ids = options['teachers'] or None
+
+        if options['check']:
+            rows = TeacherUnavailableSlot.objects.all()
+            stored = TeacherAvailability.objects.all()
+            if teacher_ids:
+                rows = rows.filter(teacher_id__in=teacher_ids)
+                stored = stored.filter(teacher_id__in=teacher_ids)
+            expected: dict[int, int] = {}
+            for teacher_id, day, ts_id in rows.values_list('teacher_id', 'day_of_week', 'time_slot_id'):
+                expected[teacher_id] = expected.get(teacher_id, 0) | availability.bit(day, ts_id)
+            actual = {
+                teacher_id: availability.decode(data)
+                for teacher_id, data in stored.values_list('teacher_id', 'unavailable_mask')
+            }
+            missing = sorted(set(expected) - set(actual))
+            differ = sorted(t for t in set(expected) & set(actual) if expected[t] != actual[t])
+            self.stdout.write(
+                f"Преподавателей со строками: {len(expected)}, без маски: {len(missing)}, расхождений: {len(differ)}"
+            )
+            if differ:
+                self.stdout.write(self.style.WARNING(f"Расходятся: {', '.join(map(str, differ[:50]))}"))
+            return
+
+        count = availability.rebuild_from_rows(teacher_ids)
+        self.stdout.write(self.style.SUCCESS(f"Маски построены для {count} преподавателей"))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from schedule.models import TimetableGenerationTask
+from schedule.tasks import recover_timetable_tasks, run_timetable_task
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь задач генерации расписания (восстанавливает прерванные задачи)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, опрашивая очередь')
+        parser.add_argument('--interval', type=int, default=5, help='Интервал опроса очереди (сек)')
+
+    def handle(self, *args, **options):
+        while True:
+            recover_timetable_tasks(submit=False)
+            processed = self._drain()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Обработано задач: {processed}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _drain(self):
+        processed = 0
+        while True:
+            task_id = (
+                TimetableGenerationTask.objects.filter(status='PENDING')
+                .order_by('created_at')
+                .values_list('pk', flat=True)
+                .first()
+            )
+            if not task_id:
+                return processed
+            self.stdout.write(f'  → Генерация задачи {task_id}...')
+            run_timetable_task(str(task_id))
+            processed += 1
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from schedule import room_analytics
+from schedule.models import Semester
+
+
+class Command(BaseCommand):
+    help = 'Загрузка аудиторий за семестр: занятые часы, пиковая насыщенность, заполнение по вместимости'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', type=int, help='ID семестра (по умолчанию текущий)')
+        parser.add_argument('--institute', type=int, help='Только аудитории института')
+        parser.add_argument('--level', choices=['rooms', 'buildings', 'institutes'], default='buildings',
+                            help='Уровень таблицы (по умолчанию корпуса)')
+        parser.add_argument('--fresh', action='store_true', help='Пересчитать, не используя кэш')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        if options['semester']:
+            semester = Semester.objects.filter(pk=options['semester']).first()
+        else:
+            semester = Semester.get_current()
+        if not semester:
+            raise CommandError('Семестр не найден')
+
+        data = room_analytics.compute(semester) if options['fresh'] else room_analytics.utilization(semester)
+        if options['institute']:
+            data = room_analytics.for_institute(data, options['institute'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+            return
+
+        level = options['level']
+        self.stdout.write(f"Семестр: {semester} (ID {semester.pk})")
+        self.stdout.write(
+            f"{'Название':<30}{'Ауд.':>6}{'Часы':>8}{'Кр., %':>8}{'Син., %':>9}"
+            f"{'Заполн., %':>12}{'Перепол.':>10}{'Полупуст.':>11}"
+        )
+        rows = sorted(data[level], key=lambda r: -max(r['utilization'].values(), default=0))
+        for row in rows:
+            name = row['number'] if level == 'rooms' else (row['name'] or '—')
+            if level == 'rooms' and row['building']:
+                name = f"{row['building']} — {name}"
+            self.stdout.write(
+                f"{str(name)[:29]:<30}{row.get('rooms', 1):>6}{row['available_hours']:>8.1f}"
+                f"{row['utilization']['RED'] * 100:>8.1f}{row['utilization']['BLUE'] * 100:>9.1f}"
+                f"{row['avg_fill'] * 100:>12.1f}{row['overflow']:>10}{row['underfilled']:>11}"
+            )
+
+        if level == 'institutes':
+            for row in rows:
+                for peak in row.get('peaks', []):
+                    self.stdout.write(
+                        f"  {row['name'] or '—'}: день {peak['day'] + 1}, {peak['start_time']}, "
+                        f"{peak['week_type']} — занято {peak['occupied']} из {row['rooms']} "
+                        f"({peak['saturation'] * 100:.0f}%)"
+                    )
@@ -1,5 +1,5 @@
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
 from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import User, Group, Teacher, Department, Faculty
 from datetime import timedelta, date
@@ -276,47 +276,8 @@ class Subject(models.Model):
             return self.semester_weeks
 
     def get_weekly_slots_needed(self) -> dict:
-        actual_weeks = self.get_actual_semester_weeks()
-        if actual_weeks <= 0:
-            return {'LECTURE': 0.0, 'PRACTICE': 0.0, 'LAB': 0.0, 'SRSP': 0.0}
-
-        lec_h = self.lecture_hours
-        prac_h = self.practice_hours
-        lab_h = self.lab_hours
-        srsp_h = self.control_hours
-
-        if lec_h == 0 and prac_h == 0 and lab_h == 0 and srsp_h == 0 and self.credits > 0:
-            try:
-                hours_per_credit = self.credit_type.hours_per_credit if self.credit_type else 24
-            except AttributeError:
-                hours_per_credit = 24
-
-            total_auditory = (self.credits * hours_per_credit) * 2 // 3
-            lec_h = total_auditory // 3
-            prac_h = total_auditory // 3
-            srsp_h = total_auditory - lec_h - prac_h
-
-        total_lec_pairs = self.get_hours_in_pairs(lec_h)
-        total_prac_pairs = self.get_hours_in_pairs(prac_h)
-        total_lab_pairs = self.get_hours_in_pairs(lab_h)
-        total_srsp_pairs = self.get_hours_in_pairs(srsp_h)
-
-        def _weekly_rate(total_pairs: int) -> float:
-            if total_pairs <= 0:
-                return 0.0
-            rate = total_pairs / actual_weeks
-            rounded_rate = round(rate * 2) / 2.0
-            if rounded_rate == 0.0 and rate > 0:
-                return 0.5
-            return rounded_rate
-
-        return {
-            'LECTURE':  _weekly_rate(total_lec_pairs),
-            'PRACTICE': _weekly_rate(total_prac_pairs),
-            'LAB':      _weekly_rate(total_lab_pairs),
-            'SRSP':     _weekly_rate(total_srsp_pairs),
-        }
-    
+        from schedule.load_planner import subject_requirements
+        return subject_requirements(self)
 
 
 class TimeSlot(models.Model):
@@ -361,6 +322,13 @@ class Semester(models.Model):
     number = models.IntegerField(choices=NUMBER_CHOICES, verbose_name=_("Номер семестра"))
     start_date = models.DateField(verbose_name=_("Дата начала"))
     end_date = models.DateField(verbose_name=_("Дата окончания"))
+    schedule_version = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_("Версия расписания"),
+        help_text=_("Растёт при каждом изменении занятий семестра; по ней сверяются кэши расписания")
+    )
+    schedule_updated_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name=_("Расписание изменено")
+    )
 
     class Meta:
         verbose_name = _("Семестр")
@@ -414,9 +382,22 @@ class Semester(models.Model):
         sd, ed = date(y, 2, 1), date(y, 6, 30)
         return ay, 2, sd, ed
 
+    @classmethod
+    def bump_schedule_version(cls, *semester_ids):
+        ids = {sid for sid in semester_ids if sid}
+        if ids:
+            cls.objects.filter(pk__in=ids).update(
+                schedule_version=F('schedule_version') + 1, schedule_updated_at=timezone.now()
+            )
+
     @classmethod
     def get_current(cls, at_date=None):
-        d = at_date or timezone.now().date()
+        """Семестр на дату (по умолчанию сегодня); кэшируется в процессе, см. schedule.semesters."""
+        from .semesters import get_current
+        return get_current(at_date)
+
+    @classmethod
+    def resolve(cls, d):
         row = cls.objects.filter(start_date__lte=d, end_date__gte=d).first()
         if row:
             return row
@@ -775,6 +756,25 @@ class TeacherUnavailableSlot(models.Model):
         return f"{self.teacher} - {self.get_day_of_week_display()} {self.time_slot}"
 
 
+class TeacherAvailability(models.Model):
+    """Недоступное время преподавателя одной битовой маской (см. schedule.availability)."""
+    teacher = models.OneToOneField(
+        'accounts.Teacher',
+        on_delete=models.CASCADE,
+        related_name='availability',
+        verbose_name=_("Преподаватель")
+    )
+    unavailable_mask = models.BinaryField(default=b'', verbose_name=_("Маска недоступности"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Обновлено"))
+
+    class Meta:
+        verbose_name = _("График доступности преподавателя")
+        verbose_name_plural = _("Графики доступности преподавателей")
+
+    def __str__(self):
+        return str(self.teacher)
+
+
 
 
 
@@ -811,3 +811,47 @@ class RupParseTask(models.Model):
         return f"RupParseTask {self.id} [{self.status}]"
 
 
+class TimetableGenerationTask(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', _('В очереди')),
+        ('RUNNING', _('Выполняется')),
+        ('SUCCESS', _('Успешно')),
+        ('FAILURE', _('Ошибка')),
+        ('CANCELLED', _('Отменено')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='PENDING', db_index=True
+    )
+    cancel_requested = models.BooleanField(default=False, verbose_name=_("Запрошена остановка"))
+    semester = models.ForeignKey(Semester, on_delete=models.CASCADE, related_name='generation_tasks')
+    institute = models.ForeignKey(Institute, on_delete=models.SET_NULL, null=True, blank=True)
+    params = models.JSONField(default=dict, verbose_name=_("Параметры генерации"))
+    progress = models.JSONField(default=dict, blank=True, verbose_name=_("Прогресс"))
+    result = models.JSONField(null=True, blank=True, verbose_name=_("Результат (JSON)"))
+    error = models.TextField(blank=True, verbose_name=_("Текст ошибки"))
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='timetable_tasks',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Задача генерации расписания")
+        verbose_name_plural = _("Задачи генерации расписания")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"TimetableGenerationTask {self.id} [{self.status}]"
+
+    @property
+    def is_finished(self):
+        return self.status in ('SUCCESS', 'FAILURE', 'CANCELLED')
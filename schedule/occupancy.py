@@ -0,0 +1,333 @@
+"""
+Индекс занятости групп, преподавателей и аудиторий по семестру.
+
+Для каждой сущности ("group", id), ("teacher", id), ("room", classroom_id),
+("room_text", номер) хранится битовая маска занятых ячеек
+(день, пара, тип недели): два бита на ячейку — красная и синяя неделя,
+занятие EVERY занимает оба. Проверка кандидата — одно AND по маске, без
+запросов к ScheduleSlot; id конфликтующих занятий ищутся только там, где бит
+совпал.
+
+Там же — матрица занятости аудиторий для конструктора: (день, пара) →
+{classroom_id: [{slot_id, stream_id, week_type}]}. Пересечение по времени
+считается один раз на столбец (пару сетки института) при первом запросе,
+дальше матрица только поправляется при изменении занятий. По ней же
+room_context отвечает подбору аудиторий (schedule.room_recommender).
+
+Индекс строится одним запросом на семестр и живёт в памяти процесса.
+Сигналы ScheduleSlot (post_save/post_delete) собирают семестры транзакции, и
+после коммита Semester.schedule_version поднимается одним UPDATE на все
+семестры, а изменения вносятся в локальный индекс. Так сохранение занятий в
+цикле не пишет строку семестра на каждое занятие и не держит её блокировку до
+конца транзакции; цена — между коммитом и UPDATE версии другие процессы
+короткое время видят новые занятия при старой версии. Перед использованием
+версия индекса сверяется с БД: если расписание меняли другой процесс или
+массовая операция без сигналов (bulk_create, update), индекс перестраивается.
+"""
+from __future__ import annotations
+
+import threading
+from functools import partial
+
+from django.db import transaction
+
+from .models import ScheduleSlot, Semester
+
+DAYS = 6
+WEEK_BITS = {"EVERY": 0b11, "RED": 0b01, "BLUE": 0b10}
+
+_lock = threading.RLock()
+_indexes: dict[int, "OccupancyIndex"] = {}
+_columns: dict[int, int] = {}
+_pending = threading.local()
+
+
+def _column(time_slot_id: int) -> int:
+    col = _columns.get(time_slot_id)
+    if col is None:
+        with _lock:
+            col = _columns.setdefault(time_slot_id, len(_columns))
+    return col
+
+
+def cell_mask(day: int, time_slot_id: int, week_type: str = "EVERY") -> int:
+    """Биты ячейки; новые пары получают следующие столбцы, старые маски не меняются."""
+    if not 0 <= day < DAYS:
+        return 0
+    return WEEK_BITS.get(week_type, 0b11) << ((_column(time_slot_id) * DAYS + day) * 2)
+
+
+def room_row(day, start, end, classroom_id, stream_id, week_type):
+    if not classroom_id or not 0 <= day < DAYS:
+        return None
+    return (day, start, end, classroom_id, stream_id, week_type)
+
+
+def slot_keys(group_id, teacher_id, classroom_id, room) -> list[tuple]:
+    keys = []
+    if group_id:
+        keys.append(("group", group_id))
+    if teacher_id:
+        keys.append(("teacher", teacher_id))
+    if classroom_id:
+        keys.append(("room", classroom_id))
+    if room:
+        keys.append(("room_text", room))
+    return keys
+
+
+class OccupancyIndex:
+    def __init__(self, semester_id: int, version: int):
+        self.semester_id = semester_id
+        self.version = version
+        self.bits: dict[tuple, int] = {}
+        self.holders: dict[tuple, set] = {}
+        self.slots: dict[int, tuple[int, list]] = {}
+        # Матрица аудиторий: строки занятий с аудиторией и материализованные столбцы-пары.
+        self.room_rows: dict[int, tuple] = {}
+        self.columns: dict[int, tuple] = {}
+        self.room_cells: dict[tuple[int, int], dict[int, dict]] = {}
+
+    @classmethod
+    def build(cls, semester_id: int, version: int) -> "OccupancyIndex":
+        index = cls(semester_id, version)
+        rows = ScheduleSlot.objects.filter(semester_id=semester_id, is_active=True).values_list(
+            "id", "day_of_week", "time_slot_id", "week_type", "group_id", "teacher_id", "classroom_id", "room",
+            "start_time", "end_time", "stream_id",
+        )
+        for (slot_id, day, ts_id, wt, group_id, teacher_id, classroom_id, room,
+             start, end, stream_id) in rows.iterator(chunk_size=5000):
+            index.add(
+                slot_id, cell_mask(day, ts_id, wt), slot_keys(group_id, teacher_id, classroom_id, room),
+                room_row(day, start, end, classroom_id, stream_id, wt),
+            )
+        return index
+
+    def add(self, slot_id: int, mask: int, keys: list, room=None) -> None:
+        self.slots[slot_id] = (mask, keys)
+        for key in keys:
+            self.holders.setdefault(key, set()).add(slot_id)
+            self.bits[key] = self.bits.get(key, 0) | mask
+        if room is not None:
+            self.room_rows[slot_id] = room
+            for ts_id, (start, end) in self.columns.items():
+                self._place_room(slot_id, room, ts_id, start, end)
+
+    def remove(self, slot_id: int) -> None:
+        room = self.room_rows.pop(slot_id, None)
+        if room is not None:
+            for ts_id in self.columns:
+                cell = self.room_cells.get((room[0], ts_id), {})
+                holders = cell.get(room[3])
+                if holders and holders.pop(slot_id, None) is not None and not holders:
+                    del cell[room[3]]
+        entry = self.slots.pop(slot_id, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            holders = self.holders.get(key)
+            if holders is None:
+                continue
+            holders.discard(slot_id)
+            mask = 0
+            for other in holders:
+                mask |= self.slots[other][0]
+            if mask:
+                self.bits[key] = mask
+            else:
+                self.bits.pop(key, None)
+                self.holders.pop(key, None)
+
+    def _place_room(self, slot_id: int, room: tuple, ts_id: int, start, end) -> None:
+        day, slot_start, slot_end, classroom_id, stream_id, week_type = room
+        if slot_start < end and slot_end > start:
+            cell = self.room_cells.setdefault((day, ts_id), {})
+            cell.setdefault(classroom_id, {})[slot_id] = (stream_id, week_type)
+
+    def _ensure_column(self, ts_id: int, start, end) -> None:
+        if self.columns.get(ts_id) == (start, end):
+            return
+        for day in range(DAYS):
+            self.room_cells.pop((day, ts_id), None)
+        self.columns[ts_id] = (start, end)
+        for slot_id, room in self.room_rows.items():
+            self._place_room(slot_id, room, ts_id, start, end)
+
+    def room_occupancy(self, time_slots) -> dict:
+        """{day: {time_slot_id: {classroom_id: [{slot_id, stream_id, week_type}]}}} по пересечению во времени."""
+        result: dict = {}
+        for ts in time_slots:
+            self._ensure_column(ts.id, ts.start_time, ts.end_time)
+            for day in range(DAYS):
+                cell = self.room_cells.get((day, ts.id))
+                if not cell:
+                    continue
+                result.setdefault(day, {})[ts.id] = {
+                    classroom_id: [
+                        {
+                            'slot_id': str(slot_id),
+                            'stream_id': str(stream_id) if stream_id else 'None',
+                            'week_type': week_type,
+                        }
+                        for slot_id, (stream_id, week_type) in holders.items()
+                    ]
+                    for classroom_id, holders in cell.items()
+                }
+        return result
+
+    def busy_rooms(self, day: int, ts_id: int, start, end, week_type: str = "EVERY", exclude=()) -> set[int]:
+        """Аудитории, занятые в ячейке (день, пара) в неделю week_type, кроме занятий exclude."""
+        self._ensure_column(ts_id, start, end)
+        bits = WEEK_BITS.get(week_type, 0b11)
+        return {
+            classroom_id
+            for classroom_id, holders in self.room_cells.get((day, ts_id), {}).items()
+            if any(
+                slot_id not in exclude and WEEK_BITS.get(wt, 0b11) & bits
+                for slot_id, (_stream_id, wt) in holders.items()
+            )
+        }
+
+    def rooms_of(self, key: tuple, day: int, week_type: str = "EVERY", exclude=()) -> list[tuple]:
+        """(начало, конец, classroom_id) занятий сущности key в день day, у которых есть аудитория."""
+        bits = WEEK_BITS.get(week_type, 0b11)
+        rows = []
+        for slot_id in self.holders.get(key, ()):
+            room = self.room_rows.get(slot_id)
+            if slot_id in exclude or room is None or room[0] != day or not WEEK_BITS.get(room[5], 0b11) & bits:
+                continue
+            rows.append((room[1], room[2], room[3]))
+        return rows
+
+    def conflicts(self, key: tuple, mask: int, exclude=()) -> list[int]:
+        """id занятий сущности key, пересекающихся с маской (без exclude)."""
+        if not self.bits.get(key, 0) & mask:
+            return []
+        return sorted(
+            slot_id for slot_id in self.holders[key]
+            if slot_id not in exclude and self.slots[slot_id][0] & mask
+        )
+
+
+def get_index(semester_id: int) -> OccupancyIndex:
+    version = Semester.objects.filter(pk=semester_id).values_list("schedule_version", flat=True).first()
+    if version is None:
+        return OccupancyIndex(semester_id, 0)
+    index = _indexes.get(semester_id)
+    if index is not None and index.version == version:
+        return index
+    index = OccupancyIndex.build(semester_id, version)
+    with _lock:
+        _indexes[semester_id] = index
+    return index
+
+
+def find_conflicts(semester_id: int, placements, exclude=()) -> list[list[tuple[str, int]]]:
+    """
+    placements — последовательность (day, time_slot_id, week_type, keys).
+    Для каждой — список (тип конфликта, id занятия); пустой список — ячейка свободна.
+    """
+    index = get_index(semester_id)
+    exclude = set(exclude)
+    results = []
+    with _lock:
+        for day, ts_id, week_type, keys in placements:
+            mask = cell_mask(day, ts_id, week_type)
+            found = []
+            for key in keys:
+                kind = "room" if key[0] == "room_text" else key[0]
+                found.extend((kind, slot_id) for slot_id in index.conflicts(key, mask, exclude))
+            results.append(found)
+    return results
+
+
+def room_occupancy(semester_id: int, time_slots) -> dict:
+    """Занятые аудитории в ячейках сетки конструктора (см. OccupancyIndex.room_occupancy)."""
+    index = get_index(semester_id)
+    with _lock:
+        return index.room_occupancy(time_slots)
+
+
+def room_context(semester_id: int, day: int, time_slot, week_type: str, group_ids, exclude=()):
+    """
+    (занятые аудитории ячейки, [(начало, конец, classroom_id)] занятий групп в этот день)
+    для подбора аудитории; exclude — занятия, которые переносятся.
+    """
+    index = get_index(semester_id)
+    exclude = set(exclude)
+    with _lock:
+        busy = index.busy_rooms(day, time_slot.id, time_slot.start_time, time_slot.end_time, week_type, exclude)
+        around = [
+            row for group_id in group_ids
+            for row in index.rooms_of(("group", group_id), day, week_type, exclude)
+        ]
+    return busy, around
+
+
+def _bump(semester_ids) -> None:
+    """Версия семестров в БД и в локальных индексах: один UPDATE на все семестры."""
+    Semester.bump_schedule_version(*semester_ids)
+    with _lock:
+        for semester_id in semester_ids:
+            index = _indexes.get(semester_id)
+            if index is not None:
+                index.version += 1
+
+
+def _flush(batch: dict) -> None:
+    if getattr(_pending, "batch", None) is batch:
+        _pending.batch = None
+    _bump(batch["semesters"])
+
+
+def _touch_version(semester_id: int) -> None:
+    """
+    Поднимает версию семестра после коммита текущей транзакции. Все семестры
+    одной транзакции поднимаются вместе; вне транзакции — сразу.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _bump([semester_id])
+        return
+    batch = getattr(_pending, "batch", None)
+    # Откат транзакции выбрасывает on_commit вместе с пачкой — тогда начинаем новую.
+    if batch is None or not any(hook[1] is batch["flush"] for hook in connection.run_on_commit):
+        batch = {"semesters": set()}
+        batch["flush"] = partial(_flush, batch)
+        _pending.batch = batch
+        transaction.on_commit(batch["flush"])
+    batch["semesters"].add(semester_id)
+
+
+def _apply(semester_id: int, slot_id: int, entry) -> None:
+    with _lock:
+        for index in _indexes.values():
+            index.remove(slot_id)
+        index = _indexes.get(semester_id)
+        if index is not None and entry is not None:
+            index.add(slot_id, *entry)
+
+
+def slot_saved(slot: ScheduleSlot) -> None:
+    _touch_version(slot.semester_id)
+    entry = None
+    if slot.is_active:
+        entry = (
+            cell_mask(slot.day_of_week, slot.time_slot_id, slot.week_type),
+            slot_keys(slot.group_id, slot.teacher_id, slot.classroom_id, slot.room),
+            room_row(slot.day_of_week, slot.start_time, slot.end_time,
+                     slot.classroom_id, slot.stream_id, slot.week_type),
+        )
+    semester_id, slot_id = slot.semester_id, slot.pk
+    transaction.on_commit(lambda: _apply(semester_id, slot_id, entry))
+
+
+def slot_deleted(slot: ScheduleSlot) -> None:
+    _touch_version(slot.semester_id)
+    semester_id, slot_id = slot.semester_id, slot.pk
+    transaction.on_commit(lambda: _apply(semester_id, slot_id, None))
+
+
+def schedule_touched(semester_id: int) -> None:
+    """Изменение расписания без изменения занятий (исключения): версия растёт, индекс остаётся."""
+    _touch_version(semester_id)
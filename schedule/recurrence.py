@@ -0,0 +1,69 @@
+"""
+Развёртка недельного расписания в даты занятий.
+
+Занятие повторяется раз в неделю в свой день недели в пределах семестра;
+RED — только нечётные недели семестра, BLUE — только чётные (неделя 1 —
+та, в которую попадает Semester.start_date). Развёртка считается сразу для
+всех занятий матрицей «занятие × неделя» на порядковых номерах дат
+(date.toordinal), исключения подклеиваются сортированным соединением по ключу
+(занятие, дата). Модуль не зависит от Django.
+"""
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+
+# Порядковые номера дат (~7.4e5) помещаются в 20 бит.
+_DATE_BITS = 20
+
+
+def expand(days_of_week, week_types, semester_starts, semester_ends, start: date, end: date):
+    """
+    Даты занятий в [start, end].
+
+    Аргументы — параллельные последовательности по занятиям (день недели 0–6,
+    EVERY/RED/BLUE, границы семестра). Возвращает (индексы занятий, порядковые
+    номера дат): сначала по занятию, внутри — по дате.
+    """
+    n = len(days_of_week)
+    if not n or start > end:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    monday = start.toordinal() - start.weekday()
+    n_weeks = (end.toordinal() - monday) // 7 + 1
+    dow = np.asarray(days_of_week, dtype=np.int64)
+    sem_start = np.fromiter((d.toordinal() for d in semester_starts), dtype=np.int64, count=n)
+    sem_end = np.fromiter((d.toordinal() for d in semester_ends), dtype=np.int64, count=n)
+    lo = np.maximum(sem_start, start.toordinal())
+    hi = np.minimum(sem_end, end.toordinal())
+
+    grid = monday + 7 * np.arange(n_weeks, dtype=np.int64)[None, :] + dow[:, None]
+    mask = (grid >= lo[:, None]) & (grid <= hi[:, None])
+
+    wt = np.asarray(week_types)
+    red = ((grid - sem_start[:, None]) // 7) % 2 == 0
+    mask &= np.where((wt == "RED")[:, None], red, True)
+    mask &= np.where((wt == "BLUE")[:, None], ~red, True)
+
+    rows, cols = np.nonzero(mask)
+    return rows, grid[rows, cols]
+
+
+def occurrence_keys(slot_ids, ordinals) -> np.ndarray:
+    return (np.asarray(slot_ids, dtype=np.int64) << _DATE_BITS) | np.asarray(ordinals, dtype=np.int64)
+
+
+def match_exceptions(occ_keys: np.ndarray, exc_keys) -> np.ndarray:
+    """
+    Для каждого ключа развёртки — индекс исключения в exc_keys или -1.
+    При нескольких исключениях на одну дату берётся последнее.
+    """
+    exc_keys = np.asarray(exc_keys, dtype=np.int64)
+    if not len(exc_keys) or not len(occ_keys):
+        return np.full(len(occ_keys), -1, dtype=np.int64)
+    order = np.argsort(exc_keys, kind="stable")
+    sorted_keys = exc_keys[order]
+    pos = np.searchsorted(sorted_keys, occ_keys, side="right") - 1
+    found = (pos >= 0) & (sorted_keys[np.clip(pos, 0, None)] == occ_keys)
+    return np.where(found, order[np.clip(pos, 0, None)], -1)
@@ -0,0 +1,181 @@
+"""
+Загрузка аудиторий за семестр: по аудитории, корпусу и институту.
+
+Для каждой чётности недели (RED, BLUE; EVERY входит в обе):
+  занятые часы / доступные часы — доступные считаются по сетке пар
+  института корпуса (или общей сетке) на 6 учебных дней;
+  пиковая насыщенность — доля аудиторий института, занятых в одну и ту же
+  пару одного дня;
+  заполнение — суммарная численность групп занятия (поток — все его группы)
+  к вместимости аудитории: среднее, число переполненных и полупустых занятий
+  (занятие EVERY считается в каждой из двух недель).
+
+Всё считается одним проходом по занятиям семестра и кэшируется по ключу с
+Semester.schedule_version; правки аудиторий и контингента ограничивает
+UTILIZATION_TTL.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from accounts.models import Group
+from .models import Classroom, ScheduleSlot, Semester, TimeSlot
+
+UTILIZATION_TTL = getattr(settings, "ROOM_UTILIZATION_TTL", 3600)
+
+WEEK_TYPES = ("RED", "BLUE")
+STUDY_DAYS = 6
+UNDERFILL_RATIO = 0.5
+PEAKS_LIMIT = 5
+
+
+def _minutes(ts_row) -> int:
+    _id, _institute_id, start, end, duration = ts_row
+    if start and end:
+        minutes = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+        if minutes > 0:
+            return minutes
+    return duration or 0
+
+
+def _ratio(part, whole) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def _totals() -> dict:
+    return {
+        "rooms": 0, "capacity": 0, "available_hours": 0.0,
+        "occupied_hours": dict.fromkeys(WEEK_TYPES, 0.0),
+        "lessons": 0, "fill_sum": 0.0, "overflow": 0, "underfilled": 0,
+    }
+
+
+def _finish(row: dict) -> dict:
+    fill_sum = row.pop("fill_sum")
+    row["utilization"] = {wt: _ratio(h, row["available_hours"]) for wt, h in row["occupied_hours"].items()}
+    row["occupied_hours"] = {wt: round(h, 2) for wt, h in row["occupied_hours"].items()}
+    row["available_hours"] = round(row["available_hours"], 2)
+    row["avg_fill"] = _ratio(fill_sum, row["lessons"])
+    return row
+
+
+def compute(semester: Semester) -> dict:
+    time_slots = list(TimeSlot.objects.values_list("id", "institute_id", "start_time", "end_time", "duration"))
+    minutes = {ts[0]: _minutes(ts) for ts in time_slots}
+    ts_start = {ts[0]: ts[2] for ts in time_slots}
+    grid_minutes: dict = defaultdict(int)
+    for ts in time_slots:
+        grid_minutes[ts[1]] += minutes[ts[0]]
+
+    rooms = {
+        row[0]: row for row in Classroom.objects.filter(is_active=True).values_list(
+            "id", "number", "capacity", "room_type", "building_id", "building__name",
+            "building__institute_id", "building__institute__name",
+        )
+    }
+
+    # (аудитория, день, пара) → {чётность: группы}
+    cells: dict = defaultdict(lambda: {wt: set() for wt in WEEK_TYPES})
+    group_ids = set()
+    for classroom_id, day, ts_id, week_type, group_id in ScheduleSlot.objects.filter(
+        semester=semester, is_active=True, classroom_id__in=rooms.keys()
+    ).values_list("classroom_id", "day_of_week", "time_slot_id", "week_type", "group_id"):
+        group_ids.add(group_id)
+        parities = cells[(classroom_id, day, ts_id)]
+        for wt in WEEK_TYPES:
+            if week_type in ("EVERY", wt):
+                parities[wt].add(group_id)
+
+    students = dict(
+        Group.objects.filter(pk__in=group_ids).annotate(n=Count("students")).values_list("pk", "n")
+    )
+
+    by_room = {}
+    for room_id, (_id, number, capacity, room_type, building_id, building, institute_id, institute) in rooms.items():
+        grid = grid_minutes.get(institute_id) or grid_minutes.get(None, 0)
+        row = _totals()
+        del row["rooms"]
+        row.update(
+            id=room_id, number=number, capacity=capacity, room_type=room_type,
+            building_id=building_id, building=building, institute_id=institute_id,
+            available_hours=STUDY_DAYS * grid / 60.0,
+        )
+        by_room[room_id] = row
+
+    peaks: dict = defaultdict(int)
+    for (room_id, day, ts_id), parities in cells.items():
+        row = by_room[room_id]
+        hours = minutes.get(ts_id, 0) / 60.0
+        for wt, groups in parities.items():
+            if not groups:
+                continue
+            row["occupied_hours"][wt] += hours
+            peaks[(row["institute_id"], day, ts_id, wt)] += 1
+            attendance = sum(students.get(g, 0) for g in groups)
+            fill = attendance / row["capacity"] if row["capacity"] else 0.0
+            row["lessons"] += 1
+            row["fill_sum"] += fill
+            row["overflow"] += attendance > row["capacity"]
+            row["underfilled"] += bool(row["capacity"]) and fill < UNDERFILL_RATIO
+
+    buildings: dict = {}
+    institutes: dict = {}
+    for room_id, row in by_room.items():
+        _id, _number, _capacity, _type, building_id, building, institute_id, institute = rooms[room_id]
+        for bucket, key, extra in (
+            (buildings, building_id, {"id": building_id, "name": building, "institute_id": institute_id}),
+            (institutes, institute_id, {"id": institute_id, "name": institute}),
+        ):
+            agg = bucket.get(key)
+            if agg is None:
+                agg = bucket[key] = {**extra, **_totals()}
+            agg["rooms"] += 1
+            for field in ("capacity", "available_hours", "lessons", "fill_sum", "overflow", "underfilled"):
+                agg[field] += row[field]
+            for wt in WEEK_TYPES:
+                agg["occupied_hours"][wt] += row["occupied_hours"][wt]
+
+    for (institute_id, day, ts_id, wt), occupied in peaks.items():
+        agg = institutes[institute_id]
+        agg.setdefault("peaks", []).append({
+            "day": day, "time_slot_id": ts_id, "start_time": ts_start.get(ts_id), "week_type": wt,
+            "occupied": occupied, "saturation": _ratio(occupied, agg["rooms"]),
+        })
+    for agg in institutes.values():
+        agg["peaks"] = sorted(agg.get("peaks", []), key=lambda p: (-p["occupied"], p["day"], p["week_type"]))[:PEAKS_LIMIT]
+
+    return {
+        "semester_id": semester.pk,
+        "generated_at": timezone.now(),
+        "rooms": [_finish(row) for row in by_room.values()],
+        "buildings": [_finish(row) for row in buildings.values()],
+        "institutes": [_finish(row) for row in institutes.values()],
+    }
+
+
+def utilization(semester: Semester) -> dict | None:
+    """compute() из кэша по версии расписания семестра."""
+    version = Semester.objects.filter(pk=semester.pk).values_list("schedule_version", flat=True).first()
+    if version is None:
+        return None
+    key = f"schedule:rooms:utilization:{semester.pk}:{version}"
+    data = cache.get(key)
+    if data is None:
+        data = compute(semester)
+        cache.set(key, data, UTILIZATION_TTL)
+    return data
+
+
+def for_institute(data: dict, institute_id) -> dict:
+    """Срез результата по одному институту."""
+    return {
+        **data,
+        "rooms": [r for r in data["rooms"] if r["institute_id"] == institute_id],
+        "buildings": [b for b in data["buildings"] if b["institute_id"] == institute_id],
+        "institutes": [i for i in data["institutes"] if i["id"] == institute_id],
+    }
@@ -0,0 +1,142 @@
+"""
+Подбор аудитории для занятия в конструкторе.
+
+Свободные аудитории ячейки (день, пара, тип недели) берутся из матрицы
+занятости schedule.occupancy, без запросов к ScheduleSlot. Кандидаты
+отбираются и оцениваются так же, как в timetable_engine.cpp:
+room_is_compatible / capacity_ok — жёсткие ограничения, capacity_penalty и
+room_type_penalty — штрафы с теми же весами (константы из timetable_fallback).
+Сверх этого учитываются запас по вместимости (меньше пустых мест — лучше) и
+корпус: аудитория в том же корпусе, что и соседняя по времени пара группы,
+или хотя бы любая её пара в этот день.
+"""
+from __future__ import annotations
+
+from django.db.models import Count, Q
+
+from accounts.models import Group
+from . import occupancy
+from .models import Classroom
+from .timetable_fallback import (
+    OVERFLOW_FACTOR, OVERFLOW_LIMITS, TINY_ROOM, WRONG_LAB, WRONG_LECTURE, WRONG_PREF,
+)
+
+LIMIT = 5
+SLACK_WEIGHT = -10.0
+NEIGHBOUR_BUILDING = 20.0
+SAME_DAY_BUILDING = 10.0
+
+_LECTURE_ROOMS = ("LECTURE", "SPORT")
+
+
+def room_is_compatible(strict: bool, lesson_type: str, preferred: str, room_type: str) -> bool:
+    if not strict:
+        return True
+    if lesson_type == "LECTURE":
+        return room_type in _LECTURE_ROOMS
+    if lesson_type == "LAB":
+        return room_type == "LAB"
+    if preferred:
+        return room_type == preferred
+    return True
+
+
+def capacity_ok(students: int, capacity: int, overflow_mode: int) -> bool:
+    return students / max(1, capacity) <= OVERFLOW_LIMITS.get(overflow_mode, 1.50)
+
+
+def room_type_penalty(strict: bool, lesson_type: str, preferred: str, room_type: str) -> float:
+    if strict:
+        return 0.0
+    pen = 0.0
+    if lesson_type == "LECTURE" and room_type not in _LECTURE_ROOMS:
+        pen += WRONG_LECTURE
+    if lesson_type == "LAB" and room_type != "LAB":
+        pen += WRONG_LAB
+    if preferred and room_type != preferred:
+        pen += WRONG_PREF
+    return pen
+
+
+def capacity_penalty(students: int, capacity: int) -> float:
+    ratio = students / max(1, capacity)
+    if ratio > 1.0:
+        return OVERFLOW_FACTOR * (ratio - 1.0)
+    if ratio < 0.30:
+        return TINY_ROOM
+    return 0.0
+
+
+def _neighbour_buildings(around, start, end, building_of) -> tuple[set, set]:
+    """(корпуса ближайших до и после пар групп, корпуса всех их пар в этот день)."""
+    before = [row for row in around if row[1] <= start]
+    after = [row for row in around if row[0] >= end]
+    neighbours = set()
+    if before:
+        latest = max(row[1] for row in before)
+        neighbours |= {building_of.get(row[2]) for row in before if row[1] == latest}
+    if after:
+        earliest = min(row[0] for row in after)
+        neighbours |= {building_of.get(row[2]) for row in after if row[0] == earliest}
+    same_day = {building_of.get(row[2]) for row in around}
+    return neighbours - {None}, same_day - {None}
+
+
+def recommend(
+    semester_id: int,
+    day: int,
+    time_slot,
+    week_type: str,
+    lesson_type: str,
+    students: int,
+    group_ids,
+    preferred_room_type: str = "",
+    institute_id=None,
+    exclude=(),
+    limit: int = LIMIT,
+    overflow_mode: int = 1,
+    strict_room_types: bool = False,
+) -> list[dict]:
+    """
+    Лучшие свободные аудитории для занятия: [{id, number, building, capacity,
+    room_type, score}] по убыванию score. exclude — id занятий, которые
+    переносятся (само занятие или весь его поток).
+    """
+    busy, around = occupancy.room_context(semester_id, day, time_slot, week_type, group_ids, exclude)
+
+    rooms = Classroom.objects.filter(is_active=True)
+    if institute_id:
+        rooms = rooms.filter(Q(building__institute_id=institute_id) | Q(building__institute__isnull=True))
+    rows = list(rooms.values_list("id", "number", "capacity", "room_type", "building_id", "building__name"))
+    building_of = {row[0]: row[4] for row in rows}
+    neighbours, same_day = _neighbour_buildings(around, time_slot.start_time, time_slot.end_time, building_of)
+
+    scored = []
+    for room_id, number, capacity, room_type, building_id, building in rows:
+        if room_id in busy:
+            continue
+        if not room_is_compatible(strict_room_types, lesson_type, preferred_room_type, room_type):
+            continue
+        if not capacity_ok(students, capacity, overflow_mode):
+            continue
+        score = capacity_penalty(students, capacity)
+        score += room_type_penalty(strict_room_types, lesson_type, preferred_room_type, room_type)
+        score += SLACK_WEIGHT * max(0.0, 1.0 - students / max(1, capacity))
+        if building_id in neighbours:
+            score += NEIGHBOUR_BUILDING
+        elif building_id in same_day:
+            score += SAME_DAY_BUILDING
+        scored.append((score, capacity, number, room_id, building, room_type))
+
+    scored.sort(key=lambda r: (-r[0], r[1], r[2]))
+    return [
+        {
+            "id": room_id, "number": number, "building": building or "",
+            "capacity": capacity, "room_type": room_type, "score": round(score, 2),
+        }
+        for score, capacity, number, room_id, building, room_type in scored[:limit]
+    ]
+
+
+def student_count(group_ids) -> int:
+    return Group.objects.filter(pk__in=list(group_ids)).aggregate(n=Count("students"))["n"] or 0
@@ -0,0 +1,66 @@
+"""
+Определение текущего семестра.
+
+Semester.get_current() вызывается почти в каждом запросе: контекст-процессор,
+дашборды, расписание, журнал, статистика. Найденная строка кэшируется в памяти
+процесса и подходит для любой даты из её [start_date, end_date]; после
+end_date она перестаёт подходить сама. Строка, выведенная по календарю
+(_infer_bounds) для даты вне её границ (июль–август), кэшируется только для
+этой даты.
+
+Сохранение и удаление семестра сбрасывают кэш этого процесса (сигналы), другие
+процессы перепроверяют строку не реже раза в CACHE_TTL секунд. Вызывающие
+получают копию строки, так что изменение её атрибутов кэш не портит; поле
+schedule_version у копии может отставать, кэши расписания читают его из БД.
+
+for_request(request) дополнительно запоминает семестр на объекте запроса.
+"""
+from __future__ import annotations
+
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Semester
+
+CACHE_TTL = getattr(settings, "SEMESTER_CACHE_TTL", 300)
+MAX_ENTRIES = 8
+
+_lock = threading.Lock()
+# (действует с, действует по, время загрузки, строка)
+_entries: list[tuple] = []
+
+
+def get_current(at_date=None) -> Semester:
+    d = at_date or timezone.now().date()
+    now = time.monotonic()
+    with _lock:
+        for valid_from, valid_to, loaded_at, row in _entries:
+            if valid_from <= d <= valid_to and now - loaded_at < CACHE_TTL:
+                return copy.copy(row)
+
+    row = Semester.resolve(d)
+    if row.start_date <= d <= row.end_date:
+        entry = (row.start_date, row.end_date, now, row)
+    else:
+        entry = (d, d, now, row)
+    with _lock:
+        fresh = [e for e in _entries if now - e[2] < CACHE_TTL and e[3].pk != row.pk]
+        _entries[:] = fresh[-(MAX_ENTRIES - 1):] + [entry]
+    return copy.copy(row)
+
+
+def for_request(request) -> Semester:
+    """Текущий семестр, один объект на весь запрос."""
+    row = getattr(request, "_current_semester", None)
+    if row is None:
+        row = request._current_semester = get_current()
+    return row
+
+
+def invalidate() -> None:
+    with _lock:
+        _entries.clear()
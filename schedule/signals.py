@@ -1,9 +1,10 @@
 import re
 from datetime import datetime
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from accounts.models import Group
-from .models import AcademicPlan, ScheduleException, ScheduleSlot, UnusedHourPool
+from . import occupancy, semesters
+from .models import AcademicPlan, ScheduleException, ScheduleSlot, Semester, UnusedHourPool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -106,4 +107,28 @@ def backup_deleted_slot(sender, instance, **kwargs):
         except Exception as e:
             logger.exception(
                 "backup_deleted_slot failed for slot_id=%s: %s", instance.pk, e
-            )
\ No newline at end of file
+            )
+
+
+@receiver(post_save, sender=ScheduleSlot)
+def track_slot_occupancy(sender, instance, **kwargs):
+    occupancy.slot_saved(instance)
+
+
+@receiver(post_delete, sender=ScheduleSlot)
+def untrack_slot_occupancy(sender, instance, **kwargs):
+    occupancy.slot_deleted(instance)
+
+
+@receiver(post_save, sender=ScheduleException)
+@receiver(post_delete, sender=ScheduleException)
+def touch_schedule_on_exception(sender, instance, **kwargs):
+    semester_id = ScheduleSlot.objects.filter(pk=instance.schedule_slot_id).values_list('semester_id', flat=True).first()
+    if semester_id:
+        occupancy.schedule_touched(semester_id)
+
+
+@receiver(post_save, sender=Semester)
+@receiver(post_delete, sender=Semester)
+def invalidate_current_semester(sender, **kwargs):
+    semesters.invalidate()
@@ -0,0 +1,122 @@
+"""
+Кэш недельной сетки расписания группы или преподавателя.
+
+Снимок — уже разложенная по (день, пара) сетка занятий семестра в виде
+кортежей примитивов, плюс список пар для шапки таблицы. Ключ кэша содержит
+Semester.schedule_version, которую сигналы ScheduleSlot и ScheduleException
+поднимают при каждом изменении, так что устаревший снимок просто перестаёт
+находиться. Переименования предметов, групп и преподавателей, а также правка
+сетки пар версию не меняют — их ограничивает SNAPSHOT_TTL.
+
+При чтении кортежи превращаются в SlotRow/TimeSlotRow с теми же атрибутами,
+что шаблоны берут у ScheduleSlot и TimeSlot.
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ScheduleSlot, Semester, Subject
+
+SNAPSHOT_TTL = getattr(settings, "SCHEDULE_SNAPSHOT_TTL", 600)
+
+_SLOT_FIELDS = (
+    "id", "day_of_week", "time_slot_id", "week_type", "start_time", "end_time",
+    "subject__name", "subject__type", "lesson_type", "is_military", "stream_id",
+    "group__name", "teacher__user__first_name", "teacher__user__last_name",
+    "room", "classroom__number", "classroom__building__name",
+)
+
+
+class TimeSlotRow:
+    __slots__ = ("id", "start_time", "end_time")
+
+    def __init__(self, id, start_time, end_time):
+        self.id = id
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+class SlotRow:
+    """Занятие из снимка: атрибуты, которые шаблоны читают у ScheduleSlot."""
+
+    __slots__ = (
+        "id", "day_of_week", "time_slot_id", "week_type", "start_time", "end_time",
+        "subject", "lesson_type", "is_military", "stream_id", "group", "teacher", "room", "classroom",
+    )
+
+    _lesson_types = dict(ScheduleSlot.LESSON_TYPE_CHOICES)
+    _subject_types = dict(Subject.TYPE_CHOICES)
+
+    def __init__(self, row: tuple):
+        (self.id, self.day_of_week, self.time_slot_id, self.week_type, self.start_time, self.end_time,
+         subject_name, subject_type, self.lesson_type, self.is_military, self.stream_id,
+         group_name, teacher_name, self.room, self.classroom) = row
+        self.subject = SimpleNamespace(
+            name=subject_name, type=subject_type,
+            get_type_display=self._subject_types.get(subject_type, subject_type),
+        )
+        self.group = SimpleNamespace(name=group_name)
+        self.teacher = SimpleNamespace(user=SimpleNamespace(get_full_name=teacher_name)) if teacher_name else None
+
+    def get_lesson_type_display(self):
+        return self._lesson_types.get(self.lesson_type, self.lesson_type)
+
+    def get_color_class(self):
+        if self.is_military:
+            return 'dark text-white'
+        if self.stream_id:
+            return 'indigo'
+        return {
+            'LECTURE': 'primary',
+            'PRACTICE': 'success',
+            'SRSP': 'warning'
+        }.get(self.lesson_type, 'secondary')
+
+
+def slot_rows(slots_qs) -> list[tuple]:
+    """Занятия queryset'а в виде кортежей для снимка (один запрос)."""
+    rows = []
+    for (slot_id, day, ts_id, week_type, start, end, subject_name, subject_type, lesson_type,
+         is_military, stream_id, group_name, first_name, last_name, room,
+         classroom_number, building_name) in slots_qs.values_list(*_SLOT_FIELDS):
+        teacher_name = f"{first_name} {last_name}".strip() if first_name is not None else None
+        if classroom_number is None:
+            classroom = None
+        elif building_name:
+            classroom = f"{building_name} — {classroom_number}"
+        else:
+            classroom = f"Каб. {classroom_number}"
+        rows.append((
+            slot_id, day, ts_id, week_type, start, end, subject_name, subject_type, lesson_type,
+            is_military, str(stream_id) if stream_id else None, group_name, teacher_name, room, classroom,
+        ))
+    return rows
+
+
+def weekly_snapshot(semester_id: int, target: str, builder) -> dict | None:
+    """
+    Снимок {'time_slots': [...], 'cells': {day: {time_slot_id: [SlotRow]}}}.
+
+    target — ключ владельца сетки ("group:5", "teacher:7"); builder() строит
+    {'time_slots': [(id, start, end)], 'slots': slot_rows(...)} при промахе кэша.
+    """
+    version = Semester.objects.filter(pk=semester_id).values_list("schedule_version", flat=True).first()
+    if version is None:
+        return None
+    key = f"schedule:snapshot:{semester_id}:{version}:{target}"
+    data = cache.get(key)
+    if data is None:
+        data = builder()
+        cache.set(key, data, SNAPSHOT_TTL)
+
+    cells: dict = {}
+    for row in data["slots"]:
+        slot = SlotRow(row)
+        cells.setdefault(slot.day_of_week, {}).setdefault(slot.time_slot_id, []).append(slot)
+    return {
+        "time_slots": [TimeSlotRow(*ts) for ts in data["time_slots"]],
+        "cells": cells,
+    }
@@ -4,7 +4,9 @@ import re
 import os
 import requests
 from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from django.db import close_old_connections
+from django.db.models import F
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,10 @@ _LLM_TIMEOUT = 180
 
 _TASK_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rup_parser")
 
+_TIMETABLE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="timetable")
+_TIMETABLE_STALE_AFTER = timedelta(minutes=10)
+_TIMETABLE_MAX_ATTEMPTS = 3
+
 _STOP_WORDS_RE = re.compile(
     r"""
     ректори | вазорати | тасдиқ  | тасдик | имзо   | мӯҳр   | сана
@@ -224,4 +230,134 @@ def _extract_json_list(raw: str) -> list:
 
 def start_parse_task(task_id: str, file_path: str, filename: str) -> None:
     _TASK_EXECUTOR.submit(parse_rup_with_llm_task, task_id, file_path, filename)
-    logger.info("start_parse_task: added to ThreadPoolQueue task_id=%s filename=%s", task_id, filename)
\ No newline at end of file
+    logger.info("start_parse_task: added to ThreadPoolQueue task_id=%s filename=%s", task_id, filename)
+
+
+def run_timetable_task(task_id: str) -> None:
+    close_old_connections()
+    try:
+        _run_timetable(task_id)
+    finally:
+        close_old_connections()
+
+
+def _claim_timetable_task(task_id: str) -> bool:
+    from schedule.models import TimetableGenerationTask
+    now = timezone.now()
+    claimed = TimetableGenerationTask.objects.filter(pk=task_id, status="PENDING").update(
+        status="RUNNING",
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F("attempts") + 1,
+    )
+    return claimed == 1
+
+
+def _run_timetable(task_id: str) -> None:
+    from accounts.models import Group
+    from schedule.models import TimetableGenerationTask
+    from schedule.timetable_bridge import AutoScheduleEngineCpp
+
+    if not _claim_timetable_task(task_id):
+        logger.debug("run_timetable_task: task_id=%s already claimed or finished", task_id)
+        return
+
+    task = TimetableGenerationTask.objects.select_related("semester", "institute").get(pk=task_id)
+    params = task.params or {}
+
+    def report(stage: str, **data) -> None:
+        TimetableGenerationTask.objects.filter(pk=task_id).update(
+            progress={"stage": stage, **data}, heartbeat_at=timezone.now()
+        )
+
+    def should_stop() -> bool:
+        return TimetableGenerationTask.objects.filter(pk=task_id, cancel_requested=True).exists()
+
+    try:
+        engine = AutoScheduleEngineCpp(
+            semester=task.semester,
+            target_groups=Group.objects.filter(id__in=params.get("group_ids", [])),
+            target_teachers=params.get("teacher_ids") or None,
+            target_rooms=params.get("room_ids") or None,
+            avoid_gaps=params.get("avoid_gaps", True),
+            overflow_mode=params.get("overflow_mode", 1),
+            strict_room_types=params.get("strict_room_types", False),
+            iterations=params.get("iterations", 5),
+            institute=task.institute,
+            clear_existing=params.get("clear_existing", False),
+            warm_start=params.get("warm_start", False),
+            progress_callback=report,
+            should_stop=should_stop,
+        )
+        result = engine.generate()
+        TimetableGenerationTask.objects.filter(pk=task_id).update(
+            status="SUCCESS",
+            result=result,
+            progress={"stage": "DONE"},
+            finished_at=timezone.now(),
+        )
+        logger.info(
+            "run_timetable_task: task_id=%s created=%s unassigned=%s",
+            task_id, result["created"], result["unassigned_count"],
+        )
+    except Exception as exc:
+        logger.exception("run_timetable_task FAILED task_id=%s", task_id)
+        TimetableGenerationTask.objects.filter(pk=task_id).update(
+            status="FAILURE", error=str(exc), finished_at=timezone.now()
+        )
+
+
+def recover_timetable_tasks(submit: bool = True, orphaned_only: bool = False) -> int:
+    """
+    Возвращает в очередь задачи, чей воркер перестал слать heartbeat.
+    orphaned_only — ставить в очередь этого процесса только задачи, ждущие
+    дольше _TIMETABLE_STALE_AFTER (свежие PENDING уже стоят в очереди
+    процесса, который их создал).
+    """
+    from schedule.models import TimetableGenerationTask
+
+    now = timezone.now()
+    stale = TimetableGenerationTask.objects.filter(
+        status="RUNNING", heartbeat_at__lt=now - _TIMETABLE_STALE_AFTER
+    )
+    stale.filter(cancel_requested=True).update(status="CANCELLED", finished_at=now)
+    stale.filter(attempts__gte=_TIMETABLE_MAX_ATTEMPTS).update(
+        status="FAILURE",
+        error="Worker stopped before the generation finished",
+        finished_at=now,
+    )
+    requeued = stale.update(status="PENDING")
+    if requeued:
+        logger.warning("recover_timetable_tasks: requeued %s interrupted task(s)", requeued)
+
+    pending = TimetableGenerationTask.objects.filter(status="PENDING")
+    if orphaned_only:
+        pending = pending.filter(created_at__lt=now - _TIMETABLE_STALE_AFTER)
+    pending_ids = list(pending.order_by("created_at").values_list("pk", flat=True))
+    if submit:
+        for pk in pending_ids:
+            _TIMETABLE_EXECUTOR.submit(run_timetable_task, str(pk))
+    return len(pending_ids)
+
+
+def cancel_timetable_task(task_id: str) -> bool:
+    from schedule.models import TimetableGenerationTask
+
+    if TimetableGenerationTask.objects.filter(pk=task_id, status="PENDING").update(
+        status="CANCELLED", cancel_requested=True, finished_at=timezone.now()
+    ):
+        return True
+    return bool(
+        TimetableGenerationTask.objects.filter(pk=task_id, status="RUNNING").update(
+            cancel_requested=True
+        )
+    )
+
+
+def start_timetable_task(task_id: str) -> None:
+    try:
+        recover_timetable_tasks(orphaned_only=True)
+    except Exception:
+        logger.exception("recover_timetable_tasks failed")
+    _TIMETABLE_EXECUTOR.submit(run_timetable_task, task_id)
+    logger.info("start_timetable_task: added to ThreadPoolQueue task_id=%s", task_id)
@@ -0,0 +1,155 @@
+"""
+Бенчмарк решателей расписания на синтетических задачах.
+
+Каждый прогон — отдельный процесс (нативный timetable_engine или
+``python -m schedule.timetable_fallback``), поэтому пиковый RSS меряется
+для самого решателя, без Django. Задачи строит timetable_synthetic с
+фиксированным seed, сиды решателей тоже фиксированы, так что отчёты разных
+коммитов можно сравнивать напрямую.
+
+Поля результата: wall_ms — полное время процесса (запуск + разбор + решение),
+solve_ms — время решения по данным самого движка, moves — шаги отжига
+(native) или переразмещения задач с полным перебором окрестности (python).
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .timetable_payload import encode_binary
+from .timetable_synthetic import find_conflicts, generate_payload
+
+SCALES = (20, 200, 2000)
+ENGINES = ("native", "python")
+DEFAULT_PARAMS = {"sa_restarts": 4, "sa_steps": 400000, "max_seconds": 60}
+SCHEMA_VERSION = 1
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _peak_rss_kb(rusage) -> int:
+    # ru_maxrss: килобайты в Linux, байты в macOS.
+    return rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+
+
+def _run_process(cmd: list[str], timeout: float) -> dict:
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        started = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=out, stderr=err, cwd=PROJECT_ROOT)
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        try:
+            if hasattr(os, "wait4"):
+                _, status, rusage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                peak_rss_kb = _peak_rss_kb(rusage)
+            else:
+                proc.wait()
+                peak_rss_kb = None
+        finally:
+            timer.cancel()
+        wall_ms = (time.perf_counter() - started) * 1000
+        out.seek(0)
+        err.seek(0)
+        return {
+            "returncode": proc.returncode,
+            "stdout": out.read(),
+            "stderr": err.read().decode("utf-8", errors="replace"),
+            "wall_ms": wall_ms,
+            "peak_rss_kb": peak_rss_kb,
+        }
+
+
+def run_case(engine: str, n_groups: int, seed: int, binary: Path,
+             params: dict | None = None, binary_payload: bool = True) -> dict:
+    payload = generate_payload(n_groups, seed=seed, **{**DEFAULT_PARAMS, **(params or {})})
+    row = {
+        "engine": engine,
+        "groups": n_groups,
+        "seed": seed,
+        "tasks": None,
+        "wall_ms": None,
+        "solve_ms": None,
+        "score": None,
+        "placed": None,
+        "unassigned": None,
+        "conflicts": None,
+        "peak_rss_kb": None,
+        "moves": None,
+        "moves_per_sec": None,
+        "stopped": None,
+        "error": None,
+    }
+
+    if engine == "native":
+        data = encode_binary(payload) if binary_payload else json.dumps(payload).encode("utf-8")
+        cmd = [str(binary)]
+    else:
+        data = json.dumps(payload).encode("utf-8")
+        cmd = [sys.executable, "-m", "schedule.timetable_fallback"]
+
+    fd, path = tempfile.mkstemp(suffix=".ttbp" if data[:4] == b"TTBP" else ".json")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        run = _run_process(cmd + [path], timeout=payload["max_seconds"] * 3 + 60)
+    finally:
+        os.remove(path)
+
+    row["wall_ms"] = round(run["wall_ms"], 1)
+    row["peak_rss_kb"] = run["peak_rss_kb"]
+    try:
+        result = json.loads(run["stdout"])
+    except ValueError:
+        result = {}
+    if run["returncode"] != 0 or not result.get("success"):
+        row["error"] = result.get("error") or run["stderr"][-500:] or f"exit code {run['returncode']}"
+        return row
+
+    solve_ms = result.get("elapsed_ms") or 0.0
+    moves = result.get("moves")
+    row.update(
+        tasks=result.get("total_tasks"),
+        solve_ms=round(solve_ms, 1),
+        score=result.get("score"),
+        placed=result.get("placed_count"),
+        unassigned=result.get("unplaced_count"),
+        conflicts=len(find_conflicts(result)),
+        moves=moves,
+        moves_per_sec=round(moves / (solve_ms / 1000)) if moves and solve_ms else None,
+        stopped=result.get("stopped", False),
+    )
+    return row
+
+
+def run_suite(binary: Path, scales=SCALES, engines=ENGINES, seed: int = 1,
+              repeat: int = 1, params: dict | None = None, on_result=None) -> dict:
+    results = []
+    for n_groups in scales:
+        for engine in engines:
+            for i in range(repeat):
+                row = run_case(engine, n_groups, seed, binary, params)
+                row["run"] = i + 1
+                results.append(row)
+                if on_result:
+                    on_result(row)
+    return {
+        "schema": SCHEMA_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "seed": seed,
+        "params": {**DEFAULT_PARAMS, **(params or {})},
+        "results": results,
+    }
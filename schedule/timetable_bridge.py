@@ -1,19 +1,27 @@
 from __future__ import annotations
 
+import hashlib
 import json
-import math
+import re
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from pathlib import Path
 from typing import List, Optional
 import os
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, Prefetch
+from django.db.models import Count, F, Prefetch
 from .models import (
-    ScheduleSlot, Subject, Classroom, TimeSlot,
-    TeacherUnavailableSlot, Semester,
+    ScheduleSlot, Subject, Classroom, TimeSlot, Semester,
 )
+from . import availability, load_planner
+from .timetable_decompose import merge_results, split_payload
+from .timetable_payload import FORMAT_NAME as BINARY_FORMAT, encode_binary
 from accounts.models import Group, Teacher
 import logging
 
@@ -28,41 +36,255 @@ if not BINARY_PATH.exists():
     elif (_bin_dir / "timetable_engine").exists():
         BINARY_PATH = _bin_dir / "timetable_engine"
 
+ENGINE_SOURCES = (
+    Path(__file__).parent / "timetable_engine.cpp",
+    Path(__file__).parent / "json.hpp",
+)
+# Минимальная версия движка, понимающая текущий payload (stop_file, warm_start, ttbp1).
+ENGINE_MIN_VERSION = 2
+BUILD_COMMAND = "python manage.py build_timetable_engine"
+
+
+ENGINE_TIMEOUT = 120
+STOP_GRACE_SECONDS = 15
+
+# "auto" — бинарный формат, если движок его поддерживает; "json" — для отладки.
+PAYLOAD_FORMAT = getattr(settings, "TIMETABLE_PAYLOAD_FORMAT", "auto")
+
+# "auto" — нативный движок, если он запускается на этом хосте, иначе NumPy-решатель;
+# "native" / "python" — принудительный выбор.
+ENGINE_BACKEND = getattr(settings, "TIMETABLE_ENGINE", "auto")
+
+# Сколько независимых частей задачи решать параллельно (отдельными процессами); 1 — без разбиения.
+DECOMPOSE_WORKERS = getattr(settings, "TIMETABLE_DECOMPOSE_WORKERS", os.cpu_count() or 1)
+
+WARM_START_SA = {
+    "sa_t0": 5.0,
+    "sa_restarts": 2,
+    "sa_steps": 60000,
+    "max_seconds": 20,
+}
+
+_RESTART_RE = re.compile(
+    r"\[restart (\d+)/(\d+)\s+score=(-?[\d.]+)\s+placed=(\d+)/(\d+)\]"
+)
+
 
 class TimetableError(Exception):
     pass
 
 
-def _weekly_slots(subj: Subject) -> dict[str, float]:
-    actual_weeks = subj.get_actual_semester_weeks() or 16
+_engine_info_cache: dict[tuple, Optional[dict]] = {}
+
 
-    lec_h = subj.lecture_hours
-    prac_h = subj.practice_hours
-    lab_h = subj.lab_hours
-    srsp_h = subj.control_hours
+def engine_info(binary: Path) -> Optional[dict]:
+    """
+    Ответ ``--version`` движка: пустой словарь для старых сборок без этого
+    флага, None — если бинарник отсутствует или не запускается на этом хосте.
+    """
+    try:
+        key = (str(binary), binary.stat().st_mtime)
+    except OSError:
+        return None
+    if key not in _engine_info_cache:
+        try:
+            proc = subprocess.run(
+                [str(binary), "--version"],
+                stdin=subprocess.DEVNULL, capture_output=True, timeout=10,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            info = None
+        else:
+            try:
+                info = json.loads(proc.stdout) if proc.returncode == 0 else {}
+            except ValueError:
+                info = {}
+            if not isinstance(info, dict):
+                info = {}
+        _engine_info_cache[key] = info
+    return _engine_info_cache[key]
+
+
+_source_hash_cache: dict[tuple, str] = {}
+
+
+def engine_source_hash() -> Optional[str]:
+    """sha256 исходников движка; None, если их нет рядом (деплой без исходников)."""
+    try:
+        key = tuple(p.stat().st_mtime for p in ENGINE_SOURCES)
+    except OSError:
+        return None
+    if key not in _source_hash_cache:
+        digest = hashlib.sha256()
+        for path in ENGINE_SOURCES:
+            digest.update(path.read_bytes())
+        _source_hash_cache[key] = digest.hexdigest()
+    return _source_hash_cache[key]
+
+
+def engine_problem(binary: Path) -> Optional[str]:
+    """Почему бинарник движка нельзя использовать; None — можно."""
+    info = engine_info(binary)
+    if info is None:
+        return f"Engine binary {binary} is missing or cannot be executed on this host"
+    version = info.get("version")
+    if not isinstance(version, int) or version < ENGINE_MIN_VERSION:
+        return (
+            f"Engine binary {binary} is incompatible "
+            f"(version {version or 'unknown'}, need >= {ENGINE_MIN_VERSION})"
+        )
+    source = engine_source_hash()
+    if source is None:
+        return None
+    built_from = info.get("source_hash")
+    if built_from:
+        if built_from != source:
+            return f"Engine binary {binary} is stale: it was built from different sources"
+    elif any(binary.stat().st_mtime < p.stat().st_mtime for p in ENGINE_SOURCES):
+        return f"Engine binary {binary} is stale: it is older than timetable_engine.cpp"
+    return None
+
+
+def engine_status(binary: Path = BINARY_PATH) -> dict:
+    """Сводка по бинарнику движка для логов и команды build_timetable_engine."""
+    info = engine_info(binary) or {}
+    manifest_path = binary.with_name("timetable_engine.build.json")
+    try:
+        build = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        build = None
+    problem = engine_problem(binary)
+    return {
+        "binary": str(binary),
+        "usable": problem is None,
+        "problem": problem,
+        "version": info.get("version"),
+        "threads": info.get("threads"),
+        "payload_formats": info.get("payload_formats", []),
+        "source_hash": info.get("source_hash") or None,
+        "expected_source_hash": engine_source_hash(),
+        "build": build,
+    }
+
+
+class EngineProgress:
+    """Последнее состояние решателя, собранное из строк stderr движка."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.restart = 0
+        self.restarts = 0
+        self.best_score = None
+        self.unassigned = None
+
+    def feed(self, line: str) -> None:
+        m = _RESTART_RE.search(line)
+        if not m:
+            return
+        score = float(m.group(3))
+        with self._lock:
+            self.restart = max(self.restart, int(m.group(1)))
+            self.restarts = int(m.group(2))
+            if self.best_score is None or score > self.best_score:
+                self.best_score = score
+                self.unassigned = int(m.group(5)) - int(m.group(4))
+            self._dirty = True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._dirty = False
+            return {
+                "restart": self.restart,
+                "restarts": self.restarts,
+                "best_score": self.best_score,
+                "unassigned": self.unassigned,
+            }
 
-    if lec_h == 0 and prac_h == 0 and lab_h == 0 and srsp_h == 0 and subj.credits > 0:
-        total_auditory = (subj.credits * 24) * 2 // 3
-        lec_h = total_auditory // 3
-        prac_h = total_auditory // 3
-        srsp_h = total_auditory - lec_h - prac_h
+    def pop_snapshot(self) -> Optional[dict]:
+        with self._lock:
+            if not self._dirty:
+                return None
+        return self.snapshot()
 
-    def pairs(h: int) -> float:
-        if not h or h <= 0:
-            return 0.0
-        return float(subj.get_hours_in_pairs(h))
 
+def _merge_progress(snapshots: list, parts_done: int) -> dict:
+    scores = [s["best_score"] for s in snapshots]
     return {
-        "LECTURE": round(pairs(lec_h) / actual_weeks, 4),
-        "PRACTICE": round(pairs(prac_h) / actual_weeks, 4),
-        "LAB": round(pairs(lab_h) / actual_weeks, 4),
-        "SRSP": round(pairs(srsp_h) / actual_weeks, 4),
+        "restart": sum(s["restart"] for s in snapshots),
+        "restarts": sum(s["restarts"] for s in snapshots),
+        "best_score": round(sum(scores), 1) if None not in scores else None,
+        "unassigned": sum(s["unassigned"] or 0 for s in snapshots),
+        "parts": len(snapshots),
+        "parts_done": parts_done,
     }
 
 
+def _initial_placements(semester, group_ids, ts_ids, tasks_json: list) -> list[dict]:
+    ref_by_groups: dict[tuple, int] = {}
+    ref_by_stream: dict[tuple, int] = {}
+    for i, task in enumerate(tasks_json):
+        ref_by_groups.setdefault(
+            (task["subject_id"], task["lesson_type"], frozenset(task["group_ids"])), i
+        )
+        if task["is_stream"]:
+            ref_by_stream.setdefault((task["subject_id"], task["lesson_type"]), i)
+
+    rows = (
+        ScheduleSlot.objects
+        .filter(
+            semester=semester,
+            group_id__in=group_ids,
+            is_active=True,
+            is_military=False,
+            time_slot_id__in=ts_ids,
+        )
+        .order_by("id")
+        .values(
+            "id", "group_id", "subject_id", "teacher_id", "lesson_type",
+            "day_of_week", "time_slot_id", "classroom_id", "week_type", "stream_id",
+        )
+    )
+
+    placements: dict[tuple, dict] = {}
+    for row in rows:
+        key = ("stream", row["stream_id"]) if row["stream_id"] else ("slot", row["id"])
+        placement = placements.get(key)
+        if placement is None:
+            placement = placements[key] = {
+                "subject_id": row["subject_id"],
+                "teacher_id": row["teacher_id"] or -1,
+                "lesson_type": row["lesson_type"],
+                "day_of_week": row["day_of_week"],
+                "time_slot_id": row["time_slot_id"],
+                "classroom_id": row["classroom_id"] or -1,
+                "week_type": row["week_type"],
+                "group_ids": [],
+                "slot_ids": [],
+            }
+        placement["group_ids"].append(row["group_id"])
+        placement["slot_ids"].append(row["id"])
+
+    for placement in placements.values():
+        key = (placement["subject_id"], placement["lesson_type"])
+        ref = ref_by_groups.get(key + (frozenset(placement["group_ids"]),))
+        if ref is None:
+            ref = ref_by_stream.get(key, -1) if len(placement["group_ids"]) > 1 else -1
+        placement["task_ref"] = ref
+
+    return list(placements.values())
+
+
 class TimetableBridge:
-    def __init__(self, binary: Path = BINARY_PATH):
+    def __init__(
+        self,
+        binary: Path = BINARY_PATH,
+        payload_format: str = PAYLOAD_FORMAT,
+        backend: str = ENGINE_BACKEND,
+    ):
         self.binary = binary
+        self.payload_format = payload_format
+        self.backend = backend
 
     def build_payload(
         self,
@@ -77,13 +299,15 @@ class TimetableBridge:
         sa_steps: int = 400000,
         max_seconds: int = 90,
         institute=None,
+        clear_existing: bool = False,
+        warm_start: bool = False,
     ) -> dict:
         logger.info(
             "TimetableBridge.build_payload: semester=%s overflow_mode=%s strict_room_types=%s avoid_gaps=%s",
             semester, overflow_mode, strict_room_types, avoid_gaps
         )
 
-        room_qs = Classroom.objects.filter(is_active=True)
+        room_qs = Classroom.objects.filter(is_active=True).select_related("building")
         if target_rooms:
             room_qs = room_qs.filter(id__in=target_rooms)
 
@@ -93,6 +317,7 @@ class TimetableBridge:
                 "number": r.number,
                 "capacity": r.capacity,
                 "room_type": r.room_type,
+                "zone": r.building.institute_id if r.building_id else None,
             }
             for r in room_qs
         ]
@@ -103,7 +328,8 @@ class TimetableBridge:
             else Group.objects.filter(id__in=[g.id for g in target_groups])
         )
         target_groups_qs = target_groups_qs.annotate(
-            student_count=Count("students", distinct=True)
+            student_count=Count("students", distinct=True),
+            zone=F("specialty__department__faculty__institute"),
         )
 
         groups_list = list(target_groups_qs)
@@ -136,6 +362,7 @@ class TimetableBridge:
                 "id": g.id,
                 "name": g.name,
                 "student_count": g.student_count,
+                "zone": g.zone,
             }
             for g in groups_list
         ]
@@ -157,6 +384,7 @@ class TimetableBridge:
             subjects_qs = subjects_qs.filter(teacher_id__in=target_teachers)
 
         subjects_list = list(subjects_qs)
+        weekly_by_subject = load_planner.weekly_requirements([s.id for s in subjects_list], exact=True)
 
         teacher_ids = {
             subj.teacher_id
@@ -166,15 +394,17 @@ class TimetableBridge:
         if target_teachers:
             teacher_ids.update(target_teachers)
 
-        unavail_map: dict[int, list] = {}
-        for u in TeacherUnavailableSlot.objects.filter(teacher_id__in=teacher_ids):
-            unavail_map.setdefault(u.teacher_id, []).append(
+        unavail_map: dict[int, list] = {
+            teacher_id: [
                 {
-                    "teacher_id": u.teacher_id,
-                    "day_of_week": u.day_of_week,
-                    "time_slot_id": u.time_slot_id,
+                    "teacher_id": teacher_id,
+                    "day_of_week": day,
+                    "time_slot_id": ts_id,
                 }
-            )
+                for day, ts_id in cells
+            ]
+            for teacher_id, cells in availability.cells_for(teacher_ids).items()
+        }
 
         teachers_json = []
         for t in Teacher.objects.filter(id__in=teacher_ids).select_related("user"):
@@ -199,7 +429,12 @@ class TimetableBridge:
                 group_id__in=group_ids_set,
                 is_active=True,
                 time_slot_id__in=valid_ts_ids,
-            ).values("group_id", "day_of_week", "time_slot_id", "week_type", "is_military")
+            )
+            if clear_existing or warm_start:
+                existing_slots_qs = existing_slots_qs.filter(is_military=True)
+            existing_slots_qs = existing_slots_qs.values(
+                "group_id", "day_of_week", "time_slot_id", "week_type", "is_military"
+            )
 
             seen = set()
             for slot in existing_slots_qs:
@@ -228,7 +463,7 @@ class TimetableBridge:
             if not any(g.id in group_ids_set for g in all_groups_for_subj):
                 continue
 
-            slot_map = _weekly_slots(subj)
+            slot_map = weekly_by_subject.get(subj.id, {})
 
             if subj.is_stream_subject and len(all_groups_for_subj) > 1:
                 total_students = sum(_students(g) for g in all_groups_for_subj)
@@ -279,7 +514,7 @@ class TimetableBridge:
             len(teachers_json), len(teacher_unavail_json), len(group_unavailable_json)
         )
 
-        return {
+        payload = {
             "time_slots": slots_json,
             "rooms": rooms_json,
             "groups": groups_json,
@@ -298,34 +533,142 @@ class TimetableBridge:
             "avoid_gaps": avoid_gaps,
         }
 
-    def run(self, payload: dict) -> dict:
-        if not self.binary.exists():
-            logger.error("Timetable engine binary not found at: %s", self.binary)
+        if warm_start:
+            initial = _initial_placements(
+                semester, group_ids_set, list(ts_id_to_idx.keys()), tasks_json
+            )
+            logger.info(
+                "TimetableBridge.build_payload: warm start from %s existing placement(s)",
+                len(initial)
+            )
+            payload.update(WARM_START_SA)
+            payload["sa_restarts"] = min(sa_restarts, WARM_START_SA["sa_restarts"])
+            payload["warm_start"] = True
+            payload["initial_placements"] = initial
+
+        return payload
+
+    def resolve_backend(self) -> str:
+        if self.backend == "python":
+            return "python"
+        problem = engine_problem(self.binary)
+        if problem is None:
+            return "native"
+        if self.backend == "native":
+            logger.error("TimetableBridge: %s", problem)
+            raise TimetableError(f"{problem}.\nRebuild it with:\n  {BUILD_COMMAND}")
+        logger.warning("TimetableBridge: %s; falling back to the NumPy solver", problem)
+        return "python"
+
+    def resolve_format(self) -> str:
+        if self.payload_format == "json":
+            return "json"
+        if BINARY_FORMAT in (engine_info(self.binary) or {}).get("payload_formats", []):
+            return BINARY_FORMAT
+        if self.payload_format == BINARY_FORMAT:
             raise TimetableError(
-                f"Engine binary not found: {self.binary}\n"
-                "Compile with:\n"
-                "  g++ -O3 -std=c++17 -pthread "
-                "-o schedule/bin/timetable_engine schedule/timetable_engine.cpp"
+                f"Engine {self.binary} does not support the {BINARY_FORMAT} payload format"
             )
+        return "json"
+
+    def encode(self, payload: dict, fmt: Optional[str] = None) -> bytes:
+        if (fmt or self.resolve_format()) == BINARY_FORMAT:
+            return encode_binary(payload)
+        return json.dumps(payload).encode("utf-8")
+
+    def run(self, payload: dict, progress_callback=None, should_stop=None) -> dict:
+        if self.resolve_backend() == "python":
+            return self._run_fallback(payload, progress_callback, should_stop)
 
+        fmt = self.resolve_format()
         logger.info(
-            "TimetableBridge.run: launching binary=%s payload_tasks=%s payload_rooms=%s",
-            self.binary.name,
+            "TimetableBridge.run: launching binary=%s format=%s payload_tasks=%s payload_rooms=%s",
+            self.binary.name, fmt,
             len(payload.get('tasks', [])),
             len(payload.get('rooms', []))
         )
+        return self._run_process([str(self.binary)], payload, fmt, progress_callback, should_stop)
+
+    def solve(self, payload: dict, progress_callback=None, should_stop=None) -> dict:
+        """
+        Как run(), но независимые части задачи (без общих групп, преподавателей,
+        потоков и аудиторий) решаются параллельно отдельными процессами.
+        Результат — один, в формате движка, для одного save_result.
+        """
+        parts = split_payload(payload, DECOMPOSE_WORKERS) if DECOMPOSE_WORKERS > 1 else [payload]
+        if len(parts) == 1:
+            return self.run(payload, progress_callback, should_stop)
+
+        backend = self.resolve_backend()
+        if backend == "python":
+            cmd = [sys.executable, "-m", "schedule.timetable_fallback"]
+            fmt, cwd = "json", Path(__file__).resolve().parent.parent
+        else:
+            cmd, fmt, cwd = [str(self.binary)], self.resolve_format(), None
+        logger.info(
+            "TimetableBridge.solve: %s independent part(s) backend=%s format=%s part_tasks=%s",
+            len(parts), backend, fmt, [len(p["tasks"]) for p in parts]
+        )
 
-        proc = subprocess.run(
-            [str(self.binary)],
-            input=json.dumps(payload),
-            capture_output=True,
-            text=True,
-            timeout=120,
+        stop = threading.Event()
+        snapshots = [
+            {"restart": 0, "restarts": part.get("sa_restarts", 0), "best_score": None, "unassigned": None}
+            for part in parts
+        ]
+
+        def part_progress(i):
+            def callback(stopping=False, **snapshot):
+                snapshots[i] = snapshot
+            return callback
+
+        with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+            futures = [
+                pool.submit(self._run_process, cmd, part, fmt, part_progress(i), stop.is_set, cwd)
+                for i, part in enumerate(parts)
+            ]
+            pending = set(futures)
+            reported = None
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_EXCEPTION)
+                if any(f.exception() for f in done):
+                    stop.set()
+                    break
+                if not stop.is_set() and should_stop is not None and should_stop():
+                    logger.info("TimetableBridge.solve: stop requested, asking all parts to finish early")
+                    stop.set()
+                snapshot = _merge_progress(snapshots, parts_done=len(parts) - len(pending))
+                if progress_callback and snapshot["best_score"] is not None and snapshot != reported:
+                    progress_callback(stopping=stop.is_set(), **snapshot)
+                    reported = snapshot
+
+        for future in futures:
+            if future.exception():
+                raise future.exception()
+
+        result = merge_results([f.result() for f in futures])
+        logger.info(
+            "TimetableBridge.solve: merged %s part(s) placed=%s unplaced=%s score=%s elapsed_ms=%s",
+            len(parts), result['placed_count'], result['unplaced_count'],
+            result['score'], result['elapsed_ms']
         )
+        return result
 
-        if proc.stderr:
-            for line in proc.stderr.strip().splitlines():
-                logger.debug("timetable_engine stderr: %s", line)
+    def _run_process(self, cmd: list, payload: dict, fmt: str, progress_callback, should_stop,
+                     cwd: Optional[Path] = None) -> dict:
+        stop_file = None
+        if should_stop is not None:
+            stop_file = os.path.join(
+                tempfile.gettempdir(), f"timetable_stop_{uuid.uuid4().hex}.flag"
+            )
+            payload = {**payload, "stop_file": stop_file}
+
+        try:
+            proc = self._stream(
+                cmd, self.encode(payload, fmt), progress_callback, should_stop, stop_file, cwd
+            )
+        finally:
+            if stop_file and os.path.exists(stop_file):
+                os.remove(stop_file)
 
         if proc.returncode != 0:
             logger.error(
@@ -361,8 +704,115 @@ class TimetableBridge:
 
         return result
 
+    def _run_fallback(self, payload: dict, progress_callback, should_stop) -> dict:
+        from .timetable_fallback import solve
+
+        logger.warning(
+            "TimetableBridge.run: using the NumPy fallback solver (binary=%s backend=%s) "
+            "payload_tasks=%s payload_rooms=%s",
+            self.binary.name, self.backend,
+            len(payload.get('tasks', [])),
+            len(payload.get('rooms', []))
+        )
+        result = solve(payload, progress_callback=progress_callback, should_stop=should_stop)
+        logger.info(
+            "TimetableBridge.run: fallback success placed=%s unplaced=%s score=%s elapsed_ms=%s",
+            result.get('placed_count'), result.get('unplaced_count'),
+            result.get('score'), result.get('elapsed_ms')
+        )
+        return result
+
+    def _stream(self, cmd: list, data: bytes, progress_callback, should_stop, stop_file,
+                cwd: Optional[Path] = None) -> subprocess.CompletedProcess:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+        )
+        progress = EngineProgress()
+        stdout_chunks: list[bytes] = []
+        stderr_lines: list[str] = []
+
+        def feed_stdin():
+            try:
+                proc.stdin.write(data)
+            except (BrokenPipeError, OSError):
+                pass
+            finally:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+
+        def read_stdout():
+            for chunk in iter(lambda: proc.stdout.read(65536), b""):
+                stdout_chunks.append(chunk)
+
+        def read_stderr():
+            for raw in proc.stderr:
+                line = raw.decode("utf-8", errors="replace").rstrip()
+                stderr_lines.append(line)
+                logger.debug("timetable_engine stderr: %s", line)
+                progress.feed(line)
+
+        io_threads = [
+            threading.Thread(target=fn, daemon=True)
+            for fn in (feed_stdin, read_stdout, read_stderr)
+        ]
+        for t in io_threads:
+            t.start()
+
+        deadline = time.monotonic() + ENGINE_TIMEOUT
+        stop_sent_at = None
+        kill_reason = None
+
+        while True:
+            try:
+                proc.wait(timeout=1.0)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            snapshot = progress.pop_snapshot()
+            if snapshot and progress_callback:
+                progress_callback(stopping=stop_sent_at is not None, **snapshot)
+
+            now = time.monotonic()
+            if stop_sent_at is None and should_stop is not None and should_stop():
+                logger.info("TimetableBridge.run: stop requested, asking engine to finish early")
+                open(stop_file, "w").close()
+                stop_sent_at = now
+                if progress_callback:
+                    progress_callback(stopping=True, **progress.snapshot())
+
+            if now > deadline:
+                kill_reason = f"Engine timed out after {ENGINE_TIMEOUT}s"
+            elif stop_sent_at is not None and now - stop_sent_at > STOP_GRACE_SECONDS:
+                kill_reason = "Engine did not stop after a stop request"
+            if kill_reason:
+                proc.kill()
+                proc.wait()
+                break
+
+        for t in io_threads:
+            t.join(timeout=5)
+
+        snapshot = progress.pop_snapshot()
+        if snapshot and progress_callback and not kill_reason:
+            progress_callback(stopping=stop_sent_at is not None, **snapshot)
+
+        stdout = b"".join(stdout_chunks).decode("utf-8", errors="replace")
+        stderr = "\n".join(stderr_lines)
+        if kill_reason:
+            logger.error("TimetableBridge.run: %s", kill_reason)
+            raise TimetableError(f"{kill_reason}.\nstderr: {stderr[-2000:]}")
+
+        return subprocess.CompletedProcess(proc.args, proc.returncode, stdout, stderr)
+
     @transaction.atomic
-    def save_result(self, result: dict, semester: Semester) -> dict:
+    def save_result(self, result: dict, semester: Semester, stream_ids: Optional[dict] = None) -> dict:
         slots_data = result.get("schedule", [])
 
         logger.info(
@@ -409,7 +859,7 @@ class TimetableBridge:
             logger.warning("TimetableBridge.save_result: missing Subject ids=%s", missing_sub)
 
         created_slots: list[ScheduleSlot] = []
-        stream_key_to_uuid: dict[str, uuid.UUID] = {}
+        stream_key_to_uuid: dict[str, uuid.UUID] = dict(stream_ids or {})
         skipped = 0
 
         for item in slots_data:
@@ -481,6 +931,7 @@ class TimetableBridge:
             )
 
         ScheduleSlot.objects.bulk_create(created_slots)
+        Semester.bump_schedule_version(semester.pk)
 
         logger.info(
             "TimetableBridge.save_result: bulk_created=%s slots, skipped=%s",
@@ -489,9 +940,84 @@ class TimetableBridge:
 
         return self._summary(result, created=len(created_slots))
 
+    @transaction.atomic
+    def save_warm_result(self, result: dict, semester: Semester, payload: dict) -> dict:
+        sent_ids = {
+            sid
+            for placement in payload.get("initial_placements", [])
+            for sid in placement["slot_ids"]
+        }
+        pinned_ids = set(result.get("pinned_slot_ids", []))
+        items = result.get("schedule", [])
+
+        existing = ScheduleSlot.objects.in_bulk(sent_ids)
+        ts_map = TimeSlot.objects.in_bulk({item["time_slot_id"] for item in items})
+
+        kept_ids: set[int] = set()
+        moved: list[ScheduleSlot] = []
+        new_items: list[dict] = []
+        stream_ids: dict[str, uuid.UUID] = {}
+
+        for item in items:
+            slot = existing.get(item.get("source_slot_id", -1))
+            ts = ts_map.get(item["time_slot_id"])
+            if slot is None or ts is None:
+                new_items.append(item)
+                continue
+            kept_ids.add(slot.id)
+            if slot.stream_id:
+                key = f"{item['subject_id']}_{item['day_of_week']}_{ts.id}_{item['week_type']}"
+                stream_ids.setdefault(key, slot.stream_id)
+
+            cls_id = item.get("classroom_id") or None
+            if (slot.day_of_week, slot.time_slot_id, slot.classroom_id, slot.week_type) == (
+                item["day_of_week"], ts.id, cls_id, item["week_type"]
+            ):
+                continue
+            slot.day_of_week = item["day_of_week"]
+            slot.time_slot = ts
+            slot.start_time = ts.start_time
+            slot.end_time = ts.end_time
+            slot.classroom_id = cls_id
+            slot.room = item.get("room_number", "")
+            slot.week_type = item["week_type"]
+            moved.append(slot)
+
+        removed_ids = sent_ids - kept_ids - pinned_ids
+        if removed_ids:
+            ScheduleSlot.objects.filter(id__in=removed_ids).delete()
+        Semester.bump_schedule_version(semester.pk)
+
+        if moved:
+            # Освобождаем аудитории, чтобы обмены местами не нарушили уникальность.
+            ScheduleSlot.objects.filter(id__in=[s.id for s in moved]).update(classroom=None)
+            ScheduleSlot.objects.bulk_update(
+                moved,
+                ["day_of_week", "time_slot", "start_time", "end_time", "classroom", "room", "week_type"],
+            )
+
+        created = 0
+        if new_items:
+            created = self.save_result(
+                {**result, "schedule": new_items}, semester, stream_ids=stream_ids
+            )["created"]
+
+        logger.info(
+            "TimetableBridge.save_warm_result: kept=%s moved=%s removed=%s created=%s pinned=%s",
+            len(kept_ids) - len(moved), len(moved), len(removed_ids),
+            created, len(pinned_ids)
+        )
+
+        summary = self._summary(result, created=created)
+        summary["moved"] = len(moved)
+        summary["removed"] = len(removed_ids)
+        return summary
+
     def generate(self, semester, target_groups, **kwargs) -> dict:
         payload = self.build_payload(semester, target_groups, **kwargs)
-        result = self.run(payload)
+        result = self.solve(payload)
+        if payload.get("warm_start"):
+            return self.save_warm_result(result, semester, payload)
         return self.save_result(result, semester)
 
     @staticmethod
@@ -503,6 +1029,7 @@ class TimetableBridge:
             "score": result.get("score", 0),
             "elapsed_ms": result.get("elapsed_ms", 0),
             "unassigned": result.get("unassigned_details", []),
+            "stopped": result.get("stopped", False),
         }
 
 
@@ -518,6 +1045,10 @@ class AutoScheduleEngineCpp:
         strict_room_types=False,
         iterations=6,
         institute=None,
+        clear_existing=False,
+        progress_callback=None,
+        should_stop=None,
+        warm_start=False,
     ):
         self.semester = semester
         self.target_groups = target_groups
@@ -528,8 +1059,16 @@ class AutoScheduleEngineCpp:
         self.strict_room_types = strict_room_types
         self.sa_restarts = max(2, min(iterations, 12))
         self.institute = institute
+        self.clear_existing = clear_existing
+        self.progress_callback = progress_callback
+        self.should_stop = should_stop
+        self.warm_start = warm_start
         self._bridge = TimetableBridge()
 
+    def _report(self, stage: str, **data) -> None:
+        if self.progress_callback:
+            self.progress_callback(stage, **data)
+
     def generate(self) -> dict:
         logger.info(
             "AutoScheduleEngineCpp.generate: semester=%s groups=%s teachers=%s rooms=%s "
@@ -545,6 +1084,7 @@ class AutoScheduleEngineCpp:
             self.institute
         )
         try:
+            self._report("BUILDING")
             payload = self._bridge.build_payload(
                 semester=self.semester,
                 target_groups=self.target_groups,
@@ -557,9 +1097,28 @@ class AutoScheduleEngineCpp:
                 sa_steps=400000,
                 max_seconds=90,
                 institute=self.institute,
+                clear_existing=self.clear_existing,
+                warm_start=self.warm_start,
+            )
+            self._report("SOLVING", tasks=len(payload["tasks"]))
+            result = self._bridge.solve(
+                payload,
+                progress_callback=lambda **data: self._report("SOLVING", **data),
+                should_stop=self.should_stop,
             )
-            result = self._bridge.run(payload)
-            saved = self._bridge.save_result(result, self.semester)
+
+            self._report("SAVING", placed=result.get("placed_count", 0))
+            if self.warm_start:
+                saved = self._bridge.save_warm_result(result, self.semester, payload)
+            else:
+                with transaction.atomic():
+                    if self.clear_existing:
+                        ScheduleSlot.objects.filter(
+                            semester=self.semester,
+                            group__in=self.target_groups,
+                            is_military=False,
+                        ).delete()
+                    saved = self._bridge.save_result(result, self.semester)
 
             logger.info(
                 "AutoScheduleEngineCpp.generate finished: created=%s unplaced=%s score=%s elapsed_ms=%s",
@@ -572,6 +1131,9 @@ class AutoScheduleEngineCpp:
                 "created": saved["created"],
                 "unassigned_count": saved["unplaced_count"],
                 "unassigned_details": saved["unassigned"],
+                "stopped": saved["stopped"],
+                "moved": saved.get("moved", 0),
+                "removed": saved.get("removed", 0),
             }
         except Exception as e:
             logger.exception(
@@ -0,0 +1,277 @@
+"""
+Разбиение задачи расписания на независимые подзадачи.
+
+Граф конфликтов: вершины — группы, преподаватели и «зоны» (институт, которому
+принадлежат группа и корпус аудитории). Занятие связывает свои группы и
+преподавателя, группа связана со своей зоной. Компоненты связности не делят
+ни групп, ни преподавателей, ни потоков, поэтому их можно решать отдельными
+процессами и просто склеить результаты.
+
+Аудитории своей зоны уходят в компоненту этой зоны. Оставшиеся общие аудитории
+(корпус без института или институт без групп в задаче) делятся между частями
+пропорционально спросу на каждый тип аудитории; при тёплом старте аудитория
+остаётся у той части, чьи занятия уже в ней стоят. Если ни один корпус не
+привязан к институту, весь фонд общий и задача решается целиком.
+
+Мелкие компоненты упаковываются в части (не больше max_parts), чтобы число
+процессов не превышало число ядер. Модуль не зависит от Django.
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Меньше этого (в часах в неделю) часть не выделяется: запуск процесса дороже решения.
+MIN_PART_HOURS = 150.0
+
+OVERFLOW_LIMITS = {0: 1.00, 1: 1.25, 2: 1.50}
+
+_SPLIT_KEYS = (
+    "rooms", "groups", "tasks", "teachers",
+    "teacher_unavailable", "group_unavailable", "initial_placements",
+)
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: dict = {}
+
+    def find(self, x):
+        parent = self.parent
+        parent.setdefault(x, x)
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, nodes) -> None:
+        nodes = iter(nodes)
+        first = next(nodes, None)
+        if first is None:
+            return
+        root = self.find(first)
+        for node in nodes:
+            other = self.find(node)
+            if other != root:
+                self.parent[other] = root
+
+
+def _nodes(spec: dict) -> list:
+    nodes = [("g", gid) for gid in spec.get("group_ids", [])]
+    tid = spec.get("teacher_id", -1)
+    if tid is not None and tid >= 0:
+        nodes.append(("t", tid))
+    return nodes
+
+
+def _room_kind(room_type: str) -> str:
+    return "LECTURE" if room_type in ("LECTURE", "SPORT") else (room_type or "PRACTICE")
+
+
+def _task_kind(task: dict) -> str:
+    if task["lesson_type"] in ("LECTURE", "LAB"):
+        return task["lesson_type"]
+    return task.get("preferred_room_type") or "PRACTICE"
+
+
+def _graph(payload: dict) -> tuple[_UnionFind, dict]:
+    uf = _UnionFind()
+    for room in payload.get("rooms", []):
+        if room.get("zone") is not None:
+            uf.union([("r", room["id"]), ("z", room["zone"])])
+    room_zones = {r.get("zone") for r in payload.get("rooms", [])} - {None}
+    for g in payload.get("groups", []):
+        if g.get("zone") in room_zones:
+            uf.union([("g", g["id"]), ("z", g["zone"])])
+    tasks = payload.get("tasks", [])
+    for task in tasks:
+        uf.union(_nodes(task))
+    if payload.get("warm_start"):
+        # Аудитория, где уже стоит занятие, связывает его с компонентой:
+        # иначе якорь окажется в аудитории другой части.
+        for p in payload.get("initial_placements") or []:
+            room = p.get("classroom_id", -1)
+            uf.union(_nodes(p) + ([("r", room)] if room is not None and room >= 0 else []))
+
+    by_root: dict = defaultdict(list)
+    for i, task in enumerate(tasks):
+        nodes = _nodes(task)
+        by_root[uf.find(nodes[0]) if nodes else ("task", i)].append(i)
+    return uf, by_root
+
+
+def find_components(payload: dict) -> list[list[int]]:
+    """Индексы занятий payload, сгруппированные по компонентам графа конфликтов."""
+    return list(_graph(payload)[1].values())
+
+
+def split_payload(payload: dict, max_parts: int, min_part_hours: float = MIN_PART_HOURS) -> list[dict]:
+    """
+    Делит payload на не более чем max_parts независимых подзадач.
+    Возвращает [payload], если делить нечего или не выгодно.
+    """
+    tasks = payload.get("tasks", [])
+    hours = [max(0.5, float(t.get("weekly_slots", 1.0))) for t in tasks]
+    total_hours = sum(hours)
+    if max_parts < 2 or total_hours < 2 * min_part_hours:
+        return [payload]
+    if all(r.get("zone") is None for r in payload.get("rooms", [])):
+        # Корпуса не привязаны к институтам: весь фонд общий, задачу не делим.
+        return [payload]
+
+    uf, by_root = _graph(payload)
+    n_parts = min(max_parts, len(by_root), int(total_hours // min_part_hours))
+    if n_parts < 2:
+        return [payload]
+
+    # Крупные компоненты — первыми в самую лёгкую часть (LPT).
+    root_part: dict = {}
+    load = [0.0] * n_parts
+    for root, comp in sorted(by_root.items(), key=lambda kv: -sum(hours[i] for i in kv[1])):
+        part = min(range(n_parts), key=load.__getitem__)
+        load[part] += sum(hours[i] for i in comp)
+        root_part[root] = part
+    task_part = [0] * len(tasks)
+    for root, comp in by_root.items():
+        for i in comp:
+            task_part[i] = root_part[root]
+
+    def owner(node):
+        return root_part.get(uf.find(node)) if node in uf.parent else None
+
+    room_part = _assign_rooms(payload, task_part, owner, n_parts)
+    if room_part is None:
+        return [payload]
+
+    parts = [_part_payload(payload, p, task_part, owner, room_part) for p in range(n_parts)]
+    logger.info(
+        "split_payload: %s component(s) packed into %s part(s), tasks per part=%s",
+        len(by_root), n_parts, [len(p["tasks"]) for p in parts]
+    )
+    return parts
+
+
+def _assign_rooms(payload: dict, task_part: list, owner, n_parts: int):
+    rooms = payload.get("rooms", [])
+    tasks = payload.get("tasks", [])
+    room_part: dict[int, int] = {}
+    shared = []
+    for room in rooms:
+        part = owner(("r", room["id"]))
+        if part is None:
+            shared.append(room)
+        else:
+            room_part[room["id"]] = part
+
+    demand: dict[str, list] = defaultdict(lambda: [0.0] * n_parts)
+    biggest: dict[str, list] = defaultdict(lambda: [0] * n_parts)
+    for i, task in enumerate(tasks):
+        kind, part = _task_kind(task), task_part[i]
+        demand[kind][part] += max(0.5, float(task.get("weekly_slots", 1.0)))
+        biggest[kind][part] = max(biggest[kind][part], task.get("students", 0))
+    total_demand = [sum(d[p] for d in demand.values()) for p in range(n_parts)]
+
+    limit = OVERFLOW_LIMITS.get(payload.get("overflow_mode", 1), 1.50)
+    by_kind: dict[str, list] = defaultdict(list)
+    for room in rooms:
+        by_kind[_room_kind(room.get("room_type", ""))].append(room)
+
+    for kind, kind_rooms in by_kind.items():
+        want = demand[kind] if kind in demand and any(demand[kind]) else total_demand
+        total = sum(want) or 1.0
+        quota = [want[p] / total * len(kind_rooms) for p in range(n_parts)]
+        got = [0] * n_parts
+        for room in kind_rooms:
+            if room["id"] in room_part:
+                got[room_part[room["id"]]] += 1
+        free = sorted(
+            (r for r in kind_rooms if r["id"] not in room_part),
+            key=lambda r: -r.get("capacity", 0),
+        )
+
+        # Каждой части, которой нужен этот тип, — хотя бы одну аудиторию,
+        # вмещающую её самое большое занятие.
+        need = biggest.get(kind, [0] * n_parts)
+        for part in sorted(range(n_parts), key=lambda p: -need[p]):
+            if got[part] or not want[part] or not free:
+                continue
+            fits = [r for r in free if r.get("capacity", 0) * limit >= need[part]]
+            room = min(fits, key=lambda r: r.get("capacity", 0)) if fits else free[0]
+            free.remove(room)
+            room_part[room["id"]] = part
+            got[part] += 1
+
+        for room in free:
+            part = max(range(n_parts), key=lambda p: (quota[p] - got[p], need[p]))
+            room_part[room["id"]] = part
+            got[part] += 1
+
+    counts = [0] * n_parts
+    for part in room_part.values():
+        counts[part] += 1
+    if not all(counts):
+        logger.info("split_payload: not enough rooms to give every part its own, solving as a whole")
+        return None
+    return room_part
+
+
+def _part_payload(payload: dict, part: int, task_part: list, owner, room_part: dict) -> dict:
+    out = {k: v for k, v in payload.items() if k not in _SPLIT_KEYS}
+    out["rooms"] = [r for r in payload.get("rooms", []) if room_part.get(r["id"]) == part]
+    out["groups"] = [g for g in payload.get("groups", []) if owner(("g", g["id"])) == part]
+    out["teachers"] = [t for t in payload.get("teachers", []) if owner(("t", t["id"])) == part]
+    out["teacher_unavailable"] = [
+        u for u in payload.get("teacher_unavailable", []) if owner(("t", u["teacher_id"])) == part
+    ]
+    out["group_unavailable"] = [
+        u for u in payload.get("group_unavailable", []) if owner(("g", u["group_id"])) == part
+    ]
+
+    local_ref = {}
+    out["tasks"] = []
+    for i, task in enumerate(payload.get("tasks", [])):
+        if task_part[i] == part:
+            local_ref[i] = len(out["tasks"])
+            out["tasks"].append(task)
+
+    if "initial_placements" in payload:
+        out["initial_placements"] = []
+        for p in payload["initial_placements"] or []:
+            ref = p.get("task_ref", -1)
+            if ref in local_ref:
+                out["initial_placements"].append({**p, "task_ref": local_ref[ref]})
+            elif not 0 <= ref < len(task_part):
+                # Закреплённое занятие — в часть своих групп и преподавателя,
+                # а если их нет среди занятий — в часть своей аудитории.
+                home = {owner(n) for n in _nodes(p)} - {None}
+                if part in home or (not home and room_part.get(p.get("classroom_id")) == part):
+                    out["initial_placements"].append(p)
+    return out
+
+
+def merge_results(results: list[dict]) -> dict:
+    """Склеивает результаты частей в один результат в формате движка."""
+    merged = {
+        "success": all(r.get("success", False) for r in results),
+        "score": sum(r.get("score", 0) for r in results),
+        "placed_count": sum(r.get("placed_count", 0) for r in results),
+        "unplaced_count": sum(r.get("unplaced_count", 0) for r in results),
+        "total_tasks": sum(r.get("total_tasks", 0) for r in results),
+        "elapsed_ms": max((r.get("elapsed_ms", 0) for r in results), default=0),
+        "stopped": any(r.get("stopped", False) for r in results),
+        "schedule": [item for r in results for item in r.get("schedule", [])],
+        "unassigned_details": [d for r in results for d in r.get("unassigned_details", [])],
+        "parts": len(results),
+    }
+    if "engine" in results[0]:
+        merged["engine"] = results[0]["engine"]
+    for key in ("moves", "invalidated_count", "moved_count"):
+        if any(key in r for r in results):
+            merged[key] = sum(r.get(key, 0) for r in results)
+    if any("pinned_slot_ids" in r for r in results):
+        merged["pinned_slot_ids"] = sorted({sid for r in results for sid in r.get("pinned_slot_ids", [])})
+    return merged
@@ -4,6 +4,7 @@
 #include <chrono>
 #include <cmath>
 #include <cstdint>
+#include <cstring>
 #include <fstream>
 #include <functional>
 #include <iomanip>
@@ -22,12 +23,34 @@
 #include <unordered_map>
 #include <vector>
 
+#ifdef _WIN32
+#include <fcntl.h>
+#include <io.h>
+#endif
+
 #include "json.hpp"
 using json = nlohmann::json;
 using namespace std;
 using Clock = chrono::steady_clock;
 using TP    = chrono::time_point<Clock>;
 
+// Выставляется наблюдателем stop_file: все фазы завершаются досрочно,
+// а в stdout уходит лучшее найденное решение.
+static atomic<bool> g_stop{false};
+
+// Версия движка и поддерживаемые форматы входа; bridge читает их через --version.
+constexpr int ENGINE_VERSION = 2;
+
+// Хеш исходников, подставляется командой build_timetable_engine (-DENGINE_SOURCE_HASH=...).
+#ifndef ENGINE_SOURCE_HASH
+#define ENGINE_SOURCE_HASH ""
+#endif
+
+static bool stopRequested() { return g_stop.load(memory_order_relaxed); }
+
+// Число выполненных шагов отжига по всем потокам (для бенчмарков: ходы/с).
+static atomic<long long> g_moves{0};
+
 namespace SC {
     constexpr double UNPLACED          = -2000.0;
     constexpr double WRONG_LECTURE     =   -60.0;
@@ -43,6 +66,8 @@ namespace SC {
     constexpr double TEACHER_LOAD_PER  =    -8.0;
     constexpr double SPREAD_BONUS      =    +8.0;
     constexpr double CROWD_PENALTY     =   -12.0;
+    constexpr double MOVE_SLOT         =  -120.0;
+    constexpr double ROOM_ONLY_SHARE   =    0.25;
 }
 
 enum class WeekType   : int8_t { EVERY=0, RED=1, BLUE=2 };
@@ -112,6 +137,16 @@ struct Task {
     RoomType       pref_room;
     WeekType       week_pref;
     bool           is_wt_flexible;
+
+    // Тёплый старт: исходное положение занятия из ScheduleSlot и id строк
+    // (выравнены с group_ids, -1 — строки нет).
+    int8_t         anchor_day  = -1;
+    int8_t         anchor_ts   = -1;
+    int16_t        anchor_room = -1;
+    WeekType       anchor_wt   = WeekType::EVERY;
+    vector<int>    source_slot_ids;
+
+    bool anchored() const { return anchor_day >= 0; }
 };
 
 struct Placement {
@@ -155,6 +190,18 @@ struct Problem {
     int  max_group_per_day   = 4;
     int  max_teacher_per_day = 4;
 
+    string stop_file;
+
+    bool   warm_start   = false;
+    double move_penalty = SC::MOVE_SLOT;
+    // Занятия, которые не удалось сопоставить задачам: не двигаются,
+    // но занимают группу/преподавателя/аудиторию.
+    vector<Task>      fixed_tasks;
+    vector<Placement> fixed_place;
+    vector<int>       pinned_slot_ids;
+    // Задачи без валидного исходного положения — их и чиним в anneal.
+    vector<int>       focus;
+
     int nDays()     const { return 6; }
     int nSlots()    const { return (int)slots.size(); }
     int nRooms()    const { return (int)rooms.size(); }
@@ -250,7 +297,7 @@ struct BusyMap {
             modify(group_busy.data(), off, wt, delta);
             group_day_cnt[gl * n_days + day] += (int16_t)delta;
         }
-        {
+        if (ri >= 0) {
             int off = ri * stride_re + day * stride_rd + tsi * 2;
             modify(room_busy.data(), off, wt, delta);
         }
@@ -367,6 +414,17 @@ static double teacherBalanceScore(const BusyMap& bm, const Problem& pb,
     return 0.0;
 }
 
+static double moveCost(const Problem& pb, const Task& task,
+                       int day, int tsi, int ri, WeekType wt)
+{
+    if (!task.anchored()) return 0.0;
+    if (day != task.anchor_day || tsi != task.anchor_ts || wt != task.anchor_wt)
+        return pb.move_penalty;
+    if (ri != task.anchor_room)
+        return pb.move_penalty * SC::ROOM_ONLY_SHARE;
+    return 0.0;
+}
+
 static double slotScore(const BusyMap& bm, const Problem& pb,
                         const Task& task,
                         int day, int tsi, int ri, WeekType wt)
@@ -382,13 +440,22 @@ static double slotScore(const BusyMap& bm, const Problem& pb,
     sc += SC::LATE_PER_IDX * tsi;
     sc += spreadScore(bm, pb, task, day);
     sc += teacherBalanceScore(bm, pb, task, day);
+    sc += moveCost(pb, task, day, tsi, ri, wt);
     return sc;
 }
 
+static void initBusy(const Problem& pb, BusyMap& bm) {
+    bm.init(pb.nTeachers(), pb.nGroups(), pb.nRooms(), pb.nDays(), pb.nSlots());
+    for (size_t i = 0; i < pb.fixed_tasks.size(); i++) {
+        const Placement& p = pb.fixed_place[i];
+        bm.apply(pb, pb.fixed_tasks[i], p.day, p.ts_idx, p.room_idx, p.wt, +1);
+    }
+}
+
 static double fullScore(const Problem& pb, const vector<Placement>& sol) {
     if (sol.empty()) return SC::UNPLACED * pb.nTasks();
     BusyMap bm;
-    bm.init(pb.nTeachers(), pb.nGroups(), pb.nRooms(), pb.nDays(), pb.nSlots());
+    initBusy(pb, bm);
     double sc = 0.0;
     for (int i = 0; i < (int)sol.size(); i++) {
         const Task&      task = pb.tasks[i];
@@ -400,124 +467,103 @@ static double fullScore(const Problem& pb, const vector<Placement>& sol) {
     return sc;
 }
 
-static Problem parseInput(const json& j) {
-    Problem pb;
+// Формат-независимое описание входа: JSON и бинарный парсеры заполняют его,
+// buildProblem раскладывает в индексированную задачу.
+struct TaskSpec {
+    int         subject_id;
+    string      name;
+    int         teacher_id;
+    vector<int> group_ids;
+    bool        is_stream;
+    int         stream_tag;
+    int         students;
+    LessonType  ltype;
+    RoomType    pref_room;
+    double      weekly;
+};
 
-    pb.sa_t0        = jget<double>(j, "sa_t0",        pb.sa_t0);
-    pb.sa_cooling   = jget<double>(j, "sa_cooling",   pb.sa_cooling);
-    pb.sa_reheat    = jget<double>(j, "sa_reheat",     pb.sa_reheat);
-    pb.sa_restarts  = jget<int>   (j, "sa_restarts",  pb.sa_restarts);
-    pb.sa_steps     = jget<int>   (j, "sa_steps",     pb.sa_steps);
-    pb.max_seconds  = jget<int>   (j, "max_seconds",  pb.max_seconds);
+struct InitialSpec {
+    int         task_ref, subject_id, teacher_id;
+    int         day, ts_id, classroom_id;
+    LessonType  ltype;
+    WeekType    wt;
+    vector<int> group_ids, slot_ids;
+};
 
-    pb.overflow_mode     = jget<int> (j, "overflow_mode",     pb.overflow_mode);
-    pb.strict_room_types = jget<bool>(j, "strict_room_types", pb.strict_room_types);
-    pb.avoid_gaps        = jget<bool>(j, "avoid_gaps",        pb.avoid_gaps);
+struct Unavail { int owner_id, day, ts_id; };
 
-    for (const auto& s : j.at("time_slots")) {
-        TSlot ts;
-        ts.id     = s.at("id").get<int>();
-        ts.start  = jget<string>(s, "start_time", "08:00");
-        ts.end    = jget<string>(s, "end_time",   "08:50");
-        ts.number = jget<int>   (s, "number",     (int)pb.slots.size()+1);
-        pb.slots.push_back(ts);
-    }
+struct RawInput {
+    Problem             pb;          // параметры, слоты, аудитории, группы
+    vector<TaskSpec>    tasks;
+    vector<InitialSpec> initial;
+    vector<Unavail>     teacher_unavail;
+    vector<Unavail>     group_unavail;
+};
 
-    {
-        int local = 0;
-        for (const auto& r : j.at("rooms")) {
-            Room room;
-            room.id        = r.at("id").get<int>();
-            room.number    = jget<string>(r, "number",    "?");
-            room.capacity  = jget<int>   (r, "capacity",  30);
-            room.room_type = rtFromStr(jget<string>(r, "room_type", "PRACTICE"));
-            pb.room_idx_map[room.id] = local++;
-            pb.rooms.push_back(room);
-        }
-    }
+static void addRoom(Problem& pb, Room room) {
+    pb.room_idx_map[room.id] = (int)pb.rooms.size();
+    pb.rooms.push_back(move(room));
+}
 
-    for (const auto& g : j.at("groups")) {
-        int gid = g.at("id").get<int>();
-        if (!pb.group_idx.count(gid))
-            pb.group_idx[gid] = pb.n_groups++;
-    }
+static void addGroup(Problem& pb, int gid) {
+    if (!pb.group_idx.count(gid))
+        pb.group_idx[gid] = pb.n_groups++;
+}
 
-    for (const auto& t : j.at("tasks")) {
-        int tid = jget<int>(t, "teacher_id", -1);
-        if (tid >= 0 && !pb.teacher_idx.count(tid))
-            pb.teacher_idx[tid] = pb.n_teachers++;
-    }
+static Problem buildProblem(RawInput&& in) {
+    Problem pb = move(in.pb);
+
+    for (const auto& t : in.tasks)
+        if (t.teacher_id >= 0 && !pb.teacher_idx.count(t.teacher_id))
+            pb.teacher_idx[t.teacher_id] = pb.n_teachers++;
+    if (pb.warm_start)
+        for (const auto& ip : in.initial)
+            if (ip.teacher_id >= 0 && !pb.teacher_idx.count(ip.teacher_id))
+                pb.teacher_idx[ip.teacher_id] = pb.n_teachers++;
 
     // Общая карта slot_id → local_index (используется для teacher_unavail и group_unavail)
     unordered_map<int,int> slot_local;
     for (int i = 0; i < (int)pb.slots.size(); i++)
         slot_local[pb.slots[i].id] = i;
 
+    const int cells = pb.nDays() * (int)pb.slots.size();
+
     // Teacher unavailability
-    pb.teacher_unavail.assign(pb.n_teachers,
-        vector<bool>(pb.nDays() * (int)pb.slots.size(), false));
-    {
-        const json* tunavail = j.find_ptr("teacher_unavailable");
-        if (tunavail && !tunavail->is_null()) { const json& it = *tunavail;
-            for (const auto& u : it) {
-                int tid   = jget<int>(u, "teacher_id",   -1);
-                int day   = jget<int>(u, "day_of_week",  -1);
-                int ts_id = jget<int>(u, "time_slot_id", -1);
-                if (tid<0 || day<0 || ts_id<0) continue;
-                auto tit = pb.teacher_idx.find(tid);
-                auto sit = slot_local.find(ts_id);
-                if (tit==pb.teacher_idx.end() || sit==slot_local.end()) continue;
-                int idx = day * (int)pb.slots.size() + sit->second;
-                if (idx < (int)pb.teacher_unavail[tit->second].size())
-                    pb.teacher_unavail[tit->second][idx] = true;
-            }
-        }
+    pb.teacher_unavail.assign(pb.n_teachers, vector<bool>(cells, false));
+    for (const auto& u : in.teacher_unavail) {
+        if (u.owner_id<0 || u.day<0 || u.ts_id<0) continue;
+        auto tit = pb.teacher_idx.find(u.owner_id);
+        auto sit = slot_local.find(u.ts_id);
+        if (tit==pb.teacher_idx.end() || sit==slot_local.end()) continue;
+        int idx = u.day * (int)pb.slots.size() + sit->second;
+        if (idx < cells) pb.teacher_unavail[tit->second][idx] = true;
     }
 
     // ★ NEW: Group unavailability (военная кафедра + уже стоящие пары)
-    pb.group_unavail.assign(pb.n_groups,
-        vector<bool>(pb.nDays() * (int)pb.slots.size(), false));
-    {
-        const json* gunavail = j.find_ptr("group_unavailable");
-        if (gunavail && !gunavail->is_null()) {
-            for (const auto& u : *gunavail) {
-                int gid   = jget<int>(u, "group_id",     -1);
-                int day   = jget<int>(u, "day_of_week",  -1);
-                int ts_id = jget<int>(u, "time_slot_id", -1);
-                if (gid<0 || day<0 || ts_id<0) continue;
-                auto git = pb.group_idx.find(gid);
-                auto sit = slot_local.find(ts_id);
-                if (git==pb.group_idx.end() || sit==slot_local.end()) continue;
-                int idx = day * (int)pb.slots.size() + sit->second;
-                if (idx < (int)pb.group_unavail[git->second].size())
-                    pb.group_unavail[git->second][idx] = true;
-            }
-        }
+    pb.group_unavail.assign(pb.n_groups, vector<bool>(cells, false));
+    for (const auto& u : in.group_unavail) {
+        if (u.owner_id<0 || u.day<0 || u.ts_id<0) continue;
+        auto git = pb.group_idx.find(u.owner_id);
+        auto sit = slot_local.find(u.ts_id);
+        if (git==pb.group_idx.end() || sit==slot_local.end()) continue;
+        int idx = u.day * (int)pb.slots.size() + sit->second;
+        if (idx < cells) pb.group_unavail[git->second][idx] = true;
     }
 
+    vector<vector<int>> ref_tasks;
     {
         int task_counter = 0;
-        for (const auto& t : j.at("tasks")) {
-            int    subject_id  = t.at("subject_id").get<int>();
-            string subj_name   = jget<string>(t, "subject_name", "");
-            int    teacher_id  = jget<int>(t, "teacher_id", -1);
-            auto&  gids_json   = t.at("group_ids");
-            bool   is_stream   = jget<bool>(t, "is_stream", false);
-            int    stream_tag  = jget<int>(t, "stream_tag", -1);
-            int    students    = jget<int>(t, "students", 25);
-            LessonType lt      = ltFromStr(jget<string>(t, "lesson_type", "LECTURE"));
-            RoomType pref_rt   = rtFromStr(jget<string>(t, "preferred_room_type", ""));
-            double weekly_f    = jget<double>(t, "weekly_slots", 1.0);
-
-            vector<int> grp_local, grp_db;
-            for (const auto& gj : gids_json) {
-                int gid = gj.get<int>();
-                grp_db.push_back(gid);
+        for (const auto& t : in.tasks) {
+            ref_tasks.emplace_back();
+
+            vector<int> grp_local;
+            for (int gid : t.group_ids) {
                 auto git = pb.group_idx.find(gid);
                 if (git != pb.group_idx.end())
                     grp_local.push_back(git->second);
             }
 
+            double weekly_f = t.weekly;
             if (weekly_f < 0.0) weekly_f = 0.0;
             int    every_count = (int)floor(weekly_f);
             double frac        = weekly_f - every_count;
@@ -529,18 +575,20 @@ static Problem parseInput(const json& j) {
             auto makeTask = [&](WeekType wt, bool flexible) {
                 Task tk;
                 tk.id             = task_counter++;
-                tk.subject_id     = subject_id;
-                tk.subject_name   = subj_name;
-                tk.teacher_id     = teacher_id;
+                tk.subject_id     = t.subject_id;
+                tk.subject_name   = t.name;
+                tk.teacher_id     = t.teacher_id;
                 tk.groups         = grp_local;
-                tk.group_ids      = grp_db;
-                tk.students       = students;
-                tk.ltype          = lt;
-                tk.is_stream      = is_stream;
-                tk.stream_tag     = stream_tag;
-                tk.pref_room      = pref_rt;
+                tk.group_ids      = t.group_ids;
+                tk.students       = t.students;
+                tk.ltype          = t.ltype;
+                tk.is_stream      = t.is_stream;
+                tk.stream_tag     = t.stream_tag;
+                tk.pref_room      = t.pref_room;
                 tk.week_pref      = wt;
                 tk.is_wt_flexible = flexible;
+                tk.source_slot_ids.assign(t.group_ids.size(), -1);
+                ref_tasks.back().push_back(tk.id);
                 pb.tasks.push_back(tk);
             };
 
@@ -552,21 +600,355 @@ static Problem parseInput(const json& j) {
         }
     }
 
+    if (pb.warm_start) {
+        for (const auto& ip : in.initial) {
+            auto sit = slot_local.find(ip.ts_id);
+            if (ip.day < 0 || ip.day >= pb.nDays() || sit == slot_local.end()) continue;
+            auto rit = pb.room_idx_map.find(ip.classroom_id);
+            int ri = rit == pb.room_idx_map.end() ? -1 : rit->second;
+
+            Task* target = nullptr;
+            if (ip.task_ref >= 0 && ip.task_ref < (int)ref_tasks.size()) {
+                for (int ti : ref_tasks[ip.task_ref]) {
+                    Task& tk = pb.tasks[ti];
+                    if (tk.anchored()) continue;
+                    bool fits = (ip.wt == WeekType::EVERY) ? !tk.is_wt_flexible : tk.is_wt_flexible;
+                    if (fits) { target = &tk; break; }
+                }
+            }
+
+            if (target) {
+                target->anchor_day  = (int8_t)ip.day;
+                target->anchor_ts   = (int8_t)sit->second;
+                target->anchor_room = (int16_t)ri;
+                target->anchor_wt   = ip.wt;
+                for (size_t k = 0; k < ip.group_ids.size() && k < ip.slot_ids.size(); k++) {
+                    auto pos = find(target->group_ids.begin(), target->group_ids.end(), ip.group_ids[k]);
+                    if (pos != target->group_ids.end())
+                        target->source_slot_ids[pos - target->group_ids.begin()] = ip.slot_ids[k];
+                }
+                continue;
+            }
+
+            // Лишнее занятие (нагрузка уменьшилась или состав потока другой):
+            // оставляем на месте как фиксированную занятость.
+            Task fx;
+            fx.id         = -1;
+            fx.subject_id = ip.subject_id;
+            fx.teacher_id = ip.teacher_id;
+            fx.group_ids  = ip.group_ids;
+            for (int gid : ip.group_ids) {
+                auto git = pb.group_idx.find(gid);
+                if (git != pb.group_idx.end()) fx.groups.push_back(git->second);
+            }
+            fx.students       = 0;
+            fx.ltype          = ip.ltype;
+            fx.is_stream      = ip.group_ids.size() > 1;
+            fx.stream_tag     = -1;
+            fx.pref_room      = RoomType::UNKNOWN;
+            fx.week_pref      = ip.wt;
+            fx.is_wt_flexible = false;
+            pb.fixed_tasks.push_back(fx);
+            pb.fixed_place.push_back({(int8_t)ip.day, (int8_t)sit->second, (int16_t)ri, ip.wt});
+            for (int sid : ip.slot_ids) if (sid > 0) pb.pinned_slot_ids.push_back(sid);
+        }
+    }
+
     return pb;
 }
+
+static Problem parseInput(const json& j) {
+    RawInput in;
+    Problem& pb = in.pb;
+
+    pb.sa_t0        = jget<double>(j, "sa_t0",        pb.sa_t0);
+    pb.sa_cooling   = jget<double>(j, "sa_cooling",   pb.sa_cooling);
+    pb.sa_reheat    = jget<double>(j, "sa_reheat",     pb.sa_reheat);
+    pb.sa_restarts  = jget<int>   (j, "sa_restarts",  pb.sa_restarts);
+    pb.sa_steps     = jget<int>   (j, "sa_steps",     pb.sa_steps);
+    pb.max_seconds  = jget<int>   (j, "max_seconds",  pb.max_seconds);
+
+    pb.overflow_mode     = jget<int> (j, "overflow_mode",     pb.overflow_mode);
+    pb.strict_room_types = jget<bool>(j, "strict_room_types", pb.strict_room_types);
+    pb.avoid_gaps        = jget<bool>(j, "avoid_gaps",        pb.avoid_gaps);
+    pb.stop_file         = jget<string>(j, "stop_file",       "");
+    pb.warm_start        = jget<bool>(j, "warm_start",        false);
+    pb.move_penalty      = jget<double>(j, "move_penalty",    pb.move_penalty);
+
+    for (const auto& s : j.at("time_slots")) {
+        TSlot ts;
+        ts.id     = s.at("id").get<int>();
+        ts.start  = jget<string>(s, "start_time", "08:00");
+        ts.end    = jget<string>(s, "end_time",   "08:50");
+        ts.number = jget<int>   (s, "number",     (int)pb.slots.size()+1);
+        pb.slots.push_back(ts);
+    }
+
+    for (const auto& r : j.at("rooms")) {
+        Room room;
+        room.id        = r.at("id").get<int>();
+        room.number    = jget<string>(r, "number",    "?");
+        room.capacity  = jget<int>   (r, "capacity",  30);
+        room.room_type = rtFromStr(jget<string>(r, "room_type", "PRACTICE"));
+        addRoom(pb, move(room));
+    }
+
+    for (const auto& g : j.at("groups"))
+        addGroup(pb, g.at("id").get<int>());
+
+    for (const auto& t : j.at("tasks")) {
+        TaskSpec ts;
+        ts.subject_id = t.at("subject_id").get<int>();
+        ts.name       = jget<string>(t, "subject_name", "");
+        ts.teacher_id = jget<int>(t, "teacher_id", -1);
+        for (const auto& gj : t.at("group_ids")) ts.group_ids.push_back(gj.get<int>());
+        ts.is_stream  = jget<bool>(t, "is_stream", false);
+        ts.stream_tag = jget<int>(t, "stream_tag", -1);
+        ts.students   = jget<int>(t, "students", 25);
+        ts.ltype      = ltFromStr(jget<string>(t, "lesson_type", "LECTURE"));
+        ts.pref_room  = rtFromStr(jget<string>(t, "preferred_room_type", ""));
+        ts.weekly     = jget<double>(t, "weekly_slots", 1.0);
+        in.tasks.push_back(move(ts));
+    }
+
+    auto readUnavail = [&](const char* key, const char* owner, vector<Unavail>& out) {
+        const json* arr = j.find_ptr(key);
+        if (!arr || arr->is_null()) return;
+        for (const auto& u : *arr)
+            out.push_back({jget<int>(u, owner, -1),
+                           jget<int>(u, "day_of_week", -1),
+                           jget<int>(u, "time_slot_id", -1)});
+    };
+    readUnavail("teacher_unavailable", "teacher_id", in.teacher_unavail);
+    readUnavail("group_unavailable",   "group_id",   in.group_unavail);
+
+    const json* initial = pb.warm_start ? j.find_ptr("initial_placements") : nullptr;
+    if (initial && !initial->is_null()) {
+        for (const auto& ip : *initial) {
+            InitialSpec is;
+            is.task_ref     = jget<int>(ip, "task_ref",     -1);
+            is.subject_id   = jget<int>(ip, "subject_id",   -1);
+            is.teacher_id   = jget<int>(ip, "teacher_id",   -1);
+            is.day          = jget<int>(ip, "day_of_week",  -1);
+            is.ts_id        = jget<int>(ip, "time_slot_id", -1);
+            is.classroom_id = jget<int>(ip, "classroom_id", -1);
+            is.ltype        = ltFromStr(jget<string>(ip, "lesson_type", "LECTURE"));
+            is.wt           = wtFromStr(jget<string>(ip, "week_type", "EVERY"));
+            for (const auto& g : ip.at("group_ids")) is.group_ids.push_back(g.get<int>());
+            for (const auto& v : ip.at("slot_ids"))  is.slot_ids.push_back(v.get<int>());
+            in.initial.push_back(move(is));
+        }
+    }
+
+    return buildProblem(move(in));
+}
+
+// ── Бинарный колоночный формат (см. schedule/timetable_payload.py) ──────────
+// Все числа little-endian; массивы идут столбцами, строки — через общую таблицу.
+constexpr char     BIN_MAGIC[4]  = {'T','T','B','P'};
+constexpr uint16_t BIN_VERSION   = 1;
+constexpr uint32_t BIN_NO_STRING = 0xFFFFFFFFu;
+
+class BinReader {
+    const string& buf_;
+    size_t        pos_ = 0;
+public:
+    explicit BinReader(const string& b) : buf_(b) {}
+
+    void need(size_t n) const {
+        if (pos_ + n > buf_.size()) throw runtime_error("binary payload truncated");
+    }
+    template<typename T> T get() {
+        need(sizeof(T));
+        T v; memcpy(&v, buf_.data() + pos_, sizeof(T));
+        pos_ += sizeof(T);
+        return v;
+    }
+    template<typename T> vector<T> column(size_t n) {
+        need(n * sizeof(T));
+        vector<T> v(n);
+        if (n) memcpy(v.data(), buf_.data() + pos_, n * sizeof(T));
+        pos_ += n * sizeof(T);
+        return v;
+    }
+    string bytes(size_t n) {
+        need(n);
+        string s = buf_.substr(pos_, n);
+        pos_ += n;
+        return s;
+    }
+};
+
+static bool isBinaryPayload(const string& input) {
+    return input.size() >= 4 && memcmp(input.data(), BIN_MAGIC, 4) == 0;
+}
+
+static Problem parseBinary(const string& input) {
+    BinReader rd(input);
+    rd.bytes(4);
+    uint16_t version = rd.get<uint16_t>();
+    rd.get<uint16_t>();
+    if (version != BIN_VERSION)
+        throw runtime_error("unsupported binary payload version " + to_string(version));
+
+    RawInput in;
+    Problem& pb = in.pb;
+
+    pb.sa_t0        = rd.get<double>();
+    pb.sa_cooling   = rd.get<double>();
+    pb.sa_reheat    = rd.get<double>();
+    pb.move_penalty = rd.get<double>();
+    pb.sa_restarts  = rd.get<int32_t>();
+    pb.sa_steps     = rd.get<int32_t>();
+    pb.max_seconds  = rd.get<int32_t>();
+    pb.overflow_mode     = rd.get<int32_t>();
+    pb.strict_room_types = rd.get<uint8_t>() != 0;
+    pb.avoid_gaps        = rd.get<uint8_t>() != 0;
+    pb.warm_start        = rd.get<uint8_t>() != 0;
+    rd.get<uint8_t>();
+
+    vector<string> strings(rd.get<uint32_t>());
+    for (auto& s : strings) s = rd.bytes(rd.get<uint32_t>());
+    auto str = [&](uint32_t i, const string& dflt) {
+        return i < strings.size() ? strings[i] : dflt;
+    };
+    pb.stop_file = str(rd.get<uint32_t>(), "");
+
+    static const RoomType ROOM_TYPES[] = {
+        RoomType::LECTURE, RoomType::PRACTICE, RoomType::COMPUTER, RoomType::LAB,
+        RoomType::LINGUISTIC, RoomType::SPORT, RoomType::UNKNOWN};
+    auto roomType = [](uint8_t v) { return v < 7 ? ROOM_TYPES[v] : RoomType::UNKNOWN; };
+    auto lessonType = [](uint8_t v) { return v < 4 ? (LessonType)v : LessonType::LECTURE; };
+    auto weekType = [](uint8_t v) { return v < 3 ? (WeekType)v : WeekType::EVERY; };
+
+    {
+        uint32_t n = rd.get<uint32_t>();
+        auto ids = rd.column<int32_t>(n), nums = rd.column<int32_t>(n);
+        auto starts = rd.column<uint32_t>(n), ends = rd.column<uint32_t>(n);
+        for (uint32_t i = 0; i < n; i++)
+            pb.slots.push_back({ids[i], str(starts[i], "08:00"), str(ends[i], "08:50"), nums[i]});
+    }
+    {
+        uint32_t n = rd.get<uint32_t>();
+        auto ids = rd.column<int32_t>(n), caps = rd.column<int32_t>(n);
+        auto nums = rd.column<uint32_t>(n);
+        auto types = rd.column<uint8_t>(n);
+        for (uint32_t i = 0; i < n; i++)
+            addRoom(pb, {ids[i], str(nums[i], "?"), caps[i], roomType(types[i])});
+    }
+    vector<int32_t> group_ids;
+    {
+        uint32_t n = rd.get<uint32_t>();
+        group_ids = rd.column<int32_t>(n);
+        for (int32_t gid : group_ids) addGroup(pb, gid);
+    }
+    {
+        uint32_t n = rd.get<uint32_t>();
+        auto subj = rd.column<int32_t>(n);
+        auto names = rd.column<uint32_t>(n);
+        auto teacher = rd.column<int32_t>(n), tag = rd.column<int32_t>(n);
+        auto students = rd.column<int32_t>(n);
+        auto weekly = rd.column<double>(n);
+        auto lt = rd.column<uint8_t>(n), stream = rd.column<uint8_t>(n), pref = rd.column<uint8_t>(n);
+        auto off = rd.column<uint32_t>(n + 1);
+        auto gids = rd.column<int32_t>(off[n]);
+        in.tasks.reserve(n);
+        for (uint32_t i = 0; i < n; i++) {
+            if (off[i] > off[i+1] || off[i+1] > gids.size())
+                throw runtime_error("binary payload: bad task group offsets");
+            in.tasks.push_back({subj[i], str(names[i], ""), teacher[i],
+                                vector<int>(gids.begin() + off[i], gids.begin() + off[i+1]),
+                                stream[i] != 0, tag[i], students[i],
+                                lessonType(lt[i]), roomType(pref[i]), weekly[i]});
+        }
+    }
+
+    // Битовые маски недоступности: бит day * n_slots + slot_index.
+    const uint32_t cells = (uint32_t)(pb.nDays() * pb.slots.size());
+    auto readBits = [&](const vector<int32_t>& owners, vector<Unavail>& out) {
+        uint32_t stride = rd.get<uint32_t>();
+        if (stride * 8 < cells) throw runtime_error("binary payload: bitset too short");
+        auto bits = rd.column<uint8_t>((size_t)stride * owners.size());
+        for (size_t o = 0; o < owners.size(); o++)
+            for (uint32_t c = 0; c < cells; c++)
+                if (bits[o * stride + c / 8] & (1u << (c % 8)))
+                    out.push_back({owners[o], (int)(c / pb.slots.size()),
+                                   pb.slots[c % pb.slots.size()].id});
+    };
+    {
+        uint32_t n = rd.get<uint32_t>();
+        auto owners = rd.column<int32_t>(n);
+        readBits(owners, in.teacher_unavail);
+    }
+    readBits(group_ids, in.group_unavail);
+
+    {
+        uint32_t n = rd.get<uint32_t>();
+        auto ref = rd.column<int32_t>(n), subj = rd.column<int32_t>(n);
+        auto teacher = rd.column<int32_t>(n), ts = rd.column<int32_t>(n);
+        auto room = rd.column<int32_t>(n);
+        auto day = rd.column<uint8_t>(n), lt = rd.column<uint8_t>(n), wt = rd.column<uint8_t>(n);
+        auto off = rd.column<uint32_t>(n + 1);
+        auto gids = rd.column<int32_t>(off[n]), sids = rd.column<int32_t>(off[n]);
+        for (uint32_t i = 0; i < n; i++) {
+            if (off[i] > off[i+1] || off[i+1] > gids.size())
+                throw runtime_error("binary payload: bad placement offsets");
+            in.initial.push_back({ref[i], subj[i], teacher[i], day[i], ts[i], room[i],
+                                  lessonType(lt[i]), weekType(wt[i]),
+                                  vector<int>(gids.begin() + off[i], gids.begin() + off[i+1]),
+                                  vector<int>(sids.begin() + off[i], sids.begin() + off[i+1])});
+        }
+    }
+
+    return buildProblem(move(in));
+}
+
+// Исходное положение задачи ещё допустимо при текущих ограничениях?
+static bool anchorValid(const Problem& pb, const BusyMap& bm, const Task& task) {
+    if (!task.anchored() || task.anchor_room < 0) return false;
+    const Room& room = pb.rooms[task.anchor_room];
+    if (!roomIsCompatible(pb, task, room) || !capacityOk(pb, task, room)) return false;
+    return !bm.hasConflict(pb, task, task.anchor_day, task.anchor_ts,
+                           task.anchor_room, task.anchor_wt);
+}
+
+// Раскладывает задачи по исходным местам; недопустимые остаются неразмещёнными.
+static vector<Placement> anchorSeed(const Problem& pb, BusyMap& bm) {
+    vector<Placement> sol(pb.nTasks());
+    for (int i = 0; i < pb.nTasks(); i++) {
+        const Task& task = pb.tasks[i];
+        if (!anchorValid(pb, bm, task)) continue;
+        sol[i] = {task.anchor_day, task.anchor_ts, task.anchor_room, task.anchor_wt};
+        bm.apply(pb, task, task.anchor_day, task.anchor_ts, task.anchor_room, task.anchor_wt, +1);
+    }
+    return sol;
+}
+
+static vector<int> invalidatedTasks(const Problem& pb) {
+    BusyMap bm;
+    initBusy(pb, bm);
+    vector<Placement> sol = anchorSeed(pb, bm);
+    vector<int> out;
+    for (int i = 0; i < pb.nTasks(); i++)
+        if (!sol[i].placed()) out.push_back(i);
+    return out;
+}
+
 static vector<Placement> greedySeed(const Problem& pb,
                                     BusyMap& bm,
-                                    mt19937& rng)
+                                    mt19937& rng,
+                                    vector<Placement> sol = {})
 {
     int nT = pb.nTasks();
     int nR = pb.nRooms();
     int nS = pb.nSlots();
     int nD = pb.nDays();
 
-    vector<Placement> sol(nT);
+    if (sol.empty()) sol.assign(nT, Placement{});
 
-    vector<int> order(nT);
-    iota(order.begin(), order.end(), 0);
+    vector<int> order;
+    for (int i = 0; i < nT; i++)
+        if (!sol[i].placed()) order.push_back(i);
     shuffle(order.begin(), order.end(), rng);
     stable_sort(order.begin(), order.end(), [&](int a, int b){
         const Task& ta = pb.tasks[a];
@@ -655,10 +1037,18 @@ static vector<Placement> anneal(const Problem& pb,
     uniform_int_distribution<int> rDay (0, nD-1);
     uniform_int_distribution<int> rSlot(0, nS-1);
     uniform_int_distribution<int> rRoom(0, nR-1);
+    const int nF = (int)pb.focus.size();
+    uniform_int_distribution<int> rFocus(0, max(0, nF-1));
+
+    auto check = [&]() { return Clock::now() < deadline && !stopRequested(); };
+    // При тёплом старте половина ходов достаётся задачам, которые надо чинить.
+    auto pickTask = [&]() {
+        if (nF > 0 && rU(rng) < 0.5) return pb.focus[rFocus(rng)];
+        return rTask(rng);
+    };
 
-    auto check = [&]() { return Clock::now() < deadline; };
-
-    for (int step = 0; step < steps; step++) {
+    int step = 0;
+    for (; step < steps; step++) {
         if ((step & 0x7FF) == 0 && !check()) break;
 
         int mv;
@@ -677,7 +1067,7 @@ static vector<Placement> anneal(const Problem& pb,
         double delta    = 0.0;
 
         if (mv == 0) {
-            int i = rTask(rng);
+            int i = pickTask();
             const Task& task = pb.tasks[i];
             Placement&  p    = sol[i];
             int nd  = rDay(rng), nts = rSlot(rng), nr = rRoom(rng);
@@ -704,7 +1094,7 @@ static vector<Placement> anneal(const Problem& pb,
             }
 
         } else if (mv == 1) {
-            int i = rTask(rng), j = rTask(rng);
+            int i = pickTask(), j = pickTask();
             if (i == j) goto upd;
             {
                 const Task& ti = pb.tasks[i];  const Task& tj = pb.tasks[j];
@@ -752,7 +1142,7 @@ static vector<Placement> anneal(const Problem& pb,
             }
 
         } else if (mv == 2) {
-            int i = rTask(rng);
+            int i = pickTask();
             const Task& task = pb.tasks[i];
             if (!task.is_wt_flexible) goto upd;
             Placement& p = sol[i];
@@ -772,7 +1162,7 @@ static vector<Placement> anneal(const Problem& pb,
             }
 
         } else if (mv == 3) {
-            int i = rTask(rng);
+            int i = pickTask();
             const Task& task = pb.tasks[i];
             Placement& p = sol[i];
             if (!p.placed()) goto upd;
@@ -794,7 +1184,7 @@ static vector<Placement> anneal(const Problem& pb,
             }
 
         } else if (mv == 4) {
-            int i = rTask(rng);
+            int i = pickTask();
             const Task& task = pb.tasks[i];
             Placement& p = sol[i];
             if (!p.placed()) goto upd;
@@ -814,7 +1204,7 @@ static vector<Placement> anneal(const Problem& pb,
             }
 
         } else if (mv == 5) {
-            int i = rTask(rng);
+            int i = pickTask();
             const Task& task = pb.tasks[i];
             Placement& p = sol[i];
             if (!p.placed()) goto upd;
@@ -834,7 +1224,7 @@ static vector<Placement> anneal(const Problem& pb,
             }
 
         } else if (mv == 6) {
-            int i = rTask(rng);
+            int i = pickTask();
             const Task& task = pb.tasks[i];
             Placement& p = sol[i];
             if (!p.placed()) goto upd;
@@ -856,7 +1246,7 @@ static vector<Placement> anneal(const Problem& pb,
             }
 
         } else {
-            int i = rTask(rng);
+            int i = pickTask();
             const Task& task = pb.tasks[i];
             Placement& p = sol[i];
             double os = p.placed()
@@ -909,6 +1299,7 @@ static vector<Placement> anneal(const Problem& pb,
         if (T < 0.005) T = 0.005;
     }
 
+    g_moves.fetch_add(step, memory_order_relaxed);
     return best_sol;
 }
 
@@ -931,7 +1322,7 @@ static vector<Placement> populationCrossover(
     for (int i = cut; i < nT; i++) child.push_back(p2[i]);
 
     BusyMap bm;
-    bm.init(pb.nTeachers(), pb.nGroups(), pb.nRooms(), pb.nDays(), pb.nSlots());
+    initBusy(pb, bm);
     for (int i = 0; i < nT; i++) {
         const Task& task = pb.tasks[i];
         Placement& p = child[i];
@@ -972,32 +1363,37 @@ static Result solveProblem(const Problem& pb) {
 
     auto worker = [&](int thread_id, int start_restart, int end_restart) {
         for (int restart = start_restart; restart < end_restart; restart++) {
-            if (Clock::now() > deadline) break;
+            if (Clock::now() > deadline || stopRequested()) break;
 
             mt19937 rng(42 + restart * 1337 + thread_id * 97);
 
             BusyMap bm;
-            bm.init(pb.nTeachers(), pb.nGroups(), pb.nRooms(),
-                    pb.nDays(), pb.nSlots());
+            initBusy(pb, bm);
 
-            vector<Placement> sol = greedySeed(pb, bm, rng);
+            vector<Placement> sol = pb.warm_start
+                ? greedySeed(pb, bm, rng, anchorSeed(pb, bm))
+                : greedySeed(pb, bm, rng);
 
             double T = pb.sa_t0 * pow(pb.sa_reheat,
                                       (double)restart / max(1, total_restarts - 1));
 
-            sol = anneal(pb, sol, bm, rng, T,
-                         pb.sa_cooling, pb.sa_steps, deadline);
+            double seed_sc = fullScore(pb, sol);
+            auto annealed  = anneal(pb, sol, bm, rng, T,
+                                    pb.sa_cooling, pb.sa_steps, deadline);
 
-            double sc = fullScore(pb, sol);
+            // anneal ведёт счёт по дельтам; полный пересчёт может оказаться
+            // хуже стартового решения — тогда оставляем старт.
+            double sc = fullScore(pb, annealed);
+            if (sc >= seed_sc) sol = move(annealed);
+            else               sc  = seed_sc;
             int placed = (int)count_if(sol.begin(), sol.end(),
                 [](const Placement& p){ return p.placed(); });
 
-            cerr << "[restart " << (restart+1) << "/" << total_restarts
-                 << "  score=" << fixed << setprecision(1) << sc
-                 << "  placed=" << placed << "/" << pb.nTasks() << "]\n";
-
             {
                 lock_guard<mutex> lock(pop_mutex);
+                cerr << "[restart " << (restart+1) << "/" << total_restarts
+                     << "  score=" << fixed << setprecision(1) << sc
+                     << "  placed=" << placed << "/" << pb.nTasks() << "]" << endl;
                 population.emplace_back(sc, sol);
                 sort(population.begin(), population.end(),
                      [](const auto& a, const auto& b){ return a.first > b.first; });
@@ -1017,7 +1413,7 @@ static Result solveProblem(const Problem& pb) {
     }
     for (auto& th : threads) th.join();
 
-    if ((int)population.size() >= 2) {
+    if ((int)population.size() >= 2 && !stopRequested()) {
         mt19937 rng_cx(999);
         cerr << "[engine] population crossover (pool=" << population.size() << ")\n";
         for (int cx = 0; cx < 5 && (int)population.size() >= 2; cx++) {
@@ -1032,10 +1428,10 @@ static Result solveProblem(const Problem& pb) {
     }
 
     auto deadline2 = Clock::now() + chrono::seconds(5);
-    if (!population.empty() && Clock::now() < deadline2) {
+    if (!population.empty() && !stopRequested()) {
         mt19937 rng_f(77777);
         BusyMap bm_f;
-        bm_f.init(pb.nTeachers(), pb.nGroups(), pb.nRooms(), pb.nDays(), pb.nSlots());
+        initBusy(pb, bm_f);
         const auto& best_ref = population[0].second;
         for (int i = 0; i < pb.nTasks(); i++) {
             if (best_ref[i].placed())
@@ -1044,7 +1440,7 @@ static Result solveProblem(const Problem& pb) {
                            best_ref[i].room_idx, best_ref[i].wt, +1);
         }
         auto fsol = anneal(pb, population[0].second, bm_f, rng_f,
-                           50.0, 0.9999, 50000, deadline2);
+                           min(50.0, pb.sa_t0), 0.9999, 50000, deadline2);
         double fsc = fullScore(pb, fsol);
         cerr << "[engine] final polish: score=" << fsc << "\n";
         if (fsc > population[0].first)
@@ -1062,7 +1458,8 @@ static Result solveProblem(const Problem& pb) {
 
     cerr << "[engine] DONE  score=" << fixed << setprecision(1) << best_sc
          << "  placed=" << placed << "/" << pb.nTasks()
-         << "  time=" << (int)elapsed << "ms\n";
+         << "  time=" << (int)elapsed << "ms"
+         << (stopRequested() ? "  (stopped)" : "") << endl;
 
     return {best_sol, best_sc, placed, unplaced, elapsed};
 }
@@ -1074,6 +1471,7 @@ static json buildOutput(const Problem& pb, const Result& res) {
     out["unplaced_count"] = res.unplaced;
     out["total_tasks"]    = pb.nTasks();
     out["elapsed_ms"]     = res.elapsed_ms;
+    out["moves"]          = (int64_t)g_moves.load();
 
     json slots_arr = json::array();
     vector<string> unassigned;
@@ -1110,12 +1508,30 @@ static json buildOutput(const Problem& pb, const Result& res) {
             slot["week_type"]    = wtToStr(p.wt);
             slot["is_stream"]    = task.is_stream;
             slot["stream_tag"]   = task.stream_tag;
+            slot["source_slot_id"] = task.source_slot_ids[k];
             slot["is_active"]    = true;
             slots_arr.push_back(slot);
         }
     }
 
     out["schedule"] = slots_arr;
+
+    if (pb.warm_start) {
+        int moved = 0;
+        for (int i = 0; i < pb.nTasks() && has_sol; i++) {
+            const Task& task = pb.tasks[i];
+            const Placement& p = res.sol[i];
+            if (task.anchored() && p.placed() &&
+                (p.day != task.anchor_day || p.ts_idx != task.anchor_ts ||
+                 p.room_idx != task.anchor_room || p.wt != task.anchor_wt))
+                moved++;
+        }
+        json pinned = json::array();
+        for (int sid : pb.pinned_slot_ids) pinned.push_back(json(sid));
+        out["pinned_slot_ids"]   = pinned;
+        out["invalidated_count"] = (int)pb.focus.size();
+        out["moved_count"]       = moved;
+    }
     {
         json ua = json::array();
         for (const auto& s : unassigned) ua.push_back(json(s));
@@ -1128,12 +1544,36 @@ int main(int argc, char* argv[]) {
     ios::sync_with_stdio(false);
     cin.tie(nullptr);
 
+    bool parse_only = false;
+    string path;
+    for (int i = 1; i < argc; i++) {
+        string arg = argv[i];
+        if (arg == "--version") {
+            json v;
+            v["engine"]          = "timetable_engine";
+            v["version"]         = ENGINE_VERSION;
+            json formats = json::array();
+            formats.push_back("json");
+            formats.push_back("ttbp1");
+            v["payload_formats"] = formats;
+            v["source_hash"]     = ENGINE_SOURCE_HASH;
+            v["threads"]         = max(1, (int)thread::hardware_concurrency());
+            cout << v.dump() << "\n";
+            return 0;
+        }
+        if (arg == "--parse-only") parse_only = true;
+        else path = arg;
+    }
+
     string input;
-    if (argc >= 2) {
-        ifstream f(argv[1]);
-        if (!f) { cerr << "Cannot open: " << argv[1] << "\n"; return 1; }
+    if (!path.empty()) {
+        ifstream f(path, ios::binary);
+        if (!f) { cerr << "Cannot open: " << path << "\n"; return 1; }
         input.assign(istreambuf_iterator<char>(f), {});
     } else {
+#ifdef _WIN32
+        _setmode(_fileno(stdin), _O_BINARY);
+#endif
         input.assign(istreambuf_iterator<char>(cin), {});
     }
     if (input.empty()) {
@@ -1141,18 +1581,43 @@ int main(int argc, char* argv[]) {
         cout << e.dump(2) << "\n"; return 1;
     }
 
-    json j;
-    try { j = json::parse(input); }
-    catch (const exception& e) {
-        json err; err["success"]=false; err["error"]=e.what();
-        cout << err.dump(2) << "\n"; return 1;
-    }
-
+    TP parse_start = Clock::now();
+    bool binary = isBinaryPayload(input);
     Problem pb;
-    try { pb = parseInput(j); }
-    catch (const exception& e) {
-        json err; err["success"]=false; err["error"]=string("parse: ")+e.what();
-        cout << err.dump(2) << "\n"; return 1;
+    if (binary) {
+        try { pb = parseBinary(input); }
+        catch (const exception& e) {
+            json err; err["success"]=false; err["error"]=string("parse: ")+e.what();
+            cout << err.dump(2) << "\n"; return 1;
+        }
+    } else {
+        json j;
+        try { j = json::parse(input); }
+        catch (const exception& e) {
+            json err; err["success"]=false; err["error"]=e.what();
+            cout << err.dump(2) << "\n"; return 1;
+        }
+        try { pb = parseInput(j); }
+        catch (const exception& e) {
+            json err; err["success"]=false; err["error"]=string("parse: ")+e.what();
+            cout << err.dump(2) << "\n"; return 1;
+        }
+    }
+    if (pb.warm_start) pb.focus = invalidatedTasks(pb);
+    double parse_ms = chrono::duration<double, milli>(Clock::now() - parse_start).count();
+
+    if (parse_only) {
+        json out;
+        out["success"]  = true;
+        out["format"]   = binary ? "ttbp1" : "json";
+        out["bytes"]    = (int)input.size();
+        out["parse_ms"] = parse_ms;
+        out["tasks"]    = pb.nTasks();
+        out["groups"]   = pb.nGroups();
+        out["teachers"] = pb.nTeachers();
+        out["rooms"]    = pb.nRooms();
+        cout << out.dump() << "\n";
+        return 0;
     }
 
     cerr << "[engine] tasks="     << pb.nTasks()
@@ -1178,13 +1643,36 @@ int main(int argc, char* argv[]) {
         else cnt_bl++;
         if (t.is_wt_flexible) cnt_fl++;
     }
+    if (pb.warm_start)
+        cerr << "[engine] warm_start  to_repair=" << pb.focus.size()
+             << "  pinned=" << pb.fixed_tasks.size() << "\n";
+
     cerr << "[engine] week_types EVERY=" << cnt_ev
          << " RED=" << cnt_rd
          << " BLUE=" << cnt_bl
          << " flexible=" << cnt_fl << "\n";
 
+    atomic<bool> solving{true};
+    thread watcher;
+    if (!pb.stop_file.empty()) {
+        watcher = thread([&]() {
+            while (solving.load()) {
+                if (ifstream(pb.stop_file).good()) {
+                    g_stop.store(true);
+                    cerr << "[engine] stop requested" << endl;
+                    return;
+                }
+                this_thread::sleep_for(chrono::milliseconds(200));
+            }
+        });
+    }
+
     Result res = solveProblem(pb);
+    solving.store(false);
+    if (watcher.joinable()) watcher.join();
+
     json out   = buildOutput(pb, res);
+    out["stopped"] = stopRequested();
 
     if (argc >= 3) {
         ofstream f(argv[2]);
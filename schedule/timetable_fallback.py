@@ -0,0 +1,529 @@
+"""
+Резервный решатель расписания на NumPy.
+
+Используется, когда нативный timetable_engine недоступен на хосте (например,
+в schedule/bin лежит только Windows-сборка). Принимает тот же payload, что
+TimetableBridge.build_payload, и возвращает результат в формате движка, так
+что save_result / save_warm_result работают без изменений.
+
+Ограничения и оценка слота повторяют timetable_engine.cpp (roomIsCompatible,
+capacityOk, capacityPenalty, roomTypePenalty, gapScore, spreadScore,
+teacherBalanceScore, moveCost). Занятость хранится булевыми тензорами
+(сущность, день, пара, бит недели): бит 0 — красная неделя, бит 1 — синяя,
+EVERY занимает оба. Для задачи сразу оцениваются все варианты
+(аудитория × день × пара), вместо отжига — жадное построение и проходы
+локального поиска с полным перебором окрестности задачи.
+"""
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+DAYS = 6
+
+UNPLACED = -2000.0
+WRONG_LECTURE = -60.0
+WRONG_LAB = -60.0
+WRONG_PREF = -35.0
+OVERFLOW_FACTOR = -100.0
+TINY_ROOM = -25.0
+LATE_PER_IDX = -2.0
+ADJACENT_BONUS = 15.0
+EMPTY_DAY_BONUS = 5.0
+GAP_PENALTY = -30.0
+TEACHER_OVERLOAD = -20.0
+TEACHER_LOAD_PER = -8.0
+SPREAD_BONUS = 8.0
+CROWD_PENALTY = -12.0
+MOVE_SLOT = -120.0
+ROOM_ONLY_SHARE = 0.25
+
+MAX_GROUP_PER_DAY = 4
+MAX_TEACHER_PER_DAY = 4
+OVERFLOW_LIMITS = {0: 1.00, 1: 1.25, 2: 1.50}
+
+EVERY, RED, BLUE = 0, 1, 2
+WEEK_TYPES = ("EVERY", "RED", "BLUE")
+WT_BITS = np.array([[True, True], [True, False], [False, True]])
+
+LESSON_TYPES = ("LECTURE", "PRACTICE", "LAB", "SRSP")
+ROOM_TYPES = ("LECTURE", "PRACTICE", "COMPUTER", "LAB", "LINGUISTIC", "SPORT")
+ROOM_UNKNOWN = len(ROOM_TYPES)
+
+MAX_PASSES = 30
+STOP_POLL_SECONDS = 1.0
+
+
+def _code(values: tuple, value, default: int) -> int:
+    try:
+        return values.index(value)
+    except ValueError:
+        return default
+
+
+class _Task:
+    __slots__ = (
+        "subject_id", "name", "teacher_id", "teacher", "groups", "group_ids",
+        "students", "ltype", "is_stream", "stream_tag", "pref_room",
+        "week_pref", "flexible", "source_slot_ids",
+        "anchor", "rooms", "room_score", "unavail",
+    )
+
+    def __init__(self, spec: dict, week_pref: int, flexible: bool):
+        self.subject_id = spec["subject_id"]
+        self.name = spec.get("subject_name", "")
+        self.teacher_id = spec.get("teacher_id", -1)
+        self.teacher = -1
+        self.groups: list[int] = []
+        self.group_ids = list(spec["group_ids"])
+        self.students = spec.get("students", 25)
+        self.ltype = _code(LESSON_TYPES, spec.get("lesson_type", "LECTURE"), 0)
+        self.is_stream = bool(spec.get("is_stream", False))
+        self.stream_tag = spec.get("stream_tag", -1)
+        self.pref_room = _code(ROOM_TYPES, spec.get("preferred_room_type") or "", ROOM_UNKNOWN)
+        self.week_pref = week_pref
+        self.flexible = flexible
+        self.source_slot_ids = [-1] * len(self.group_ids)
+        # (day, slot_idx, room_idx, week_type) исходного положения при тёплом старте
+        self.anchor = None
+
+    @property
+    def week_options(self) -> tuple:
+        return (RED, BLUE) if self.flexible else (self.week_pref,)
+
+
+class _Busy:
+    def __init__(self, n_teachers: int, n_groups: int, n_rooms: int, n_slots: int):
+        self.teacher = np.zeros((n_teachers, DAYS, n_slots, 2), dtype=bool)
+        self.group = np.zeros((n_groups, DAYS, n_slots, 2), dtype=bool)
+        self.room = np.zeros((n_rooms, DAYS, n_slots, 2), dtype=bool)
+        self.teacher_day = np.zeros((n_teachers, DAYS), dtype=np.int32)
+        self.group_day = np.zeros((n_groups, DAYS), dtype=np.int32)
+
+    def copy(self) -> "_Busy":
+        other = _Busy.__new__(_Busy)
+        for name in ("teacher", "group", "room", "teacher_day", "group_day"):
+            setattr(other, name, getattr(self, name).copy())
+        return other
+
+    def apply(self, task: _Task, place: tuple, on: bool) -> None:
+        day, slot, room, wt = place
+        bits = WT_BITS[wt]
+        delta = 1 if on else -1
+        if task.teacher >= 0:
+            self.teacher[task.teacher, day, slot, bits] = on
+            self.teacher_day[task.teacher, day] += delta
+        for g in task.groups:
+            self.group[g, day, slot, bits] = on
+            self.group_day[g, day] += delta
+        if room >= 0:
+            self.room[room, day, slot, bits] = on
+
+
+class FallbackSolver:
+    def __init__(self, payload: dict):
+        self.slots = payload.get("time_slots", [])
+        self.rooms = payload.get("rooms", [])
+        self.n_slots = len(self.slots)
+        self.overflow_mode = payload.get("overflow_mode", 1)
+        self.strict_room_types = bool(payload.get("strict_room_types", False))
+        self.avoid_gaps = bool(payload.get("avoid_gaps", True))
+        self.restarts = max(1, int(payload.get("sa_restarts", 6)))
+        self.max_seconds = payload.get("max_seconds", 90)
+        self.warm_start = bool(payload.get("warm_start", False))
+        self.move_penalty = payload.get("move_penalty", MOVE_SLOT)
+
+        self.group_idx = {g["id"]: i for i, g in enumerate(payload.get("groups", []))}
+        self.room_idx = {r["id"]: i for i, r in enumerate(self.rooms)}
+        slot_local = {s["id"]: i for i, s in enumerate(self.slots)}
+
+        self.teacher_idx: dict[int, int] = {}
+        initial = (payload.get("initial_placements") or []) if self.warm_start else []
+        for spec in list(payload.get("tasks", [])) + initial:
+            tid = spec.get("teacher_id", -1)
+            if tid is not None and tid >= 0:
+                self.teacher_idx.setdefault(tid, len(self.teacher_idx))
+
+        teacher_unavail = np.zeros((len(self.teacher_idx), DAYS, self.n_slots), dtype=bool)
+        group_unavail = np.zeros((len(self.group_idx), DAYS, self.n_slots), dtype=bool)
+        for key, owner, index, grid in (
+            ("teacher_unavailable", "teacher_id", self.teacher_idx, teacher_unavail),
+            ("group_unavailable", "group_id", self.group_idx, group_unavail),
+        ):
+            for u in payload.get(key) or []:
+                o = index.get(u.get(owner))
+                s = slot_local.get(u.get("time_slot_id"))
+                day = u.get("day_of_week", -1)
+                if o is not None and s is not None and 0 <= day < DAYS:
+                    grid[o, day, s] = True
+
+        self.tasks: list[_Task] = []
+        ref_tasks: list[list[int]] = []
+        for spec in payload.get("tasks", []):
+            ref_tasks.append([])
+            weekly = max(0.0, float(spec.get("weekly_slots", 1.0)))
+            every = int(weekly)
+            biweek = weekly - every >= 0.10 or (every == 0 and weekly > 0.01)
+            kinds = [(EVERY, False)] * every + ([(RED, True)] if biweek else [])
+            for week_pref, flexible in kinds:
+                task = _Task(spec, week_pref, flexible)
+                ref_tasks[-1].append(len(self.tasks))
+                self.tasks.append(task)
+
+        self._prepare_rooms()
+        for task in self.tasks:
+            self._bind(task, teacher_unavail, group_unavail)
+
+        self.base = _Busy(len(self.teacher_idx), len(self.group_idx), len(self.rooms), self.n_slots)
+        self.pinned_slot_ids: list[int] = []
+        for p in initial:
+            self._place_initial(p, ref_tasks, slot_local)
+
+        self._late = LATE_PER_IDX * np.arange(self.n_slots)
+
+    # ── Подготовка ────────────────────────────────────────────────────────
+
+    def _prepare_rooms(self) -> None:
+        if not self.tasks or not self.rooms:
+            for task in self.tasks:
+                task.rooms = np.zeros(0, dtype=np.intp)
+                task.room_score = np.zeros(0)
+            return
+
+        # Совместимость с аудиторией зависит только от (студенты, тип занятия,
+        # предпочтительный тип аудитории) — считаем по уникальным профилям.
+        profiles = {}
+        for task in self.tasks:
+            profiles.setdefault((task.students, task.ltype, task.pref_room), len(profiles))
+        keys = np.array(list(profiles), dtype=float).reshape(-1, 3)
+
+        capacity = np.array([max(1, r.get("capacity", 30)) for r in self.rooms])
+        rtype = np.array([_code(ROOM_TYPES, r.get("room_type", "PRACTICE"), ROOM_UNKNOWN) for r in self.rooms])
+        students = keys[:, 0:1]
+        ltype = keys[:, 1:2].astype(int)
+        pref = keys[:, 2:3].astype(int)
+
+        lecture_room = np.isin(rtype, (ROOM_TYPES.index("LECTURE"), ROOM_TYPES.index("SPORT")))[None, :]
+        lab_room = (rtype == ROOM_TYPES.index("LAB"))[None, :]
+        is_lecture = ltype == LESSON_TYPES.index("LECTURE")
+        is_lab = ltype == LESSON_TYPES.index("LAB")
+        has_pref = pref != ROOM_UNKNOWN
+        pref_match = pref == rtype[None, :]
+
+        ratio = students / capacity[None, :]
+        valid = ratio <= OVERFLOW_LIMITS.get(self.overflow_mode, 1.50)
+        score = np.where(ratio > 1.0, OVERFLOW_FACTOR * (ratio - 1.0), np.where(ratio < 0.30, TINY_ROOM, 0.0))
+
+        if self.strict_room_types:
+            valid &= np.where(is_lecture, lecture_room, np.where(is_lab, lab_room, ~has_pref | pref_match))
+        else:
+            score = score + np.where(is_lecture & ~lecture_room, WRONG_LECTURE, 0.0)
+            score = score + np.where(is_lab & ~lab_room, WRONG_LAB, 0.0)
+            score = score + np.where(has_pref & ~pref_match, WRONG_PREF, 0.0)
+
+        rooms = [np.flatnonzero(row) for row in valid]
+        room_scores = [score[i, r] for i, r in enumerate(rooms)]
+        for task in self.tasks:
+            i = profiles[(task.students, task.ltype, task.pref_room)]
+            task.rooms, task.room_score = rooms[i], room_scores[i]
+
+    def _bind(self, task: _Task, teacher_unavail, group_unavail) -> None:
+        task.teacher = self.teacher_idx.get(task.teacher_id, -1)
+        task.groups = [self.group_idx[g] for g in task.group_ids if g in self.group_idx]
+        unavail = np.zeros((DAYS, self.n_slots), dtype=bool)
+        if task.teacher >= 0:
+            unavail |= teacher_unavail[task.teacher]
+        if task.groups:
+            unavail |= group_unavail[task.groups].any(axis=0)
+        task.unavail = unavail
+
+    def _place_initial(self, p: dict, ref_tasks: list, slot_local: dict) -> None:
+        s = slot_local.get(p.get("time_slot_id"))
+        day = p.get("day_of_week", -1)
+        if s is None or not 0 <= day < DAYS:
+            return
+        room = self.room_idx.get(p.get("classroom_id"), -1)
+        wt = _code(WEEK_TYPES, p.get("week_type", "EVERY"), EVERY)
+        ref = p.get("task_ref", -1)
+
+        if 0 <= ref < len(ref_tasks):
+            for ti in ref_tasks[ref]:
+                task = self.tasks[ti]
+                if task.anchor is None and task.flexible == (wt != EVERY):
+                    task.anchor = (day, s, room, wt)
+                    for gid, sid in zip(p["group_ids"], p["slot_ids"]):
+                        if gid in task.group_ids:
+                            task.source_slot_ids[task.group_ids.index(gid)] = sid
+                    return
+
+        # Лишнее занятие остаётся на месте как фиксированная занятость.
+        fixed = _Task.__new__(_Task)
+        fixed.teacher = self.teacher_idx.get(p.get("teacher_id", -1), -1)
+        fixed.groups = [self.group_idx[g] for g in p["group_ids"] if g in self.group_idx]
+        self.base.apply(fixed, (day, s, room, wt), True)
+        self.pinned_slot_ids.extend(sid for sid in p["slot_ids"] if sid > 0)
+
+    # ── Оценка ────────────────────────────────────────────────────────────
+
+    def _time_grid(self, busy: _Busy, task: _Task, wt: int):
+        """Свободные (день, пара) и часть оценки, не зависящая от аудитории."""
+        bits = WT_BITS[wt]
+        free = ~task.unavail
+        grid = np.broadcast_to(self._late, (DAYS, self.n_slots)).copy()
+
+        if task.teacher >= 0:
+            free &= ~busy.teacher[task.teacher][..., bits].any(axis=-1)
+            cnt = busy.teacher_day[task.teacher]
+            grid += np.where(
+                cnt >= MAX_TEACHER_PER_DAY,
+                TEACHER_OVERLOAD + TEACHER_LOAD_PER * (cnt - MAX_TEACHER_PER_DAY + 1),
+                0.0,
+            )[:, None]
+
+        if task.groups:
+            occ = busy.group[task.groups][..., bits].any(axis=-1)
+            free &= ~occ.any(axis=0)
+            cnt = busy.group_day[task.groups]
+            grid += np.where(cnt == 0, SPREAD_BONUS, np.where(cnt >= MAX_GROUP_PER_DAY, CROWD_PENALTY, 0.0)).sum(axis=0)[:, None]
+            if self.avoid_gaps:
+                adjacent = np.zeros_like(occ)
+                adjacent[..., 1:] |= occ[..., :-1]
+                adjacent[..., :-1] |= occ[..., 1:]
+                empty = ~occ.any(axis=-1, keepdims=True)
+                grid += np.where(adjacent, ADJACENT_BONUS, np.where(empty, EMPTY_DAY_BONUS, GAP_PENALTY)).sum(axis=0)
+
+        return free, grid
+
+    def _move_cost(self, task: _Task, wt: int) -> np.ndarray:
+        cost = np.full((len(task.rooms), DAYS, self.n_slots), self.move_penalty)
+        day, slot, room, anchor_wt = task.anchor
+        if wt == anchor_wt:
+            cost[:, day, slot] = np.where(task.rooms == room, 0.0, self.move_penalty * ROOM_ONLY_SHARE)
+        return cost
+
+    def _candidates(self, busy: _Busy, task: _Task, wt: int) -> np.ndarray:
+        """Оценки всех (аудитория, день, пара); -inf там, где занятие не встаёт."""
+        free, grid = self._time_grid(busy, task, wt)
+        room_free = ~busy.room[task.rooms][..., WT_BITS[wt]].any(axis=-1)
+        scores = task.room_score[:, None, None] + grid[None, :, :]
+        if task.anchor is not None:
+            scores = scores + self._move_cost(task, wt)
+        return np.where(room_free & free[None, :, :], scores, -np.inf)
+
+    def _score_at(self, busy: _Busy, task: _Task, place: tuple) -> float:
+        day, slot, room, wt = place
+        _, grid = self._time_grid(busy, task, wt)
+        k = int(np.searchsorted(task.rooms, room))
+        score = float(task.room_score[k] + grid[day, slot])
+        if task.anchor is not None:
+            a_day, a_slot, a_room, a_wt = task.anchor
+            if (day, slot, wt) != (a_day, a_slot, a_wt):
+                score += self.move_penalty
+            elif room != a_room:
+                score += self.move_penalty * ROOM_ONLY_SHARE
+        return score
+
+    def _best(self, busy: _Busy, task: _Task, rng):
+        self.moves += 1
+        best_score, best = -np.inf, None
+        if not len(task.rooms) or not self.n_slots:
+            return best_score, best
+        for wt in task.week_options:
+            scores = self._candidates(busy, task, wt)
+            top = scores.max()
+            if top == -np.inf or top < best_score:
+                continue
+            flat = np.flatnonzero(scores == top)
+            k, day, slot = np.unravel_index(rng.choice(flat), scores.shape)
+            if top > best_score or rng.random() < 0.5:
+                best_score, best = float(top), (int(day), int(slot), int(task.rooms[k]), wt)
+        return best_score, best
+
+    def _anchor_valid(self, busy: _Busy, task: _Task) -> bool:
+        if task.anchor is None or task.anchor[2] < 0 or task.anchor[2] not in task.rooms:
+            return False
+        day, slot, room, wt = task.anchor
+        free, _ = self._time_grid(busy, task, wt)
+        return bool(free[day, slot] and not busy.room[room, day, slot, WT_BITS[wt]].any())
+
+    def full_score(self, sol: list) -> float:
+        busy = self.base.copy()
+        score = 0.0
+        for task, place in zip(self.tasks, sol):
+            if place is None:
+                score += UNPLACED
+                continue
+            score += self._score_at(busy, task, place)
+            busy.apply(task, place, True)
+        return score
+
+    # ── Поиск ─────────────────────────────────────────────────────────────
+
+    def _anchor_seed(self, busy: _Busy) -> list:
+        sol = [None] * len(self.tasks)
+        for i, task in enumerate(self.tasks):
+            if self._anchor_valid(busy, task):
+                sol[i] = task.anchor
+                busy.apply(task, task.anchor, True)
+        return sol
+
+    def _greedy(self, busy: _Busy, sol: list, rng) -> None:
+        order = [i for i in rng.permutation(len(self.tasks)) if sol[i] is None]
+        order.sort(key=lambda i: (not self.tasks[i].is_stream, -self.tasks[i].students))
+        for i in order:
+            if self._interrupted():
+                return
+            _, place = self._best(busy, self.tasks[i], rng)
+            if place is not None:
+                sol[i] = place
+                busy.apply(self.tasks[i], place, True)
+
+    def _improve(self, busy: _Busy, sol: list, rng) -> None:
+        for _ in range(MAX_PASSES):
+            gained = 0.0
+            for i in rng.permutation(len(self.tasks)):
+                if self._interrupted():
+                    return
+                task, place = self.tasks[i], sol[i]
+                current = UNPLACED
+                if place is not None:
+                    busy.apply(task, place, False)
+                    current = self._score_at(busy, task, place)
+                score, best = self._best(busy, task, rng)
+                if best is not None and score > current + 1e-9:
+                    sol[i] = best
+                    busy.apply(task, best, True)
+                    gained += score - current
+                elif place is not None:
+                    busy.apply(task, place, True)
+            if gained <= 0.0:
+                return
+
+    def _interrupted(self) -> bool:
+        if self._stopped:
+            return True
+        now = time.monotonic()
+        if now > self._deadline:
+            self._stopped = self._timed_out = True
+        elif self._should_stop is not None and now - self._last_poll >= STOP_POLL_SECONDS:
+            self._last_poll = now
+            self._stopped = bool(self._should_stop())
+        return self._stopped
+
+    def solve(self, progress_callback=None, should_stop=None, seed: int = 42) -> dict:
+        started = time.monotonic()
+        self._deadline = started + self.max_seconds
+        self._should_stop = should_stop
+        self._last_poll = started
+        self._stopped = self._timed_out = False
+        self.moves = 0
+
+        focus = []
+        if self.warm_start:
+            seed_sol = self._anchor_seed(self.base.copy())
+            focus = [i for i, p in enumerate(seed_sol) if p is None]
+
+        best_sol, best_score = [None] * len(self.tasks), -np.inf
+        for restart in range(self.restarts):
+            rng = np.random.default_rng(seed + restart * 1337)
+            busy = self.base.copy()
+            sol = self._anchor_seed(busy) if self.warm_start else [None] * len(self.tasks)
+            self._greedy(busy, sol, rng)
+            self._improve(busy, sol, rng)
+
+            score = self.full_score(sol)
+            if score > best_score:
+                best_sol, best_score = sol, score
+            if progress_callback:
+                progress_callback(
+                    stopping=self._stopped and not self._timed_out,
+                    restart=restart + 1,
+                    restarts=self.restarts,
+                    best_score=best_score,
+                    unassigned=sum(p is None for p in best_sol),
+                )
+            if self._stopped:
+                break
+
+        return self._output(best_sol, best_score, focus, started)
+
+    def _output(self, sol: list, score: float, focus: list, started: float) -> dict:
+        schedule, unassigned = [], []
+        for task, place in zip(self.tasks, sol):
+            if place is None:
+                unassigned.append(
+                    f"{task.name} ({LESSON_TYPES[task.ltype]} / {WEEK_TYPES[task.week_pref]})"
+                )
+                continue
+            day, slot, room, wt = place
+            ts, rm = self.slots[slot], self.rooms[room]
+            for k, gid in enumerate(task.group_ids):
+                schedule.append({
+                    "group_id": gid,
+                    "subject_id": task.subject_id,
+                    "subject_name": task.name,
+                    "teacher_id": task.teacher_id,
+                    "day_of_week": day,
+                    "time_slot_id": ts["id"],
+                    "start_time": ts.get("start_time", "08:00"),
+                    "end_time": ts.get("end_time", "08:50"),
+                    "classroom_id": rm["id"],
+                    "room_number": rm.get("number", "?"),
+                    "lesson_type": LESSON_TYPES[task.ltype],
+                    "week_type": WEEK_TYPES[wt],
+                    "is_stream": task.is_stream,
+                    "stream_tag": task.stream_tag,
+                    "source_slot_id": task.source_slot_ids[k],
+                    "is_active": True,
+                })
+
+        placed = sum(p is not None for p in sol)
+        out = {
+            "success": True,
+            "engine": "python",
+            "score": score if np.isfinite(score) else UNPLACED * len(self.tasks),
+            "placed_count": placed,
+            "unplaced_count": len(self.tasks) - placed,
+            "total_tasks": len(self.tasks),
+            "elapsed_ms": (time.monotonic() - started) * 1000,
+            "moves": self.moves,
+            "stopped": self._stopped and not self._timed_out,
+            "schedule": schedule,
+            "unassigned_details": unassigned,
+        }
+        if self.warm_start:
+            out["pinned_slot_ids"] = self.pinned_slot_ids
+            out["invalidated_count"] = len(focus)
+            out["moved_count"] = sum(
+                1 for task, p in zip(self.tasks, sol)
+                if task.anchor is not None and p is not None and p != task.anchor
+            )
+        return out
+
+
+def solve(payload: dict, progress_callback=None, should_stop=None) -> dict:
+    return FallbackSolver(payload).solve(progress_callback, should_stop)
+
+
+if __name__ == "__main__":
+    # Тот же интерфейс, что у timetable_engine: JSON-payload из файла или stdin, результат в stdout,
+    # строки прогресса [restart …] в stderr, досрочная остановка по stop_file.
+    import json
+    import os
+    import sys
+
+    with (open(sys.argv[1], encoding="utf-8") if len(sys.argv) > 1 else sys.stdin) as fh:
+        payload = json.load(fh)
+    solver = FallbackSolver(payload)
+    total = len(solver.tasks)
+
+    def report(restart, restarts, best_score, unassigned, **_):
+        print(
+            f"[restart {restart}/{restarts} score={best_score:.1f} placed={total - unassigned}/{total}]",
+            file=sys.stderr, flush=True,
+        )
+
+    stop_file = payload.get("stop_file")
+    result = solver.solve(report, (lambda: os.path.exists(stop_file)) if stop_file else None)
+    json.dump(result, sys.stdout)
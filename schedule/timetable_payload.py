@@ -0,0 +1,189 @@
+"""
+Бинарный колоночный формат входа движка расписания (TTBP, версия 1).
+
+Кодирует тот же словарь, что строит TimetableBridge.build_payload, поэтому
+JSON остаётся полноценным отладочным форматом. Раскладка зеркалит
+parseBinary в timetable_engine.cpp: все числа little-endian, массивы
+записей идут столбцами, строки вынесены в общую таблицу, недоступность
+преподавателей и групп упакована в битовые маски по сетке день × пара.
+"""
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+
+MAGIC = b"TTBP"
+VERSION = 1
+FORMAT_NAME = "ttbp1"
+
+NO_STRING = 0xFFFFFFFF
+DAYS = 6
+
+LESSON_TYPES = {"LECTURE": 0, "PRACTICE": 1, "LAB": 2, "SRSP": 3}
+ROOM_TYPES = {
+    "LECTURE": 0, "PRACTICE": 1, "COMPUTER": 2, "LAB": 3,
+    "LINGUISTIC": 4, "SPORT": 5,
+}
+ROOM_TYPE_UNKNOWN = 6
+WEEK_TYPES = {"EVERY": 0, "RED": 1, "BLUE": 2}
+
+# Значение по умолчанию совпадает с SC::MOVE_SLOT движка.
+MOVE_PENALTY = -120.0
+
+
+class _Writer:
+    def __init__(self):
+        self.parts: list[bytes] = []
+        self.strings: dict[str, int] = {}
+
+    def pack(self, fmt: str, *values) -> None:
+        self.parts.append(struct.pack("<" + fmt, *values))
+
+    def column(self, typecode: str, values) -> None:
+        arr = array(typecode, values)
+        if sys.byteorder == "big":
+            arr.byteswap()
+        self.parts.append(arr.tobytes())
+
+    def string(self, value) -> int:
+        if value is None:
+            return NO_STRING
+        value = str(value)
+        idx = self.strings.get(value)
+        if idx is None:
+            idx = self.strings[value] = len(self.strings)
+        return idx
+
+
+def _bitsets(owners: list[int], cells: list[tuple], slot_index: dict, n_slots: int):
+    stride = (DAYS * n_slots + 7) // 8
+    buf = bytearray(stride * len(owners))
+    row = {owner: i for i, owner in enumerate(owners)}
+    for owner, day, ts_id in cells:
+        i = row.get(owner)
+        s = slot_index.get(ts_id)
+        if i is None or s is None or not 0 <= day < DAYS:
+            continue
+        bit = day * n_slots + s
+        buf[i * stride + bit // 8] |= 1 << (bit % 8)
+    return stride, bytes(buf)
+
+
+def _csr(rows: list[list[int]]) -> tuple[list[int], list[int]]:
+    offsets = [0]
+    flat: list[int] = []
+    for row in rows:
+        flat.extend(row)
+        offsets.append(len(flat))
+    return offsets, flat
+
+
+def encode_binary(payload: dict) -> bytes:
+    """Упаковывает payload движка в формат TTBP."""
+    w = _Writer()
+    slots = payload["time_slots"]
+    rooms = payload["rooms"]
+    groups = payload["groups"]
+    tasks = payload["tasks"]
+    warm = bool(payload.get("warm_start"))
+    initial = (payload.get("initial_placements") or []) if warm else []
+
+    # Строки регистрируются до записи тела, чтобы таблица шла перед столбцами.
+    stop_idx = w.string(payload.get("stop_file") or None)
+    slot_starts = [w.string(s.get("start_time", "08:00")) for s in slots]
+    slot_ends = [w.string(s.get("end_time", "08:50")) for s in slots]
+    room_numbers = [w.string(r.get("number", "?")) for r in rooms]
+    task_names = [w.string(t.get("subject_name", "")) for t in tasks]
+
+    w.parts.append(MAGIC)
+    w.pack("HH", VERSION, 0)
+    w.pack(
+        "ddddiiiiBBBB",
+        float(payload.get("sa_t0", 1200.0)),
+        float(payload.get("sa_cooling", 0.99985)),
+        float(payload.get("sa_reheat", 1.5)),
+        float(payload.get("move_penalty", MOVE_PENALTY)),
+        int(payload.get("sa_restarts", 6)),
+        int(payload.get("sa_steps", 400000)),
+        int(payload.get("max_seconds", 90)),
+        int(payload.get("overflow_mode", 1)),
+        bool(payload.get("strict_room_types", False)),
+        bool(payload.get("avoid_gaps", True)),
+        warm,
+        0,
+    )
+
+    w.pack("I", len(w.strings))
+    for value in w.strings:
+        raw = value.encode("utf-8")
+        w.pack("I", len(raw))
+        w.parts.append(raw)
+    w.pack("I", stop_idx)
+
+    w.pack("I", len(slots))
+    w.column("i", [s["id"] for s in slots])
+    w.column("i", [s.get("number", i + 1) for i, s in enumerate(slots)])
+    w.column("I", slot_starts)
+    w.column("I", slot_ends)
+
+    w.pack("I", len(rooms))
+    w.column("i", [r["id"] for r in rooms])
+    w.column("i", [r.get("capacity", 30) for r in rooms])
+    w.column("I", room_numbers)
+    w.column("B", [ROOM_TYPES.get(r.get("room_type", "PRACTICE"), ROOM_TYPE_UNKNOWN) for r in rooms])
+
+    group_ids = [g["id"] for g in groups]
+    w.pack("I", len(group_ids))
+    w.column("i", group_ids)
+
+    w.pack("I", len(tasks))
+    w.column("i", [t["subject_id"] for t in tasks])
+    w.column("I", task_names)
+    w.column("i", [t.get("teacher_id", -1) for t in tasks])
+    w.column("i", [t.get("stream_tag", -1) for t in tasks])
+    w.column("i", [t.get("students", 25) for t in tasks])
+    w.column("d", [float(t.get("weekly_slots", 1.0)) for t in tasks])
+    w.column("B", [LESSON_TYPES.get(t.get("lesson_type", "LECTURE"), 0) for t in tasks])
+    w.column("B", [bool(t.get("is_stream", False)) for t in tasks])
+    w.column("B", [ROOM_TYPES.get(t.get("preferred_room_type") or "", ROOM_TYPE_UNKNOWN) for t in tasks])
+    offsets, flat = _csr([t["group_ids"] for t in tasks])
+    w.column("I", offsets)
+    w.column("i", flat)
+
+    slot_index = {s["id"]: i for i, s in enumerate(slots)}
+    teacher_cells = [
+        (u.get("teacher_id", -1), u.get("day_of_week", -1), u.get("time_slot_id", -1))
+        for u in payload.get("teacher_unavailable") or []
+    ]
+    teacher_ids = sorted({c[0] for c in teacher_cells if c[0] >= 0})
+    stride, bits = _bitsets(teacher_ids, teacher_cells, slot_index, len(slots))
+    w.pack("I", len(teacher_ids))
+    w.column("i", teacher_ids)
+    w.pack("I", stride)
+    w.parts.append(bits)
+
+    group_cells = [
+        (u.get("group_id", -1), u.get("day_of_week", -1), u.get("time_slot_id", -1))
+        for u in payload.get("group_unavailable") or []
+    ]
+    stride, bits = _bitsets(group_ids, group_cells, slot_index, len(slots))
+    w.pack("I", stride)
+    w.parts.append(bits)
+
+    w.pack("I", len(initial))
+    w.column("i", [p.get("task_ref", -1) for p in initial])
+    w.column("i", [p.get("subject_id") or -1 for p in initial])
+    w.column("i", [p.get("teacher_id", -1) for p in initial])
+    w.column("i", [p.get("time_slot_id", -1) for p in initial])
+    w.column("i", [p.get("classroom_id") or -1 for p in initial])
+    w.column("B", [p["day_of_week"] if 0 <= p.get("day_of_week", -1) < DAYS else 0xFF for p in initial])
+    w.column("B", [LESSON_TYPES.get(p.get("lesson_type", "LECTURE"), 0) for p in initial])
+    w.column("B", [WEEK_TYPES.get(p.get("week_type", "EVERY"), 0) for p in initial])
+    pairs = [list(zip(p["group_ids"], p["slot_ids"])) for p in initial]
+    offsets, flat_groups = _csr([[g for g, _ in row] for row in pairs])
+    w.column("I", offsets)
+    w.column("i", flat_groups)
+    w.column("i", [s for row in pairs for s in (sid for _, sid in row)])
+
+    return b"".join(w.parts)
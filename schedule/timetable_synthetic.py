@@ -0,0 +1,166 @@
+"""
+Синтетические задачи для движка расписания.
+
+Генерирует payload в формате TimetableBridge.build_payload без обращения к БД:
+потоки лекций на курс, практики и лабораторные по группам, аудиторный фонд
+разных типов и недоступность части преподавателей. Один и тот же seed всегда
+даёт одну и ту же задачу, поэтому результаты прогонов сравнимы между собой.
+"""
+from __future__ import annotations
+
+import random
+
+GROUPS_PER_COURSE = 5
+SUBJECTS_PER_COURSE = 6
+SLOTS_PER_DAY = 6
+
+
+def generate_payload(n_groups: int, seed: int = 1, **params) -> dict:
+    rng = random.Random(seed)
+
+    slots = [
+        {
+            "id": i + 1,
+            "index": i,
+            "number": i + 1,
+            "start_time": f"{8 + i * 2:02d}:00",
+            "end_time": f"{9 + i * 2:02d}:40",
+        }
+        for i in range(SLOTS_PER_DAY)
+    ]
+
+    groups = [
+        {"id": 1000 + i, "name": f"G-{i + 1}", "student_count": rng.randint(15, 30)}
+        for i in range(n_groups)
+    ]
+    courses = [groups[i:i + GROUPS_PER_COURSE] for i in range(0, n_groups, GROUPS_PER_COURSE)]
+
+    n_teachers = max(3, n_groups * 4 // 5)
+    teachers = [{"id": 1 + i} for i in range(n_teachers)]
+
+    n_rooms = max(6, n_groups * 3 // 5)
+    room_kinds = (
+        [("LECTURE", (120, 150, 200))] * max(1, n_rooms * 15 // 100)
+        + [("LAB", (15, 20, 25))] * max(1, n_rooms * 15 // 100)
+        + [("COMPUTER", (20, 25, 30))] * max(1, n_rooms // 10)
+    )
+    room_kinds += [("PRACTICE", (25, 30, 35))] * (n_rooms - len(room_kinds))
+    rooms = [
+        {"id": 100 + i, "number": str(100 + i), "capacity": rng.choice(capacities), "room_type": room_type}
+        for i, (room_type, capacities) in enumerate(room_kinds)
+    ]
+
+    tasks = []
+    subject_id = 1
+    for course in courses:
+        course_students = sum(g["student_count"] for g in course)
+        for s in range(SUBJECTS_PER_COURSE):
+            teacher_id = rng.randint(1, n_teachers)
+            name = f"Subject {subject_id}"
+            lecture = rng.choice([1.0, 1.0, 1.5])
+            practice = rng.choice([1.0, 1.5, 2.0])
+            lab_type = "COMPUTER" if s % 3 == 0 else ""
+            has_lab = s % 2 == 0
+            if len(course) > 1:
+                tasks.append({
+                    "subject_id": subject_id,
+                    "subject_name": name,
+                    "teacher_id": teacher_id,
+                    "group_ids": [g["id"] for g in course],
+                    "lesson_type": "LECTURE",
+                    "is_stream": True,
+                    "stream_tag": subject_id,
+                    "students": course_students,
+                    "preferred_room_type": "",
+                    "weekly_slots": lecture,
+                })
+            for g in course:
+                group_teacher = rng.randint(1, n_teachers)
+                rows = [("PRACTICE", practice)]
+                if len(course) == 1:
+                    rows.append(("LECTURE", lecture))
+                if has_lab:
+                    rows.append(("LAB", 0.5))
+                for lesson_type, weekly in rows:
+                    tasks.append({
+                        "subject_id": subject_id,
+                        "subject_name": name,
+                        "teacher_id": teacher_id if lesson_type == "LECTURE" else group_teacher,
+                        "group_ids": [g["id"]],
+                        "lesson_type": lesson_type,
+                        "is_stream": False,
+                        "stream_tag": -1,
+                        "students": g["student_count"],
+                        "preferred_room_type": lab_type if lesson_type == "LAB" else "",
+                        "weekly_slots": weekly,
+                    })
+            subject_id += 1
+
+    teacher_unavailable = []
+    for t in teachers:
+        if rng.random() < 0.2:
+            day = rng.randrange(6)
+            for slot in slots:
+                teacher_unavailable.append(
+                    {"teacher_id": t["id"], "day_of_week": day, "time_slot_id": slot["id"]}
+                )
+
+    # Военная кафедра: у части групп один день занят целиком.
+    group_unavailable = []
+    for g in groups:
+        if rng.random() < 0.1:
+            day = rng.randrange(6)
+            for slot in slots:
+                for week_type in ("RED", "BLUE"):
+                    group_unavailable.append({
+                        "group_id": g["id"], "day_of_week": day,
+                        "time_slot_id": slot["id"], "week_type": week_type,
+                    })
+
+    payload = {
+        "time_slots": slots,
+        "rooms": rooms,
+        "groups": groups,
+        "tasks": tasks,
+        "teachers": teachers,
+        "teacher_unavailable": teacher_unavailable,
+        "group_unavailable": group_unavailable,
+        "sa_t0": 1200.0,
+        "sa_cooling": 0.99985,
+        "sa_reheat": 1.5,
+        "sa_restarts": 6,
+        "sa_steps": 400000,
+        "max_seconds": 90,
+        "overflow_mode": 1,
+        "strict_room_types": False,
+        "avoid_gaps": True,
+    }
+    payload.update(params)
+    return payload
+
+
+def find_conflicts(result: dict) -> list[str]:
+    """Пересечения групп, преподавателей и аудиторий в результате движка."""
+    lessons: dict[tuple, list] = {}
+    for i, item in enumerate(result.get("schedule", [])):
+        lesson = ("stream", item["stream_tag"], item["lesson_type"]) if item.get("is_stream") else ("single", i)
+        key = lesson + (
+            item["teacher_id"], item["classroom_id"],
+            item["day_of_week"], item["time_slot_id"], item["week_type"],
+        )
+        lessons.setdefault(key, []).append(item["group_id"])
+
+    busy: dict[tuple, int] = {}
+    conflicts = []
+    for key, group_ids in lessons.items():
+        teacher_id, room_id, day, ts_id, week_type = key[-5:]
+        owners = [("room", room_id)] + [("group", g) for g in group_ids]
+        if teacher_id is not None and teacher_id >= 0:
+            owners.append(("teacher", teacher_id))
+        for wt in (("RED", "BLUE") if week_type == "EVERY" else (week_type,)):
+            for kind, owner in owners:
+                slot = (kind, owner, day, ts_id, wt)
+                busy[slot] = busy.get(slot, 0) + 1
+                if busy[slot] == 2:
+                    conflicts.append(f"{kind} {owner}: day={day} slot={ts_id} week={wt}")
+    return conflicts
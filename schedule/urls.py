@@ -8,12 +8,16 @@ urlpatterns = [
     path('', views.schedule_view, name='view'),
     path('today/', views.today_classes, name='today'),
     path('export/', views.export_schedule, name='export'),
+    path('export/batch/', views.export_schedule_batch, name='export_batch'),
     path('api/check-conflicts/', views.check_schedule_conflicts, name='check_conflicts'),
+    path('api/check-conflicts/batch/', views.check_schedule_conflicts_batch, name='check_conflicts_batch'),
 
     path('calendar/', views.schedule_calendar, name='calendar'),
     path('api/calendar-events/', views.schedule_calendar_events, name='calendar_events_api'),
     path('api/calendar-move/', views.calendar_move_slot, name='calendar_move'),
     path('api/calendar-sidebar/', views.calendar_sidebar_api, name='calendar_sidebar_api'),
+    path('api/ical-link/', views.schedule_ical_link, name='ical_link'),
+    path('ical/<str:token>/schedule.ics', views.schedule_ical_feed, name='ical_feed'),
 
     path('buildings/', views.manage_buildings, name='manage_buildings'),
     path('buildings/add/', views.add_building, name='add_building'),
@@ -23,6 +27,7 @@ urlpatterns = [
     path('constructor/', views.schedule_constructor, name='constructor'),
     path('constructor/create/', views.create_schedule_slot, name='create_slot'),
     path('constructor/update-room/<int:slot_id>/', views.update_schedule_room, name='update_room'),
+    path('api/suggest-rooms/', views.suggest_rooms, name='suggest_rooms'),
     path('constructor/delete/<int:slot_id>/', views.delete_schedule_slot, name='delete_slot'),
     path('constructor/clear/', views.clear_schedule, name='clear_schedule'),
     path('constructor/clear-military/', views.clear_military_day, name='clear_military_day'),
@@ -41,6 +46,7 @@ urlpatterns = [
     path('classrooms/<int:classroom_id>/edit/', views.edit_classroom, name='edit_classroom'),
     path('classrooms/<int:classroom_id>/delete/', views.delete_classroom, name='delete_classroom'),
     path('classrooms/occupancy/', views.classroom_occupancy, name='classroom_occupancy'),
+    path('api/classrooms/utilization/', views.classroom_utilization_api, name='classroom_utilization_api'),
 
     path('groups/', views.group_list, name='group_list'),
 
@@ -62,7 +68,10 @@ urlpatterns = [
     path('plans/<int:plan_id>/import/<int:semester_num>/', views.import_rup_excel, name='import_rup_excel'),
     path('api/ai-assign-teachers/', views.api_ai_assign_teachers, name='api_ai_assign_teachers'),
     path('constructor/auto/', views.auto_schedule_config, name='auto_schedule_config'),
+    path('api/auto-schedule/status/<uuid:task_id>/', views.timetable_task_status, name='timetable_task_status'),
+    path('api/auto-schedule/cancel/<uuid:task_id>/', views.timetable_task_cancel, name='timetable_task_cancel'),
     path('teachers/availability/', views.manage_teacher_availability, name='manage_teacher_availability'),
+    path('api/teachers/availability/batch/', views.api_teacher_availability_batch, name='api_teacher_availability_batch'),
     path('api/credit-type/create/', views.api_create_credit_type, name='api_create_credit_type'),
     path('plans/discipline/<int:discipline_id>/edit/', views.edit_plan_discipline, name='edit_plan_discipline'),
     path('credit-templates/', views.manage_credit_templates, name='manage_credit_templates'),
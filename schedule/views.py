@@ -1,12 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.db.models import Q
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
 from django.db import transaction
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_cache_control
 from django.utils import translation
 from datetime import datetime, timedelta, date
+import hashlib
+import itertools
 import json
 import uuid
 import re
@@ -14,8 +19,7 @@ import tempfile
 import os
 import glob
 import time
-from io import BytesIO 
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from django.urls import reverse
 import logging
 logger = logging.getLogger(__name__)
@@ -26,29 +30,25 @@ logger = logging.getLogger('schedule')
 from django.template.loader import render_to_string
 from accounts.models import Faculty
 
-try:
-    from docx import Document
-    from docx.shared import Pt, Cm
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
-    from docx.oxml import OxmlElement
-    from docx.oxml.ns import qn
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
 from schedule.models import ROOM_TYPES
 from lms.models import Assignment
 from schedule.models import RupParseTask
 from django import forms
-from .models import Subject, CreditType, CreditTemplate, ScheduleSlot, Semester, Classroom, TimeSlot, TeacherUnavailableSlot, AcademicPlan, PlanDiscipline, SubjectTemplate, SubjectMaterial, Building, Institute, RupParseTask
+from .models import Subject, CreditType, CreditTemplate, ScheduleSlot, Semester, Classroom, TimeSlot, AcademicPlan, PlanDiscipline, SubjectTemplate, SubjectMaterial, Building, Institute, RupParseTask
 from .forms import SubjectForm, RupImportForm, ClassroomForm, BulkClassroomForm, TimeSlotForm, MaterialUploadForm, ScheduleImportForm, AcademicPlanForm, PlanDisciplineForm, SubjectTemplateForm, BuildingForm, CreditTemplateForm
 from .services import ScheduleImporter, RupImporter
-from accounts.models import Group, Student, Teacher, Director, ProRector, Department, Faculty
+from accounts.models import Group, Student, Teacher, Department, Faculty
 import math
+import numpy as np
 from django.utils.translation import gettext as _
 from schedule.models import ROOM_TYPES
 from .services import AIAssignmentService, AlgorithmicAssignmentService 
-from .timetable_bridge import AutoScheduleEngineCpp as AutoScheduleEngine
+from .models import TimetableGenerationTask
+from .tasks import start_timetable_task, cancel_timetable_task
+from . import (
+    availability, cancellation, export_render, exports, ical, load_planner, occupancy, recurrence, room_analytics,
+    room_recommender, semesters, snapshots,
+)
 from schedule.models import ScheduleException as SchedExc
 from datetime import date as date_cls, datetime as dt_cls
 
@@ -161,7 +161,7 @@ def schedule_constructor(request):
         if not selected_group:
             request.session.pop('last_constructor_group', None)
 
-    active_semester = Semester.get_current()
+    active_semester = semesters.for_request(request)
 
     schedule_data = {}
     subjects_to_schedule = []
@@ -188,28 +188,19 @@ def schedule_constructor(request):
 
         assigned_subjects = Subject.objects.filter(groups=selected_group).select_related('teacher__user').distinct()
 
-        for subject in assigned_subjects:
-            needed = subject.get_weekly_slots_needed()
-            
-            for l_type, label, color in [('LECTURE', _('Лекция'), 'primary'), ('PRACTICE', _('Практика'), 'success'), ('LAB', _('Лабораторная'), 'info'), ('SRSP', _('СРСП'), 'warning')]:
-                needed_weekly = needed.get(l_type, 0)
-                
-                if needed_weekly > 0:
-                    type_slots = [s for s in slots if s.subject_id == subject.id and s.lesson_type == l_type]
-                    scheduled_weekly = 0
-                    
-                    for s in type_slots:
-                        scheduled_weekly += 1 if s.week_type == 'EVERY' else 0.5
-
-                    remaining_pairs = max(0, needed_weekly - scheduled_weekly)
-                    if remaining_pairs > 0:
-                        subjects_to_schedule.append({
-                            'obj': subject,
-                            'type': l_type,
-                            'label': label,
-                            'remaining': remaining_pairs,
-                            'color': color
-                        })
+        lesson_labels = {
+            'LECTURE': (_('Лекция'), 'primary'), 'PRACTICE': (_('Практика'), 'success'),
+            'LAB': (_('Лабораторная'), 'info'), 'SRSP': (_('СРСП'), 'warning'),
+        }
+        for subject, l_type, remaining_pairs in load_planner.remaining_for_group(selected_group, assigned_subjects, active_semester):
+            label, color = lesson_labels[l_type]
+            subjects_to_schedule.append({
+                'obj': subject,
+                'type': l_type,
+                'label': label,
+                'remaining': remaining_pairs,
+                'color': color
+            })
 
     time_slots = []
     if selected_group:
@@ -234,33 +225,7 @@ def schedule_constructor(request):
 
     occupied_rooms = {}
     if active_semester and time_slots:
-        all_active_slots = ScheduleSlot.objects.filter(
-            semester=active_semester, is_active=True
-        ).exclude(classroom__isnull=True).values(
-            'day_of_week', 'start_time', 'end_time', 'classroom_id', 'stream_id', 'id', 'week_type'
-        )
-
-        for s in all_active_slots:
-            d = s['day_of_week']
-            rm = s['classroom_id']
-            st_id = str(s['stream_id']) if s['stream_id'] else 'None'
-            slot_id = str(s['id'])
-            wt = s['week_type']
-
-            for ts in time_slots:
-                if s['start_time'] < ts.end_time and s['end_time'] > ts.start_time:
-                    if d not in occupied_rooms:
-                        occupied_rooms[d] = {}
-                    if ts.id not in occupied_rooms[d]:
-                        occupied_rooms[d][ts.id] = {}
-                    if rm not in occupied_rooms[d][ts.id]:
-                        occupied_rooms[d][ts.id][rm] = []
-
-                    occupied_rooms[d][ts.id][rm].append({
-                        'slot_id': slot_id,
-                        'stream_id': st_id,
-                        'week_type': wt
-                    })
+        occupied_rooms = occupancy.room_occupancy(active_semester.pk, list(time_slots))
 
     military_days = set()
     if selected_group and active_semester:
@@ -305,7 +270,7 @@ def create_schedule_slot(request):
                 group_id = data.get('group')
                 day_of_week = int(data.get('day_of_week'))
                 group = get_object_or_404(Group, id=group_id)
-                semester = Semester.get_current()
+                semester = semesters.for_request(request)
 
                 institute = None
                 try:
@@ -385,7 +350,7 @@ def create_schedule_slot(request):
         subject = get_object_or_404(Subject, id=subject_id)
         time_slot = get_object_or_404(TimeSlot, id=time_slot_id)
 
-        active_semester = Semester.get_current()
+        active_semester = semesters.for_request(request)
         if not active_semester:
             return JsonResponse({'success': False, 'error': _('Нет активного семестра')}, status=400)
 
@@ -514,6 +479,7 @@ def update_schedule_room(request, slot_id):
                         room="",
                         classroom=None
                     )
+                    Semester.bump_schedule_version(slot.semester_id)
                 else:
                     slot.room = ""
                     slot.classroom = None
@@ -582,7 +548,8 @@ def update_schedule_room(request, slot_id):
                     'num': r_num,
                     'group': other.group.name,
                     'subject': other.subject.name
-                }
+                },
+                'suggestions': _slot_room_suggestions(slot),
             }, status=400)
 
         if not force and classroom:
@@ -619,6 +586,7 @@ def update_schedule_room(request, slot_id):
                     room=room_number,
                     classroom=classroom
                 )
+                Semester.bump_schedule_version(slot.semester_id)
             else:
                 slot.room = room_number
                 slot.classroom = classroom
@@ -650,6 +618,80 @@ def update_schedule_room(request, slot_id):
         return JsonResponse({'success': False, 'error': _('Внутренняя ошибка сервера')}, status=500)
 
 
+def _group_institute_id(group):
+    try:
+        return group.specialty.department.faculty.institute_id
+    except AttributeError:
+        return None
+
+
+def _slot_room_suggestions(slot, limit=room_recommender.LIMIT):
+    """Свободные аудитории для уже стоящего занятия (с потоком — для всего потока)."""
+    if not slot.time_slot_id:
+        return []
+    if slot.stream_id:
+        siblings = list(ScheduleSlot.objects.filter(stream_id=slot.stream_id).values_list('id', 'group_id'))
+    else:
+        siblings = [(slot.id, slot.group_id)]
+    group_ids = [group_id for _slot_id, group_id in siblings]
+    return room_recommender.recommend(
+        slot.semester_id, slot.day_of_week, slot.time_slot, slot.week_type, slot.lesson_type,
+        students=room_recommender.student_count(group_ids),
+        group_ids=group_ids,
+        preferred_room_type=slot.subject.preferred_room_type or '',
+        institute_id=_group_institute_id(slot.group),
+        exclude=[slot_id for slot_id, _group_id in siblings],
+        limit=limit,
+    )
+
+
+@login_required
+def suggest_rooms(request):
+    """
+    Свободные аудитории для занятия: ?slot=<id> для стоящего занятия или
+    ?group=&subject=&time_slot=&day_of_week=&week_type=&lesson_type= для нового.
+    """
+    if not is_dean_or_admin(request.user):
+        return JsonResponse({'success': False, 'error': _('Нет прав')}, status=403)
+
+    try:
+        limit = max(1, min(20, int(request.GET.get('limit', room_recommender.LIMIT))))
+        if request.GET.get('slot'):
+            slot = get_object_or_404(
+                ScheduleSlot.objects.select_related('subject', 'time_slot', 'group__specialty__department__faculty'),
+                id=request.GET['slot']
+            )
+            return JsonResponse({'success': True, 'rooms': _slot_room_suggestions(slot, limit)})
+
+        group = get_object_or_404(
+            Group.objects.select_related('specialty__department__faculty'), id=request.GET.get('group')
+        )
+        subject = get_object_or_404(Subject, id=request.GET.get('subject'))
+        time_slot = get_object_or_404(TimeSlot, id=request.GET.get('time_slot'))
+        day_of_week = int(request.GET.get('day_of_week'))
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': _('Неверные параметры')}, status=400)
+
+    active_semester = semesters.for_request(request)
+    if not active_semester:
+        return JsonResponse({'success': False, 'error': _('Нет активного семестра')}, status=400)
+
+    group_ids = [group.id]
+    if subject.is_stream_subject:
+        stream_groups = list(subject.groups.values_list('id', flat=True))
+        if len(stream_groups) > 1:
+            group_ids = stream_groups
+
+    rooms = room_recommender.recommend(
+        active_semester.pk, day_of_week, time_slot,
+        request.GET.get('week_type', 'EVERY'), request.GET.get('lesson_type', 'LECTURE'),
+        students=room_recommender.student_count(group_ids),
+        group_ids=group_ids,
+        preferred_room_type=subject.preferred_room_type or '',
+        institute_id=_group_institute_id(group),
+        limit=limit,
+    )
+    return JsonResponse({'success': True, 'rooms': rooms})
 
 
 @login_required
@@ -663,7 +705,7 @@ def clear_schedule(request):
         group_id = data.get('group_id')
 
         group = get_object_or_404(Group, id=group_id)
-        semester = Semester.get_current()
+        semester = semesters.for_request(request)
 
         if hasattr(request.user, 'dean_profile'):
             faculty = request.user.dean_profile.faculty
@@ -729,6 +771,44 @@ def delete_schedule_slot(request, slot_id):
 
 
 
+def _group_schedule_snapshot(group, semester):
+    def build():
+        institute_id = Group.objects.filter(pk=group.pk).values_list(
+            'specialty__department__faculty__institute_id', flat=True
+        ).first()
+        time_slots = list(get_time_slots_for_shift(group.shift, institute_id).values_list('id', 'start_time', 'end_time'))
+        slots = ScheduleSlot.objects.filter(
+            group=group,
+            semester=semester,
+            time_slot_id__in=[ts[0] for ts in time_slots],
+            is_active=True
+        )
+        return {'time_slots': time_slots, 'slots': snapshots.slot_rows(slots)}
+
+    return snapshots.weekly_snapshot(semester.pk, f'group:{group.pk}', build)
+
+
+def _teacher_schedule_snapshot(teacher, semester):
+    def build():
+        slots = ScheduleSlot.objects.filter(teacher=teacher, semester=semester, is_active=True)
+        used_slot_ids = slots.values_list('time_slot_id', flat=True).distinct()
+        if used_slot_ids:
+            time_slots = TimeSlot.objects.filter(id__in=used_slot_ids).order_by('start_time')
+        else:
+            institute_id = Teacher.objects.filter(pk=teacher.pk).values_list(
+                'department__faculty__institute_id', flat=True
+            ).first()
+            time_slots = TimeSlot.objects.filter(
+                Q(institute_id=institute_id) | Q(institute__isnull=True)
+            ).order_by('shift', 'start_time')
+        return {
+            'time_slots': list(time_slots.values_list('id', 'start_time', 'end_time')),
+            'slots': snapshots.slot_rows(slots),
+        }
+
+    return snapshots.weekly_snapshot(semester.pk, f'teacher:{teacher.pk}', build)
+
+
 @login_required
 def schedule_view(request):
     user = request.user
@@ -746,7 +826,7 @@ def schedule_view(request):
             pass
 
     if not active_semester:
-        active_semester = Semester.get_current()
+        active_semester = semesters.for_request(request)
 
     groups = Group.objects.none()
     is_management = hasattr(user, 'dean_profile') or user.is_superuser or hasattr(user, 'director_profile') or hasattr(user, 'prorector_profile')
@@ -785,7 +865,7 @@ def schedule_view(request):
             if not group:
                 request.session.pop('last_schedule_group', None)
             else:
-                active_semester = Semester.get_current()
+                active_semester = semesters.for_request(request)
         elif is_teacher and request.GET.get('view') != 'groups':
             teacher = user.teacher_profile
             
@@ -801,57 +881,23 @@ def schedule_view(request):
         if group_id:
             group = get_object_or_404(Group, id=group_id, id__in=group_ids)
 
-    slots = None
+    snapshot = None
     target_key = None
     time_slots = TimeSlot.objects.none()
-    
-    if group and active_semester:
-        institute = None
-        if group.specialty and group.specialty.department.faculty:
-            institute = group.specialty.department.faculty.institute
-        time_slots = get_time_slots_for_shift(group.shift, institute)
-        valid_slot_ids = list(time_slots.values_list('id', flat=True))
 
-        slots = ScheduleSlot.objects.filter(
-            group=group,
-            semester=active_semester,
-            time_slot_id__in=valid_slot_ids,
-            is_active=True
-        ).select_related('subject', 'teacher__user', 'time_slot')
+    if group and active_semester:
+        snapshot = _group_schedule_snapshot(group, active_semester)
         target_key = group.id
 
     elif teacher and active_semester and not group:
-        used_slot_ids = ScheduleSlot.objects.filter(
-            teacher=teacher, semester=active_semester, is_active=True
-        ).values_list('time_slot_id', flat=True).distinct()
-        
-        if used_slot_ids:
-            time_slots = TimeSlot.objects.filter(id__in=used_slot_ids).order_by('start_time')
-        else:
-            institute = None
-            if teacher.department and teacher.department.faculty:
-                institute = teacher.department.faculty.institute
-            time_slots = TimeSlot.objects.filter(
-                Q(institute=institute) | Q(institute__isnull=True)
-            ).order_by('shift', 'start_time')
-
-        slots = ScheduleSlot.objects.filter(
-            teacher=teacher,
-            semester=active_semester,
-            is_active=True
-        ).select_related('subject', 'group', 'time_slot')
+        snapshot = _teacher_schedule_snapshot(teacher, active_semester)
         target_key = 'teacher'
 
-    if slots is not None:
+    if snapshot is not None:
         days =[(0, _('ДУШАНБЕ')), (1, _('СЕШАНБЕ')), (2, _('ЧОРШАНБЕ')), (3, _('ПАНҶШАНБЕ')), (4, _('ҶУМЪА')), (5, _('ШАНБЕ'))]
-        
-        schedule_data = {target_key: {}}
-        for slot in slots:
-            if slot.day_of_week not in schedule_data[target_key]:
-                schedule_data[target_key][slot.day_of_week] = {}
-            if slot.time_slot.id not in schedule_data[target_key][slot.day_of_week]:
-                schedule_data[target_key][slot.day_of_week][slot.time_slot.id] =[]
-            schedule_data[target_key][slot.day_of_week][slot.time_slot.id].append(slot)
+
+        time_slots = snapshot['time_slots']
+        schedule_data = {target_key: snapshot['cells']}
 
         context = {
             'group': group,
@@ -893,33 +939,33 @@ def today_classes(request):
             logger.exception("today_classes active_semester")
             active_semester = None
     else:
-        active_semester = Semester.get_current()
+        active_semester = semesters.for_request(request)
 
     classes = []
     if not active_semester:
         return render(request, 'schedule/today_widget.html', {'classes': classes, 'current_time': current_time, 'today': today})
 
+    snapshot = None
     if hasattr(user, 'student_profile'):
         try:
             student = user.student_profile
             if student.group:
-                classes = ScheduleSlot.objects.filter(
-                    group=student.group, semester=active_semester,
-                    day_of_week=day_of_week, is_active=True
-                ).select_related('subject', 'teacher__user').order_by('start_time')
+                snapshot = _group_schedule_snapshot(student.group, active_semester)
         except Student.DoesNotExist:
             pass
 
     elif hasattr(user, 'teacher_profile'):
         try:
-            teacher = user.teacher_profile
-            classes = ScheduleSlot.objects.filter(
-                teacher=teacher, semester=active_semester,
-                day_of_week=day_of_week, is_active=True
-            ).select_related('subject', 'group').order_by('start_time')
+            snapshot = _teacher_schedule_snapshot(user.teacher_profile, active_semester)
         except Teacher.DoesNotExist:
             pass
 
+    if snapshot is not None:
+        classes = sorted(
+            (slot for cell in snapshot['cells'].get(day_of_week, {}).values() for slot in cell),
+            key=lambda slot: slot.start_time,
+        )
+
     return render(request, 'schedule/today_widget.html', {
         'classes': classes, 'current_time': current_time, 'today': today
     })
@@ -1110,6 +1156,8 @@ def split_subject(request, subject_id):
             from journal.models import JournalEntry, StudentMatrixScore
             JournalEntry.objects.filter(subject=subject, student__group=grp).update(subject=new_subject)
             StudentMatrixScore.objects.filter(subject=subject, student__group=grp).update(subject=new_subject)
+            from journal import stats_queue
+            stats_queue.mark_students(grp.students.values_list('id', flat=True))
             
     messages.success(request, f"Предмет успешно разделен на {len(groups)} отдельных предметов!")
     return redirect('schedule:manage_subjects')
@@ -1300,7 +1348,10 @@ def group_list(request):
 
 @login_required
 def export_schedule(request):
-    if not DOCX_AVAILABLE:
+    fmt = request.GET.get('format', 'docx')
+    if fmt not in exports.FORMATS:
+        fmt = 'docx'
+    if not exports.available(fmt):
         return HttpResponse(_("Library python-docx not installed"), status=500)
 
     group_id = request.GET.get('group')
@@ -1313,335 +1364,77 @@ def export_schedule(request):
 
     lang = request.GET.get('lang', current_site_lang)
 
-    if lang not in ['ru', 'tg', 'en']:
+    if lang not in exports.LANGUAGES:
         lang = 'ru'
 
-    translation.activate(lang)
-
     try:
-        group = get_object_or_404(Group, id=group_id)
+        group = get_object_or_404(Group.objects.select_related('specialty__department__faculty__institute'), id=group_id)
         active_semester = get_active_semester_for_group(group)
 
         if not active_semester:
             return HttpResponse(_("Нет активного семестра"), status=400)
 
         logger.info(
-            "export_schedule: group=%s lang=%s semester=%s user=%s",
-            group.name, lang, active_semester, request.user.username
+            "export_schedule: group=%s lang=%s format=%s semester=%s user=%s",
+            group.name, lang, fmt, active_semester, request.user.username
         )
 
         try:
-            if group.specialty:
-                specialty_code = group.specialty.code
-                specialty_name = group.specialty.name
-                department = group.specialty.department
-                faculty = department.faculty
-                institute = faculty.institute
-            else:
-                specialty_code = "—"
-                specialty_name = _("Умумитаълимӣ (Общая)")
-                institute = Institute.objects.first()
+            data = exports.group_document(group, active_semester, lang, fmt, _group_schedule_snapshot)
         except AttributeError:
             return HttpResponse(_("Ошибка структуры: Невозможно определить институт."), status=400)
+        if data is None:
+            return HttpResponse(_("Нет активного семестра"), status=400)
 
-        director_user = None
-        director_obj = Director.objects.filter(institute=institute).first()
-        if director_obj:
-            director_user = director_obj.user
-
-        vice_user = None
-        vice_obj = ProRector.objects.filter(institute=institute, title__icontains='таълим').first()
-        if not vice_obj:
-            vice_obj = ProRector.objects.filter(institute=institute).first()
-
-        if vice_obj:
-            vice_user = vice_obj.user
-
-        director_name = director_user.get_full_name() if director_user else "__________________"
-        vice_name = vice_user.get_full_name() if vice_user else "__________________"
-        head_edu_obj = ProRector.objects.filter(
-            institute=institute,
-            title__icontains='раёсат'
-        ).exclude(
-            title__icontains='директор'
-        ).first()
-
-        head_edu_name = head_edu_obj.user.get_full_name() if head_edu_obj else "__________________"
-
-        trans = {
-            'ru': {
-                'agreed': "Согласовано:",
-                'head_edu': "Начальник учебного управления",
-                'approved': "Утверждаю:",
-                'vice_director': "Заместитель директора\nпо учебной работе",
-                'docent': "________ доцент",
-                'date_line': "«___» _________ 202__ г.",
-                'title': "Расписание уроков",
-                'subtitle': "на {sem_text} семестр {year_text} учебного года для студентов {course}-го курса {institute_name}",
-                'sem_1': "первый",
-                'sem_2': "второй",
-                'shift': "(СМЕНА {shift_num})",
-                'week': "НЕДЕЛЯ",
-                'time': "ЧАС",
-                'aud': "АУД",
-                'military': "Военная кафедра",
-                'director': "Директор",
-                'days':['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота'],
-                'students': "чел."
-            },
-            'tg': {
-                'agreed': "Мувофиқа карда шуд:",
-                'head_edu': "Сардори раёсати таълим",
-                'approved': "Тасдиқ мекунам:",
-                'vice_director': "Муовини директор\nоид ба корҳои таълимӣ",
-                'docent': "________ дотсент",
-                'date_line': "«___» _________ 202__ с.",
-                'title': "ҶАДВАЛИ ДАРСӢ",
-                'subtitle': "дар нимсолаи {sem_text} соли таҳсили {year_text} барои донишҷӯёни курси {course}-юми {institute_name}",
-                'sem_1': "якуми",
-                'sem_2': "дуюми",
-                'shift': "(БАСТИ {shift_num})",
-                'week': "РӮЗҲО",
-                'time': "СОАТ",
-                'aud': "ҲУҶРА",
-                'military': "Кафедраи ҳарбӣ",
-                'director': "Директор",
-                'days':['Душанбе', 'Сешанбе', 'Чоршанбе', 'Панҷшанбе', 'Ҷумъа', 'Шанбе'],
-                'students': "нафар"
-            },
-            'en': {
-                'agreed': "Agreed:",
-                'head_edu': "Head of Educational Department",
-                'approved': "Approved:",
-                'vice_director': "Deputy Director\nfor Academic Affairs",
-                'docent': "________ docent",
-                'date_line': "«___» _________ 202__",
-                'title': "Class Schedule",
-                'subtitle': "for the {sem_text} semester of {year_text} academic year for {course} year students of {institute_name}",
-                'sem_1': "first",
-                'sem_2': "second",
-                'shift': "(SHIFT {shift_num})",
-                'week': "DAY",
-                'time': "TIME",
-                'aud': "ROOM",
-                'military': "Military Department",
-                'director': "Director",
-                'days':['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'],
-                'students': "students"
-            }
-        }
-
-        t = trans[lang]
-
-        doc = Document()
-
-        section = doc.sections[0]
-        section.left_margin = Cm(1.0)
-        section.right_margin = Cm(1.0)
-        section.top_margin = Cm(1.0)
-        section.bottom_margin = Cm(1.0)
-
-        header_table = doc.add_table(rows=1, cols=2)
-        header_table.autofit = True
-        header_table.width = section.page_width - section.left_margin - section.right_margin
-
-        c1 = header_table.cell(0, 0)
-        p1 = c1.paragraphs[0]
-        p1.add_run(t['agreed'] + "\n").bold = True
-        p1.add_run(t['head_edu'] + "\n")
-        p1.add_run(f"{t['docent']} {head_edu_name}\n")
-        p1.add_run(t['date_line'])
-
-        c2 = header_table.cell(0, 1)
-        p2 = c2.paragraphs[0]
-        p2.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        p2.add_run(t['approved'] + "\n").bold = True
-        p2.add_run(t['vice_director'] + "\n").bold = False
-        p2.add_run(f"{t['docent']} {vice_name}\n")
-        p2.add_run(t['date_line'])
-
-        doc.add_paragraph()
-
-        title_p = doc.add_paragraph()
-        title_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = title_p.add_run(t['title'])
-        run.bold = True
-        run.font.size = Pt(16)
-        run.font.name = 'Times New Roman'
-
-        subtitle = doc.add_paragraph()
-        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        sem_text = t['sem_1'] if active_semester.number == 1 else t['sem_2']
-        year_text = active_semester.academic_year
-
-        text = t['subtitle'].format(
-            sem_text=sem_text,
-            year_text=year_text,
-            course=group.course,
-            institute_name=institute.name
-        )
-
-        run_sub = subtitle.add_run(text)
-        run_sub.font.name = 'Times New Roman'
-        run_sub.font.size = Pt(12)
-        run_sub.bold = True
-
-        shift_map = {'MORNING': '1', 'DAY': '2', 'EVENING': '3'}
-        shift_num = shift_map.get(group.shift, '1')
-        shift_p = doc.add_paragraph(t['shift'].format(shift_num=shift_num))
-        shift_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        shift_p.runs[0].bold = True
-        shift_p.runs[0].font.size = Pt(14)
-
-        table = doc.add_table(rows=1, cols=4)
-        table.style = 'Table Grid'
-        table.autofit = False
-
-        def set_col_widths(row):
-            row.cells[0].width = Cm(1.5)
-            row.cells[1].width = Cm(2.5)
-            row.cells[2].width = Cm(11.0)
-            row.cells[3].width = Cm(2.0)
-
-        set_col_widths(table.rows[0])
-
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = t['week']
-        hdr_cells[1].text = t['time']
-
-        hdr_cells[2].text = f"Группа {group.name} | {specialty_code} – «{specialty_name}» ({group.students.count()} {t['students']})"
-        hdr_cells[3].text = t['aud']
-
-        for cell in hdr_cells:
-            cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-            cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-            shading_elm = OxmlElement('w:shd')
-            shading_elm.set(qn('w:val'), 'clear')
-            shading_elm.set(qn('w:color'), 'auto')
-            shading_elm.set(qn('w:fill'), 'D9D9D9')
-            cell._tc.get_or_add_tcPr().append(shading_elm)
-
-            for run in cell.paragraphs[0].runs:
-                run.bold = True
-                run.font.size = Pt(10)
-
-        time_slots = get_time_slots_for_shift(group.shift, institute)
-
-        days = list(enumerate(t['days']))
-
-        for day_num, day_name in days:
-            is_military_day = ScheduleSlot.objects.filter(
-                group=group, semester=active_semester, day_of_week=day_num, is_military=True
-            ).exists()
-
-            first_row_idx = len(table.rows)
-
-            for ts in time_slots:
-                row = table.add_row()
-                set_col_widths(row)
-                row.cells[1].text = f'{ts.start_time.strftime("%H:%M")}-{ts.end_time.strftime("%H:%M")}'
-                row.cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                row.cells[1].vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-                row.cells[1].paragraphs[0].runs[0].font.bold = True
-
-                if not is_military_day:
-                    cell_slots = ScheduleSlot.objects.filter(
-                        group=group, semester=active_semester, day_of_week=day_num, time_slot=ts, is_active=True
-                    )
-
-                    if cell_slots.exists():
-                        cell = row.cells[2]
-                        p = cell.paragraphs[0]
-                        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-                        rooms =[]
-                        for idx, slot in enumerate(cell_slots):
-                            lesson_type_display = slot.get_lesson_type_display()
-                            week_mark = ""
-                            if slot.week_type == 'RED': week_mark = " (Красн.)"
-                            elif slot.week_type == 'BLUE': week_mark = " (Син.)"
-
-                            if idx > 0:
-                                p.add_run("\n-------------------\n")
-
-                            run = p.add_run(f"{slot.subject.name} ({lesson_type_display}){week_mark}\n")
-                            run.bold = True
-                            if slot.teacher:
-                                p.add_run(f"{slot.teacher.user.get_full_name()}")
-
-                            if slot.room:
-                                rooms.append(slot.room)
-
-                        cell_aud = row.cells[3]
-                        cell_aud.text = "\n".join(set(rooms)) if rooms else ""
-                        cell_aud.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        cell_aud.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-
-            day_cell = table.rows[first_row_idx].cells[0]
-            day_cell.text = day_name
-            day_cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-
-            tcPr = day_cell._tc.get_or_add_tcPr()
-            textDirection = OxmlElement('w:textDirection')
-            textDirection.set(qn('w:val'), 'btLr')
-            tcPr.append(textDirection)
-
-            shading_elm = OxmlElement('w:shd')
-            shading_elm.set(qn('w:val'), 'clear')
-            shading_elm.set(qn('w:color'), 'auto')
-            shading_elm.set(qn('w:fill'), 'D9D9D9')
-            tcPr.append(shading_elm)
-
-            last_row_idx = len(table.rows) - 1
-            if last_row_idx > first_row_idx:
-                day_cell.merge(table.rows[last_row_idx].cells[0])
-
-            if is_military_day:
-                top_left = table.rows[first_row_idx].cells[2]
-                bottom_right = table.rows[last_row_idx].cells[3]
-                top_left.merge(bottom_right)
-
-                top_left.text = t['military']
-
-                for paragraph in top_left.paragraphs:
-                    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    for run in paragraph.runs:
-                        run.bold = True
-                        run.font.size = Pt(48)
-                        run.font.name = 'Times New Roman'
-                top_left.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-
-        doc.add_paragraph().add_run('\n')
-
-        footer_table = doc.add_table(rows=1, cols=2)
-        footer_table.autofit = True
-        footer_table.width = section.page_width
-
-        f_c1 = footer_table.cell(0, 0)
-        fp1 = f_c1.paragraphs[0]
-        fp1.add_run(t['director']).bold = True
-
-        f_c2 = footer_table.cell(0, 1)
-        fp2 = f_c2.paragraphs[0]
-        fp2.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        fp2.add_run(director_name).bold = True
-
-        f = BytesIO()
-        doc.save(f)
-        f.seek(0)
-
-        filename = f"Jadval_{group.name}_{lang}.docx"
-        response = HttpResponse(f.read(), content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response = HttpResponse(data, content_type=export_render.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{exports.filename(group, lang, fmt)}"'
         return response
+    except Http404:
+        raise
     except Exception as e:
         logger.exception(
             "export_schedule: group_id=%s lang=%s user=%s error=%s",
             group_id, lang, request.user.username, e
         )
         return HttpResponse(_("Ошибка генерации документа"), status=500)
-    finally:
-        translation.deactivate()
+
+
+@user_passes_test(is_dean_or_admin)
+def export_schedule_batch(request):
+    """ZIP с расписаниями всех групп факультета, отдаётся потоком."""
+    fmt = request.GET.get('format', 'docx')
+    if fmt not in exports.FORMATS:
+        fmt = 'docx'
+    if not exports.available(fmt):
+        return HttpResponse(_("Library python-docx not installed"), status=500)
+
+    lang = request.GET.get('lang') or (translation.get_language() or 'ru')[:2]
+    if lang not in exports.LANGUAGES:
+        lang = 'ru'
+
+    profile = getattr(request.user, 'dean_profile', None) or getattr(request.user, 'vicedean_profile', None)
+    if profile:
+        faculty = profile.faculty
+    else:
+        faculty = get_object_or_404(Faculty, id=request.GET.get('faculty'))
+
+    groups = list(
+        Group.objects.filter(specialty__department__faculty=faculty)
+        .select_related('specialty__department__faculty__institute')
+        .annotate(student_count=Count('students'))
+        .order_by('course', 'name')
+    )
+    logger.info(
+        "export_schedule_batch: faculty=%s groups=%s lang=%s format=%s user=%s",
+        faculty.pk, len(groups), lang, fmt, request.user.username
+    )
+
+    response = StreamingHttpResponse(
+        exports.archive_stream(groups, lang, fmt, _group_schedule_snapshot),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="Jadval_{faculty.pk}_{lang}_{fmt}.zip"'
+    return response
 
 
 @user_passes_test(is_dean_or_admin)
@@ -1716,7 +1509,7 @@ def plan_detail(request, plan_id):
 
     target_course = (current_sem_num + 1) // 2
 
-    calendar_semester = Semester.get_current()
+    calendar_semester = semesters.for_request(request)
 
     credit_types = CreditType.objects.filter(Q(faculty=user_faculty) | Q(faculty__isnull=True))
 
@@ -1788,7 +1581,7 @@ def generate_subjects_from_rup(request):
     diagnostics =[]
 
     for group in groups:
-        active_semester = Semester.get_current()
+        active_semester = semesters.for_request(request)
         current_semester_num = (group.course - 1) * 2 + active_semester.number
 
         plan = None
@@ -1989,7 +1782,7 @@ def classroom_occupancy(request):
     day = int(request.GET.get('day', 0))
     shift_filter = request.GET.get('shift', '')
 
-    current_semester = Semester.get_current()
+    current_semester = semesters.for_request(request)
  
     classrooms = Classroom.objects.select_related('building').filter(is_active=True)
     institutes = []
@@ -2057,6 +1850,35 @@ def classroom_occupancy(request):
     })
 
 
+@user_passes_test(is_facility_admin)
+def classroom_utilization_api(request):
+    """Загрузка аудиторий, корпусов и институтов за семестр (см. room_analytics)."""
+    semester_id = request.GET.get('semester')
+    if semester_id:
+        try:
+            semester = Semester.objects.filter(pk=int(semester_id)).first()
+        except ValueError:
+            return JsonResponse({'error': _('Неверный семестр')}, status=400)
+    else:
+        semester = semesters.for_request(request)
+    if not semester:
+        return JsonResponse({'error': _('Семестр не найден')}, status=404)
+
+    data = room_analytics.utilization(semester)
+    if data is None:
+        return JsonResponse({'error': _('Семестр не найден')}, status=404)
+
+    profile = getattr(request.user, 'dean_profile', None) or getattr(request.user, 'vicedean_profile', None)
+    if profile and profile.faculty:
+        data = room_analytics.for_institute(data, profile.faculty.institute_id)
+    elif request.GET.get('institute'):
+        try:
+            data = room_analytics.for_institute(data, int(request.GET['institute']))
+        except ValueError:
+            return JsonResponse({'error': _('Неверный институт')}, status=400)
+    return JsonResponse(data)
+
+
 @login_required
 def import_schedule_view(request):
     if not (hasattr(request.user, 'dean_profile') or hasattr(request.user, 'vicedean_profile') or request.user.is_superuser):
@@ -2064,7 +1886,7 @@ def import_schedule_view(request):
         return redirect('schedule:view')
 
     if request.method == 'POST' and 'confirm_import' in request.POST:
-        semester = Semester.get_current()
+        semester = semesters.for_request(request)
 
         all_keys = [k for k in request.POST.keys() if k.startswith('item_') and k.endswith('_group_id')]
         if not all_keys:
@@ -2247,25 +2069,17 @@ def teacher_load_report(request):
         teachers = teachers.filter(department__faculty=faculty)
     
     report_data = []
-    
+    totals = load_planner.hours_by(Subject.objects.filter(teacher__in=teachers), 'teacher_id')
+
     for teacher in teachers:
-        subjects = teacher.subject_set.all()
-        
-        total_hours = 0
-        total_credits = 0
-        subjects_list = []
-        
-        for subj in subjects:
-            hours = subj.total_auditory_hours
-            total_hours += hours
-            total_credits += subj.credits
-            subjects_list.append(f"{subj.name} ({hours}ч)")
-            
+        hours = totals.get(teacher.id, {})
+        subjects_list = [f"{subj.name} ({subj.total_auditory_hours}ч)" for subj in teacher.subject_set.all()[:4]]
+
         report_data.append({
             'teacher': teacher,
-            'total_hours': total_hours,
-            'total_credits': total_credits,
-            'subjects_count': subjects.count(),
+            'total_hours': hours.get('lec', 0) + hours.get('prac', 0) + hours.get('kmro', 0),
+            'total_credits': hours.get('credits', 0),
+            'subjects_count': hours.get('count', 0),
             'subjects_names': ", ".join(subjects_list[:3]) + ("..." if len(subjects_list) > 3 else "")
         })
     
@@ -2457,13 +2271,10 @@ def delete_building(request, building_id):
 
 
 
-@login_required
-@require_POST
-def check_schedule_conflicts(request):
-    import json
-    data = json.loads(request.body)
-    
-    semester_id = data.get('semester_id')
+MAX_CONFLICT_CANDIDATES = 1000
+
+
+def _conflict_semester_id(semester_id):
     if semester_id is not None and semester_id != '':
         try:
             semester_id = int(semester_id)
@@ -2472,72 +2283,151 @@ def check_schedule_conflicts(request):
     if not semester_id:
         sem = Semester.get_current()
         semester_id = sem.pk if sem else None
-    day = data.get('day')
-    time_slot_id = data.get('time_slot_id')
-    group_id = data.get('group_id')
-    teacher_id = data.get('teacher_id') 
-    room_number = data.get('room') 
-    subject_id = data.get('subject_id')
-    
-    conflicts = []
-    
-    base_qs = ScheduleSlot.objects.filter(
-        semester_id=semester_id,
-        day_of_week=day,
-        time_slot_id=time_slot_id,
-        is_active=True
-    )
+    return semester_id
+
+
+def _conflict_placements(candidates):
+    """
+    Кандидаты → (day, time_slot_id, week_type, keys) для индекса занятости.
+    Кабинет по номеру ищется в институте группы; все номера — одним запросом.
+    """
+    numbers = {c['room'] for c in candidates if c.get('room') and not c.get('classroom_id')}
+    rooms_by_number = {}
+    institutes = {}
+    if numbers:
+        for room in Classroom.objects.filter(number__in=numbers, is_active=True).select_related('building'):
+            rooms_by_number.setdefault(room.number, []).append(room)
+        group_ids = {c['group_id'] for c in candidates if c.get('group_id')}
+        institutes = dict(
+            Group.objects.filter(id__in=group_ids).values_list('id', 'specialty__department__faculty__institute')
+        )
 
-    if group_id:
-        group_conflict = base_qs.filter(group_id=group_id).first()
-        if group_conflict:
-            conflicts.append({
-                'type': 'group',
-                'message': _(f"Группа {group_conflict.group.name} уже занята: {group_conflict.subject.name}")
-            })
+    placements = []
+    for c in candidates:
+        classroom_id = c.get('classroom_id') or None
+        room = c.get('room') or None
+        if room and not classroom_id:
+            matches = rooms_by_number.get(room, [])
+            institute_id = institutes.get(c.get('group_id'))
+            if institute_id:
+                matches = [r for r in matches if r.building and r.building.institute_id == institute_id]
+            if matches:
+                classroom_id, room = matches[0].id, None
+        keys = occupancy.slot_keys(c.get('group_id'), c.get('teacher_id'), classroom_id, room)
+        placements.append((int(c['day']), int(c['time_slot_id']), c.get('week_type') or 'EVERY', keys))
+    return placements
+
+
+def _conflict_message(kind, slot):
+    if kind == 'group':
+        return _("Группа %(group)s уже занята: %(subject)s") % {
+            'group': slot.group.name, 'subject': slot.subject.name,
+        }
+    if kind == 'teacher':
+        return _("Преподаватель %(teacher)s уже ведет пару в группе %(group)s") % {
+            'teacher': slot.teacher.user.get_full_name(), 'group': slot.group.name,
+        }
+    if slot.classroom:
+        building = slot.classroom.building.name if slot.classroom.building else '—'
+        return _("Кабинет %(room)s (%(building)s) занят: %(group)s, %(teacher)s") % {
+            'room': slot.classroom.number, 'building': building, 'group': slot.group.name,
+            'teacher': slot.teacher.user.last_name if slot.teacher else '',
+        }
+    return _("Кабинет %(room)s (текст) занят: %(group)s") % {'room': slot.room, 'group': slot.group.name}
+
+
+def _conflict_details(found):
+    ids = {slot_id for conflicts in found for _kind, slot_id in conflicts}
+    slots = ScheduleSlot.objects.filter(id__in=ids).select_related(
+        'group', 'subject', 'teacher__user', 'classroom__building'
+    ).in_bulk() if ids else {}
+    return [
+        [
+            {'type': kind, 'slot_id': slot_id, 'message': _conflict_message(kind, slots[slot_id])}
+            for kind, slot_id in conflicts if slot_id in slots
+        ]
+        for conflicts in found
+    ]
 
-    if teacher_id:
-        teacher_conflict = base_qs.filter(teacher_id=teacher_id).first()
-        if teacher_conflict:
-            conflicts.append({
-                'type': 'teacher',
-                'message': _(f"Преподаватель {teacher_conflict.teacher.user.get_full_name()} уже ведет пару в группе {teacher_conflict.group.name}")
-            })
 
-    if room_number:
-        
-        classroom_qs = Classroom.objects.filter(number=room_number, is_active=True)
-        
-        if group_id:
-            try:
-                grp = Group.objects.get(id=group_id)
-                inst = grp.specialty.department.faculty.institute
-                classroom_qs = classroom_qs.filter(building__institute=inst)
-            except Exception:
-                logger.exception("check_conflicts classroom filter")
-        
-        target_classroom = classroom_qs.first()
-        
-        if target_classroom:
-            room_conflict = base_qs.filter(classroom=target_classroom).first()
-            if room_conflict:
-                conflicts.append({
-                    'type': 'room',
-                    'message': _(f"Кабинет {room_number} ({target_classroom.building.name}) занят: {room_conflict.group.name}, {room_conflict.teacher.user.last_name if room_conflict.teacher else ''}")
-                })
-        else:
-            text_conflict = base_qs.filter(room=room_number).first()
-            if text_conflict:
-                 conflicts.append({
-                    'type': 'room',
-                    'message': _(f"Кабинет {room_number} (текст) занят: {text_conflict.group.name}")
-                })
+@login_required
+@require_POST
+def check_schedule_conflicts(request):
+    data = json.loads(request.body)
+    semester_id = _conflict_semester_id(data.get('semester_id'))
+    candidate = {
+        'day': data.get('day'),
+        'time_slot_id': data.get('time_slot_id'),
+        'group_id': data.get('group_id'),
+        'teacher_id': data.get('teacher_id'),
+        'room': data.get('room'),
+        'week_type': data.get('week_type'),
+    }
+    try:
+        placements = _conflict_placements([candidate])
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': _('Неверные данные')}, status=400)
+
+    found = occupancy.find_conflicts(semester_id, placements) if semester_id else [[]]
+    conflicts, seen = [], set()
+    for item in _conflict_details(found)[0]:
+        if item['type'] not in seen:
+            seen.add(item['type'])
+            conflicts.append({'type': item['type'], 'message': item['message']})
 
     if conflicts:
         return JsonResponse({'success': False, 'conflicts': conflicts})
-    
+
     return JsonResponse({'success': True})
 
+
+@login_required
+@require_POST
+def check_schedule_conflicts_batch(request):
+    """
+    Проверка многих вариантов размещения за один запрос.
+    Поля group_id, teacher_id, classroom_id, room, week_type верхнего уровня —
+    значения по умолчанию для каждого кандидата; details=false — без текстов
+    (только тип и id занятия), без обращения к БД за подробностями.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': _('Неверный JSON')}, status=400)
+
+    candidates = data.get('candidates')
+    if not isinstance(candidates, list) or not candidates:
+        return JsonResponse({'success': False, 'error': _('Не переданы варианты размещения')}, status=400)
+    if len(candidates) > MAX_CONFLICT_CANDIDATES:
+        return JsonResponse({
+            'success': False,
+            'error': _('Слишком много вариантов: не больше %(n)s за запрос') % {'n': MAX_CONFLICT_CANDIDATES},
+        }, status=400)
+
+    defaults = {
+        key: data[key]
+        for key in ('group_id', 'teacher_id', 'classroom_id', 'room', 'week_type')
+        if key in data
+    }
+    semester_id = _conflict_semester_id(data.get('semester_id'))
+    try:
+        placements = _conflict_placements([{**defaults, **c} for c in candidates])
+        exclude = {int(sid) for sid in data.get('exclude_slot_ids') or []}
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': _('Неверные данные')}, status=400)
+
+    found = occupancy.find_conflicts(semester_id, placements, exclude) if semester_id else [[] for _c in placements]
+    if data.get('details', True):
+        details = _conflict_details(found)
+    else:
+        details = [[{'type': kind, 'slot_id': slot_id} for kind, slot_id in conflicts] for conflicts in found]
+
+    return JsonResponse({
+        'success': True,
+        'semester_id': semester_id,
+        'results': [{'ok': not conflicts, 'conflicts': conflicts} for conflicts in details],
+    })
+
 @user_passes_test(lambda u: u.is_superuser or u.role in [
     'DEAN', 'VICE_DEAN', 'HEAD_OF_DEPT', 'DIRECTOR', 'PRO_RECTOR'
 ])
@@ -2975,6 +2865,7 @@ def auto_schedule_config(request):
         room_ids = request.POST.getlist('rooms')
 
         clear_existing = request.POST.get('clear_existing') == 'on'
+        warm_start = request.POST.get('warm_start') == 'on'
         avoid_gaps = request.POST.get('avoid_gaps') == 'on'
         strict_room_types = request.POST.get('strict_room_types') == 'on'
         overflow_mode = int(request.POST.get('overflow_mode', 1))
@@ -2984,76 +2875,57 @@ def auto_schedule_config(request):
             messages.error(request, "Выберите хотя бы одну группу.")
             return redirect('schedule:auto_schedule_config')
 
-        semester = Semester.get_current()
+        semester = semesters.for_request(request)
         target_groups = Group.objects.filter(id__in=group_ids)
 
-        logger.info(
-            "auto_schedule_config: starting generation user=%s semester=%s groups=%s "
-            "clear=%s avoid_gaps=%s strict_rooms=%s overflow=%s iterations=%s",
-            request.user.username, semester.pk, group_ids,
-            clear_existing, avoid_gaps, strict_room_types, overflow_mode, iterations
-        )
-
         if not institute and target_groups.exists():
             first_group = target_groups.first()
             if first_group.specialty and first_group.specialty.department.faculty:
                 institute = first_group.specialty.department.faculty.institute
 
-        try:
-            with transaction.atomic():
-                if clear_existing:
-                    ScheduleSlot.objects.filter(
-                        semester=semester,
-                        group__in=target_groups,
-                        is_military=False
-                    ).delete()
-
-                engine = AutoScheduleEngine(
-                    semester=semester,
-                    target_groups=target_groups,
-                    target_teachers=teacher_ids if teacher_ids else None,
-                    target_rooms=room_ids if room_ids else None,
-                    avoid_gaps=avoid_gaps,
-                    overflow_mode=overflow_mode,
-                    strict_room_types=strict_room_types,
-                    iterations=iterations,
-                    institute=institute
-                )
-                result = engine.generate()
+        task = TimetableGenerationTask.objects.create(
+            semester=semester,
+            institute=institute,
+            created_by=request.user,
+            params={
+                'group_ids': [int(g) for g in group_ids],
+                'teacher_ids': [int(t) for t in teacher_ids],
+                'room_ids': [int(r) for r in room_ids],
+                'clear_existing': clear_existing and not warm_start,
+                'warm_start': warm_start,
+                'avoid_gaps': avoid_gaps,
+                'strict_room_types': strict_room_types,
+                'overflow_mode': overflow_mode,
+                'iterations': iterations,
+            },
+        )
+        transaction.on_commit(lambda: start_timetable_task(str(task.id)))
 
-            if result['unassigned_count'] == 0:
-                logger.info(
-                    "auto_schedule_config: generation complete created=%s user=%s semester=%s",
-                    result['created'], request.user.username, semester.pk
-                )
-                messages.success(request, f"✨ Успех! Сгенерировано {result['created']} занятий. Проанализировано {iterations} вариантов.")
-            else:
-                logger.warning(
-                    "auto_schedule_config: generation partial created=%s unassigned=%s user=%s semester=%s details=%s",
-                    result['created'], result['unassigned_count'],
-                    request.user.username, semester.pk,
-                    result['unassigned_details'][:5]
-                )
-                error_list = "<br>".join(result['unassigned_details'][:10])
-                messages.warning(request, f"Сгенерировано {result['created']} занятий. Не удалось разместить {result['unassigned_count']} занятий (не хватило аудиторий или времени у преподавателей).<br><small>{error_list}</small>")
+        logger.info(
+            "auto_schedule_config: queued generation task_id=%s user=%s semester=%s groups=%s "
+            "clear=%s warm_start=%s avoid_gaps=%s strict_rooms=%s overflow=%s iterations=%s",
+            task.id, request.user.username, semester.pk, group_ids,
+            clear_existing, warm_start, avoid_gaps, strict_room_types, overflow_mode, iterations
+        )
 
-            if target_groups.exists():
-                request.session['last_constructor_group'] = str(target_groups.first().id)
-                return redirect(f"/schedule/constructor/?group={target_groups.first().id}")
-            return redirect('schedule:constructor')
+        request.session['last_constructor_group'] = str(group_ids[0])
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'task_id': str(task.id)})
+        return redirect(f"{reverse('schedule:auto_schedule_config')}?task={task.id}")
 
-        except Exception as e:
-            logger.exception(
-                "auto_schedule_config: generation failed user=%s semester=%s groups=%s error=%s",
-                request.user.username, semester.pk, group_ids, e
-            )
-            messages.error(request, _("Критическая ошибка алгоритма. См. журнал сервера."))
-            return redirect('schedule:auto_schedule_config')
+    active_task = None
+    task_param = request.GET.get('task')
+    if task_param:
+        try:
+            active_task = _timetable_tasks_for(request.user).filter(pk=uuid.UUID(task_param)).first()
+        except ValueError:
+            active_task = None
 
     return render(request, 'schedule/auto_schedule.html', {
         'groups': groups,
         'teachers': teachers,
-        'rooms': rooms
+        'rooms': rooms,
+        'active_task': active_task,
     })
 
 
@@ -3106,31 +2978,20 @@ def manage_teacher_availability(request):
     if teacher_id:
         selected_teacher = get_object_or_404(Teacher, id=teacher_id)
         if request.method == 'POST':
-            TeacherUnavailableSlot.objects.filter(teacher=selected_teacher).delete()
-            
-            new_slots = []
+            cells = []
             for key in request.POST.keys():
                 if key.startswith('slot_'):
                     parts = key.split('_')
-                    day = int(parts[1])
-                    ts_id = int(parts[2])
-                    new_slots.append(TeacherUnavailableSlot(
-                        teacher=selected_teacher,
-                        day_of_week=day,
-                        time_slot_id=ts_id
-                    ))
-            
-            if new_slots:
-                TeacherUnavailableSlot.objects.bulk_create(new_slots)
-                
+                    cells.append((int(parts[1]), int(parts[2])))
+            known_slots = set(TimeSlot.objects.filter(id__in={ts_id for _day, ts_id in cells}).values_list('id', flat=True))
+            cells = [(day, ts_id) for day, ts_id in cells if ts_id in known_slots]
+            availability.save_masks({selected_teacher.id: availability.to_mask(cells)})
+
             messages.success(request, f"График доступности для {selected_teacher.user.get_full_name()} успешно обновлен!")
             return redirect(f"{request.path}?teacher_id={teacher_id}")
-            
-        unavailable_qs = TeacherUnavailableSlot.objects.filter(teacher=selected_teacher)
-        for u in unavailable_qs:
-            if u.day_of_week not in unavailable_dict:
-                unavailable_dict[u.day_of_week] = {}
-            unavailable_dict[u.day_of_week][u.time_slot_id] = True
+
+        for day, ts_id in availability.cells_for([selected_teacher.id]).get(selected_teacher.id, []):
+            unavailable_dict.setdefault(day, {})[ts_id] = True
 
     return render(request, 'schedule/manage_teacher_availability.html', {
         'teachers': teachers,
@@ -3143,6 +3004,62 @@ def manage_teacher_availability(request):
 
 
 
+@login_required
+@require_POST
+def api_teacher_availability_batch(request):
+    """
+    Пакетное изменение графиков доступности:
+    {"teachers": [{"teacher_id": 5, "unavailable": [[день, time_slot_id], ...]},
+                  {"teacher_id": 7, "add": [[0, 3]], "remove": [[1, 4]]}]}
+    """
+    if not is_dean_or_admin(request.user):
+        return JsonResponse({'success': False, 'error': _('Нет прав')}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        changes = []
+        for item in data.get('teachers', []):
+            change = {'teacher_id': int(item['teacher_id'])}
+            for field in ('unavailable', 'add', 'remove'):
+                if field in item:
+                    change[field] = [(int(day), int(ts_id)) for day, ts_id in item[field]]
+            changes.append(change)
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'success': False, 'error': _('Неверный формат данных')}, status=400)
+
+    teacher_ids = {c['teacher_id'] for c in changes}
+    known = set(Teacher.objects.filter(id__in=teacher_ids).values_list('id', flat=True))
+    if teacher_ids - known:
+        return JsonResponse({
+            'success': False,
+            'error': _('Преподаватели не найдены: %(ids)s') % {'ids': ', '.join(map(str, sorted(teacher_ids - known)))}
+        }, status=400)
+
+    cells = [cell for c in changes for field in ('unavailable', 'add', 'remove') for cell in c.get(field, ())]
+    if any(not 0 <= day < availability.DAYS for day, _ts_id in cells):
+        return JsonResponse({'success': False, 'error': _('День недели должен быть от 0 до 5')}, status=400)
+    slot_ids = {ts_id for _day, ts_id in cells}
+    unknown_slots = slot_ids - set(TimeSlot.objects.filter(id__in=slot_ids).values_list('id', flat=True))
+    if unknown_slots:
+        return JsonResponse({
+            'success': False,
+            'error': _('Пары не найдены: %(ids)s') % {'ids': ', '.join(map(str, sorted(unknown_slots)))}
+        }, status=400)
+
+    masks = availability.apply_changes(changes)
+    logger.info(
+        "api_teacher_availability_batch: teachers=%s user=%s", len(masks), request.user.username
+    )
+    return JsonResponse({
+        'success': True,
+        'updated': len(masks),
+        'teachers': {
+            str(teacher_id): [list(cell) for cell in availability.to_cells(mask)]
+            for teacher_id, mask in masks.items()
+        },
+    })
+
+
 @login_required
 @require_POST
 def api_create_credit_type(request):
@@ -3488,7 +3405,7 @@ def clear_military_day(request):
         day_of_week = data.get('day_of_week')
  
         group    = get_object_or_404(Group, id=group_id)
-        semester = Semester.get_current()
+        semester = semesters.for_request(request)
  
         if hasattr(request.user, 'dean_profile'):
             faculty = request.user.dean_profile.faculty
@@ -3555,7 +3472,7 @@ def schedule_calendar(request):
     if group_id:
         selected_group = Group.objects.filter(id=group_id).first()
 
-    active_semester = Semester.get_current()
+    active_semester = semesters.for_request(request)
 
     can_edit = is_dean_or_admin(user)
     can_move_calendar = (
@@ -3609,7 +3526,7 @@ def calendar_sidebar_api(request):
         if not group:
             return JsonResponse({'weekly_slots': 0, 'unused_hours': []})
 
-        active_semester = Semester.get_current()
+        active_semester = semesters.for_request(request)
         if not active_semester:
             return JsonResponse({'weekly_slots': 0, 'unused_hours': []})
 
@@ -3637,17 +3554,19 @@ def calendar_sidebar_api(request):
         return JsonResponse({'weekly_slots': 0, 'unused_hours': []}, status=500)
 
 
-@login_required
-def schedule_calendar_events(request):
+CALENDAR_COLORS = {'LECTURE': '#2563eb', 'PRACTICE': '#16a34a', 'LAB': '#0891b2', 'SRSP': '#d97706'}
+CALENDAR_STREAM_CHUNK = 500
+
+
+def _calendar_scope(request):
+    """Занятия, период и задания LMS ленты календаря; считается один раз на запрос."""
+    scope = getattr(request, '_calendar_scope', None)
+    if scope is not None:
+        return scope
+
     group_id = request.GET.get('group')
     start_str = request.GET.get('start', '')[:10]
     end_str   = request.GET.get('end',   '')[:10]
-
-    logger.debug(
-        "schedule_calendar_events: user=%s group_id=%s start=%s end=%s",
-        request.user.username, group_id, start_str, end_str
-    )
-
     try:
         start_date = date_cls.fromisoformat(start_str)
         end_date   = date_cls.fromisoformat(end_str)
@@ -3656,7 +3575,6 @@ def schedule_calendar_events(request):
         end_date   = start_date + timedelta(days=35)
 
     user = request.user
-
     if group_id:
         slots_qs = ScheduleSlot.objects.filter(group_id=group_id, is_active=True)
     elif hasattr(user, 'student_profile') and getattr(user.student_profile, 'group', None):
@@ -3666,131 +3584,271 @@ def schedule_calendar_events(request):
     else:
         slots_qs = ScheduleSlot.objects.none()
 
-    slots_qs = slots_qs.select_related('subject', 'teacher__user', 'group', 'time_slot', 'semester', 'classroom')
-
-    slot_ids = list(slots_qs.values_list('id', flat=True))
-    exceptions_qs = SchedExc.objects.filter(
-        schedule_slot_id__in=slot_ids,
-        exception_date__gte=start_date,
-        exception_date__lte=end_date + timedelta(days=7),
+    semesters = list(
+        Semester.objects.filter(pk__in=slots_qs.values('semester_id'))
+        .order_by('pk').values_list('pk', 'schedule_version', 'schedule_updated_at')
     )
-    exc_map = {(e.schedule_slot_id, e.exception_date): e for e in exceptions_qs}
 
-    COLORS = {'LECTURE': '#2563eb', 'PRACTICE': '#16a34a', 'LAB': '#0891b2', 'SRSP': '#d97706'}
-    events =[]
+    assignments = []
+    if hasattr(user, 'student_profile') or hasattr(user, 'teacher_profile'):
+        assignments = list(Assignment.objects.filter(
+            due_date__gte=start_date, due_date__lte=end_date,
+            module__section__course__enrolments__user=user
+        ).order_by('pk').values_list(
+            'pk', 'due_date', 'module_id', 'module__title',
+            'module__section__course__short_name', 'module__section__course__updated_at',
+        ))
+
+    scope = {
+        'group_id': group_id, 'start': start_date, 'end': end_date,
+        'slots': slots_qs, 'semesters': semesters, 'assignments': assignments,
+    }
+    request._calendar_scope = scope
+    return scope
 
-    for slot in slots_qs:
-        sem = slot.semester
-        if not sem or not sem.start_date or not sem.end_date: continue
 
-        loop_start = max(sem.start_date, start_date)
-        days_ahead  = (slot.day_of_week - loop_start.weekday()) % 7
-        current     = loop_start + timedelta(days=days_ahead)
+def _calendar_etag(request):
+    scope = _calendar_scope(request)
+    state = repr((
+        request.user.pk, scope['group_id'], scope['start'], scope['end'],
+        [(pk, version) for pk, version, _changed in scope['semesters']],
+        [row[:5] for row in scope['assignments']],
+    ))
+    return hashlib.sha1(state.encode('utf-8')).hexdigest()
 
-        while current <= min(sem.end_date, end_date):
-            week_num = ((current - sem.start_date).days // 7) + 1
 
-            is_red = (week_num % 2 == 1)
-            show = (slot.week_type == 'EVERY' or (slot.week_type == 'RED' and is_red) or (slot.week_type == 'BLUE' and not is_red))
+def _calendar_last_modified(request):
+    scope = _calendar_scope(request)
+    stamps = [changed for _pk, _version, changed in scope['semesters'] if changed]
+    stamps += [row[5] for row in scope['assignments'] if row[5]]
+    return max(stamps, default=None)
 
-            if not show:
-                current += timedelta(weeks=1)
-                continue
 
-            exc = exc_map.get((slot.id, current))
+def _calendar_slot_events(slots, start_date, end_date):
+    """События занятий: развёртка recurrence.expand + исключения, поля занятия считаются один раз."""
+    slots = [s for s in slots if s.semester and s.semester.start_date and s.semester.end_date]
+    if not slots:
+        return
 
-            if exc and exc.exception_type == 'CANCEL':
-                events.append({
-                    'id': f'exc_cancel_{exc.id}',
-                    'title': f'❌ {slot.subject.name}',
-                    'start': f'{current}T{slot.time_slot.start_time.strftime("%H:%M:%S")}',
-                    'end': f'{current}T{slot.time_slot.end_time.strftime("%H:%M:%S")}',
-                    'color': '#9ca3af',
-                    'classNames':['fc-cancelled'],
-                    'extendedProps': {
-                        'cancelled': True, 'reason': exc.reason, 'exception_id': exc.id,
-                        'type_display': slot.get_lesson_type_display(),
-                        'group': slot.group.name,
-                        'teacher': slot.teacher.user.get_full_name() if slot.teacher else '—',
-                        'teacher_id': slot.teacher.user_id if slot.teacher else None,
-                        'room': slot.room or '—', 'slot_id': slot.id,
-                    }
-                })
-                current += timedelta(weeks=1)
-                continue
+    rows, ordinals = recurrence.expand(
+        [s.day_of_week for s in slots], [s.week_type for s in slots],
+        [s.semester.start_date for s in slots], [s.semester.end_date for s in slots],
+        start_date, end_date,
+    )
+    slot_ids = np.fromiter((s.id for s in slots), dtype=np.int64, count=len(slots))
+    occ_keys = recurrence.occurrence_keys(slot_ids[rows], ordinals)
 
-            if exc and exc.exception_type == 'RESCHEDULE' and exc.new_date:
-                new_st = exc.new_start_time or slot.time_slot.start_time
-                new_et = exc.new_end_time or slot.time_slot.end_time
-                if start_date <= exc.new_date <= end_date:
-                    events.append({
-                        'id': f'exc_moved_{exc.id}',
-                        'title': f'🔄 {slot.subject.name}',
-                        'start': f'{exc.new_date}T{new_st.strftime("%H:%M:%S")}',
-                        'end': f'{exc.new_date}T{new_et.strftime("%H:%M:%S")}',
-                        'color': COLORS.get(slot.lesson_type, '#6b7280'),
-                        'editable': True,
-                        'extendedProps': {
-                            'rescheduled': True, 'reason': exc.reason, 'exception_id': exc.id,
-                            'original_date': str(current),
-                            'type_display': slot.get_lesson_type_display(),
-                            'group': slot.group.name,
-                            'teacher': slot.teacher.user.get_full_name() if slot.teacher else '—',
-                            'teacher_id': slot.teacher.user_id if slot.teacher else None,
-                            'room': slot.room or '—', 'slot_id': slot.id,
-                        }
-                    })
-                current += timedelta(weeks=1)
-                continue
+    exceptions = list(SchedExc.objects.filter(
+        schedule_slot_id__in=slot_ids.tolist(),
+        exception_date__gte=start_date,
+        exception_date__lte=end_date,
+    ).order_by('pk'))
+    exc_index = recurrence.match_exceptions(
+        occ_keys,
+        recurrence.occurrence_keys(
+            [e.schedule_slot_id for e in exceptions], [e.exception_date.toordinal() for e in exceptions]
+        ),
+    )
+    iso = {o: date_cls.fromordinal(o).isoformat() for o in np.unique(ordinals).tolist()}
+
+    static = []
+    for slot in slots:
+        color = '#1f2937' if slot.is_military else CALENDAR_COLORS.get(slot.lesson_type, '#6b7280')
+        props = {
+            'type_display': slot.get_lesson_type_display(),
+            'group': slot.group.name,
+            'teacher': slot.teacher.user.get_full_name() if slot.teacher else '—',
+            'teacher_id': slot.teacher.user_id if slot.teacher else None,
+            'slot_id': slot.id,
+        }
+        static.append({
+            'slot': slot,
+            'props': props,
+            'color': color,
+            'start_time': slot.time_slot.start_time.strftime("%H:%M:%S"),
+            'end_time': slot.time_slot.end_time.strftime("%H:%M:%S"),
+            'room': slot.room or (slot.classroom.number if slot.classroom else '—'),
+        })
 
-            events.append({
-                'id': f'slot_{slot.id}_{current}',
-                'title': ('🪖 Воен. каф' if slot.is_military else slot.subject.name),
-                'start': f'{current}T{slot.time_slot.start_time.strftime("%H:%M:%S")}',
-                'end': f'{current}T{slot.time_slot.end_time.strftime("%H:%M:%S")}',
-                'backgroundColor': '#1f2937' if slot.is_military else COLORS.get(slot.lesson_type, '#6b7280'),
-                'borderColor': '#1f2937' if slot.is_military else COLORS.get(slot.lesson_type, '#6b7280'),
-                'textColor': '#ffffff',
-                'editable': True,
+    for row, ordinal, exc_i in zip(rows.tolist(), ordinals.tolist(), exc_index.tolist()):
+        info = static[row]
+        slot = info['slot']
+        current = iso[ordinal]
+        exc = exceptions[exc_i] if exc_i >= 0 else None
+
+        if exc and exc.exception_type == 'CANCEL':
+            yield {
+                'id': f'exc_cancel_{exc.id}',
+                'title': f'❌ {slot.subject.name}',
+                'start': f'{current}T{info["start_time"]}',
+                'end': f'{current}T{info["end_time"]}',
+                'color': '#9ca3af',
+                'classNames':['fc-cancelled'],
                 'extendedProps': {
-                    'slot_id': slot.id, 'original_date': str(current),
-                    'type_display': slot.get_lesson_type_display(),
-                    'group': slot.group.name, 'teacher': slot.teacher.user.get_full_name() if slot.teacher else '—',
-                    'teacher_id': slot.teacher.user_id if slot.teacher else None,
-                    'room': slot.room or (slot.classroom.number if slot.classroom else '—'),
-                    'is_stream': bool(slot.stream_id), 'military': slot.is_military,
-                    'lesson_type': slot.lesson_type,
+                    'cancelled': True, 'reason': exc.reason, 'exception_id': exc.id,
+                    **info['props'], 'room': slot.room or '—',
                 }
-            })
-            current += timedelta(weeks=1)
+            }
+            continue
 
-    if hasattr(user, 'student_profile') or hasattr(user, 'teacher_profile'):
-        assignments = Assignment.objects.filter(
-            due_date__gte=start_date, due_date__lte=end_date,
-            module__section__course__enrolments__user=user
-        ).select_related('module__section__course')
-
-        for ass in assignments:
-            events.append({
-                'id': f'lms_{ass.id}',
-                'title': f'📚 LMS Дедлайн: {ass.module.title} ({ass.module.section.course.short_name})',
-                'start': ass.due_date.isoformat(),
-                'color': '#8b5cf6',
-                'extendedProps': {
-                    'is_lms': True, 'url': f'/lms/modules/{ass.module.id}/'
+        if exc and exc.exception_type == 'RESCHEDULE' and exc.new_date:
+            new_st = exc.new_start_time or slot.time_slot.start_time
+            new_et = exc.new_end_time or slot.time_slot.end_time
+            if start_date <= exc.new_date <= end_date:
+                yield {
+                    'id': f'exc_moved_{exc.id}',
+                    'title': f'🔄 {slot.subject.name}',
+                    'start': f'{exc.new_date}T{new_st.strftime("%H:%M:%S")}',
+                    'end': f'{exc.new_date}T{new_et.strftime("%H:%M:%S")}',
+                    'color': CALENDAR_COLORS.get(slot.lesson_type, '#6b7280'),
+                    'editable': True,
+                    'extendedProps': {
+                        'rescheduled': True, 'reason': exc.reason, 'exception_id': exc.id,
+                        'original_date': current,
+                        **info['props'], 'room': slot.room or '—',
+                    }
                 }
-            })
+            continue
+
+        yield {
+            'id': f'slot_{slot.id}_{current}',
+            'title': ('🪖 Воен. каф' if slot.is_military else slot.subject.name),
+            'start': f'{current}T{info["start_time"]}',
+            'end': f'{current}T{info["end_time"]}',
+            'backgroundColor': info['color'],
+            'borderColor': info['color'],
+            'textColor': '#ffffff',
+            'editable': True,
+            'extendedProps': {
+                **info['props'], 'original_date': current,
+                'room': info['room'],
+                'is_stream': bool(slot.stream_id), 'military': slot.is_military,
+                'lesson_type': slot.lesson_type,
+            }
+        }
+
+
+def _calendar_lms_events(assignments):
+    for pk, due_date, module_id, title, short_name, _updated in assignments:
+        yield {
+            'id': f'lms_{pk}',
+            'title': f'📚 LMS Дедлайн: {title} ({short_name})',
+            'start': due_date.isoformat(),
+            'color': '#8b5cf6',
+            'extendedProps': {
+                'is_lms': True, 'url': f'/lms/modules/{module_id}/'
+            }
+        }
+
+
+def _stream_json_array(items, label):
+    encoder = DjangoJSONEncoder()
+    count = 0
+    chunk = []
+    yield '['
+    for item in items:
+        chunk.append(encoder.encode(item))
+        count += 1
+        if len(chunk) >= CALENDAR_STREAM_CHUNK:
+            yield (',' if count > len(chunk) else '') + ','.join(chunk)
+            chunk = []
+    if chunk:
+        yield (',' if count > len(chunk) else '') + ','.join(chunk)
+    yield ']'
+    logger.debug("%s: streamed %s events", label, count)
+
+
+@login_required
+@condition(etag_func=_calendar_etag, last_modified_func=_calendar_last_modified)
+def schedule_calendar_events(request):
+    scope = _calendar_scope(request)
+    start_date, end_date = scope['start'], scope['end']
 
     logger.debug(
-        "schedule_calendar_events: returning %s events for group=%s period=%s to %s",
-        len(events), group_id, start_date, end_date
+        "schedule_calendar_events: user=%s group_id=%s start=%s end=%s",
+        request.user.username, scope['group_id'], start_date, end_date
+    )
+
+    slots = scope['slots'].select_related('subject', 'teacher__user', 'group', 'time_slot', 'semester', 'classroom')
+    events = itertools.chain(
+        _calendar_slot_events(slots, start_date, end_date),
+        _calendar_lms_events(scope['assignments']),
+    )
+    return StreamingHttpResponse(
+        _stream_json_array(events, f"schedule_calendar_events group={scope['group_id']} period={start_date} to {end_date}"),
+        content_type='application/json',
     )
-    return JsonResponse(events, safe=False)
 
 
 
 
  
+ICAL_MAX_AGE = 3600
+
+
+def _ical_scope(request, token):
+    scope = getattr(request, '_ical_scope', None)
+    if scope is None:
+        parsed = ical.parse_token(token)
+        found = ical.feed_scope(*parsed) if parsed else None
+        semesters = []
+        if found:
+            semesters = list(
+                Semester.objects.filter(pk__in=found[1].values('semester_id'))
+                .order_by('pk').values_list('pk', 'schedule_version', 'schedule_updated_at')
+            )
+        scope = request._ical_scope = {'found': found, 'semesters': semesters}
+    return scope
+
+
+def _ical_etag(request, token):
+    scope = _ical_scope(request, token)
+    if scope['found'] is None:
+        return None
+    state = repr((token, scope['found'][0], [(pk, version) for pk, version, _changed in scope['semesters']]))
+    return hashlib.sha1(state.encode('utf-8')).hexdigest()
+
+
+def _ical_last_modified(request, token):
+    return max((changed for _pk, _version, changed in _ical_scope(request, token)['semesters'] if changed), default=None)
+
+
+@condition(etag_func=_ical_etag, last_modified_func=_ical_last_modified)
+def schedule_ical_feed(request, token):
+    """Лента .ics по подписанной ссылке; без сессии, чтобы её могли опрашивать календарные приложения."""
+    found = _ical_scope(request, token)['found']
+    if found is None:
+        raise Http404
+    name, slots = found
+
+    cache_key = f'schedule:ical:{_ical_etag(request, token)}'
+    body = cache.get(cache_key)
+    if body is None:
+        body = ical.build_feed(name, slots, _ical_last_modified(request, token))
+        cache.set(cache_key, body, ICAL_MAX_AGE)
+        logger.info("schedule_ical_feed: built feed %r, %s bytes", name, len(body))
+
+    response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="schedule.ics"'
+    patch_cache_control(response, private=True, max_age=ICAL_MAX_AGE)
+    return response
+
+
+@login_required
+def schedule_ical_link(request):
+    group_id = request.GET.get('group')
+    if group_id:
+        group = Group.objects.filter(id=group_id).first()
+        if not group:
+            return JsonResponse({'success': False, 'error': _('Группа не найдена')}, status=404)
+        token = ical.feed_token('g', group.id)
+    else:
+        token = ical.feed_token('u', request.user.pk)
+
+    url = request.build_absolute_uri(reverse('schedule:ical_feed', args=[token]))
+    return JsonResponse({'success': True, 'url': url, 'webcal': 'webcal://' + url.split('://', 1)[1]})
+
+
 @login_required
 @require_POST
 def calendar_move_slot(request):
@@ -3919,6 +3977,7 @@ def calendar_move_slot(request):
             ScheduleSlot.objects.filter(id=slot.id).update(**update_fields)
             if slot.stream_id:
                 ScheduleSlot.objects.filter(stream_id=slot.stream_id).update(**update_fields)
+            Semester.bump_schedule_version(slot.semester_id)
             return JsonResponse({'success': True, 'type': 'slot_updated'})
 
     except Exception as e:
@@ -3968,35 +4027,10 @@ def mass_cancel_day(request):
             logger.warning("Отказ в доступе: Нет прав")
             return JsonResponse({'success': False, 'error': 'Нет прав на массовую отмену'})
 
-        slots_count = slots.count()
-        logger.info(f"Найдено слотов для отмены: {slots_count}")
-
-        with transaction.atomic():
-            count = 0
-            for slot in slots:
-                sem = Semester.get_current(cancel_date)
-                if not sem or not sem.start_date:
-                    continue
+        result = cancellation.cancel_day(slots, cancel_date, reason)
 
-                week_num = ((cancel_date - sem.start_date).days // 7) + 1
-                is_red = (week_num % 2 == 1)
-                show = (slot.week_type == 'EVERY' or (slot.week_type == 'RED' and is_red) or (slot.week_type == 'BLUE' and not is_red))
-
-                if show:
-                    logger.info(f"Отменяем слот ID: {slot.id}, Предмет: {slot.subject.name}")
-                    SchedExc.objects.update_or_create(
-                        schedule_slot=slot, exception_date=cancel_date,
-                        defaults={'exception_type': 'CANCEL', 'reason': reason}
-                    )
-                    UnusedHourPool.objects.get_or_create(
-                        group=slot.group, subject=slot.subject, teacher=slot.teacher,
-                        semester=sem, original_date=cancel_date,
-                        defaults={'reason': reason}
-                    )
-                    count += 1
-
-        logger.info(f"=== УСПЕШНО ОТМЕНЕНО: {count} ПАР ===")
-        return JsonResponse({'success': True, 'count': count})
+        logger.info(f"=== УСПЕШНО ОТМЕНЕНО: {result['count']} ПАР ===")
+        return JsonResponse({'success': True, **result})
         
     except Exception as e:
         logger.exception(f"КРИТИЧЕСКАЯ ОШИБКА В MASS_CANCEL: {str(e)}")
@@ -4072,6 +4106,70 @@ def rup_parse_status(request, task_id):
     return JsonResponse(payload)
 
 
+def _timetable_tasks_for(user):
+    """Задачи генерации, которые пользователь может видеть и отменять: свои и своего института."""
+    tasks = TimetableGenerationTask.objects.all()
+    if user.is_superuser:
+        return tasks
+    mine = Q(created_by=user)
+    profile = getattr(user, 'dean_profile', None) or getattr(user, 'vicedean_profile', None)
+    if profile:
+        institute = profile.faculty.institute if profile.faculty else None
+    else:
+        profile = getattr(user, 'director_profile', None) or getattr(user, 'prorector_profile', None)
+        institute = profile.institute if profile else None
+    if institute:
+        mine |= Q(institute=institute)
+    return tasks.filter(mine)
+
+
+@login_required
+@user_passes_test(is_dean_or_admin)
+def timetable_task_status(request, task_id):
+    try:
+        task = _timetable_tasks_for(request.user).get(pk=task_id)
+    except TimetableGenerationTask.DoesNotExist:
+        return JsonResponse({'error': 'Task not found'}, status=404)
+
+    payload = {
+        'status': task.status,
+        'progress': task.progress,
+        'created_at': task.created_at.isoformat(),
+        'started_at': task.started_at.isoformat() if task.started_at else None,
+        'cancel_requested': task.cancel_requested,
+    }
+    if task.status == 'SUCCESS':
+        result = task.result or {}
+        payload['result'] = {
+            'created': result.get('created', 0),
+            'stopped': result.get('stopped', False),
+            'moved': result.get('moved', 0),
+            'removed': result.get('removed', 0),
+            'unassigned_count': result.get('unassigned_count', 0),
+            'unassigned_details': result.get('unassigned_details', [])[:10],
+        }
+        group_ids = task.params.get('group_ids') or []
+        payload['constructor_url'] = (
+            f"{reverse('schedule:constructor')}?group={group_ids[0]}" if group_ids
+            else reverse('schedule:constructor')
+        )
+    elif task.status == 'FAILURE':
+        payload['error'] = task.error
+    return JsonResponse(payload)
+
+
+@login_required
+@user_passes_test(is_dean_or_admin)
+@require_POST
+def timetable_task_cancel(request, task_id):
+    if not _timetable_tasks_for(request.user).filter(pk=task_id).exists():
+        return JsonResponse({'success': False, 'error': 'Task not found'}, status=404)
+    if not cancel_timetable_task(str(task_id)):
+        return JsonResponse({'success': False, 'error': 'Task is not running'}, status=409)
+    logger.info("timetable_task_cancel: task_id=%s user=%s", task_id, request.user.username)
+    return JsonResponse({'success': True})
+
+
 
 
 @login_required
@@ -4079,7 +4177,6 @@ def rup_parse_status(request, task_id):
 def department_load_summary(request):
     
     faculties_qs = Faculty.objects.prefetch_related(
-        'departments__subjects', 
         'departments__head__user', 
         'departments__teachers',
         'institute'
@@ -4089,7 +4186,10 @@ def department_load_summary(request):
         faculties_qs = faculties_qs.filter(id=request.user.dean_profile.faculty.id)
         
     report_data = []
-    
+    dept_hours = load_planner.hours_by(
+        Subject.objects.filter(is_active=True, department__faculty__in=faculties_qs), 'department_id'
+    )
+
     for faculty in faculties_qs:
         fac_data = {
             'faculty_name': f"{faculty.institute.name if faculty.institute else ''} - {faculty.name}",
@@ -4105,17 +4205,16 @@ def department_load_summary(request):
         }
         
         for dept in faculty.departments.all():
-            subjects = dept.subjects.filter(is_active=True)
-            
-            tot_lec = sum(s.lecture_hours for s in subjects)
-            tot_prac = sum(s.practice_hours + s.lab_hours for s in subjects)
-            tot_kmro = sum(s.control_hours for s in subjects)
+            hours = dept_hours.get(dept.id, {})
+
+            tot_lec = hours.get('lec', 0)
+            tot_prac = hours.get('prac', 0)
+            tot_kmro = hours.get('kmro', 0)
             tot_all = tot_lec + tot_prac + tot_kmro
-            
-            assigned_subs = subjects.filter(teacher__isnull=False)
-            ass_lec = sum(s.lecture_hours for s in assigned_subs)
-            ass_prac = sum(s.practice_hours + s.lab_hours for s in assigned_subs)
-            ass_kmro = sum(s.control_hours for s in assigned_subs)
+
+            ass_lec = hours.get('ass_lec', 0)
+            ass_prac = hours.get('ass_prac', 0)
+            ass_kmro = hours.get('ass_kmro', 0)
             ass_all = ass_lec + ass_prac + ass_kmro
             
             rem_lec = tot_lec - ass_lec